@@ -2,16 +2,32 @@
 from __future__ import annotations
 
 import os
+from concurrent.futures import TimeoutError as FuturesTimeout
+from datetime import datetime
 from decimal import Decimal, InvalidOperation
 from flask import (
-    Flask, render_template, render_template_string,
-    request, redirect, url_for, flash
+    Flask, Response, render_template, render_template_string,
+    request, redirect, url_for, flash, abort, stream_with_context
 )
 from flask_login import (
     LoginManager, UserMixin, login_user, logout_user,
     current_user, login_required
 )
 from flask import Blueprint
+from sqlalchemy.exc import SQLAlchemyError
+
+from inteligencia import bp as inteligencia_bp
+from monitoramento import bp as monitoramento_bp
+from relatorios import bp as relatorios_bp
+from tarefas import bp as tarefas_bp
+import tasks
+from services.account_cache import account_cache
+from services.client_registry import registry as client_registry
+from services.fanout import fan_out
+from services.order_history import EXPORTADORES, Filtros, contexto_historico
+from services import pnl, trade_sync
+from services.price_service import price_service
+from services.valuation import conversion_paths, value_balances
 
 # -------- Binance ----------
 try:
@@ -29,6 +45,9 @@ app.secret_key = os.getenv("SECRET_KEY", "dev-secret-change-me")
 login_manager = LoginManager(app)
 login_manager.login_view = "usuarios.login"
 
+# Prazo total das consultas à Binance no dashboard (segundos)
+DASHBOARD_DEADLINE_S = float(os.getenv("DASHBOARD_DEADLINE_S", "4.0"))
+
 
 # -----------------------------------------------------------------------------
 # Usuário em memória (admin fixo)
@@ -55,7 +74,7 @@ def load_user(user_id: str):
 # Helpers
 # -----------------------------------------------------------------------------
 def get_binance_client() -> Client | None:
-    """Cria o client se as variáveis de ambiente existirem."""
+    """Devolve o client (reaproveitado do registro) se as variáveis de ambiente existirem."""
     if Client is None:
         return None
     key = os.getenv("BINANCE_API_KEY")
@@ -63,7 +82,7 @@ def get_binance_client() -> Client | None:
     if not key or not sec:
         return None
     try:
-        return Client(api_key=key, api_secret=sec)
+        return client_registry.get(key, sec)
     except Exception:
         return None
 
@@ -125,34 +144,39 @@ def configurar_api():
 @login_required
 def ordens():
     """
-    Mostra últimas ordens para um símbolo:
-    1) tenta Spot (get_all_orders)
-    2) se não houver, tenta Futuros USD-M (futures_get_open_orders)
+    Últimas ordens (Spot e Futuros USD-M) de um símbolo, lidas da cópia
+    local. A sincronização incremental com a Binance roda em segundo plano
+    quando a cópia passa de TRADE_SYNC_STALE_S; na primeira visita a um
+    símbolo esperamos por ela até DASHBOARD_DEADLINE_S.
     """
     symbol = (request.args.get("symbol") or "BTCUSDT").upper()
     client = get_binance_client()
     error = None
-    orders = []
-    fonte = "spot"
 
     if client is None:
         error = "Defina BINANCE_API_KEY e BINANCE_API_SECRET no Render (Environment)."
     else:
-        # Spot
-        try:
-            orders = client.get_all_orders(symbol=symbol, limit=15) or []
-        except Exception as e:
-            error = f"Spot: {e}"
-
-        # Se não achou nada em Spot, tenta Futuros (USD-M)
-        if not orders:
-            try:
-                fonte = "futuros"
-                orders = client.futures_get_open_orders(symbol=symbol) or []
-                error = None  # sucesso em futuros
-            except Exception as e:
-                error = (error + f" | Futuros: {e}") if error else f"Futuros: {e}"
-
+        sincronizado = trade_sync.last_synced(current_user.id, symbol)
+        if sincronizado is None or (datetime.utcnow() - sincronizado).total_seconds() > trade_sync.TRADE_SYNC_STALE_S:
+            futuro = trade_sync.sync_in_background(client, current_user.id, symbol)
+            if sincronizado is None:
+                try:
+                    resultado = futuro.result(timeout=DASHBOARD_DEADLINE_S)
+                    erros = [v for k, v in resultado.items() if k.endswith("_erro")]
+                    if len(erros) == len(trade_sync.MARKETS):
+                        error = " | ".join(erros)
+                except FuturesTimeout:
+                    error = "Sincronizando o histórico com a Binance; recarregue em instantes."
+
+    orders = [
+        {
+            "orderId": o.order_id, "side": o.side, "type": o.tipo, "price": o.price,
+            "origQty": o.orig_qty, "status": o.status, "market": o.market,
+            "hora": datetime.utcfromtimestamp(o.time / 1000).strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        for o in trade_sync.local_orders(current_user.id, symbol, limite=50)
+    ]
+    fonte = ", ".join(sorted({o["market"] for o in orders})) or "local"
     return render_template(
         "painel/ordens.html",
         symbol=symbol, orders=orders, error=error, fonte=fonte
@@ -162,7 +186,23 @@ def ordens():
 @bp_usuarios.route("/historico")
 @login_required
 def historico():
-    return render_template("painel/historico.html")
+    return render_template("usuarios/historico.html", **contexto_historico(current_user.id, request.args))
+
+
+@bp_usuarios.route("/historico/exportar.<formato>")
+@login_required
+def historico_exportar(formato: str):
+    if formato not in EXPORTADORES:
+        abort(404)
+    try:
+        filtros = Filtros.from_args(request.args)
+    except ValueError:
+        abort(400)
+    gerar, mimetype = EXPORTADORES[formato]
+    return Response(
+        stream_with_context(gerar(current_user.id, filtros)), mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=historico.{formato}"},
+    )
 
 
 # ------------------------- PAINEL (OPERACAO) ---------------------------------
@@ -175,13 +215,24 @@ def dashboard():
     Também somamos as ordens abertas de Spot + Futuros.
     """
     alert_msgs: list[str] = []
-    spot_rows: list[dict] = []     # [{asset, free, locked, total}]
+    spot_rows: list[dict] = []     # [{asset, free, locked, total, usdt}]
     futures_usdt_balance = Decimal("0")
     abertas_total = 0
-    lucro_24h = Decimal("0")       # placeholder
+
+    def lucro_do_usuario(precos=None) -> dict:
+        if not current_user.is_authenticated:
+            return {}
+        try:
+            # lido dos trades copiados por services.trade_sync, sem chamar a Binance
+            return pnl.resumo(current_user.id, precos)
+        except SQLAlchemyError as e:
+            alert_msgs.append(f"Lucro indisponível ({e.__class__.__name__}).")
+            return {}
 
     client = get_binance_client()
     if client is None:
+        lucro = lucro_do_usuario()
+        lucro_24h = lucro.get("24h", Decimal("0"))
         alert_msgs.append(
             "Defina BINANCE_API_KEY e BINANCE_API_SECRET em Settings → Environment (no Render)."
         )
@@ -190,65 +241,129 @@ def dashboard():
             alert="<br>".join(alert_msgs),
             abertas=abertas_total,
             lucro_24h=fmt_decimal(lucro_24h, 2),
+            lucro={k: fmt_decimal(v, 2) for k, v in lucro.items()},
             saldo_total_usdt="0",
             spot_rows=[],
-            futures_usdt="0"
+            futures_usdt="0",
+            timings=[],
+            indisponiveis=[],
         )
 
+    # As quatro consultas são independentes: disparamos em paralelo e
+    # esperamos no máximo DASHBOARD_DEADLINE_S; o que não voltar a tempo
+    # aparece como indisponível em vez de travar a página inteira.
+    # Seções ainda frescas no cache compartilhado entre workers nem saem daqui.
+    account_calls = {
+        "spot_saldos": client.get_account,
+        "spot_ordens": client.get_open_orders,
+        "futuros_saldo": client.futures_account_balance,
+        "futuros_ordens": client.futures_get_open_orders,
+    }
+    fp = client_registry.fingerprint_of(client)
+    generation = account_cache.generation(fp) if fp else -1
+    cached = account_cache.get(fp, account_calls) if fp else {}
+    calls = {name: fn for name, fn in account_calls.items() if name not in cached}
+    # públicos e em cache: normalmente voltam na hora
+    calls["precos"] = price_service.snapshot
+    calls["conversoes"] = conversion_paths
+    results = fan_out(calls, deadline_s=DASHBOARD_DEADLINE_S)
+
+    for r in results.values():
+        client_registry.report_error(client, r.error)
+    fresh = {name: r.value for name, r in results.items() if r.ok and name in account_calls}
+    if fp and fresh:
+        account_cache.put(fp, fresh, generation)
+    failed = [name for name in account_calls if name not in cached and name not in fresh]
+    stale = account_cache.get(fp, failed, max_age_s=float("inf")) if fp and failed else {}
+
+    indisponiveis = [r.name for r in results.values() if r.status == "timeout"]
+    timings = [{"nome": name, "status": "cache", "ms": 0.0} for name in cached]
+    timings += [
+        {"nome": r.name, "status": r.status, "ms": round(r.elapsed_ms, 1)}
+        for r in results.values()
+    ]
+
+    def section(name: str, label: str):
+        if name in cached:
+            return cached[name][0]
+        r = results[name]
+        if r.ok:
+            return r.value
+        if r.status == "timeout":
+            alert_msgs.append(f"{label}: sem resposta em {DASHBOARD_DEADLINE_S:g}s (indisponível).")
+        else:
+            alert_msgs.append(f"Falha ao buscar {label} ({r.error}).")
+        if name in stale:
+            value, age = stale[name]
+            alert_msgs.append(f"Exibindo {label} de {age:.0f}s atrás.")
+            return value
+        return None
+
     # ----------------- SPOT: todos os ativos com saldo -----------------
-    try:
-        acct = client.get_account() or {}
-        balances = acct.get("balances", [])
-        # somamos free + locked e filtramos quem tem algo (>0)
-        for b in balances:
-            asset = b.get("asset")
-            free = to_decimal(b.get("free", "0"))
-            locked = to_decimal(b.get("locked", "0"))
-            total = free + locked
-            if total > 0:
-                spot_rows.append(
-                    {
-                        "asset": asset,
-                        "free": free,
-                        "locked": locked,
-                        "total": total,
-                        "free_str": fmt_decimal(free),
-                        "locked_str": fmt_decimal(locked),
-                        "total_str": fmt_decimal(total),
-                    }
-                )
-    except Exception as e:
-        alert_msgs.append(f"Falha ao buscar saldos Spot ({e}).")
-
-    # ordena decrescente por total
-    spot_rows.sort(key=lambda r: r["total"], reverse=True)
-
-    # saldo “principal”: se houver USDT no spot, usamos; caso contrário 0
-    saldo_usdt_spot = next((r["total"] for r in spot_rows if r["asset"] == "USDT"), Decimal("0"))
+    acct = section("spot_saldos", "saldos Spot") or {}
+    # somamos free + locked e filtramos quem tem algo (>0)
+    for b in acct.get("balances", []):
+        asset = b.get("asset")
+        free = to_decimal(b.get("free", "0"))
+        locked = to_decimal(b.get("locked", "0"))
+        total = free + locked
+        if total > 0:
+            spot_rows.append(
+                {
+                    "asset": asset,
+                    "free": free,
+                    "locked": locked,
+                    "total": total,
+                    "free_str": fmt_decimal(free),
+                    "locked_str": fmt_decimal(locked),
+                    "total_str": fmt_decimal(total),
+                }
+            )
+
+    # ----------------- SPOT: valor de cada ativo em USDT -----------------
+    snap = section("precos", "preços")
+    paths = section("conversoes", "pares de conversão")
+    if snap is not None and paths is not None:
+        valuation = value_balances(
+            {r["asset"]: float(r["total"]) for r in spot_rows}, snap.prices, paths
+        )
+        if valuation.unpriced:
+            alert_msgs.append("Sem cotação em USDT para: " + ", ".join(valuation.unpriced))
+    else:
+        valuation = None
+    for r in spot_rows:
+        if valuation is not None:
+            usdt = to_decimal(valuation.per_asset.get(r["asset"], 0))
+        else:
+            usdt = r["total"] if r["asset"] == "USDT" else Decimal("0")
+        r["usdt"] = usdt
+        r["usdt_str"] = fmt_decimal(usdt, 2)
+
+    # uma leitura só: realizado e em aberto saem juntos, sob o lock do usuário
+    lucro = lucro_do_usuario(snap.prices if snap is not None else None)
+    lucro_24h = lucro.get("24h", Decimal("0"))
+
+    # ordena decrescente pelo valor em USDT
+    spot_rows.sort(key=lambda r: (r["usdt"], r["total"]), reverse=True)
+
+    saldo_usdt_spot = sum((r["usdt"] for r in spot_rows), Decimal("0"))
 
     # ----------------- SPOT: ordens abertas -----------------
-    try:
-        abertas_spot = client.get_open_orders() or []
+    abertas_spot = section("spot_ordens", "ordens Spot")
+    if abertas_spot:
         abertas_total += len(abertas_spot)
-    except Exception as e:
-        alert_msgs.append(f"Falha ao buscar ordens Spot ({e}).")
 
     # ----------------- FUTUROS USD-M: balanço USDT + ordens -----------------
-    try:
-        f_balances = client.futures_account_balance() or []
-        usdt_row = next((r for r in f_balances if r.get("asset") == "USDT"), None)
-        if usdt_row:
-            futures_usdt_balance = to_decimal(usdt_row.get("balance", "0"))
-        try:
-            f_open = client.futures_get_open_orders() or []
-            abertas_total += len(f_open)
-        except Exception as e:
-            alert_msgs.append(f"Falha ao buscar ordens Futuros ({e}).")
-    except Exception as e:
-        # pode falhar se a conta não tiver futuros habilitado
-        alert_msgs.append(f"Falha ao buscar saldo Futuros ({e}).")
-
-    # total “USDT” combinando Spot(USDT) + Futuros(USDT)
+    # pode falhar se a conta não tiver futuros habilitado
+    f_balances = section("futuros_saldo", "saldo Futuros") or []
+    usdt_row = next((r for r in f_balances if r.get("asset") == "USDT"), None)
+    if usdt_row:
+        futures_usdt_balance = to_decimal(usdt_row.get("balance", "0"))
+    f_open = section("futuros_ordens", "ordens Futuros")
+    if f_open:
+        abertas_total += len(f_open)
+
+    # total “USDT” combinando Spot (todos os ativos) + Futuros(USDT)
     saldo_total_usdt = saldo_usdt_spot + futures_usdt_balance
 
     return render_template(
@@ -256,9 +371,12 @@ def dashboard():
         alert="<br>".join(alert_msgs) if alert_msgs else None,
         abertas=abertas_total,
         lucro_24h=fmt_decimal(lucro_24h, 2),
+        lucro={k: fmt_decimal(v, 2) for k, v in lucro.items()},
         saldo_total_usdt=fmt_decimal(saldo_total_usdt, 2),
         spot_rows=spot_rows,
         futures_usdt=fmt_decimal(futures_usdt_balance, 2),
+        timings=timings,
+        indisponiveis=indisponiveis,
     )
 
 
@@ -273,7 +391,11 @@ def painel_root():
 @bp_auto.route("/painel")
 @login_required
 def painel_automatico():
-    return render_template("painel/automatico.html")
+    try:
+        job = tasks.coordenador.job("auto", current_user.id)
+    except SQLAlchemyError:
+        job = None
+    return render_template("painel/automatico.html", job=job)
 
 
 # -----------------------------------------------------------------------------
@@ -295,6 +417,15 @@ def healthz():
 app.register_blueprint(bp_usuarios)
 app.register_blueprint(bp_painel)
 app.register_blueprint(bp_auto)
+app.register_blueprint(inteligencia_bp)
+app.register_blueprint(monitoramento_bp)
+app.register_blueprint(relatorios_bp)
+app.register_blueprint(tarefas_bp)
+
+# sob o gunicorn o agendador sobe no post_worker_init; em ``flask run`` /
+# ``python app.py`` não há esse hook, então run_local.sh liga por aqui
+if os.getenv("SCHEDULER_AUTOSTART") == "1":
+    tasks.iniciar()
 
 
 # -----------------------------------------------------------------------------
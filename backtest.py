@@ -0,0 +1,237 @@
+"""Backtest de ``strategy.decide_and_execute`` sobre candles armazenados.
+
+Os candles (de ``services.kline_store`` ou de qualquer array) são
+reproduzidos um a um: a cada fechamento os indicadores incrementais são
+atualizados, a estratégia é chamada com um client simulado no lugar do
+``binance.client.Client`` e ordens a mercado são executadas no fechamento,
+com comissão calculada por ``calcular_comissao``. O resultado traz curva de
+patrimônio, drawdown e a lista de negociações. Execuções independentes
+podem ser distribuídas entre processos com :func:`executar_em_paralelo`.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Sequence
+
+import numpy as np
+
+from inteligencia_financeira.incremental import IndicadoresIncrementais
+from inteligencia_financeira.utils import calcular_comissao
+from strategy import decide_and_execute
+
+BACKTEST_PROCESSOS = int(os.getenv("BACKTEST_PROCESSOS", str(os.cpu_count() or 2)))
+
+
+class OrdemRecusada(Exception):
+    """Ordem que a corretora simulada recusaria (saldo insuficiente etc.)."""
+
+
+class OrdemInexistente(Exception):
+    """``get_order`` de um id desconhecido (código -2013, como na Binance)."""
+
+    code = -2013
+
+
+class SimulatedClient:
+    """Subconjunto de ``binance.client.Client`` usado pela estratégia.
+
+    Ordens a mercado são executadas no fechamento do candle corrente; a
+    comissão sai do ativo de cotação.
+    """
+
+    def __init__(self, symbol: str, saldo_cotacao: float, taxa: float = 0.001) -> None:
+        self.symbol = symbol
+        self.taxa = taxa
+        self.cotacao = float(saldo_cotacao)  # ex.: USDT
+        self.base = 0.0                      # ex.: BTC
+        self.preco = 0.0
+        self.tempo = 0
+        self.trades: list[dict] = []
+        self._por_client_id: dict[str, dict] = {}
+        self._proximo_id = 1
+
+    def avancar(self, tempo: int, preco: float) -> None:
+        self.tempo = tempo
+        self.preco = preco
+
+    def get_symbol_ticker(self, symbol: str) -> dict:
+        return {"symbol": symbol, "price": repr(self.preco)}
+
+    def get_order(self, symbol: str, origClientOrderId: str, **_: Any) -> dict:
+        try:
+            return self._por_client_id[origClientOrderId]
+        except KeyError:
+            raise OrdemInexistente("Order does not exist.") from None
+
+    def create_order(self, symbol: str, side: str, type: str, quantity,
+                     newClientOrderId: str | None = None, **_: Any) -> dict:
+        if type != "MARKET":
+            raise OrdemRecusada(f"tipo {type} não suportado no backtest")
+        qty = float(quantity)
+        valor = qty * self.preco
+        comissao = calcular_comissao(valor, self.taxa)
+        if side == "BUY":
+            if valor + comissao > self.cotacao:
+                raise OrdemRecusada("saldo insuficiente")
+            self.cotacao -= valor + comissao
+            self.base += qty
+        else:
+            if qty > self.base + 1e-12:
+                raise OrdemRecusada("saldo insuficiente")
+            self.cotacao += valor - comissao
+            self.base -= qty
+        trade = {
+            "orderId": self._proximo_id, "symbol": symbol, "side": side, "type": type,
+            "status": "FILLED", "price": self.preco, "executedQty": qty,
+            "cummulativeQuoteQty": valor, "commission": comissao, "transactTime": self.tempo,
+        }
+        self._proximo_id += 1
+        self.trades.append(trade)
+        if newClientOrderId:
+            trade["clientOrderId"] = newClientOrderId
+            self._por_client_id[newClientOrderId] = trade
+        return trade
+
+    def patrimonio(self) -> float:
+        return self.cotacao + self.base * self.preco
+
+
+class AnaliseCruzamento:
+    """Sinal de entrada/saída pelos indicadores, no formato de ``solicitar_analise_json``.
+
+    ``compra`` quando o MACD cruza a linha de sinal para cima com RSI abaixo
+    de ``rsi_max``; ``venda`` no cruzamento para baixo. Entre cruzamentos
+    devolve ``aguardar``.
+    """
+
+    _COMPRA = {"sugestao": "compra"}
+    _VENDA = {"sugestao": "venda"}
+    _AGUARDAR = {"sugestao": "aguardar"}
+
+    def __init__(self, indicadores: IndicadoresIncrementais, rsi_max: float = 70.0) -> None:
+        self.indicadores = indicadores
+        self.rsi_max = rsi_max
+        self._acima: bool | None = None
+
+    def __call__(self) -> dict:
+        macd, sinal = self.indicadores.macd.valor
+        acima = macd > sinal
+        anterior, self._acima = self._acima, acima
+        if anterior is None or acima == anterior:
+            return self._AGUARDAR
+        if acima:
+            return self._COMPRA if self.indicadores.rsi.valor < self.rsi_max else self._AGUARDAR
+        return self._VENDA
+
+
+@dataclass
+class ResultadoBacktest:
+    symbol: str
+    tempos: np.ndarray
+    patrimonio: np.ndarray
+    trades: list[dict]
+    recusadas: int
+    segundos: float
+    params: dict = field(default_factory=dict)
+
+    @property
+    def drawdown(self) -> np.ndarray:
+        """Queda relativa ao topo anterior, candle a candle (≤ 0)."""
+        if self.patrimonio.size == 0:
+            return self.patrimonio
+        topo = np.maximum.accumulate(self.patrimonio)
+        return self.patrimonio / topo - 1
+
+    @property
+    def max_drawdown(self) -> float:
+        dd = self.drawdown
+        return float(dd.min()) if dd.size else 0.0
+
+    @property
+    def retorno_pct(self) -> float:
+        if self.patrimonio.size == 0 or self.patrimonio[0] == 0:
+            return 0.0
+        return float((self.patrimonio[-1] / self.patrimonio[0] - 1) * 100)
+
+    @property
+    def candles_por_minuto(self) -> float:
+        return self.patrimonio.size / self.segundos * 60 if self.segundos else float("inf")
+
+    def resumo(self) -> dict:
+        return {
+            "symbol": self.symbol,
+            "candles": int(self.patrimonio.size),
+            "trades": len(self.trades),
+            "recusadas": self.recusadas,
+            "retorno_pct": self.retorno_pct,
+            "max_drawdown_pct": self.max_drawdown * 100,
+            "comissoes": float(sum(t["commission"] for t in self.trades)),
+            "candles_por_minuto": self.candles_por_minuto,
+            **self.params,
+        }
+
+
+def executar_backtest(
+    fechamentos: Sequence[float],
+    tempos: Sequence[int] | None = None,
+    symbol: str = "BTCUSDT",
+    saldo_inicial: float = 10_000.0,
+    quantidade: str = "0.001",
+    taxa: float = 0.001,
+    indicadores: dict | None = None,
+    analise: Callable[[IndicadoresIncrementais], Callable[[], dict]] = AnaliseCruzamento,
+    estrategia: Callable[..., dict] = decide_and_execute,
+) -> ResultadoBacktest:
+    """Reproduz os candles pela estratégia e devolve o resultado."""
+    precos = np.asarray(fechamentos, dtype=np.float64)
+    n = precos.size
+    tempos_arr = np.arange(n, dtype=np.int64) if tempos is None else np.asarray(tempos, dtype=np.int64)
+    ind = IndicadoresIncrementais(**(indicadores or {}))
+    analisar = analise(ind)
+    client = SimulatedClient(symbol, saldo_inicial, taxa)
+    patrimonio = np.empty(n)
+    recusadas = 0
+
+    inicio = time.perf_counter()
+    atualizar, avancar = ind.atualizar, client.avancar
+    for i, (t, preco) in enumerate(zip(tempos_arr.tolist(), precos.tolist())):
+        avancar(t, preco)
+        atualizar(preco)
+        r = estrategia("backtest", client, analisar=analisar, symbol=symbol, quantidade=quantidade, chave=t)
+        if "erro" in r:
+            recusadas += 1
+        patrimonio[i] = client.cotacao + client.base * preco
+    segundos = time.perf_counter() - inicio
+
+    params = {"quantidade": quantidade, "taxa": taxa, **(indicadores or {})}
+    return ResultadoBacktest(symbol, tempos_arr, patrimonio, client.trades, recusadas, segundos, params)
+
+
+def backtest_armazenado(symbol: str, intervalo: str, inicio_ms: int | None = None,
+                        fim_ms: int | None = None, **kwargs) -> ResultadoBacktest:
+    """Backtest sobre os candles do armazenamento local."""
+    from services.kline_store import kline_store
+
+    cols = kline_store.range(symbol, intervalo, inicio_ms, fim_ms)
+    return executar_backtest(cols["close"], cols["open_time"], symbol=symbol, **kwargs)
+
+
+def _executar_config(config: dict) -> dict:
+    return backtest_armazenado(**config).resumo()
+
+
+def executar_em_paralelo(configs: Sequence[dict], processos: int = BACKTEST_PROCESSOS) -> list[dict]:
+    """Roda ``backtest_armazenado(**config)`` para cada config em processos separados.
+
+    Devolve os resumos na mesma ordem das configs.
+    """
+    if processos <= 1 or len(configs) <= 1:
+        return [_executar_config(c) for c in configs]
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(processos, len(configs)), mp_context=ctx) as pool:
+        return list(pool.map(_executar_config, configs))
@@ -0,0 +1,87 @@
+"""Ocupação dos workers: análise do GPT síncrona x em job de segundo plano.
+
+Simula ``workers`` workers síncronos do gunicorn (threads) recebendo uma
+rajada de ``pedidos`` análises com prompts distintos, contra o servidor
+OpenAI falso local. No modo síncrono cada worker fica preso durante a
+chamada; no modo job ele só enfileira e a chamada roda no pool de
+``AIJobs``. Mede a latência da resposta HTTP, a ocupação dos workers e a
+vazão da fila.
+
+Uso: python -m benchmarks.analise_jobs [pedidos] [workers] [latencia_s] [threads_job]
+"""
+
+from __future__ import annotations
+
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from openai import OpenAI
+
+from benchmarks.fake_openai import FakeOpenAI
+from services.ai_cache import AICache, cached_chat
+from services.ai_jobs import AIJobs
+from services.single_flight import SingleFlight
+
+
+def _mensagens(i: int) -> list:
+    return [{"role": "user", "content": f"Analise RSI {30 + i % 40} MACD {i * 0.01:.2f} pedido {i}"}]
+
+
+def _pool_http(workers: int, pedidos: int, handler) -> tuple[list[float], float]:
+    """Latência de cada resposta (chegada simultânea) e tempo total dos workers ocupados."""
+    chegada = time.perf_counter()
+
+    def atender(i):
+        t0 = time.perf_counter()
+        handler(i)
+        t1 = time.perf_counter()
+        return t1 - chegada, t1 - t0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        res = list(pool.map(atender, range(pedidos)))
+    return [r[0] for r in res], sum(r[1] for r in res)
+
+
+def main(pedidos: int = 64, workers: int = 4, latencia_s: float = 0.5, threads_job: int = 16) -> None:
+    tmp = Path(tempfile.mkdtemp())
+    with FakeOpenAI(latencia_s=latencia_s) as fake:
+        api = OpenAI(base_url=f"{fake.url}/v1", api_key="stub", max_retries=0)
+
+        def chamar(i, rodada):
+            return cached_chat(api, "gpt-4o-mini", _mensagens(i + rodada * pedidos),
+                               cache=AICache(path=str(tmp / "ai.db")), sf=SingleFlight(path=str(tmp / "sf.db")))
+
+        t0 = time.perf_counter()
+        lat_sync, ocupado_sync = _pool_http(workers, pedidos, lambda i: chamar(i, 0))
+        total_sync = time.perf_counter() - t0
+
+        jobs = AIJobs(path=str(tmp / "jobs.db"), workers=threads_job)
+        ids = []
+        t0 = time.perf_counter()
+        lat_job, ocupado_job = _pool_http(workers, pedidos, lambda i: ids.append(jobs.submit(lambda: chamar(i, 1))))
+        pendentes = set(ids)
+        while pendentes:
+            time.sleep(0.01)
+            pendentes = {j for j in pendentes if jobs.status(j)["status"] not in ("concluido", "erro")}
+        total_job = time.perf_counter() - t0
+        resumo = jobs.resumo()
+
+    def p(lat, q):
+        return sorted(lat)[min(len(lat) - 1, int(q * len(lat)))] * 1000
+
+    print(f"{pedidos} análises, {workers} workers http, OpenAI falsa com {latencia_s * 1000:.0f} ms")
+    print(f"síncrono: resposta p50 {p(lat_sync, .5):7.0f} ms  p99 {p(lat_sync, .99):7.0f} ms  "
+          f"ocupação {ocupado_sync / (workers * total_sync):5.0%}  vazão {pedidos / total_sync:6.1f}/s")
+    print(f"job:      resposta p50 {p(lat_job, .5):7.1f} ms  p99 {p(lat_job, .99):7.1f} ms  "
+          f"ocupação {ocupado_job / (workers * total_job):5.1%}  vazão {pedidos / total_job:6.1f}/s")
+    print(f"  fila: {threads_job} threads, pico {resumo['pico_ativos']} ativas, espera média "
+          f"{resumo['espera_media_ms']} ms, execução média {resumo['execucao_media_ms']} ms, "
+          f"erros {resumo['erros']}, pico na OpenAI falsa {fake.pico}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:5]
+    main(*(t(a) for t, a in zip((int, int, float, int), args)))
@@ -0,0 +1,27 @@
+"""Vazão do backtest de ``strategy.decide_and_execute`` em um núcleo.
+
+Uso: python -m benchmarks.backtest [candles]
+"""
+
+from __future__ import annotations
+
+import sys
+
+import numpy as np
+
+from backtest import executar_backtest
+
+
+def main(candles: int = 1_000_000) -> None:
+    rng = np.random.default_rng(42)
+    precos = 30_000 * np.cumprod(1 + rng.normal(0, 0.002, candles))
+    r = executar_backtest(precos)
+    resumo = r.resumo()
+    print(f"{candles} candles em {r.segundos:.2f} s")
+    print(f"  candles/minuto: {resumo['candles_por_minuto']:,.0f}")
+    print(f"  trades: {resumo['trades']}  recusadas: {resumo['recusadas']}")
+    print(f"  retorno: {resumo['retorno_pct']:.2f}%  max drawdown: {resumo['max_drawdown_pct']:.2f}%")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
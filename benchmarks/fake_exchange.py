@@ -0,0 +1,111 @@
+"""Corretora falsa local para medir o envio de ordens sem tocar a Binance.
+
+Atende ``POST``/``GET`` em ``/api/v3/order`` e ``/fapi/v1/order`` com
+assinatura HMAC, rejeita ``newClientOrderId`` repetido e pode perder uma
+fração das respostas *depois* de registrar a ordem (o caso que força a
+consulta por ``origClientOrderId`` antes de reenviar).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+
+class FakeExchange:
+    def __init__(self, api_secret: str = "segredo", falha_pct: float = 0.0,
+                 latencia_s: float = 0.0, seed: int = 0) -> None:
+        self.api_secret = api_secret
+        self.falha_pct = falha_pct
+        self.latencia_s = latencia_s
+        self.ordens: dict[str, dict] = {}
+        self.posts = 0
+        self._rnd = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "FakeExchange":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        exchange = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+
+            def log_message(self, *args):
+                pass
+
+            def _responder(self, status: int, corpo: dict) -> None:
+                dados = json.dumps(corpo).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(dados)))
+                self.end_headers()
+                self.wfile.write(dados)
+
+            def _params(self) -> dict | None:
+                query = urlsplit(self.path).query
+                corpo, _, assinatura = query.rpartition("&signature=")
+                esperado = hmac.new(exchange.api_secret.encode(), corpo.encode(), hashlib.sha256).hexdigest()
+                if not hmac.compare_digest(assinatura, esperado):
+                    self._responder(400, {"code": -1022, "msg": "Signature for this request is not valid."})
+                    return None
+                return dict(parse_qsl(corpo))
+
+            def do_POST(self):
+                params = self._params()
+                if params is None:
+                    return
+                if exchange.latencia_s:
+                    time.sleep(exchange.latencia_s)
+                cid = params["newClientOrderId"]
+                with exchange._lock:
+                    exchange.posts += 1
+                    if cid in exchange.ordens:
+                        self._responder(400, {"code": -2010, "msg": "Duplicate order sent."})
+                        return
+                    ordem = {
+                        "symbol": params["symbol"], "orderId": next(exchange._ids),
+                        "clientOrderId": cid, "side": params["side"], "type": params["type"],
+                        "origQty": params["quantity"], "executedQty": params["quantity"],
+                        "status": "FILLED", "transactTime": int(time.time() * 1000),
+                    }
+                    exchange.ordens[cid] = ordem
+                    perdeu = exchange._rnd.random() < exchange.falha_pct
+                if perdeu:
+                    self._responder(503, {"code": -1007, "msg": "Timeout waiting for response from backend server."})
+                else:
+                    self._responder(200, ordem)
+
+            def do_GET(self):
+                params = self._params()
+                if params is None:
+                    return
+                ordem = exchange.ordens.get(params.get("origClientOrderId", ""))
+                if ordem is None:
+                    self._responder(400, {"code": -2013, "msg": "Order does not exist."})
+                else:
+                    self._responder(200, ordem)
+
+        return Handler
@@ -0,0 +1,131 @@
+"""Servidor OpenAI falso local para medir as chamadas de IA sem a API real.
+
+Atende ``POST /v1/chat/completions`` no formato da OpenAI, com latência
+configurável (fixa + proporcional aos tokens da resposta), e conta as
+requisições e o pico de chamadas simultâneas. Com ``"stream": true`` manda
+um evento SSE por token, ``s_por_token`` entre eles, e conta os streams
+que o cliente fechou antes do fim (``interrompidos``). Use com
+``OpenAI(base_url=f"{fake.url}/v1", api_key="stub")``.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOpenAI:
+    def __init__(self, latencia_s: float = 0.5, tokens: int = 60, s_por_token: float = 0.0,
+                 status: int = 200) -> None:
+        self.latencia_s = latencia_s
+        self.tokens = tokens
+        self.s_por_token = s_por_token
+        self.status = status
+        self.requisicoes = 0
+        self.ativas = 0
+        self.pico = 0
+        self.interrompidos = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "FakeOpenAI":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def resposta(self, messages: list) -> list[str]:
+        """Tokens da resposta: ecoa o início da última mensagem."""
+        ultima = str(messages[-1].get("content", "")) if messages else ""
+        base = ultima.split() or ["ok"]
+        return [base[i % len(base)] for i in range(self.tokens)]
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+
+            def log_message(self, *args):
+                pass
+
+            def _responder(self, status: int, corpo: dict) -> None:
+                dados = json.dumps(corpo).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(dados)))
+                self.end_headers()
+                self.wfile.write(dados)
+
+            def do_POST(self):
+                tamanho = int(self.headers.get("Content-Length") or 0)
+                pedido = json.loads(self.rfile.read(tamanho) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._responder(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+                    return
+                with fake._lock:
+                    fake.requisicoes += 1
+                    fake.ativas += 1
+                    fake.pico = max(fake.pico, fake.ativas)
+                try:
+                    tokens = fake.resposta(pedido.get("messages") or [])
+                    if pedido.get("stream") and fake.status == 200:
+                        self._stream(pedido, tokens)
+                        return
+                    time.sleep(fake.latencia_s + fake.s_por_token * len(tokens))
+                    if fake.status != 200:
+                        self._responder(fake.status, {"error": {"message": "stub error", "type": "server_error"}})
+                        return
+                    self._responder(200, {
+                        "id": f"chatcmpl-{next(fake._ids)}",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": pedido.get("model", "stub"),
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": " ".join(tokens)}}],
+                        "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens),
+                                  "total_tokens": len(tokens)},
+                    })
+                finally:
+                    with fake._lock:
+                        fake.ativas -= 1
+
+            def _stream(self, pedido: dict, tokens: list[str]) -> None:
+                base = {"id": f"chatcmpl-{next(fake._ids)}", "object": "chat.completion.chunk",
+                        "created": int(time.time()), "model": pedido.get("model", "stub")}
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                time.sleep(fake.latencia_s)
+                try:
+                    for i, token in enumerate(tokens):
+                        delta = {"content": token if i == 0 else " " + token}
+                        if i == 0:
+                            delta["role"] = "assistant"
+                        evento = {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+                        self.wfile.write(f"data: {json.dumps(evento)}\n\n".encode())
+                        self.wfile.flush()
+                        time.sleep(fake.s_por_token)
+                    fim = {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+                    self.wfile.write(f"data: {json.dumps(fim)}\n\ndata: [DONE]\n\n".encode())
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    with fake._lock:
+                        fake.interrompidos += 1
+
+        return Handler
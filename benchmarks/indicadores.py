@@ -0,0 +1,66 @@
+"""Compara as funções escalares com a API vetorizada (300 pares USDT).
+
+Uso: python -m benchmarks.indicadores [símbolos] [candles]
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+
+import numpy as np
+
+from inteligencia_financeira.utils import (
+    calcular_macd,
+    calcular_media_movel,
+    calcular_performance,
+    calcular_rsi,
+)
+from inteligencia_financeira.vetorizado import (
+    macd_matriz,
+    media_movel_matriz,
+    performance_matriz,
+    rsi_matriz,
+)
+
+
+def _cronometro(fn, repeticoes: int = 3) -> float:
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        fn()
+        melhor = min(melhor, time.perf_counter() - t0)
+    return melhor * 1000
+
+
+def main(simbolos: int = 300, candles: int = 500) -> None:
+    rng = np.random.default_rng(42)
+    precos = 100 * np.cumprod(1 + rng.normal(0, 0.01, (simbolos, candles)), axis=1)
+    listas = precos.tolist()
+
+    def escalar():
+        for v in listas:
+            calcular_rsi(v, 14)
+            calcular_macd(v, 12, 26, 9)
+            calcular_media_movel(v, 20)
+            calcular_performance(v)
+
+    def vetorizado():
+        rsi_matriz(precos, [14])
+        macd_matriz(precos, [(12, 26, 9)])
+        media_movel_matriz(precos, [20])
+        performance_matriz(precos)
+
+    def varios_periodos():
+        rsi_matriz(precos, [7, 14, 21, 28])
+        macd_matriz(precos, [(c, l, 9) for c in (8, 12) for l in (21, 26)])
+        media_movel_matriz(precos, [10, 20, 50, 100])
+
+    print(f"{simbolos} símbolos x {candles} candles")
+    print(f"  escalar (último ponto, laço por símbolo): {_cronometro(escalar):8.1f} ms")
+    print(f"  vetorizado (séries completas):            {_cronometro(vetorizado):8.1f} ms")
+    print(f"  vetorizado, 4 RSI + 4 MACD + 4 MM:        {_cronometro(varios_periodos):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
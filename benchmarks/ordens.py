@@ -0,0 +1,50 @@
+"""Rajada de ordens contra a corretora falsa local.
+
+Compara o envio sequencial antigo (``requests.request`` sem sessão) com o
+``OrderGateway`` (pool de conexões + workers), com parte das respostas
+perdidas para exercitar as retentativas. Nenhuma ordem pode ser duplicada.
+
+Uso: python -m benchmarks.ordens [ordens] [workers] [falha_pct]
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+
+import requests
+
+from benchmarks.fake_exchange import FakeExchange
+from services.order_gateway import OrderGateway, client_order_id, sign
+
+
+def main(ordens: int = 2000, workers: int = 16, falha_pct: float = 0.05) -> None:
+    with FakeExchange(falha_pct=0.0, latencia_s=0.002) as fx:
+        t0 = time.perf_counter()
+        for i in range(ordens // 4):
+            params = {"symbol": "BTCUSDT", "side": "BUY", "type": "MARKET", "quantity": "0.001",
+                      "newClientOrderId": client_order_id("seq", i), "timestamp": int(time.time() * 1000)}
+            requests.request("POST", f"{fx.url}/api/v3/order?{sign(params, fx.api_secret)}").json()
+        seq = (ordens // 4) / (time.perf_counter() - t0)
+
+    with FakeExchange(falha_pct=falha_pct, latencia_s=0.002) as fx:
+        # sessão sem o governor: aqui medimos só o transporte
+        gw = OrderGateway("chave", fx.api_secret, base_url=fx.url, session=requests.Session(),
+                          workers=workers, espera_s=0.01)
+        t0 = time.perf_counter()
+        futuros = [gw.submit("BTCUSDT", "BUY", "0.001", chave=i) for i in range(ordens)]
+        resultados = [f.result() for f in futuros]
+        dt = time.perf_counter() - t0
+        gw.close()
+        ids = {r["clientOrderId"] for r in resultados}
+
+    print(f"sequencial sem sessão: {seq:8.0f} ordens/s")
+    print(f"gateway ({workers} workers):  {ordens / dt:8.0f} ordens/s  ({ordens} ordens em {dt:.2f} s)")
+    print(f"  respostas perdidas: {falha_pct:.0%}  retentativas: {gw.stats['retentativas']}"
+          f"  recuperadas por consulta: {gw.stats['recuperadas']}")
+    print(f"  ordens na corretora: {len(fx.ordens)}  ids distintos: {len(ids)}  POSTs: {fx.posts}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:4]
+    main(*(t(a) for t, a in zip((int, int, float), args)))
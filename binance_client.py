@@ -1,5 +1,5 @@
 import os
-from binance.client import Client
+from services.client_registry import get_client as _registry_client
 
 def get_client(username=None, api_key=None, api_secret=None, testnet=None):
     key = api_key or os.getenv("BINANCE_API_KEY")
@@ -8,4 +8,5 @@ def get_client(username=None, api_key=None, api_secret=None, testnet=None):
         testnet = os.getenv("BINANCE_TESTNET", "true").lower() == "true"
     if not key or not secret:
         raise RuntimeError("BINANCE_API_KEY/SECRET não configurados no Environment.")
-    return Client(key, secret, testnet=testnet)
\ No newline at end of file
+    # reaproveita o client (e o pool HTTP) da mesma credencial entre jobs
+    return _registry_client(key, secret, testnet=testnet)
\ No newline at end of file
@@ -1,32 +1,54 @@
 import os
+import threading
 import time
-import hmac
-import hashlib
-import requests
-from urllib.parse import urlencode
+from concurrent.futures import Future
+
+from services.order_gateway import ORDER_HTTP_TIMEOUT_S, OrderGateway, sign
+from services.order_log_writer import record_order
+from services.weight_governor import GovernedSession
 
 API_KEY = os.getenv("BINANCE_API_KEY")
 API_SECRET = os.getenv("BINANCE_API_SECRET")
 BASE_URL = "https://api.binance.com"
 
+_session = GovernedSession()
+_session.headers["X-MBX-APIKEY"] = API_KEY or ""
+_gateway: OrderGateway | None = None
+_gateway_lock = threading.Lock()
+
 
 def _signed_request(method, path, params):
     if not API_KEY or not API_SECRET:
         raise EnvironmentError("Chaves da Binance não configuradas")
     params['timestamp'] = int(time.time() * 1000)
-    query = urlencode(params)
-    signature = hmac.new(API_SECRET.encode(), query.encode(), hashlib.sha256).hexdigest()
-    headers = {'X-MBX-APIKEY': API_KEY}
-    url = f"{BASE_URL}{path}?{query}&signature={signature}"
-    resp = requests.request(method, url, headers=headers)
+    url = f"{BASE_URL}{path}?{sign(params, API_SECRET)}"
+    resp = _session.request(method, url, timeout=ORDER_HTTP_TIMEOUT_S)
     resp.raise_for_status()
     return resp.json()
 
 
-def executar_ordem(symbol, side, quantity):
-    params = {
-        'symbol': symbol,
-        'side': side,
-        'type': 'MARKET',
-        'quantity': quantity,
-    }
\ No newline at end of file
+def gateway() -> OrderGateway:
+    """Gateway de ordens da conta configurada em ``BINANCE_API_KEY``."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = OrderGateway(API_KEY, API_SECRET, base_url=BASE_URL)
+        return _gateway
+
+
+def enviar_ordem(symbol, side, quantity, chave=None, market="spot", user_id="sistema") -> Future:
+    """Enfileira uma ordem a mercado; o ``Future`` resolve com a resposta da Binance."""
+    futuro = gateway().submit(symbol, side, quantity, type="MARKET", market=market, chave=chave)
+
+    def registrar(f: Future) -> None:
+        erro = f.exception()
+        ordem = {} if erro else f.result()
+        record_order(user_id, f"binance-{market}", symbol, side, "MARKET", quantity, 0.0,
+                     "error" if erro else ordem.get("status", "sent"), str(erro) if erro else ordem)
+
+    futuro.add_done_callback(registrar)
+    return futuro
+
+
+def executar_ordem(symbol, side, quantity, chave=None, market="spot", user_id="sistema"):
+    return enviar_ordem(symbol, side, quantity, chave=chave, market=market, user_id=user_id).result()
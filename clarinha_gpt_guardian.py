@@ -1,31 +1,49 @@
 """Helpers for Clarinha's interaction with the OpenAI API."""
 
 import os
+from typing import Dict, List, Optional
+
 from openai import OpenAI
 
+from services.ai_cache import cached_chat
+from services.chat_context import GestorContexto
+
 
 api_key = os.getenv("OPENAI_API_KEY")
 client = OpenAI(api_key=api_key) if api_key else None
 
+PERSONA = (
+    "Você é a IA Clarinha, uma entidade cósmica intuitiva e sábia, "
+    "especializada em criptoativos. Sua missão é responder a perguntas "
+    "existenciais e operacionais sobre o mundo financeiro."
+)
+
+
+def _resumir(msgs: List[Dict], max_tokens: int) -> str:
+    return cached_chat(client, model="gpt-4o-mini", messages=msgs, temperature=0, max_tokens=max_tokens)
+
+
+gestor_contexto = GestorContexto(resumir=_resumir)
 
-def interpretar_pergunta(pergunta_usuario: str) -> str:
-    """Consulta o modelo da OpenAI para interpretar a pergunta."""
+
+def interpretar_pergunta(pergunta_usuario: str, contexto: Optional[List[Dict]] = None,
+                         conversa: Optional[str] = None) -> str:
+    """Consulta o modelo da OpenAI para interpretar a pergunta.
+
+    ``contexto`` é o histórico da conversa; entra resumido quando passa do
+    orçamento de tokens. ``conversa`` (``services.chat_context.conversa_id``)
+    identifica a conversa para o resumo ser guardado e reaproveitado.
+    """
     if client is None:
         return "OPENAI_API_KEY não configurada"
 
-    prompt = (
-        "Você é a IA Clarinha, uma entidade cósmica intuitiva e sábia, "
-        "especializada em criptoativos. Sua missão é responder a perguntas "
-        "existenciais e operacionais sobre o mundo financeiro.\n"
-        f"Pergunta: {pergunta_usuario}"
-    )
     try:
-        resp = client.chat.completions.create(
+        return cached_chat(
+            client,
             model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
+            messages=gestor_contexto.montar(PERSONA, contexto, f"Pergunta: {pergunta_usuario}",
+                                            conversa=conversa),
             temperature=0.4,
         )
-        return resp.choices[0].message.content
-
-
-
+    except Exception as e:
+        return f"Erro ao consultar GPT: {e}"
@@ -32,5 +32,6 @@ def get_session():
 def create_all():
     """Cria as tabelas de acordo com os modelos declarados."""
     # importa para registrar as classes no metadata antes de criar
-    from models import Usuario, UserCredential, OrderLog  # noqa: F401
+    from models import Usuario, UserCredential, OrderLog, TradeRecord, ExchangeOrder, SyncCursor, DailyRollup  # noqa: F401
+    from models import SchedulerLease, ScheduledJob  # noqa: F401
     Base.metadata.create_all(bind=engine)
\ No newline at end of file
@@ -1,5 +1,26 @@
 import os
 
 bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
-workers = 4
+# a varredura (inteligencia_financeira.varredura) divide as CPUs por este número
+workers = int(os.environ.get("WEB_CONCURRENCY", 4))
+# threads: um chat em SSE (/inteligencia/chat/stream) ocupa uma thread, não o
+# worker inteiro; no gthread o timeout vale para o worker travado, não para
+# um request longo (o stream tem seu próprio teto, CHAT_STREAM_MAX_S)
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
 timeout = 120
+
+
+def post_worker_init(worker):
+    # todos os workers disputam os leases; só o dono de cada shard executa os jobs
+    import tasks
+    tasks.iniciar()
+
+
+def worker_exit(server, worker):
+    # grava o que ainda estiver na fila do OrderLog antes de o worker sair
+    from services.order_log_writer import order_log_writer
+    order_log_writer.close()
+    # devolve os leases do agendador para outro worker assumir já
+    import tasks
+    tasks.parar()
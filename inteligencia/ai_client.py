@@ -1,7 +1,12 @@
 import os, re
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
 from openai import OpenAI
 
+from services.ai_cache import cached_chat
+from services.chat_context import GestorContexto
+from services.chat_stream import MetricasStream, stream_chat
+from services.single_flight import coalesce
+
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY", ""))
 
 SYSTEM_PROMPT = (
@@ -9,18 +14,31 @@ SYSTEM_PROMPT = (
     "Foque em gestão de risco, responda curto e sempre devolva uma quantidade numérica quando pedido."
 )
 
-def chat_responder(mensagem: str, contexto: Optional[List[Dict]] = None, modelo: str = "gpt-4o-mini") -> str:
-    msgs = [{"role": "system", "content": SYSTEM_PROMPT}]
-    if contexto: msgs.extend(contexto)
-    msgs.append({"role": "user", "content": mensagem})
+def _resumir(msgs: List[Dict], max_tokens: int) -> str:
+    return cached_chat(client, model="gpt-4o-mini", messages=msgs, temperature=0, max_tokens=max_tokens)
+
+# histórico longo vira resumo: o prompt fica dentro de CHAT_CONTEXT_BUDGET tokens
+gestor_contexto = GestorContexto(resumir=_resumir)
+
+def _mensagens(mensagem: str, contexto: Optional[List[Dict]] = None, conversa: Optional[str] = None) -> List[Dict]:
+    return gestor_contexto.montar(SYSTEM_PROMPT, contexto, mensagem, conversa=conversa)
+
+def chat_responder(mensagem: str, contexto: Optional[List[Dict]] = None, modelo: str = "gpt-4o-mini",
+                   conversa: Optional[str] = None) -> str:
+    """``conversa`` (``services.chat_context.conversa_id``) guarda o resumo do histórico entre chamadas."""
     try:
-        resp = client.chat.completions.create(model=modelo, messages=msgs)
-        return resp.choices[0].message.content or ""
+        return cached_chat(client, model=modelo, messages=_mensagens(mensagem, contexto, conversa))
     except Exception as e:
         return f"[IA indisponível] {e}"
 
+def chat_stream(mensagem: str, contexto: Optional[List[Dict]] = None, modelo: str = "gpt-4o-mini",
+                metricas: Optional[MetricasStream] = None, conversa: Optional[str] = None) -> Iterator[str]:
+    """Como ``chat_responder``, mas gera a resposta em pedaços conforme chegam (erros sobem)."""
+    return stream_chat(client, model=modelo, messages=_mensagens(mensagem, contexto, conversa), metricas=metricas)
+
 _QTY_RE = re.compile(r"([0-9]+(?:\.[0-9]+)?)")
 
+@coalesce("sugerir_quantidade")
 def sugerir_quantidade(symbol: str, preco: float, saldo_usdt: float, risco: str = "conservador") -> Dict:
     prompt = (
         f"Atue como risk manager.\n"
@@ -1,5 +1,67 @@
-from . import bp
+import json
+import os
+import time
+from dataclasses import asdict
+
+from flask import Response, jsonify, render_template, request
+from flask_login import current_user, login_required
+
+from services.chat_context import conversa_id
+from services.chat_stream import MetricasStream
+from . import ai_client, bp
+
+MODELO_CHAT = "gpt-4o-mini"
+CHAT_STREAM_MAX_S = float(os.getenv("CHAT_STREAM_MAX_S", "90"))
+
+
+def _sse(dados, evento=None) -> str:
+    prefixo = f"event: {evento}\n" if evento else ""
+    return f"{prefixo}data: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
 
 @bp.route('/')
 def index():
     return 'inteligencia placeholder'
+
+
+@bp.route('/chat')
+@login_required
+def chat():
+    return render_template("inteligencia/chat.html")
+
+
+@bp.route('/chat/stream')
+@login_required
+def chat_stream():
+    """Resposta da Clara por Server-Sent Events, token a token.
+
+    Cada pedaço sai como ``data: {"t": ...}``; no fim vem ``event: fim`` com
+    TTFT e tokens/s, ou ``event: erro``. Se o navegador desconecta, o
+    servidor fecha o gerador e o stream com a OpenAI é cancelado; o mesmo
+    acontece ao passar de ``CHAT_STREAM_MAX_S``, para um stream não prender
+    a thread do worker indefinidamente.
+    """
+    mensagem = (request.args.get("mensagem") or "").strip()
+    if not mensagem:
+        return jsonify({"erro": "mensagem vazia"}), 400
+    metricas = MetricasStream(model=MODELO_CHAT)
+    # cada aba do chat é uma conversa do usuário
+    conversa = conversa_id(current_user.id, request.args.get("conversa") or "chat")
+
+    def eventos():
+        prazo = time.monotonic() + CHAT_STREAM_MAX_S
+        pedacos = ai_client.chat_stream(mensagem, modelo=MODELO_CHAT, metricas=metricas, conversa=conversa)
+        try:
+            for pedaco in pedacos:
+                yield _sse({"t": pedaco})
+                if time.monotonic() > prazo:
+                    yield _sse({"erro": f"resposta interrompida após {CHAT_STREAM_MAX_S:.0f}s"}, "erro")
+                    return
+            yield _sse(asdict(metricas), "fim")
+        except Exception as e:
+            yield _sse({"erro": f"[IA indisponível] {e}"}, "erro")
+        finally:
+            pedacos.close()
+
+    return Response(eventos(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
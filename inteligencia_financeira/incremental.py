@@ -0,0 +1,186 @@
+"""Indicadores incrementais: um fechamento por vez, sem reprocessar o histórico.
+
+Cada classe reproduz, bit a bit, a função em lote equivalente de
+:mod:`.utils` (``calcular_rsi``, ``calcular_macd``, ``calcular_media_movel``)
+olhando só a própria janela. O estado pode ser salvo e restaurado com
+``salvar_estado`` / ``carregar_estado`` (dicts serializáveis em JSON), o que
+permite manter centenas de símbolos atualizados a cada tick.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from typing import Any
+
+
+class MediaMovelIncremental:
+    """Média móvel simples dos últimos ``periodo`` fechamentos.
+
+    A soma é refeita sobre a janela a cada fechamento, da esquerda para a
+    direita como o ``cumsum`` de ``calcular_media_movel``: custa
+    ``O(periodo)``, mas o resultado é idêntico bit a bit ao da função em lote.
+    """
+
+    def __init__(self, periodo: int = 20) -> None:
+        self.periodo = periodo
+        self._janela: deque[float] = deque(maxlen=max(periodo, 0) or None)
+        self._soma = 0.0
+
+    def atualizar(self, preco: float) -> float:
+        if self.periodo <= 0:
+            return 0.0
+        self._janela.append(float(preco))
+        self._soma = sum(self._janela)
+        return self.valor
+
+    @property
+    def valor(self) -> float:
+        if self.periodo <= 0 or len(self._janela) < self.periodo:
+            return 0.0
+        return self._soma / self.periodo
+
+    def salvar_estado(self) -> dict[str, Any]:
+        return {"periodo": self.periodo, "janela": list(self._janela)}
+
+    @classmethod
+    def carregar_estado(cls, estado: dict[str, Any]) -> "MediaMovelIncremental":
+        obj = cls(estado["periodo"])
+        obj._janela.extend(estado["janela"])
+        obj._soma = sum(obj._janela)
+        return obj
+
+
+class RSIIncremental:
+    """RSI com média simples dos ganhos/perdas dos últimos ``periodo`` deltas.
+
+    Como na média móvel, as somas são refeitas sobre a janela de deltas na
+    mesma ordem de ``calcular_rsi``, então o valor é idêntico bit a bit.
+    """
+
+    def __init__(self, periodo: int = 14) -> None:
+        self.periodo = periodo
+        self._ultimo: float | None = None
+        self._deltas: deque[float] = deque(maxlen=max(periodo, 0) or None)
+        self._ganhos = 0.0
+        self._perdas = 0.0
+
+    def atualizar(self, preco: float) -> float:
+        preco = float(preco)
+        if self._ultimo is not None and self.periodo > 0:
+            self._deltas.append(preco - self._ultimo)
+            self._recalcular()
+        self._ultimo = preco
+        return self.valor
+
+    def _recalcular(self) -> None:
+        # mesma ordem de soma da função em lote
+        self._ganhos = sum(d for d in self._deltas if d > 0)
+        self._perdas = sum(-d for d in self._deltas if d <= 0)
+
+    @property
+    def valor(self) -> float:
+        if self.periodo <= 0 or len(self._deltas) < self.periodo:
+            return 0.0
+        media_perda = self._perdas / self.periodo
+        if media_perda == 0:
+            return 100.0
+        rs = (self._ganhos / self.periodo) / media_perda
+        return 100 - (100 / (1 + rs))
+
+    def salvar_estado(self) -> dict[str, Any]:
+        return {"periodo": self.periodo, "ultimo": self._ultimo, "deltas": list(self._deltas)}
+
+    @classmethod
+    def carregar_estado(cls, estado: dict[str, Any]) -> "RSIIncremental":
+        obj = cls(estado["periodo"])
+        obj._ultimo = estado["ultimo"]
+        obj._deltas.extend(estado["deltas"])
+        obj._recalcular()
+        return obj
+
+
+class MACDIncremental:
+    """MACD e linha de sinal com EMAs semeadas pelo primeiro valor.
+
+    Faz exatamente as mesmas operações de ``calcular_macd``, então o
+    resultado é idêntico bit a bit.
+    """
+
+    def __init__(self, curto: int = 12, longo: int = 26, sinal: int = 9) -> None:
+        self.curto, self.longo, self.sinal = curto, longo, sinal
+        self._k_curto = 2 / (curto + 1)
+        self._k_longo = 2 / (longo + 1)
+        self._k_sinal = 2 / (sinal + 1)
+        self._ema_curta: float | None = None
+        self._ema_longa = 0.0
+        self._ema_sinal = 0.0
+
+    def atualizar(self, preco: float) -> tuple[float, float]:
+        if self._ema_curta is None:
+            self._ema_curta = self._ema_longa = preco
+            self._ema_sinal = self._ema_curta - self._ema_longa
+        else:
+            self._ema_curta = preco * self._k_curto + self._ema_curta * (1 - self._k_curto)
+            self._ema_longa = preco * self._k_longo + self._ema_longa * (1 - self._k_longo)
+            macd = self._ema_curta - self._ema_longa
+            self._ema_sinal = macd * self._k_sinal + self._ema_sinal * (1 - self._k_sinal)
+        return self.valor
+
+    @property
+    def valor(self) -> tuple[float, float]:
+        if self._ema_curta is None:
+            return 0.0, 0.0
+        return self._ema_curta - self._ema_longa, self._ema_sinal
+
+    def salvar_estado(self) -> dict[str, Any]:
+        return {
+            "curto": self.curto, "longo": self.longo, "sinal": self.sinal,
+            "ema_curta": self._ema_curta, "ema_longa": self._ema_longa, "ema_sinal": self._ema_sinal,
+        }
+
+    @classmethod
+    def carregar_estado(cls, estado: dict[str, Any]) -> "MACDIncremental":
+        obj = cls(estado["curto"], estado["longo"], estado["sinal"])
+        obj._ema_curta = estado["ema_curta"]
+        obj._ema_longa = estado["ema_longa"]
+        obj._ema_sinal = estado["ema_sinal"]
+        return obj
+
+
+class IndicadoresIncrementais:
+    """RSI + MACD + média móvel de um símbolo, atualizados juntos."""
+
+    def __init__(self, rsi_periodo: int = 14, macd_curto: int = 12, macd_longo: int = 26,
+                 macd_sinal: int = 9, mm_periodo: int = 20) -> None:
+        self.rsi = RSIIncremental(rsi_periodo)
+        self.macd = MACDIncremental(macd_curto, macd_longo, macd_sinal)
+        self.media_movel = MediaMovelIncremental(mm_periodo)
+        self.ultimo: float | None = None
+
+    def atualizar(self, preco: float) -> dict[str, float]:
+        self.ultimo = float(preco)
+        self.rsi.atualizar(preco)
+        self.macd.atualizar(preco)
+        self.media_movel.atualizar(preco)
+        return self.valores()
+
+    def valores(self) -> dict[str, float]:
+        macd, sinal = self.macd.valor
+        return {"rsi": self.rsi.valor, "macd": macd, "sinal": sinal, "media_movel": self.media_movel.valor}
+
+    def salvar_estado(self) -> dict[str, Any]:
+        return {
+            "rsi": self.rsi.salvar_estado(),
+            "macd": self.macd.salvar_estado(),
+            "media_movel": self.media_movel.salvar_estado(),
+            "ultimo": self.ultimo,
+        }
+
+    @classmethod
+    def carregar_estado(cls, estado: dict[str, Any]) -> "IndicadoresIncrementais":
+        obj = cls.__new__(cls)
+        obj.rsi = RSIIncremental.carregar_estado(estado["rsi"])
+        obj.macd = MACDIncremental.carregar_estado(estado["macd"])
+        obj.media_movel = MediaMovelIncremental.carregar_estado(estado["media_movel"])
+        obj.ultimo = estado["ultimo"]
+        return obj
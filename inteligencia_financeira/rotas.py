@@ -1,9 +1,12 @@
 """Rotas para a aplicação de inteligência financeira."""
 
 import os
-from flask import render_template, request
+from flask import jsonify, render_template, request
 from openai import OpenAI
 
+from services.ai_cache import ai_cache, cache_key, cached_chat
+from services.ai_jobs import ai_jobs
+
 from . import bp
 from .utils import (
     calcular_comissao,
@@ -13,15 +16,55 @@ from .utils import (
     calcular_rsi,
     obter_dados_mercado,
 )
+from .varredura import montar_grade, parse_faixa, varrer, versao_dados
 
 
 api_key = os.getenv("OPENAI_API_KEY")
 client = OpenAI(api_key=api_key) if api_key else None
 
+VALORES_DEMONSTRACAO = [
+    100, 101, 102, 99, 98, 100, 102, 101, 103, 105,
+    104, 106, 108, 107, 109, 111, 110, 112, 115, 113,
+    114, 116, 118, 117, 119, 121, 120, 122, 124, 123,
+    125, 127, 126, 128, 130, 129, 131, 133, 132, 134,
+]
+
+
+MODELO_ANALISE = "gpt-4o-mini"
+
+
+def _mensagens_analise(rsi, macd, sinal, media_movel, performance_liquida):
+    prompt = (
+        "Você é uma IA analista financeira. Considere os indicadores a seguir\n"
+        f"RSI: {rsi:.2f}\n"
+        f"MACD: {macd:.2f}\n"
+        f"Sinal: {sinal:.2f}\n"
+        f"Média Móvel: {media_movel:.2f}\n"
+        f"Performance: {performance_liquida:.2f}% após comissões\n"
+        "Forneça uma breve análise combinando estes indicadores."
+    )
+    return [{"role": "user", "content": prompt}]
+
+
+def gerar_analise(messages, cliente=None) -> str:
+    """Chamada ao GPT (com cache); roda dentro de um job de ``ai_jobs``."""
+    return cached_chat(
+        cliente or client,
+        model=MODELO_ANALISE,
+        messages=messages,
+        temperature=0.4,
+        max_tokens=200,
+    ).strip()
+
 
 @bp.route('/')
 def analise():
-    """Calcula indicadores e consulta o GPT para gerar uma análise."""
+    """Calcula indicadores e enfileira a análise do GPT.
+
+    Os indicadores saem na hora; o texto do GPT vem do cache quando já foi
+    gerado e, senão, de um job em segundo plano que a página consulta em
+    ``/analise/<job_id>``.
+    """
 
     ticker = request.args.get("ticker", "demo")
     periodo_rsi = request.args.get("rsi_periodo", 14, type=int)
@@ -35,12 +78,7 @@ def analise():
     erro_dados = False
     if not valores:
         erro_dados = True
-        valores = [
-            100, 101, 102, 99, 98, 100, 102, 101, 103, 105,
-            104, 106, 108, 107, 109, 111, 110, 112, 115, 113,
-            114, 116, 118, 117, 119, 121, 120, 122, 124, 123,
-            125, 127, 126, 128, 130, 129, 131, 133, 132, 134,
-        ]
+        valores = VALORES_DEMONSTRACAO
 
     rsi = calcular_rsi(valores, periodo_rsi)
     macd, sinal = calcular_macd(valores, macd_curto, macd_longo, macd_sinal)
@@ -50,26 +88,18 @@ def analise():
     performance_liquida = performance - comissao
 
     analise_texto = "OPENAI_API_KEY não configurada"
+    job_id = None
     if client is not None:
-        prompt = (
-            "Você é uma IA analista financeira. Considere os indicadores a seguir\n"
-            f"RSI: {rsi:.2f}\n"
-            f"MACD: {macd:.2f}\n"
-            f"Sinal: {sinal:.2f}\n"
-            f"Média Móvel: {media_movel:.2f}\n"
-            f"Performance: {performance_liquida:.2f}% após comissões\n"
-            "Forneça uma breve análise combinando estes indicadores."
-        )
-        try:
-            resp = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.4,
-                max_tokens=200,
-            )
-            analise_texto = resp.choices[0].message.content.strip()
-        except Exception as e:
-            analise_texto = f"Erro ao consultar GPT: {e}"
+        msgs = _mensagens_analise(rsi, macd, sinal, media_movel, performance_liquida)
+        chave = cache_key(MODELO_ANALISE, msgs, 0.4, 200)
+        analise_texto = ai_cache.get(chave)
+        if analise_texto is not None:
+            analise_texto = analise_texto.strip()  # acerto no cache: renderiza sem job nem polling
+        else:
+            try:
+                job_id = ai_jobs.submit(lambda: gerar_analise(msgs), chave=f"analise:{chave}")
+            except Exception as e:
+                analise_texto = f"Erro ao consultar GPT: {e}"
 
     contexto = {
         "rsi": rsi,
@@ -81,6 +111,7 @@ def analise():
         "comissao": comissao,
         "performance_liquida": performance_liquida,
         "analise": analise_texto,
+        "job_id": job_id,
         "erro_dados": erro_dados,
         "ticker": ticker,
         "rsi_periodo": periodo_rsi,
@@ -91,3 +122,58 @@ def analise():
         "taxa": taxa,
     }
     return render_template("inteligencia_financeira/analise.html", **contexto)
+
+
+@bp.route('/analise/<job_id>')
+def analise_status(job_id):
+    """Status do job da análise do GPT (``pendente``, ``rodando``, ``concluido`` ou ``erro``)."""
+
+    estado = ai_jobs.status(job_id)
+    if estado is None:
+        return jsonify({"erro": "job não encontrado"}), 404
+    if estado["status"] == "erro":
+        estado["analise"] = f"Erro ao consultar GPT: {estado['erro']}"
+    else:
+        estado["analise"] = estado["resultado"]
+    return jsonify(estado)
+
+
+@bp.route('/varredura')
+def varredura():
+    """Avalia uma grade de parâmetros e devolve as melhores combinações.
+
+    Cada parâmetro aceita ``inicio:fim:passo``, lista ``a,b,c`` ou valor único,
+    por exemplo ``?ticker=BTCUSDT&rsi_periodo=7:21:7&macd_curto=8,12``.
+    """
+
+    ticker = request.args.get("ticker", "demo")
+    limite = request.args.get("limite", 20, type=int)
+    try:
+        grade = montar_grade(
+            parse_faixa(request.args.get("rsi_periodo"), 14),
+            parse_faixa(request.args.get("macd_curto"), 12),
+            parse_faixa(request.args.get("macd_longo"), 26),
+            parse_faixa(request.args.get("macd_sinal"), 9),
+            parse_faixa(request.args.get("mm_periodo"), 20),
+            parse_faixa(request.args.get("taxa"), 0.001, float),
+        )
+    except ValueError as e:
+        return jsonify({"erro": f"Parâmetros inválidos: {e}"}), 400
+
+    valores = obter_dados_mercado(ticker)
+    erro_dados = not valores
+    if erro_dados:
+        valores = VALORES_DEMONSTRACAO
+
+    try:
+        resultados = varrer(ticker, valores, grade)
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+    return jsonify({
+        "ticker": ticker,
+        "versao_dados": versao_dados(valores),
+        "erro_dados": erro_dados,
+        "combinacoes": len(grade),
+        "resultados": resultados[:max(limite, 0)],
+    })
@@ -2,10 +2,12 @@
 
 from __future__ import annotations
 
-import functools
 from typing import Iterable
 
-import requests
+from services.kline_store import kline_store
+from services.single_flight import single_flight
+
+from .vetorizado import macd_matriz, media_movel_matriz, performance_matriz, rsi_matriz
 
 
 def calcular_indicador_exemplo(valores: Iterable[float]) -> float:
@@ -16,26 +18,26 @@ def calcular_indicador_exemplo(valores: Iterable[float]) -> float:
     return sum(valores) / len(valores)
 
 
-@functools.lru_cache(maxsize=32)
-def obter_dados_mercado(ticker: str) -> list[float]:
-    """Obtém preços de mercado para ``ticker``.
+def obter_dados_mercado(ticker: str, intervalo: str = "1h", limite: int = 500) -> list[float]:
+    """Obtém os últimos ``limite`` fechamentos de ``ticker``.
+
+    Os candles vêm do armazenamento local (``services.kline_store``), que só
+    busca na Binance o trecho que ainda não está em disco. Qualquer falha
+    resulta numa lista vazia, permitindo que a aplicação continue
+    funcionando mesmo sem conexão com a API externa.
 
-    A função faz uma requisição HTTP simples e implementa ``lru_cache`` para
-    evitar chamadas repetidas. Qualquer exceção é capturada e uma lista vazia
-    é retornada, permitindo que a aplicação continue funcionando mesmo sem
-    conexão com a API externa.
+    Pedidos simultâneos do mesmo (ticker, intervalo, limite) são atendidos
+    por uma única leitura (``services.single_flight``).
     """
 
-    url = f"https://example.com/market/{ticker}"
-    try:
-        resposta = requests.get(url, timeout=5)
-        resposta.raise_for_status()
-        dados = resposta.json().get("precos", [])
-        if not isinstance(dados, list):
+    def buscar() -> list[float]:
+        try:
+            kline_store.sync(ticker, intervalo)
+            return kline_store.tail(ticker, intervalo, limite)["close"].tolist()
+        except Exception:
             return []
-        return [float(v) for v in dados]
-    except Exception:
-        return []
+
+    return single_flight.do(f"klines:{ticker}:{intervalo}:{limite}", buscar)
 
 
 def calcular_rsi(valores: list[float], periodo: int = 14) -> float:
@@ -53,29 +55,11 @@ def calcular_rsi(valores: list[float], periodo: int = 14) -> float:
         Valor do RSI entre 0 e 100. Retorna 0 caso não haja dados suficientes.
     """
 
-    if len(valores) < periodo + 1:
+    if len(valores) < periodo + 1 or periodo == 0:
         return 0.0
-
-    ganhos = 0.0
-    perdas = 0.0
-    for i in range(-periodo, 0):
-        delta = valores[i] - valores[i - 1]
-        if delta > 0:
-            ganhos += delta
-        else:
-            perdas += -delta
-
-    if periodo == 0:
-        return 0.0
-
-    media_ganho = ganhos / periodo
-    media_perda = perdas / periodo
-
-    if media_perda == 0:
-        return 100.0
-
-    rs = media_ganho / media_perda
-    return 100 - (100 / (1 + rs))
+    # só a última janela interessa; a versão vetorizada devolve a série toda
+    janela = list(valores[-(periodo + 1):])
+    return float(rsi_matriz(janela, [periodo])[0, 0, -1])
 
 
 def calcular_macd(
@@ -99,26 +83,8 @@ def calcular_macd(
     if not valores:
         return 0.0, 0.0
 
-    def ema_series(dados: list[float], periodo: int) -> list[float]:
-        """Retorna a série EMA para os dados informados."""
-        k = 2 / (periodo + 1)
-        ema_valor = dados[0]
-        serie = [ema_valor]
-        for preco in dados[1:]:
-            ema_valor = preco * k + ema_valor * (1 - k)
-            serie.append(ema_valor)
-        return serie
-
-    ema_curta = ema_series(valores, curto)
-    ema_longa = ema_series(valores, longo)
-
-    # Ajusta as séries para terem o mesmo tamanho
-    tamanho = min(len(ema_curta), len(ema_longa))
-    macd_series = [ema_curta[i] - ema_longa[i] for i in range(tamanho)]
-
-    sinal_series = ema_series(macd_series, sinal)
-
-    return macd_series[-1], sinal_series[-1]
+    macd_series, sinal_series = macd_matriz(list(valores), [(curto, longo, sinal)])
+    return float(macd_series[0, 0, -1]), float(sinal_series[0, 0, -1])
 
 
 def calcular_media_movel(valores: Iterable[float], periodo: int = 20) -> float:
@@ -126,7 +92,7 @@ def calcular_media_movel(valores: Iterable[float], periodo: int = 20) -> float:
     valores = list(valores)
     if len(valores) < periodo or periodo <= 0:
         return 0.0
-    return sum(valores[-periodo:]) / periodo
+    return float(media_movel_matriz(valores[-periodo:], [periodo])[0, 0, -1])
 
 
 def calcular_performance(valores: Iterable[float]) -> float:
@@ -134,10 +100,7 @@ def calcular_performance(valores: Iterable[float]) -> float:
     valores = list(valores)
     if len(valores) < 2:
         return 0.0
-    inicial, final = valores[0], valores[-1]
-    if inicial == 0:
-        return 0.0
-    return (final - inicial) / inicial * 100
+    return float(performance_matriz([valores[0], valores[-1]])[0, -1])
 
 
 def calcular_comissao(valor: float, taxa: float = 0.001) -> float:
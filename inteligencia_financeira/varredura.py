@@ -0,0 +1,190 @@
+"""Varredura de parâmetros dos indicadores sobre uma mesma série de preços.
+
+Cada combinação ``(rsi, macd curto/longo/sinal, média móvel, taxa)`` é
+avaliada por uma regra simples — comprado enquanto MACD > sinal, preço acima
+da média móvel e RSI abaixo de 70 — e ranqueada pela performance líquida,
+descontando ``calcular_comissao`` a cada entrada/saída. Os indicadores vêm
+de :mod:`.vetorizado`, uma vez por período distinto; grades grandes são
+divididas entre processos. Cada worker do gunicorn tem o seu pool, de
+``cpu_count // WEB_CONCURRENCY`` processos (no mínimo 2, para a grade nunca
+ser calculada dentro do próprio worker). A thread do request continua
+esperando o resultado; o que sai dela é o cálculo, não a espera.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import itertools
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Sequence
+
+import numpy as np
+
+from .utils import calcular_comissao
+from .vetorizado import macd_matriz, media_movel_matriz, rsi_matriz
+
+
+def _processos_por_worker(cpus: int | None, workers: int) -> int:
+    return max(2, (cpus or 1) // max(1, workers))
+
+
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "4"))
+VARREDURA_PROCESSOS = int(os.getenv(
+    "VARREDURA_PROCESSOS", str(_processos_por_worker(os.cpu_count(), WEB_CONCURRENCY))
+))
+VARREDURA_MIN_PARALELO = int(os.getenv("VARREDURA_MIN_PARALELO", "400"))
+VARREDURA_MAX_COMBINACOES = int(os.getenv("VARREDURA_MAX_COMBINACOES", "20000"))
+VARREDURA_CACHE = int(os.getenv("VARREDURA_CACHE", "64"))
+
+RSI_SOBRECOMPRA = 70.0
+
+
+class Combinacao(NamedTuple):
+    rsi_periodo: int
+    macd_curto: int
+    macd_longo: int
+    macd_sinal: int
+    mm_periodo: int
+    taxa: float
+
+
+def parse_faixa(texto: str | None, padrao, tipo=int) -> list:
+    """Interpreta ``"7:21:7"`` (início:fim:passo, inclusivo), ``"7,14"`` ou ``"14"``."""
+    if texto is None or str(texto).strip() == "":
+        return [padrao]
+    texto = str(texto).strip()
+    if ":" in texto:
+        partes = [tipo(p) for p in texto.split(":")]
+        inicio, fim = partes[0], partes[1]
+        passo = partes[2] if len(partes) > 2 else tipo(1)
+        if passo <= 0:
+            raise ValueError("passo deve ser positivo")
+        valores, v = [], inicio
+        while v <= fim + (1e-12 if tipo is float else 0):
+            if len(valores) >= VARREDURA_MAX_COMBINACOES:
+                raise ValueError(f"faixa {texto!r} longa demais")
+            valores.append(round(v, 10) if tipo is float else v)
+            v += passo
+        return valores
+    return [tipo(p) for p in texto.split(",") if p.strip()]
+
+
+def montar_grade(rsi: Sequence[int], curto: Sequence[int], longo: Sequence[int],
+                 sinal: Sequence[int], mm: Sequence[int], taxa: Sequence[float]) -> list[Combinacao]:
+    """Produto cartesiano, descartando combinações inválidas (curto >= longo).
+
+    O tamanho do produto é conferido antes de gerar qualquer tupla: cada
+    faixa sozinha é limitada, mas o produto delas pode ter bilhões de itens.
+    """
+    total = 1
+    for faixa in (rsi, curto, longo, sinal, mm, taxa):
+        total *= len(faixa)
+    if total > VARREDURA_MAX_COMBINACOES:
+        raise ValueError(f"grade com {total} combinações; máximo {VARREDURA_MAX_COMBINACOES}")
+    return [
+        Combinacao(*c)
+        for c in itertools.product(rsi, curto, longo, sinal, mm, taxa)
+        if c[1] < c[2] and min(c[0], c[1], c[3], c[4]) > 0
+    ]
+
+
+def avaliar_grade(valores: Sequence[float], grade: Sequence[Combinacao]) -> list[dict]:
+    """Performance bruta, comissões e líquida de cada combinação (na ordem da grade)."""
+    precos = np.asarray(valores, dtype=np.float64)
+    if len(grade) == 0 or precos.size < 2:
+        return []
+    rsi_p = sorted({c.rsi_periodo for c in grade})
+    macd_c = sorted({(c.macd_curto, c.macd_longo, c.macd_sinal) for c in grade})
+    mm_p = sorted({c.mm_periodo for c in grade})
+    rsi = rsi_matriz(precos, rsi_p)[:, 0]
+    macd, sinal = macd_matriz(precos, macd_c)
+    histograma = (macd - sinal)[:, 0]
+    mm = media_movel_matriz(precos, mm_p)[:, 0]
+
+    pos_rsi = {p: i for i, p in enumerate(rsi_p)}
+    pos_macd = {m: i for i, m in enumerate(macd_c)}
+    pos_mm = {p: i for i, p in enumerate(mm_p)}
+    i_rsi = np.array([pos_rsi[c.rsi_periodo] for c in grade])
+    i_macd = np.array([pos_macd[(c.macd_curto, c.macd_longo, c.macd_sinal)] for c in grade])
+    i_mm = np.array([pos_mm[c.mm_periodo] for c in grade])
+
+    # posição decidida no fechamento t vale para o retorno de t até t+1
+    comprado = (
+        (histograma[i_macd] > 0)
+        & (mm[i_mm] > 0) & (precos > mm[i_mm])
+        & (rsi[i_rsi] > 0) & (rsi[i_rsi] < RSI_SOBRECOMPRA)
+    )[:, :-1]
+    retornos = np.diff(precos) / precos[:-1] * 100
+    bruto = (comprado * retornos).sum(axis=1)
+    mudancas = np.abs(np.diff(comprado.astype(np.int8), axis=1, prepend=0)).sum(axis=1)
+    mudancas += comprado[:, -1]  # posição aberta no fim é encerrada
+
+    resultados = []
+    for c, b, n in zip(grade, bruto.tolist(), mudancas.tolist()):
+        # cada entrada/saída movimenta 100% do capital
+        comissao = calcular_comissao(100.0 * n, c.taxa)
+        resultados.append({
+            **c._asdict(),
+            "performance": b,
+            "operacoes": int(n),
+            "comissao": comissao,
+            "performance_liquida": b - comissao,
+        })
+    return resultados
+
+
+_POOL: ProcessPoolExecutor | None = None
+_POOL_LOCK = threading.Lock()
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            # "spawn": o worker web tem threads (fan-out etc.), fork seria arriscado
+            _POOL = ProcessPoolExecutor(
+                max_workers=VARREDURA_PROCESSOS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _POOL
+
+
+def _avaliar_paralelo(valores: Sequence[float], grade: list[Combinacao]) -> list[dict]:
+    if len(grade) < VARREDURA_MIN_PARALELO or VARREDURA_PROCESSOS <= 1:
+        return avaliar_grade(valores, grade)
+    tamanho = -(-len(grade) // VARREDURA_PROCESSOS)
+    partes = [grade[i:i + tamanho] for i in range(0, len(grade), tamanho)]
+    lista = list(valores)
+    resultados: list[dict] = []
+    for parcial in _pool().map(avaliar_grade, itertools.repeat(lista), partes):
+        resultados.extend(parcial)
+    return resultados
+
+
+_CACHE: "OrderedDict[tuple, list[dict]]" = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+
+
+def versao_dados(valores: Sequence[float]) -> str:
+    """Identificador da série: muda sempre que algum preço muda."""
+    return hashlib.blake2b(np.asarray(valores, dtype=np.float64).tobytes(), digest_size=8).hexdigest()
+
+
+def varrer(ticker: str, valores: Sequence[float], grade: list[Combinacao]) -> list[dict]:
+    """Resultados da grade ordenados pela performance líquida (maior primeiro)."""
+    if len(grade) > VARREDURA_MAX_COMBINACOES:
+        raise ValueError(f"grade com {len(grade)} combinações; máximo {VARREDURA_MAX_COMBINACOES}")
+    chave = (ticker, versao_dados(valores), tuple(grade))
+    with _CACHE_LOCK:
+        if chave in _CACHE:
+            _CACHE.move_to_end(chave)
+            return _CACHE[chave]
+    resultados = sorted(_avaliar_paralelo(valores, grade), key=lambda r: r["performance_liquida"], reverse=True)
+    with _CACHE_LOCK:
+        _CACHE[chave] = resultados
+        while len(_CACHE) > VARREDURA_CACHE:
+            _CACHE.popitem(last=False)
+    return resultados
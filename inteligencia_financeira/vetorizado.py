@@ -0,0 +1,144 @@
+"""Indicadores vetorizados com NumPy para vários símbolos e períodos.
+
+Todas as funções recebem uma matriz de preços ``(símbolos, tempo)`` (um
+vetor 1-D é tratado como um único símbolo) e devolvem a série completa de
+cada indicador. Os períodos vêm em lista: o resultado ganha um eixo à
+frente, ``(períodos, símbolos, tempo)``, calculado numa única passada.
+
+As fórmulas são as mesmas das funções escalares de :mod:`.utils`, que são
+implementadas em cima deste módulo; onde a versão escalar devolve ``0.0``
+por falta de dados, aqui a posição correspondente também é ``0.0``.
+"""
+
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+
+# Abaixo disso o laço em Python puro é mais rápido que operações NumPy por passo
+_LIMIAR_LACO_PYTHON = 8
+
+
+def _matriz(precos) -> np.ndarray:
+    arr = np.asarray(precos, dtype=np.float64)
+    if arr.ndim == 1:
+        arr = arr[None, :]
+    if arr.ndim != 2:
+        raise ValueError("precos deve ser (símbolos, tempo)")
+    return arr
+
+
+def _ema_linhas(linhas: np.ndarray, ks: np.ndarray) -> np.ndarray:
+    """EMA semeada pelo primeiro valor de cada linha, com fator ``ks[i]`` por linha.
+
+    Mesma operação de ``calcular_macd``: ``preco * k + ema * (1 - k)``.
+    """
+    n, t = linhas.shape
+    out = np.empty((n, t))
+    if t == 0:
+        return out
+    if n < _LIMIAR_LACO_PYTHON:
+        for i in range(n):
+            k = float(ks[i])
+            um_menos_k = 1 - k
+            ema = float(linhas[i, 0])
+            serie = [ema]
+            for preco in linhas[i, 1:].tolist():
+                ema = preco * k + ema * um_menos_k
+                serie.append(ema)
+            out[i] = serie
+        return out
+    # laço no tempo, vetorizado entre linhas (layout tempo-major contíguo)
+    cols = np.ascontiguousarray(linhas.T)
+    res = np.empty((t, n))
+    res[0] = cols[0]
+    um_menos_k = 1 - ks
+    for j in range(1, t):
+        np.add(cols[j] * ks, res[j - 1] * um_menos_k, out=res[j])
+    out[:] = res.T
+    return out
+
+
+def ema_matriz(precos, periodos: Sequence[int]) -> np.ndarray:
+    """EMA para cada período: ``(P, S, T)``."""
+    m = _matriz(precos)
+    s, t = m.shape
+    periodos = list(periodos)
+    linhas = np.repeat(m[None], len(periodos), axis=0).reshape(-1, t)
+    ks = np.repeat(np.array([2 / (p + 1) for p in periodos]), s)
+    return _ema_linhas(linhas, ks).reshape(len(periodos), s, t)
+
+
+def macd_matriz(precos, combinacoes: Sequence[tuple[int, int, int]]) -> tuple[np.ndarray, np.ndarray]:
+    """Linhas MACD e de sinal para cada ``(curto, longo, sinal)``: ``(C, S, T)`` cada.
+
+    As EMAs de preço são calculadas uma vez por período distinto e
+    compartilhadas entre as combinações.
+    """
+    m = _matriz(precos)
+    s, t = m.shape
+    combinacoes = list(combinacoes)
+    periodos = sorted({p for c, l, _ in combinacoes for p in (c, l)})
+    emas = ema_matriz(m, periodos)
+    idx = {p: i for i, p in enumerate(periodos)}
+    macd = np.stack([emas[idx[c]] - emas[idx[l]] for c, l, _ in combinacoes]) if combinacoes else np.empty((0, s, t))
+    ks = np.repeat(np.array([2 / (g + 1) for _, _, g in combinacoes]), s)
+    sinal = _ema_linhas(macd.reshape(-1, t), ks).reshape(macd.shape)
+    return macd, sinal
+
+
+def rsi_matriz(precos, periodos: Sequence[int]) -> np.ndarray:
+    """RSI (média simples de ganhos/perdas) para cada período: ``(P, S, T)``.
+
+    Posições com menos de ``periodo`` variações anteriores valem 0.
+    """
+    m = _matriz(precos)
+    s, t = m.shape
+    periodos = list(periodos)
+    out = np.zeros((len(periodos), s, t))
+    if t < 2:
+        return out
+    deltas = np.diff(m, axis=1)
+    # soma acumulada com zero à esquerda: janela = acum[t] - acum[t - p]
+    ganhos = np.zeros((s, t))
+    perdas = np.zeros((s, t))
+    np.cumsum(np.where(deltas > 0, deltas, 0.0), axis=1, out=ganhos[:, 1:])
+    np.cumsum(np.where(deltas > 0, 0.0, -deltas), axis=1, out=perdas[:, 1:])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for i, p in enumerate(periodos):
+            if p <= 0 or p >= t:
+                continue
+            media_ganho = (ganhos[:, p:] - ganhos[:, :-p]) / p
+            media_perda = (perdas[:, p:] - perdas[:, :-p]) / p
+            rs = media_ganho / media_perda
+            out[i, :, p:] = np.where(media_perda == 0, 100.0, 100 - (100 / (1 + rs)))
+    return out
+
+
+def media_movel_matriz(precos, periodos: Sequence[int]) -> np.ndarray:
+    """Média móvel simples para cada período: ``(P, S, T)``; 0 sem dados suficientes."""
+    m = _matriz(precos)
+    s, t = m.shape
+    periodos = list(periodos)
+    out = np.zeros((len(periodos), s, t))
+    acum = np.zeros((s, t + 1))
+    np.cumsum(m, axis=1, out=acum[:, 1:])
+    for i, p in enumerate(periodos):
+        if p <= 0 or p > t:
+            continue
+        out[i, :, p - 1:] = (acum[:, p:] - acum[:, :-p]) / p
+    return out
+
+
+def performance_matriz(precos) -> np.ndarray:
+    """Variação percentual acumulada desde o primeiro preço: ``(S, T)``."""
+    m = _matriz(precos)
+    if m.shape[1] == 0:
+        return np.zeros_like(m)
+    inicial = m[:, :1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        perf = (m - inicial) / inicial * 100
+    perf[np.broadcast_to(inicial == 0, perf.shape)] = 0.0
+    perf[:, 0] = 0.0
+    return perf
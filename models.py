@@ -1,6 +1,6 @@
 from __future__ import annotations
-from datetime import datetime
-from sqlalchemy import String, DateTime, Text, Float, Boolean
+from datetime import date, datetime
+from sqlalchemy import BigInteger, Date, Integer, String, DateTime, Text, Float, Boolean, Index, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column
 from flask_login import UserMixin
 from db import Base
@@ -30,6 +30,8 @@ class UserCredential(Base):
 
 class OrderLog(Base):
     __tablename__ = "order_logs"
+    # histórico paginado por (created_at, id) dentro de cada usuário
+    __table_args__ = (Index("ix_order_logs_user_created_id", "user_id", "created_at", "id"),)
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[str] = mapped_column(String(128), index=True)
@@ -41,4 +43,117 @@ class OrderLog(Base):
     price: Mapped[float] = mapped_column(Float, default=0.0)
     status: Mapped[str] = mapped_column(String(32), default="created")
     resp_json: Mapped[str] = mapped_column(Text, default="")
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+class TradeRecord(Base):
+    """Execução (``myTrades`` / ``userTrades``) copiada da corretora."""
+    __tablename__ = "trade_records"
+    __table_args__ = (
+        UniqueConstraint("user_id", "market", "symbol", "trade_id", name="uq_trade_records_trade"),
+        Index("ix_trade_records_user_symbol_time", "user_id", "symbol", "time"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    user_id: Mapped[str] = mapped_column(String(128))
+    market: Mapped[str] = mapped_column(String(16))          # spot / futures
+    symbol: Mapped[str] = mapped_column(String(32))
+    trade_id: Mapped[int] = mapped_column(BigInteger)
+    order_id: Mapped[int] = mapped_column(BigInteger)
+    side: Mapped[str] = mapped_column(String(8))             # BUY / SELL
+    price: Mapped[float] = mapped_column(Float)
+    qty: Mapped[float] = mapped_column(Float)
+    quote_qty: Mapped[float] = mapped_column(Float, default=0.0)
+    commission: Mapped[float] = mapped_column(Float, default=0.0)
+    commission_asset: Mapped[str] = mapped_column(String(16), default="")
+    realized_pnl: Mapped[float] = mapped_column(Float, default=0.0)  # só futuros
+    is_maker: Mapped[bool] = mapped_column(Boolean, default=False)
+    time: Mapped[int] = mapped_column(BigInteger)            # ms desde epoch
+
+class ExchangeOrder(Base):
+    """Ordem (``allOrders``) copiada da corretora; status é atualizado pelo sync."""
+    __tablename__ = "exchange_orders"
+    __table_args__ = (
+        UniqueConstraint("user_id", "market", "symbol", "order_id", name="uq_exchange_orders_order"),
+        Index("ix_exchange_orders_user_symbol_time", "user_id", "symbol", "time"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    user_id: Mapped[str] = mapped_column(String(128))
+    market: Mapped[str] = mapped_column(String(16))
+    symbol: Mapped[str] = mapped_column(String(32))
+    order_id: Mapped[int] = mapped_column(BigInteger)
+    client_order_id: Mapped[str] = mapped_column(String(64), default="")
+    side: Mapped[str] = mapped_column(String(8))
+    tipo: Mapped[str] = mapped_column(String(32))
+    price: Mapped[float] = mapped_column(Float, default=0.0)
+    orig_qty: Mapped[float] = mapped_column(Float, default=0.0)
+    executed_qty: Mapped[float] = mapped_column(Float, default=0.0)
+    status: Mapped[str] = mapped_column(String(32))
+    time: Mapped[int] = mapped_column(BigInteger)
+    update_time: Mapped[int] = mapped_column(BigInteger, default=0)
+
+class SyncCursor(Base):
+    """Até onde já copiamos trades/ordens de (usuário, mercado, símbolo)."""
+    __tablename__ = "sync_cursors"
+    __table_args__ = (
+        UniqueConstraint("user_id", "market", "symbol", "kind", name="uq_sync_cursors_key"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    user_id: Mapped[str] = mapped_column(String(128), index=True)
+    market: Mapped[str] = mapped_column(String(16))
+    symbol: Mapped[str] = mapped_column(String(32))
+    kind: Mapped[str] = mapped_column(String(16))             # trades / orders / rollup
+    next_id: Mapped[int] = mapped_column(BigInteger, default=0)  # fromId / orderId da próxima busca
+    synced_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+class DailyRollup(Base):
+    """Totais diários (UTC) por usuário e símbolo, mantidos por ``services.rollups``."""
+    __tablename__ = "daily_rollups"
+    __table_args__ = (
+        UniqueConstraint("user_id", "dia", "market", "symbol", name="uq_daily_rollups_key"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    user_id: Mapped[str] = mapped_column(String(128))
+    dia: Mapped[date] = mapped_column(Date)
+    market: Mapped[str] = mapped_column(String(16))
+    symbol: Mapped[str] = mapped_column(String(32))
+    quote: Mapped[str] = mapped_column(String(16), default="")
+    trades: Mapped[int] = mapped_column(Integer, default=0)
+    volume: Mapped[float] = mapped_column(Float, default=0.0)     # na moeda de cotação
+    taxas: Mapped[float] = mapped_column(Float, default=0.0)
+    lucro: Mapped[float] = mapped_column(Float, default=0.0)      # realizado, líquido de taxas
+    ganhos: Mapped[int] = mapped_column(Integer, default=0)       # fills que realizaram lucro
+    perdas: Mapped[int] = mapped_column(Integer, default=0)
+
+class SchedulerLease(Base):
+    """Lease do agendador: ``membro:<worker>`` (presença) ou ``shard:<n>`` (dono dos jobs do shard)."""
+    __tablename__ = "scheduler_leases"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    owner: Mapped[str] = mapped_column(String(128), default="")
+    expires_at: Mapped[float] = mapped_column(Float, default=0.0)   # epoch em segundos
+
+class ScheduledJob(Base):
+    """Job periódico de um usuário (``auto``, ``sync``...), executado pelo dono do shard."""
+    __tablename__ = "scheduled_jobs"
+    __table_args__ = (
+        UniqueConstraint("kind", "usuario", name="uq_scheduled_jobs_key"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(32))
+    usuario: Mapped[str] = mapped_column(String(128))
+    interval_s: Mapped[int] = mapped_column(Integer, default=60)
+    enabled: Mapped[bool] = mapped_column(Boolean, default=True, index=True)
+    slot: Mapped[int] = mapped_column(Integer, default=0)            # hash estável; shard = slot % shards
+    params: Mapped[str] = mapped_column(Text, default="{}")          # JSON (ex.: symbol, quantidade)
+    last_tick: Mapped[int] = mapped_column(BigInteger, default=-1)   # último tick reivindicado
+    next_run_at: Mapped[float] = mapped_column(Float, default=0.0)   # epoch em segundos
+    last_run_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    last_status: Mapped[str] = mapped_column(String(16), default="")
+    last_error: Mapped[str] = mapped_column(Text, default="")
+    last_owner: Mapped[str] = mapped_column(String(128), default="")
+    runs: Mapped[int] = mapped_column(Integer, default=0)
+
@@ -1,5 +1,49 @@
+from flask import jsonify
+
+from services.ai_cache import ai_cache
+from services.ai_jobs import ai_jobs
+from services.chat_stream import chat_stream_stats
+from services.order_log_writer import order_log_writer
+from services.single_flight import single_flight
+from services.weight_governor import governor
 from . import bp
 
 @bp.route('/')
 def index():
     return 'monitoramento placeholder'
+
+
+@bp.route('/binance')
+def binance():
+    """Uso atual dos limites de peso/ordens da Binance (todos os workers)."""
+    return jsonify(governor.utilisation())
+
+
+@bp.route('/order_log')
+def order_log():
+    """Fila de gravação do OrderLog deste worker (profundidade, latência do flush)."""
+    return jsonify(order_log_writer.stats())
+
+
+@bp.route('/ai_cache')
+def ai_cache_stats():
+    """Acertos/faltas do cache de respostas da OpenAI e latência economizada (todos os workers)."""
+    return jsonify(ai_cache.stats())
+
+
+@bp.route('/ai_jobs')
+def ai_jobs_stats():
+    """Jobs de IA em segundo plano: fila de todos os workers, espera e ocupação deste worker."""
+    return jsonify(ai_jobs.resumo())
+
+
+@bp.route('/chat_stream')
+def chat_stream():
+    """TTFT e tokens/s dos chats em streaming deste worker (últimos pedidos e totais)."""
+    return jsonify(chat_stream_stats.resumo())
+
+
+@bp.route('/single_flight')
+def single_flight_stats():
+    """Chamadas coalescidas por single-flight neste worker (líderes e seguidores)."""
+    return jsonify(single_flight.stats)
@@ -1,5 +1,53 @@
+import logging
+
+from flask import flash, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+from sqlalchemy.exc import SQLAlchemyError
+
+from services import rollups
 from . import bp
 
+log = logging.getLogger(__name__)
+
+
 @bp.route('/')
+@login_required
 def index():
-    return 'relatorios placeholder'
+    """Volume, taxas, lucro e taxa de acerto do período, lidos dos rollups diários."""
+    erro = None
+    periodo = rollups.Periodo()
+    dados = {"totais": [], "por_simbolo": [], "por_dia": []}
+    try:
+        periodo = rollups.Periodo.from_args(request.args)
+    except ValueError as e:
+        erro = f"Período inválido: {e}"
+    try:
+        # traz o que o sync gravou desde o último agregado (normalmente nada)
+        rollups.atualizar(current_user.id)
+    except Exception as e:
+        log.warning("rollup de %s não atualizado: %s", current_user.id, e)
+    try:
+        dados = rollups.relatorio(current_user.id, periodo)
+    except SQLAlchemyError as e:
+        erro = f"Relatórios indisponíveis ({e.__class__.__name__})."
+    metricas = {}
+    for t in dados["totais"]:
+        q = t["quote"]
+        metricas[f"Lucro ({q})"] = round(t["lucro"], 2)
+        metricas[f"Volume ({q})"] = round(t["volume"], 2)
+        metricas[f"Taxas ({q})"] = round(t["taxas"], 4)
+        metricas[f"Trades ({q})"] = t["trades"]
+        metricas[f"Acerto ({q})"] = f"{t['win_rate']:.0%}" if t["win_rate"] is not None else "-"
+    return render_template(
+        'relatorios/relatorio_geral.html',
+        periodo=periodo, erro=erro, metricas=metricas, **dados,
+    )
+
+
+@bp.route('/reconstruir', methods=['POST'])
+@login_required
+def reconstruir():
+    """Refaz os rollups do usuário a partir dos trades copiados."""
+    lidos = rollups.reconstruir(current_user.id)
+    flash(f"Relatórios refeitos a partir de {lidos} trades.")
+    return redirect(url_for('relatorios.index'))
@@ -7,4 +7,6 @@ source .venv/bin/activate
 pip install -r requirements.txt
 export FLASK_APP=app.py
 export FLASK_ENV=development
+# sem gunicorn não há post_worker_init: o app liga o agendador de jobs
+export SCHEDULER_AUTOSTART=1
 flask run
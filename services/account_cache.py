@@ -0,0 +1,151 @@
+# services/account_cache.py
+"""Cache de snapshots de conta compartilhado entre workers.
+
+Cada seção (saldos spot, ordens abertas, saldo de futuros...) é guardada por
+credencial no SQLite local, com TTL curto. Enviar uma ordem invalida o
+snapshot da credencial; um contador de geração impede que uma leitura que
+começou antes da ordem grave dados velhos depois da invalidação.
+"""
+from __future__ import annotations
+
+import functools
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Tuple
+
+from services.client_registry import registry
+from services.local_store import connect
+
+__all__ = ["AccountCache", "account_cache", "invalidates_account"]
+
+log = logging.getLogger(__name__)
+
+ACCOUNT_SNAPSHOT_TTL_S = float(os.getenv("ACCOUNT_SNAPSHOT_TTL_S", "5"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS account_snapshots (
+    fingerprint TEXT NOT NULL,
+    section TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (fingerprint, section)
+);
+CREATE TABLE IF NOT EXISTS account_generations (
+    fingerprint TEXT PRIMARY KEY,
+    gen INTEGER NOT NULL
+);
+"""
+
+
+class AccountCache:
+    def __init__(self, path: str | None = None, ttl_s: float = ACCOUNT_SNAPSHOT_TTL_S) -> None:
+        self.path = path
+        self.ttl_s = ttl_s
+        self._ready_pid: int | None = None
+
+    def _conn(self):
+        conn = connect(self.path)
+        if self._ready_pid != os.getpid():
+            conn.executescript(_SCHEMA)
+            self._ready_pid = os.getpid()
+        return conn
+
+    def generation(self, fingerprint: str) -> int:
+        """Contador de invalidações da credencial; leia antes de buscar na Binance."""
+        try:
+            row = self._conn().execute(
+                "SELECT gen FROM account_generations WHERE fingerprint = ?", (fingerprint,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            log.warning("account cache indisponível: %s", e)
+            return -1
+        return row[0] if row else 0
+
+    def get(self, fingerprint: str, sections: Iterable[str],
+            max_age_s: float | None = None) -> Dict[str, Tuple[Any, float]]:
+        """Seções em cache com idade ≤ ``max_age_s``: ``{seção: (valor, idade_s)}``."""
+        max_age_s = self.ttl_s if max_age_s is None else max_age_s
+        sections = list(sections)
+        marks = ",".join("?" * len(sections))
+        try:
+            rows = self._conn().execute(
+                f"SELECT section, payload, fetched_at FROM account_snapshots "
+                f"WHERE fingerprint = ? AND section IN ({marks})",
+                (fingerprint, *sections),
+            ).fetchall()
+        except sqlite3.Error as e:
+            # cache é acessório: sem ele o dashboard só vai direto à Binance
+            log.warning("account cache indisponível: %s", e)
+            return {}
+        now = time.time()
+        return {
+            section: (json.loads(payload), now - fetched_at)
+            for section, payload, fetched_at in rows
+            if now - fetched_at <= max_age_s
+        }
+
+    def put(self, fingerprint: str, values: Dict[str, Any], generation: int) -> bool:
+        """Grava ``values`` se nenhuma invalidação aconteceu desde ``generation``."""
+        now = time.time()
+        rows = [(fingerprint, k, json.dumps(v), now) for k, v in values.items()]
+        try:
+            with self._transaction() as conn:
+                if self.generation(fingerprint) != generation:
+                    return False
+                conn.executemany(
+                    "INSERT OR REPLACE INTO account_snapshots (fingerprint, section, payload, fetched_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+            return True
+        except sqlite3.Error as e:
+            log.warning("falha ao gravar account cache: %s", e)
+            return False
+
+    def invalidate(self, fingerprint: str) -> None:
+        try:
+            with self._transaction() as conn:
+                conn.execute(
+                    "INSERT INTO account_generations (fingerprint, gen) VALUES (?, 1) "
+                    "ON CONFLICT(fingerprint) DO UPDATE SET gen = gen + 1",
+                    (fingerprint,),
+                )
+                conn.execute("DELETE FROM account_snapshots WHERE fingerprint = ?", (fingerprint,))
+        except sqlite3.Error as e:
+            log.error("falha ao invalidar account cache de %s: %s", fingerprint, e)
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def invalidate_client(self, client: Any) -> None:
+        fp = registry.fingerprint_of(client) if client is not None else None
+        if fp:
+            self.invalidate(fp)
+
+
+account_cache = AccountCache()
+
+
+def invalidates_account(fn):
+    """Decorator para funções ``f(client, ...)`` que alteram a conta."""
+    @functools.wraps(fn)
+    def wrapper(client, *args, **kwargs):
+        try:
+            return fn(client, *args, **kwargs)
+        finally:
+            # mesmo em erro: um timeout pode ter deixado a ordem aceita
+            account_cache.invalidate_client(client)
+    return wrapper
@@ -0,0 +1,209 @@
+# services/ai_cache.py
+"""Cache de respostas da OpenAI compartilhado entre workers.
+
+A chave é o hash de (modelo, mensagens normalizadas, temperatura,
+max_tokens): o prompt da análise é montado a partir de indicadores
+arredondados, então pedidos idênticos são frequentes e a resposta pode ser
+reaproveitada por ``AI_CACHE_TTL_S``. O armazenamento é o SQLite local
+(``services.local_store``), limitado a ``AI_CACHE_MAX_ENTRIES`` linhas: ao
+passar do limite saem as usadas há mais tempo (LRU).
+
+Cada acerto soma ao ``economizado_ms`` a latência que a chamada original
+levou; os contadores também ficam no SQLite e valem para todos os workers.
+Faltas simultâneas para a mesma chave passam por ``services.single_flight``:
+só uma chamada vai à OpenAI e as demais recebem a mesma resposta.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from services.local_store import connect
+from services.single_flight import SingleFlight, single_flight
+
+__all__ = ["AICache", "ai_cache", "cache_key", "normalizar_mensagens", "cached_chat"]
+
+log = logging.getLogger(__name__)
+
+AI_CACHE_TTL_S = float(os.getenv("AI_CACHE_TTL_S", "900"))
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "5000"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ai_responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_hit REAL NOT NULL,
+    latency_ms REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_ai_responses_last_hit ON ai_responses (last_hit);
+CREATE TABLE IF NOT EXISTS ai_cache_stats (
+    name TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+
+def normalizar_mensagens(messages: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """Só ``role``/``content``, sem espaços repetidos ou nas pontas das linhas."""
+    out = []
+    for m in messages:
+        texto = str(m.get("content") or "")
+        texto = "\n".join(" ".join(linha.split()) for linha in texto.strip().splitlines())
+        out.append({"role": str(m.get("role", "user")).lower(), "content": texto})
+    return out
+
+
+def cache_key(model: str, messages: List[Dict[str, Any]], temperature: float | None = None,
+              max_tokens: int | None = None) -> str:
+    bruto = json.dumps(
+        {"model": model, "messages": normalizar_mensagens(messages),
+         "temperature": temperature, "max_tokens": max_tokens},
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.blake2b(bruto.encode(), digest_size=20).hexdigest()
+
+
+class AICache:
+    def __init__(self, path: str | None = None, ttl_s: float = AI_CACHE_TTL_S,
+                 max_entries: int = AI_CACHE_MAX_ENTRIES) -> None:
+        self.path = path
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._ready_pid: int | None = None
+
+    def _conn(self):
+        conn = connect(self.path)
+        if self._ready_pid != os.getpid():
+            conn.executescript(_SCHEMA)
+            self._ready_pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _contar(conn, **deltas: float) -> None:
+        conn.executemany(
+            "INSERT INTO ai_cache_stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            list(deltas.items()),
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        """Resposta em cache e dentro do TTL, ou ``None`` (conta acerto/falta)."""
+        now = time.time()
+        try:
+            with self._transaction() as conn:
+                row = conn.execute(
+                    "SELECT response, created_at, latency_ms FROM ai_responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or now - row[1] > self.ttl_s:
+                    self._contar(conn, faltas=1)
+                    return None
+                conn.execute("UPDATE ai_responses SET last_hit = ?, hits = hits + 1 WHERE key = ?", (now, key))
+                self._contar(conn, acertos=1, economizado_ms=row[2])
+                return row[0]
+        except sqlite3.Error as e:
+            # cache é acessório: sem ele a chamada vai direto à OpenAI
+            log.warning("cache de IA indisponível: %s", e)
+            return None
+
+    def put(self, key: str, model: str, response: str, latency_ms: float) -> None:
+        now = time.time()
+        try:
+            with self._transaction() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO ai_responses (key, model, response, created_at, last_hit, latency_ms, hits) "
+                    "VALUES (?, ?, ?, ?, ?, ?, 0)",
+                    (key, model, response, now, now, latency_ms),
+                )
+                expiradas = conn.execute(
+                    "DELETE FROM ai_responses WHERE created_at < ?", (now - self.ttl_s,)
+                ).rowcount
+                excesso = conn.execute("SELECT COUNT(*) FROM ai_responses").fetchone()[0] - self.max_entries
+                removidas = 0
+                if excesso > 0:
+                    removidas = conn.execute(
+                        "DELETE FROM ai_responses WHERE key IN "
+                        "(SELECT key FROM ai_responses ORDER BY last_hit LIMIT ?)", (excesso,)
+                    ).rowcount
+                self._contar(conn, gravadas=1, expiradas=expiradas, removidas_lru=removidas)
+        except sqlite3.Error as e:
+            log.warning("falha ao gravar no cache de IA: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            conn = self._conn()
+            valores = dict(conn.execute("SELECT name, value FROM ai_cache_stats").fetchall())
+            entradas = conn.execute("SELECT COUNT(*) FROM ai_responses").fetchone()[0]
+        except sqlite3.Error as e:
+            return {"erro": str(e)}
+        acertos, faltas = int(valores.get("acertos", 0)), int(valores.get("faltas", 0))
+        return {
+            "acertos": acertos,
+            "faltas": faltas,
+            "taxa_acerto": round(acertos / (acertos + faltas), 4) if acertos + faltas else None,
+            "economizado_ms": round(valores.get("economizado_ms", 0.0), 1),
+            "entradas": entradas,
+            "gravadas": int(valores.get("gravadas", 0)),
+            "expiradas": int(valores.get("expiradas", 0)),
+            "removidas_lru": int(valores.get("removidas_lru", 0)),
+            "ttl_s": self.ttl_s,
+            "max_entradas": self.max_entries,
+        }
+
+    def clear(self) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM ai_responses")
+            conn.execute("DELETE FROM ai_cache_stats")
+
+
+ai_cache = AICache()
+
+
+def cached_chat(client, model: str, messages: List[Dict[str, Any]], temperature: float | None = None,
+                max_tokens: int | None = None, cache: AICache | None = None,
+                sf: SingleFlight | None = None) -> str:
+    """``client.chat.completions.create`` com cache; devolve o texto da resposta.
+
+    Erros da API não são guardados: sobem para o chamador como antes (e para
+    quem estava esperando a mesma chamada).
+    """
+    cache = cache or ai_cache
+    key = cache_key(model, messages, temperature, max_tokens)
+    texto = cache.get(key)
+    if texto is not None:
+        return texto
+    kwargs: Dict[str, Any] = {"model": model, "messages": messages}
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    if max_tokens is not None:
+        kwargs["max_tokens"] = max_tokens
+
+    def chamar() -> str:
+        t0 = time.perf_counter()
+        resp = client.chat.completions.create(**kwargs)
+        latencia_ms = (time.perf_counter() - t0) * 1000
+        texto = resp.choices[0].message.content or ""
+        cache.put(key, model, texto, latencia_ms)
+        return texto
+
+    return (sf or single_flight).do(f"ai:{key}", chamar)
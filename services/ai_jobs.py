@@ -0,0 +1,230 @@
+# services/ai_jobs.py
+"""Fila de jobs em segundo plano para chamadas lentas à OpenAI.
+
+A rota responde na hora e deixa a chamada num pool de
+``AI_JOBS_WORKERS`` threads do próprio worker do gunicorn; a página
+consulta o status até o resultado aparecer. O estado dos jobs fica no
+SQLite local (``services.local_store``), então a consulta pode cair em
+qualquer worker.
+
+Cada job guarda o pid do worker que o roda, e esse worker renova o
+``heartbeat`` dos seus jobs abertos a cada ``AI_JOBS_HEARTBEAT_S``. Um job
+sem heartbeat há ``_ORFAO_BATIDAS`` intervalos é órfão (o worker morreu ou
+foi reciclado): ``status`` o reporta como erro e ``submit`` não o
+reaproveita. ``submit`` com ``chave`` reaproveita um job igual ainda
+pendente ou em andamento (de qualquer worker vivo). Um job que passa de
+``AI_JOBS_TIMEOUT_S`` sem terminar também é reportado como erro.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+from services.local_store import connect
+
+__all__ = ["AIJobs", "ai_jobs"]
+
+log = logging.getLogger(__name__)
+
+AI_JOBS_WORKERS = int(os.getenv("AI_JOBS_WORKERS", "4"))
+AI_JOBS_TIMEOUT_S = float(os.getenv("AI_JOBS_TIMEOUT_S", "300"))
+AI_JOBS_RETER_S = float(os.getenv("AI_JOBS_RETER_S", "3600"))
+AI_JOBS_HEARTBEAT_S = float(os.getenv("AI_JOBS_HEARTBEAT_S", "5"))
+_ORFAO_BATIDAS = 3
+
+PENDENTE, RODANDO, CONCLUIDO, ERRO = "pendente", "rodando", "concluido", "erro"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ai_jobs (
+    id TEXT PRIMARY KEY,
+    chave TEXT,
+    status TEXT NOT NULL,
+    resultado TEXT,
+    erro TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    pid INTEGER,
+    heartbeat REAL
+);
+CREATE INDEX IF NOT EXISTS ix_ai_jobs_chave ON ai_jobs (chave, status);
+CREATE INDEX IF NOT EXISTS ix_ai_jobs_finished ON ai_jobs (finished_at);
+"""
+# bancos criados antes do heartbeat
+_COLUNAS_NOVAS = ("pid INTEGER", "heartbeat REAL")
+
+
+class AIJobs:
+    def __init__(self, path: str | None = None, workers: int = AI_JOBS_WORKERS,
+                 timeout_s: float = AI_JOBS_TIMEOUT_S, reter_s: float = AI_JOBS_RETER_S,
+                 heartbeat_s: float = AI_JOBS_HEARTBEAT_S) -> None:
+        self.path = path
+        self.workers = max(1, workers)
+        self.timeout_s = timeout_s
+        self.reter_s = reter_s
+        self.heartbeat_s = heartbeat_s
+        self._batidas: threading.Thread | None = None
+        self._pool: ThreadPoolExecutor | None = None
+        self._pool_pid: int | None = None
+        self._lock = threading.Lock()
+        self._ready_pid: int | None = None
+        self._ativos = 0
+        self.stats: Dict[str, Any] = {"enviados": 0, "reaproveitados": 0, "concluidos": 0, "erros": 0,
+                                      "espera_ms": 0.0, "execucao_ms": 0.0, "pico_ativos": 0}
+
+    def _conn(self):
+        conn = connect(self.path)
+        if self._ready_pid != os.getpid():
+            conn.executescript(_SCHEMA)
+            for coluna in _COLUNAS_NOVAS:
+                try:
+                    conn.execute(f"ALTER TABLE ai_jobs ADD COLUMN {coluna}")
+                except sqlite3.OperationalError:
+                    pass  # já existe
+            self._ready_pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def _pool_(self) -> ThreadPoolExecutor:
+        # threads não sobrevivem ao fork do gunicorn: recria o pool no worker
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ai-job")
+                self._pool_pid = os.getpid()
+                self._batidas = threading.Thread(target=self._laco_heartbeat, name="ai-job-heartbeat",
+                                                 daemon=True)
+                self._batidas.start()
+            return self._pool
+
+    # ------------------------------------------------------------ interface
+    def submit(self, fn: Callable[[], Any], chave: str | None = None) -> str:
+        """Enfileira ``fn()`` e devolve o id do job (o de um job igual, se houver)."""
+        agora = time.time()
+        pool = self._pool_()
+        with self._transaction() as conn:
+            if chave is not None:
+                row = conn.execute(
+                    "SELECT id FROM ai_jobs WHERE chave = ? AND status IN (?, ?) AND created_at > ? "
+                    "AND heartbeat > ? ORDER BY created_at DESC LIMIT 1",
+                    (chave, PENDENTE, RODANDO, agora - self.timeout_s, agora - self._orfao_s),
+                ).fetchone()
+                if row:
+                    self.stats["reaproveitados"] += 1
+                    return row[0]
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO ai_jobs (id, chave, status, created_at, pid, heartbeat) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, chave, PENDENTE, agora, os.getpid(), agora),
+            )
+            conn.execute("DELETE FROM ai_jobs WHERE finished_at < ?", (agora - self.reter_s,))
+        self.stats["enviados"] += 1
+        pool.submit(self._rodar, job_id, fn, agora)
+        return job_id
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Estado do job (``None`` se não existe ou já foi descartado)."""
+        row = self._conn().execute(
+            "SELECT status, resultado, erro, created_at, started_at, finished_at, heartbeat "
+            "FROM ai_jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        status, resultado, erro, criado, iniciado, terminado, batida = row
+        agora = time.time()
+        if status in (PENDENTE, RODANDO) and agora - criado > self.timeout_s:
+            status, erro = ERRO, "job expirou sem resposta"
+        elif status in (PENDENTE, RODANDO) and agora - (batida or criado) > self._orfao_s:
+            status, erro = ERRO, "o worker que rodava o job parou"
+        return {
+            "id": job_id,
+            "status": status,
+            "resultado": json.loads(resultado) if resultado is not None else None,
+            "erro": erro,
+            "espera_ms": round((iniciado - criado) * 1000, 1) if iniciado else None,
+            "execucao_ms": round((terminado - iniciado) * 1000, 1) if terminado and iniciado else None,
+        }
+
+    def resumo(self) -> Dict[str, Any]:
+        """Contadores deste worker e a fila de todos os workers."""
+        try:
+            por_status = dict(self._conn().execute(
+                "SELECT status, COUNT(*) FROM ai_jobs GROUP BY status").fetchall())
+        except sqlite3.Error as e:
+            por_status = {"erro": str(e)}
+        terminados = self.stats["concluidos"] + self.stats["erros"]
+        return {
+            **self.stats,
+            "espera_media_ms": round(self.stats["espera_ms"] / terminados, 1) if terminados else None,
+            "execucao_media_ms": round(self.stats["execucao_ms"] / terminados, 1) if terminados else None,
+            "ativos": self._ativos,
+            "threads": self.workers,
+            "fila": por_status,
+        }
+
+    # ------------------------------------------------------------- internos
+    @property
+    def _orfao_s(self) -> float:
+        return self.heartbeat_s * _ORFAO_BATIDAS
+
+    def _laco_heartbeat(self) -> None:
+        pid = os.getpid()
+        while self._pool_pid == pid:
+            time.sleep(self.heartbeat_s)
+            try:
+                self._conn().execute(
+                    "UPDATE ai_jobs SET heartbeat = ? WHERE pid = ? AND status IN (?, ?)",
+                    (time.time(), pid, PENDENTE, RODANDO),
+                )
+            except sqlite3.Error as e:
+                log.warning("falha ao renovar o heartbeat dos jobs de IA: %s", e)
+
+    def _marcar(self, job_id: str, sql: str, params: tuple) -> None:
+        try:
+            self._conn().execute(f"UPDATE ai_jobs SET {sql} WHERE id = ?", (*params, job_id))
+        except sqlite3.Error as e:
+            log.warning("falha ao atualizar o job %s: %s", job_id, e)
+
+    def _rodar(self, job_id: str, fn: Callable[[], Any], criado: float) -> None:
+        inicio = time.time()
+        with self._lock:
+            self._ativos += 1
+            self.stats["pico_ativos"] = max(self.stats["pico_ativos"], self._ativos)
+        self._marcar(job_id, "status = ?, started_at = ?", (RODANDO, inicio))
+        try:
+            resultado = fn()
+            texto = json.dumps(resultado, ensure_ascii=False)
+        except Exception as e:
+            log.warning("job de IA %s falhou: %s", job_id, e)
+            self._marcar(job_id, "status = ?, erro = ?, finished_at = ?", (ERRO, str(e), time.time()))
+            self.stats["erros"] += 1
+        else:
+            self._marcar(job_id, "status = ?, resultado = ?, finished_at = ?", (CONCLUIDO, texto, time.time()))
+            self.stats["concluidos"] += 1
+        finally:
+            with self._lock:
+                self._ativos -= 1
+            self.stats["espera_ms"] += (inicio - criado) * 1000
+            self.stats["execucao_ms"] += (time.time() - inicio) * 1000
+
+
+ai_jobs = AIJobs()
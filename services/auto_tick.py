@@ -0,0 +1,120 @@
+# services/auto_tick.py
+"""Tick do modo automático agrupado por (símbolo, intervalo).
+
+Em vez de cada usuário buscar candles e pedir a própria análise, o tick
+recebe todos os usuários vencidos de uma vez (``Coordenador`` com
+``lote=True``), busca os dados de mercado e calcula a análise uma vez por
+(símbolo, intervalo) e avalia a regra de cada usuário contra essa mesma
+análise. As ordens saem num pool de ``AUTO_TICK_CONCORRENCIA`` threads, em
+lotes, então o custo de dados/IA cresce com os símbolos, não com os
+usuários, e o de ordens fica limitado.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from services.job_scheduler import Disparo
+
+__all__ = ["TickEngine", "SYMBOL_PADRAO", "INTERVALO_PADRAO", "QUANTIDADE_PADRAO"]
+
+log = logging.getLogger(__name__)
+
+AUTO_TICK_CONCORRENCIA = int(os.getenv("AUTO_TICK_CONCORRENCIA", "8"))
+AUTO_TICK_LOTE = int(os.getenv("AUTO_TICK_LOTE", "50"))
+SYMBOL_PADRAO = "BTCUSDT"
+INTERVALO_PADRAO = "1h"
+QUANTIDADE_PADRAO = "0.001"
+
+Grupo = Tuple[str, str]   # (symbol, intervalo dos candles)
+
+
+class TickEngine:
+    """Executa um lote de disparos ``auto``.
+
+    ``mercado(symbol, intervalo)`` devolve o snapshot de mercado,
+    ``analisar(snapshot)`` a análise (dict com ``sugestao``) e
+    ``executar(usuario, analise, disparo)`` avalia a regra do usuário e envia
+    a ordem, devolvendo o resultado de ``strategy.decide_and_execute``.
+    """
+
+    def __init__(self, mercado: Callable[[str, str], Dict[str, Any]],
+                 analisar: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 executar: Callable[[str, Dict[str, Any], Disparo], Dict[str, Any]],
+                 concorrencia: int = AUTO_TICK_CONCORRENCIA, lote: int = AUTO_TICK_LOTE) -> None:
+        self.mercado = mercado
+        self.analisar = analisar
+        self.executar = executar
+        self.concorrencia = max(1, concorrencia)
+        self.lote = max(1, lote)
+        self._pool: ThreadPoolExecutor | None = None
+        self._pool_lock = threading.Lock()
+        self.stats: Dict[str, Any] = {"ticks": 0, "usuarios": 0, "grupos": 0, "analises": 0,
+                                      "ordens": 0, "erros": 0, "ultimo_ms": None}
+
+    @staticmethod
+    def grupo(d: Disparo) -> Grupo:
+        p = d.params
+        return (p.get("symbol") or SYMBOL_PADRAO).upper(), p.get("intervalo") or INTERVALO_PADRAO
+
+    def __call__(self, disparos: Iterable[Disparo]) -> Dict[str, str]:
+        t0 = time.perf_counter()
+        grupos: Dict[Grupo, List[Disparo]] = {}
+        for d in disparos:
+            grupos.setdefault(self.grupo(d), []).append(d)
+
+        # dados + análise: uma vez por grupo, em paralelo
+        analises = dict(zip(grupos, self._pool_().map(self._analisar_grupo, grupos)))
+
+        erros: Dict[str, str] = {}
+        tarefas = []
+        for g, ds in grupos.items():
+            analise = analises[g]
+            for d in ds:
+                if isinstance(analise, Exception):
+                    erros[d.usuario] = f"análise de {g[0]} {g[1]} indisponível: {analise}"
+                else:
+                    tarefas.append((d, analise))
+
+        # ordens: em lotes, no máximo ``concorrencia`` ao mesmo tempo
+        ordens = 0
+        for i in range(0, len(tarefas), self.lote):
+            for usuario, erro, executou in self._pool_().map(self._executar_um, tarefas[i:i + self.lote]):
+                if erro:
+                    erros[usuario] = erro
+                ordens += executou
+
+        self.stats["ticks"] += 1
+        self.stats["usuarios"] += sum(len(ds) for ds in grupos.values())
+        self.stats["grupos"] += len(grupos)
+        self.stats["analises"] += sum(not isinstance(a, Exception) for a in analises.values())
+        self.stats["ordens"] += ordens
+        self.stats["erros"] += len(erros)
+        self.stats["ultimo_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        return erros
+
+    def _pool_(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.concorrencia, thread_name_prefix="auto-tick")
+        return self._pool
+
+    def _analisar_grupo(self, g: Grupo):
+        try:
+            return self.analisar(self.mercado(*g))
+        except Exception as e:
+            log.warning("análise de %s %s falhou: %s", g[0], g[1], e)
+            return e
+
+    def _executar_um(self, item: Tuple[Disparo, Dict[str, Any]]) -> Tuple[str, str, bool]:
+        d, analise = item
+        try:
+            resultado = self.executar(d.usuario, analise, d) or {}
+        except Exception as e:
+            return d.usuario, str(e), False
+        return d.usuario, resultado.get("erro") or "", bool(resultado.get("executado"))
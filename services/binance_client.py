@@ -1,4 +1,4 @@
-import os, time, requests
+import os
 from typing import Dict
 from binance.client import Client
 from binance.enums import (
@@ -7,30 +7,44 @@ from binance.enums import (
     TIME_IN_FORCE_GTC
 )
 from binance.exceptions import BinanceAPIException, BinanceRequestException
+from services.account_cache import invalidates_account
+from services.client_registry import registry
+from services.order_log_writer import logs_order
+from services.paper_engine import PAPER_PRICE_FIXED, PAPER_PRICE_LIVE, paper_engine
+from services.price_service import price_service
 
 BINANCE_TESTNET = os.getenv("BINANCE_TESTNET", "true").lower() == "true"
 BINANCE_API_BASE = os.getenv("BINANCE_API_BASE", "").strip()
 PAPER_TRADING = os.getenv("PAPER_TRADING", "true").lower() == "true"
-PAPER_PRICE_LIVE = os.getenv("PAPER_PRICE_LIVE", "true").lower() == "true"
 
 def make_client(api_key: str, api_secret: str) -> Client | None:
     if PAPER_TRADING:
         return None
-    client = Client(api_key, api_secret, tld='com', testnet=BINANCE_TESTNET)
-    if BINANCE_API_BASE:
-        client.API_URL = f"{BINANCE_API_BASE}/api"
-    return client
+    return registry.get(api_key, api_secret, testnet=BINANCE_TESTNET, base_url=BINANCE_API_BASE)
 
 def _ok(order: Dict): return {"ok": True, "order": order}
-def _err(e: Exception):
+def _err(e: Exception, client: Client | None = None):
+    registry.report_error(client, e)  # chave revogada: recria o client na próxima chamada
     code = getattr(e, "status_code", "")
     return {"ok": False, "error": f"{code} {str(e)}"}
 
-def _paper_order(symbol, side, tipo, qty, price=0.0, extra=None):
-    now = int(time.time()*1000)
-    return _ok({"paper": True, "symbol": symbol, "side": side, "type": tipo,
-                "origQty": qty, "price": price, "extra": extra or {},
-                "transactTime": now, "orderId": now})
+def _paper_order(symbol, side, tipo, qty, price=0.0, extra=None, owner=None):
+    # ordens limitadas/stop ficam no livro do motor até o preço cruzar
+    extra = extra or {}
+    try:
+        if tipo == "OCO":
+            limite, stop = paper_engine.submit_oco(symbol, side, qty, extra["price"],
+                                                   extra["stopPrice"], extra["stopLimitPrice"], owner=owner)
+            return _ok({"paper": True, "symbol": symbol, "orderListId": limite.order_list_id,
+                        "contingencyType": "OCO", "transactionTime": limite.time,
+                        "orderReports": [limite.as_dict(), stop.as_dict()]})
+        ordem = paper_engine.submit(symbol, side, tipo, qty, price, extra.get("stopPrice", 0.0), owner=owner)
+    except Exception as e:
+        return _err(e)
+    if tipo == "MARKET" and ordem.status != "FILLED":
+        # sem preço de referência a ordem a mercado não executa: é rejeição, não sucesso
+        return {"ok": False, "error": f"sem preço de {symbol} para executar a ordem a mercado (paper)"}
+    return _ok(ordem.as_dict())
 
 def test_account(client: Client | None) -> dict:
     if PAPER_TRADING:
@@ -40,20 +54,16 @@ def test_account(client: Client | None) -> dict:
         balances = {b['asset']: float(b['free']) for b in info.get('balances', []) if float(b.get('free', '0')) > 0}
         return {"ok": True, "balances": balances}
     except (BinanceAPIException, BinanceRequestException) as e:
-        return _err(e)
+        return _err(e, client)
     except Exception as e:
-        return _err(e)
+        return _err(e, client)
 
 def get_symbol_price(client: Client | None, symbol="BTCUSDT") -> float | None:
     if PAPER_TRADING and PAPER_PRICE_LIVE:
-        try:
-            r = requests.get("https://api.binance.com/api/v3/ticker/price", params={"symbol": symbol}, timeout=5)
-            r.raise_for_status()
-            return float(r.json()["price"])
-        except Exception:
-            return 68000.0
+        # snapshot compartilhado de todos os pares; None se ainda não houver preço
+        return price_service.get_price(symbol)
     if PAPER_TRADING:
-        return 68000.0
+        return PAPER_PRICE_FIXED
     try:
         t = client.get_symbol_ticker(symbol=symbol)
         return float(t["price"])
@@ -69,59 +79,69 @@ def get_free_usdt(client: Client | None) -> float:
     except Exception:
         return 0.0
 
-def place_market_order(client: Client | None, symbol="BTCUSDT", side="BUY", qty=0.001) -> dict:
-    if PAPER_TRADING: return _paper_order(symbol, side, "MARKET", qty)
+@logs_order("MARKET")
+@invalidates_account
+def place_market_order(client: Client | None, symbol="BTCUSDT", side="BUY", qty=0.001, user_id: str | None = None) -> dict:
+    if PAPER_TRADING: return _paper_order(symbol, side, "MARKET", qty, owner=user_id)
     try:
         return _ok(client.create_order(symbol=symbol, side=side, type=ORDER_TYPE_MARKET, quantity=qty))
     except (BinanceAPIException, BinanceRequestException) as e:
-        return _err(e)
+        return _err(e, client)
     except Exception as e:
-        return _err(e)
+        return _err(e, client)
 
-def place_limit_order(client: Client | None, symbol="BTCUSDT", side="BUY", qty=0.001, price: float = 0.0) -> dict:
-    if PAPER_TRADING: return _paper_order(symbol, side, "LIMIT", qty, price)
+@logs_order("LIMIT")
+@invalidates_account
+def place_limit_order(client: Client | None, symbol="BTCUSDT", side="BUY", qty=0.001, price: float = 0.0, user_id: str | None = None) -> dict:
+    if PAPER_TRADING: return _paper_order(symbol, side, "LIMIT", qty, price, owner=user_id)
     try:
         return _ok(client.create_order(symbol=symbol, side=side, type=ORDER_TYPE_LIMIT,
                                        timeInForce=TIME_IN_FORCE_GTC, quantity=qty, price=f"{price:.8f}"))
     except (BinanceAPIException, BinanceRequestException) as e:
-        return _err(e)
+        return _err(e, client)
     except Exception as e:
-        return _err(e)
+        return _err(e, client)
 
+@logs_order("STOP_LOSS_LIMIT")
+@invalidates_account
 def place_stop_loss_limit(client: Client | None, symbol="BTCUSDT", side="SELL", qty=0.001,
-                          stop_price: float=0.0, limit_price: float=0.0) -> dict:
-    if PAPER_TRADING: return _paper_order(symbol, side, "STOP_LOSS_LIMIT", qty, limit_price, {"stopPrice": stop_price})
+                          stop_price: float=0.0, limit_price: float=0.0, user_id: str | None = None) -> dict:
+    if PAPER_TRADING: return _paper_order(symbol, side, "STOP_LOSS_LIMIT", qty, limit_price, {"stopPrice": stop_price}, owner=user_id)
     try:
         return _ok(client.create_order(symbol=symbol, side=side, type=ORDER_TYPE_STOP_LOSS_LIMIT,
                                        timeInForce=TIME_IN_FORCE_GTC, quantity=qty,
                                        price=f"{limit_price:.8f}", stopPrice=f"{stop_price:.8f}"))
     except (BinanceAPIException, BinanceRequestException) as e:
-        return _err(e)
+        return _err(e, client)
     except Exception as e:
-        return _err(e)
+        return _err(e, client)
 
+@logs_order("TAKE_PROFIT_LIMIT")
+@invalidates_account
 def place_take_profit_limit(client: Client | None, symbol="BTCUSDT", side="SELL", qty=0.001,
-                            stop_price: float=0.0, limit_price: float=0.0) -> dict:
-    if PAPER_TRADING: return _paper_order(symbol, side, "TAKE_PROFIT_LIMIT", qty, limit_price, {"stopPrice": stop_price})
+                            stop_price: float=0.0, limit_price: float=0.0, user_id: str | None = None) -> dict:
+    if PAPER_TRADING: return _paper_order(symbol, side, "TAKE_PROFIT_LIMIT", qty, limit_price, {"stopPrice": stop_price}, owner=user_id)
     try:
         return _ok(client.create_order(symbol=symbol, side=side, type=ORDER_TYPE_TAKE_PROFIT_LIMIT,
                                        timeInForce=TIME_IN_FORCE_GTC, quantity=qty,
                                        price=f"{limit_price:.8f}", stopPrice=f"{stop_price:.8f}"))
     except (BinanceAPIException, BinanceRequestException) as e:
-        return _err(e)
+        return _err(e, client)
     except Exception as e:
-        return _err(e)
+        return _err(e, client)
 
+@logs_order("OCO")
+@invalidates_account
 def place_oco_order(client: Client | None, symbol="BTCUSDT", side="SELL", qty=0.001,
-                    price: float=0.0, stop_price: float=0.0, stop_limit_price: float=0.0) -> dict:
+                    price: float=0.0, stop_price: float=0.0, stop_limit_price: float=0.0, user_id: str | None = None) -> dict:
     if PAPER_TRADING:
-        return _paper_order(symbol, side, "OCO", qty, price, {"price": price, "stopPrice": stop_price, "stopLimitPrice": stop_limit_price})
+        return _paper_order(symbol, side, "OCO", qty, price, {"price": price, "stopPrice": stop_price, "stopLimitPrice": stop_limit_price}, owner=user_id)
     try:
         order = client.create_oco_order(symbol=symbol, side=side, quantity=qty,
                                         price=f"{price:.8f}", stopPrice=f"{stop_price:.8f}",
                                         stopLimitPrice=f"{stop_limit_price:.8f}", stopLimitTimeInForce=TIME_IN_FORCE_GTC)
         return _ok(order)
     except (BinanceAPIException, BinanceRequestException) as e:
-        return _err(e)
+        return _err(e, client)
     except Exception as e:
-        return _err(e)
\ No newline at end of file
+        return _err(e, client)
\ No newline at end of file
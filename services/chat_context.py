@@ -0,0 +1,210 @@
+# services/chat_context.py
+"""Contexto de conversa com orçamento de tokens e resumo acumulado.
+
+``GestorContexto.montar`` recebe o prompt de sistema, o histórico e a
+mensagem nova e devolve as mensagens a enviar dentro de ``orcamento``
+tokens (contados localmente, com ``tiktoken`` se estiver instalado ou uma
+estimativa por palavras/pontuação). O prompt de sistema, a mensagem nova e
+as ``recentes`` últimas mensagens sempre vão. Quando o histórico não cabe,
+as mensagens mais antigas são dobradas num resumo, que entra como
+mensagem de sistema.
+
+O resumo é acumulado: fica no SQLite local por conversa (``conversa_id``:
+usuário + sessão de chat), junto com até onde do histórico ele cobre e o
+hash desse trecho. Sem id de conversa o resumo é feito, mas não guardado —
+duas conversas que começam igual não podem compartilhar o resumo. Na rodada seguinte só
+as mensagens que saíram desde então são somadas ao resumo anterior, e o
+corte vai até ``FOLGA`` do orçamento para o resumo não ser refeito a cada
+mensagem nova.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.local_store import connect
+
+__all__ = ["GestorContexto", "contar_tokens", "conversa_id", "tokens_mensagens"]
+
+log = logging.getLogger(__name__)
+
+CHAT_CONTEXT_BUDGET = int(os.getenv("CHAT_CONTEXT_BUDGET", "3000"))
+CHAT_CONTEXT_RECENT = int(os.getenv("CHAT_CONTEXT_RECENT", "4"))
+CHAT_SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", "400"))
+FOLGA = 0.6
+_TOKENS_POR_MENSAGEM = 4   # papéis e separadores do formato de chat
+
+Mensagem = Dict[str, str]
+Resumidor = Callable[[List[Mensagem], int], str]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_summaries (
+    conversa TEXT PRIMARY KEY,
+    ate INTEGER NOT NULL,
+    prefixo TEXT NOT NULL,
+    resumo TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+_encoder: Any = None
+_PALAVRAS = re.compile(r"\w+|[^\w\s]")
+
+
+def contar_tokens(texto: str) -> int:
+    """Tokens de ``texto``: exato com ``tiktoken``; sem ele, uma estimativa."""
+    global _encoder
+    if _encoder is None:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            # sem a lib (ou sem o arquivo do BPE): cada palavra ~4 caracteres por token
+            _encoder = False
+    if _encoder:
+        return len(_encoder.encode(texto))
+    return sum(math.ceil(len(p) / 4) for p in _PALAVRAS.findall(texto))
+
+
+def tokens_mensagens(msgs: List[Mensagem]) -> int:
+    return sum(contar_tokens(m.get("content") or "") + _TOKENS_POR_MENSAGEM for m in msgs) + 2
+
+
+def conversa_id(usuario: Any, sessao: Any) -> str:
+    """Chave da conversa no cache de resumos: um usuário pode ter várias sessões."""
+    return f"{usuario}:{sessao}"
+
+
+def _hash(*partes: Any) -> str:
+    bruto = json.dumps(partes, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(bruto.encode(), digest_size=16).hexdigest()
+
+
+class GestorContexto:
+    """Monta o contexto de uma conversa dentro do orçamento de tokens.
+
+    ``resumir(mensagens, max_tokens)`` chama o modelo com o pedido de resumo
+    e devolve o texto; se falhar, as mensagens antigas são só descartadas.
+    """
+
+    def __init__(self, resumir: Resumidor, orcamento: int = CHAT_CONTEXT_BUDGET,
+                 recentes: int = CHAT_CONTEXT_RECENT, resumo_tokens: int = CHAT_SUMMARY_TOKENS,
+                 path: str | None = None) -> None:
+        self.resumir = resumir
+        self.orcamento = orcamento
+        self.recentes = recentes
+        self.resumo_tokens = resumo_tokens
+        self.path = path
+        self._ready_pid: int | None = None
+        self.stats: Dict[str, int] = {"montagens": 0, "com_resumo": 0, "resumos": 0, "falhas_resumo": 0,
+                                      "tokens_historico": 0, "tokens_enviados": 0}
+
+    # ------------------------------------------------------------ interface
+    def montar(self, system: str, historico: Optional[List[Dict[str, Any]]], mensagem: str,
+               conversa: str | None = None, orcamento: int | None = None) -> List[Mensagem]:
+        """Mensagens para a API: sistema, [resumo], histórico recente e a mensagem nova.
+
+        ``conversa`` (ver ``conversa_id``) identifica a conversa no cache de
+        resumos; sem ela o resumo é refeito a cada chamada.
+        """
+        hist = [{"role": str(m.get("role", "user")), "content": str(m.get("content") or "")}
+                for m in historico or [] if m.get("content")]
+        inicio = [{"role": "system", "content": system}]
+        fim = [{"role": "user", "content": mensagem}]
+        custos = [contar_tokens(m["content"]) + _TOKENS_POR_MENSAGEM for m in hist]
+        disponivel = (orcamento or self.orcamento) - tokens_mensagens(inicio + fim)
+        self.stats["montagens"] += 1
+        self.stats["tokens_historico"] += sum(custos)
+
+        if sum(custos) <= disponivel:
+            self.stats["tokens_enviados"] += sum(custos)
+            return inicio + hist + fim
+
+        ate, resumo = self._resumo_salvo(conversa, hist) if conversa else (0, "")
+        espaco = disponivel - self.resumo_tokens
+        corte = self._corte(custos, hist, ate, espaco)
+        if corte > ate:
+            novo = self._dobrar(resumo, hist[ate:corte])
+            if novo is not None:
+                resumo = novo
+                if conversa:
+                    self._salvar(conversa, corte, _hash(hist[:corte]), resumo)
+        kept = hist[corte:]
+        if resumo:
+            self.stats["com_resumo"] += 1
+            kept = [{"role": "system", "content": f"Resumo da conversa até aqui:\n{resumo}"}] + kept
+        self.stats["tokens_enviados"] += tokens_mensagens(kept) - 2
+        return inicio + kept + fim
+
+    # ------------------------------------------------------------- internos
+    def _corte(self, custos: List[int], hist: List[Mensagem], ate: int, espaco: int) -> int:
+        """Primeiro índice mantido: ``ate`` se ainda cabe; senão corta até ``FOLGA`` do espaço."""
+        limite = max(ate, len(hist) - self.recentes)
+        if sum(custos[ate:]) <= espaco or limite <= ate:
+            return ate
+        alvo = espaco * FOLGA
+        corte, restante = ate, sum(custos[ate:])
+        while corte < limite and restante > alvo:
+            restante -= custos[corte]
+            corte += 1
+        # não deixa uma resposta do assistente sem a pergunta que a originou
+        while corte < limite and hist[corte]["role"] != "user":
+            corte += 1
+        return corte
+
+    def _dobrar(self, resumo: str, mensagens: List[Mensagem]) -> Optional[str]:
+        trecho = "\n".join(f"{m['role']}: {m['content']}" for m in mensagens)
+        pedido = [
+            {"role": "system", "content": (
+                "Resuma a conversa para servir de contexto às próximas respostas. Mantenha fatos, "
+                "números, decisões e preferências do usuário; descarte cumprimentos e repetições. "
+                f"Use no máximo {self.resumo_tokens} tokens."
+            )},
+            {"role": "user", "content": (f"Resumo anterior:\n{resumo}\n\n" if resumo else "")
+             + f"Novas mensagens:\n{trecho}"},
+        ]
+        try:
+            novo = (self.resumir(pedido, self.resumo_tokens) or "").strip()
+        except Exception as e:
+            log.warning("falha ao resumir o contexto (mensagens antigas descartadas): %s", e)
+            self.stats["falhas_resumo"] += 1
+            return None
+        self.stats["resumos"] += 1
+        return novo or None
+
+    def _conn(self):
+        conn = connect(self.path)
+        if self._ready_pid != os.getpid():
+            conn.executescript(_SCHEMA)
+            self._ready_pid = os.getpid()
+        return conn
+
+    def _resumo_salvo(self, conversa: str, hist: List[Mensagem]) -> Tuple[int, str]:
+        """(até onde o resumo cobre, resumo) — (0, "") se não há ou o histórico mudou."""
+        try:
+            row = self._conn().execute(
+                "SELECT ate, prefixo, resumo FROM chat_summaries WHERE conversa = ?", (conversa,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            log.warning("cache de resumos indisponível: %s", e)
+            return 0, ""
+        if row is None or row[0] > len(hist) or _hash(hist[:row[0]]) != row[1]:
+            return 0, ""
+        return row[0], row[2]
+
+    def _salvar(self, conversa: str, ate: int, prefixo: str, resumo: str) -> None:
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO chat_summaries (conversa, ate, prefixo, resumo, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (conversa, ate, prefixo, resumo, time.time()),
+            )
+        except sqlite3.Error as e:
+            log.warning("falha ao gravar o resumo da conversa: %s", e)
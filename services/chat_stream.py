@@ -0,0 +1,151 @@
+# services/chat_stream.py
+"""Chat da OpenAI em streaming, token a token, com métricas por pedido.
+
+``stream_chat`` é o par de ``services.ai_cache.cached_chat`` para quem
+quer mostrar a resposta enquanto ela é gerada: devolve um gerador de
+pedaços de texto na ordem em que chegam. Se o consumidor fecha o gerador
+(o navegador desconectou e o servidor WSGI chamou ``close()``), o stream
+HTTP com a OpenAI é fechado na hora e a geração para de ser cobrada.
+
+Por pedido ficam o tempo até o primeiro token (TTFT), os tokens e
+tokens/s da geração (cada pedaço com texto conta como um token, que é o
+que a API manda) e se terminou, foi cancelado ou deu erro. Respostas
+completas vão para o cache de IA; um acerto sai de uma vez.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, Deque, Dict, Iterator, List
+
+from services.ai_cache import AICache, ai_cache, cache_key
+
+__all__ = ["MetricasStream", "ChatStreamStats", "chat_stream_stats", "stream_chat"]
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class MetricasStream:
+    model: str
+    ttft_ms: float | None = None
+    duracao_ms: float | None = None
+    tokens: int = 0
+    tokens_s: float | None = None
+    status: str = "andamento"    # concluido | cancelado | erro
+    cache: bool = False
+
+
+class ChatStreamStats:
+    """Últimos ``janela`` pedidos deste worker e os totais por status."""
+
+    def __init__(self, janela: int = 500) -> None:
+        self._recentes: Deque[MetricasStream] = deque(maxlen=janela)
+        self._lock = threading.Lock()
+        self.totais: Dict[str, int] = {"concluido": 0, "cancelado": 0, "erro": 0, "cache": 0}
+
+    def registrar(self, m: MetricasStream) -> None:
+        with self._lock:
+            self._recentes.append(m)
+            self.totais[m.status] = self.totais.get(m.status, 0) + 1
+            self.totais["cache"] += m.cache
+        log.info("chat stream %s: ttft=%sms tokens=%d tokens/s=%s cache=%s",
+                 m.status, m.ttft_ms, m.tokens, m.tokens_s, m.cache)
+
+    def resumo(self) -> Dict[str, Any]:
+        with self._lock:
+            recentes = list(self._recentes)
+        ttft = sorted(m.ttft_ms for m in recentes if m.ttft_ms is not None and not m.cache)
+        vel = [m.tokens_s for m in recentes if m.tokens_s is not None and not m.cache]
+
+        def pct(q: float) -> float | None:
+            return ttft[min(len(ttft) - 1, int(q * len(ttft)))] if ttft else None
+
+        return {
+            **self.totais,
+            "ttft_p50_ms": pct(0.5),
+            "ttft_p95_ms": pct(0.95),
+            "tokens_s_medio": round(sum(vel) / len(vel), 1) if vel else None,
+            "recentes": [asdict(m) for m in recentes[-20:]],
+        }
+
+
+chat_stream_stats = ChatStreamStats()
+
+
+def stream_chat(client, model: str, messages: List[Dict[str, Any]], temperature: float | None = None,
+                max_tokens: int | None = None, cache: AICache | None = None,
+                metricas: MetricasStream | None = None,
+                stats: ChatStreamStats | None = None) -> Iterator[str]:
+    """Gera os pedaços da resposta conforme a OpenAI os envia.
+
+    ``metricas`` (opcional) é preenchido durante o stream, para o chamador
+    poder mandar os números ao cliente no fim. Erros da API sobem para o
+    consumidor do gerador.
+    """
+    cache = cache or ai_cache
+    stats = stats or chat_stream_stats
+    m = metricas or MetricasStream(model=model)
+    key = cache_key(model, messages, temperature, max_tokens)
+    t0 = time.perf_counter()
+
+    texto = cache.get(key)
+    if texto is not None:
+        m.cache, m.ttft_ms, m.tokens = True, 0.0, 1
+        try:
+            yield texto
+            m.status = "concluido"
+        except GeneratorExit:
+            m.status = "cancelado"
+            raise
+        finally:
+            m.duracao_ms = round((time.perf_counter() - t0) * 1000, 1)
+            stats.registrar(m)
+        return
+
+    kwargs: Dict[str, Any] = {"model": model, "messages": messages, "stream": True}
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    if max_tokens is not None:
+        kwargs["max_tokens"] = max_tokens
+    partes: List[str] = []
+    primeiro = None
+    resp = None
+    try:
+        resp = client.chat.completions.create(**kwargs)
+        for chunk in resp:
+            if not chunk.choices:
+                continue
+            pedaco = chunk.choices[0].delta.content
+            if not pedaco:
+                continue
+            if primeiro is None:
+                primeiro = time.perf_counter()
+                m.ttft_ms = round((primeiro - t0) * 1000, 1)
+            m.tokens += 1
+            partes.append(pedaco)
+            yield pedaco
+        m.status = "concluido"
+    except GeneratorExit:
+        m.status = "cancelado"
+        raise
+    except Exception:
+        m.status = "erro"
+        raise
+    finally:
+        if resp is not None and m.status != "concluido":
+            # fecha a conexão: a OpenAI para de gerar (e de cobrar) o resto
+            try:
+                resp.close()
+            except Exception as e:
+                log.debug("falha ao fechar o stream: %s", e)
+        fim = time.perf_counter()
+        m.duracao_ms = round((fim - t0) * 1000, 1)
+        if primeiro is not None and m.tokens > 1 and fim > primeiro:
+            m.tokens_s = round((m.tokens - 1) / (fim - primeiro), 1)
+        stats.registrar(m)
+
+    cache.put(key, model, "".join(partes), m.duracao_ms)
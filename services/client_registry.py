@@ -0,0 +1,162 @@
+# services/client_registry.py
+"""Registro de clients Binance reutilizáveis por credencial.
+
+Montar um ``binance.client.Client`` abre uma sessão HTTP nova (e, por padrão,
+faz um ping); fazer isso a cada request joga fora o pool keep-alive e paga o
+handshake TLS de novo. Aqui mantemos um client por (credencial, testnet,
+base URL) no processo, com despejo por LRU e por tempo ocioso.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Tuple
+
+from requests.adapters import HTTPAdapter
+
+from services.weight_governor import GovernedSession
+
+try:
+    from binance.client import Client  # python-binance
+    from binance.exceptions import BinanceAPIException
+except Exception:
+    Client = None  # se a lib não estiver disponível no build
+    BinanceAPIException = None
+
+__all__ = ["ClientRegistry", "registry", "get_client", "fingerprint", "is_auth_error"]
+
+CLIENT_REGISTRY_MAX = int(os.getenv("CLIENT_REGISTRY_MAX", "64"))
+CLIENT_IDLE_TTL_S = float(os.getenv("CLIENT_IDLE_TTL_S", "900"))
+CLIENT_HTTP_TIMEOUT_S = float(os.getenv("CLIENT_HTTP_TIMEOUT_S", "10"))
+CLIENT_POOL_SIZE = int(os.getenv("CLIENT_POOL_SIZE", "10"))
+
+# Códigos da Binance que indicam chave/assinatura inválida ou revogada.
+_AUTH_ERROR_CODES = {-1022, -2008, -2014, -2015}
+
+RegistryKey = Tuple[str, bool, str]
+
+
+def fingerprint(api_key: str, api_secret: str) -> str:
+    """Identificador estável e não reversível de um par de chaves."""
+    return hashlib.sha256(f"{api_key}:{api_secret}".encode()).hexdigest()[:16]
+
+
+def is_auth_error(exc: BaseException | None) -> bool:
+    """True se ``exc`` indica que o client precisa ser recriado."""
+    if exc is None or BinanceAPIException is None or not isinstance(exc, BinanceAPIException):
+        return False
+    return exc.code in _AUTH_ERROR_CODES or exc.status_code == 401
+
+
+def _build_client(api_key: str, api_secret: str, testnet: bool, base_url: str) -> Any:
+    client = Client(api_key, api_secret, tld="com", testnet=testnet, ping=False,
+                    requests_params={"timeout": CLIENT_HTTP_TIMEOUT_S})
+    if base_url:
+        client.API_URL = f"{base_url}/api"
+    # todo o tráfego passa pelo controle de peso compartilhado
+    session = GovernedSession()
+    session.headers.update(client.session.headers)
+    # pool maior para aguentar o fan-out do dashboard sem descartar conexões
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=CLIENT_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    client.session = session
+    return client
+
+
+@dataclass
+class _Entry:
+    client: Any
+    last_used: float
+
+
+class ClientRegistry:
+    """Cache LRU de clients, seguro para uso entre threads."""
+
+    def __init__(self, max_size: int = CLIENT_REGISTRY_MAX, idle_ttl_s: float = CLIENT_IDLE_TTL_S,
+                 factory=_build_client) -> None:
+        self.max_size = max_size
+        self.idle_ttl_s = idle_ttl_s
+        self._factory = factory
+        self._entries: "OrderedDict[RegistryKey, _Entry]" = OrderedDict()
+        self._keys_by_client: dict[int, RegistryKey] = {}
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.hits = 0
+
+    def get(self, api_key: str, api_secret: str, testnet: bool = False, base_url: str = "") -> Any:
+        """Devolve o client da credencial, criando-o se necessário."""
+        key: RegistryKey = (fingerprint(api_key, api_secret), bool(testnet), base_url or "")
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.last_used = now
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.client
+            client = self._factory(api_key, api_secret, bool(testnet), base_url or "")
+            self.builds += 1
+            self._entries[key] = _Entry(client, now)
+            self._keys_by_client[id(client)] = key
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+            return client
+
+    def fingerprint_of(self, client: Any) -> str | None:
+        """Fingerprint da credencial de um client criado por este registro."""
+        with self._lock:
+            key = self._keys_by_client.get(id(client))
+            return key[0] if key else None
+
+    def discard(self, client: Any) -> None:
+        """Remove ``client``; a próxima chamada a :meth:`get` cria outro."""
+        with self._lock:
+            key = self._keys_by_client.get(id(client))
+            if key is not None and key in self._entries:
+                self._drop(key)
+
+    def report_error(self, client: Any, exc: BaseException | None) -> None:
+        """Descarta o client se ``exc`` for erro de autenticação."""
+        if is_auth_error(exc):
+            self.discard(client)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_client.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "builds": self.builds, "hits": self.hits}
+
+    # ------------------------------------------------------------------
+    def _evict_idle(self, now: float) -> None:
+        # entradas estão em ordem de uso: basta olhar o início
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry.last_used <= self.idle_ttl_s:
+                break
+            self._drop(key)
+
+    def _drop(self, key: RegistryKey) -> None:
+        # Não fechamos a sessão: outra thread pode estar no meio de uma
+        # requisição com este client. O GC fecha o pool quando ninguém mais
+        # tiver referência.
+        entry = self._entries.pop(key)
+        self._keys_by_client.pop(id(entry.client), None)
+
+
+registry = ClientRegistry()
+
+
+def get_client(api_key: str, api_secret: str, testnet: bool = False, base_url: str = "") -> Any:
+    """Atalho para ``registry.get``; exige python-binance instalado."""
+    if Client is None:
+        raise RuntimeError("python-binance não está disponível.")
+    return registry.get(api_key, api_secret, testnet=testnet, base_url=base_url)
@@ -0,0 +1,91 @@
+# services/fanout.py
+"""Execução concorrente de chamadas bloqueantes com prazo global.
+
+Usado pelo dashboard para disparar as consultas à Binance em paralelo: o
+tempo da página passa a ser o da chamada mais lenta (limitado pelo prazo),
+e não a soma de todas.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict
+
+__all__ = ["CallResult", "fan_out", "format_timings"]
+
+log = logging.getLogger(__name__)
+
+FANOUT_MAX_WORKERS = int(os.getenv("FANOUT_MAX_WORKERS", "8"))
+FANOUT_DEADLINE_S = float(os.getenv("FANOUT_DEADLINE_S", "4.0"))
+
+_EXECUTOR: ThreadPoolExecutor | None = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Executor do processo, criado sob demanda (seguro após o fork do gunicorn)."""
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(max_workers=FANOUT_MAX_WORKERS, thread_name_prefix="fanout")
+    return _EXECUTOR
+
+
+@dataclass
+class CallResult:
+    """Resultado de uma chamada do fan-out.
+
+    ``status`` é ``"ok"``, ``"error"`` ou ``"timeout"`` (a chamada não
+    terminou dentro do prazo e a seção deve ser exibida como indisponível).
+    """
+    name: str
+    status: str
+    value: Any = None
+    error: Exception | None = None
+    elapsed_ms: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "ok"
+
+
+def _timed(fn: Callable[[], Any]) -> tuple[Any, Exception | None, float]:
+    t0 = time.perf_counter()
+    try:
+        value, error = fn(), None
+    except Exception as e:
+        value, error = None, e
+    return value, error, (time.perf_counter() - t0) * 1000
+
+
+def fan_out(calls: Dict[str, Callable[[], Any]], deadline_s: float | None = None) -> Dict[str, CallResult]:
+    """Executa ``calls`` em paralelo e espera no máximo ``deadline_s`` segundos.
+
+    Chamadas que estouram o prazo continuam rodando no executor (não há como
+    interromper uma requisição HTTP em andamento), mas o resultado é
+    descartado e marcado como ``timeout``.
+    """
+    deadline_s = FANOUT_DEADLINE_S if deadline_s is None else deadline_s
+    started = time.perf_counter()
+    executor = _get_executor()
+    futures = {executor.submit(_timed, fn): name for name, fn in calls.items()}
+    done, _pending = wait(futures, timeout=deadline_s)
+
+    results: Dict[str, CallResult] = {}
+    for fut, name in futures.items():
+        if fut not in done:
+            fut.cancel()
+            results[name] = CallResult(name, "timeout", elapsed_ms=(time.perf_counter() - started) * 1000)
+            continue
+        value, error, elapsed_ms = fut.result()
+        status = "ok" if error is None else "error"
+        results[name] = CallResult(name, status, value=value, error=error, elapsed_ms=elapsed_ms)
+
+    log.info("fan_out total=%.1fms %s", (time.perf_counter() - started) * 1000, format_timings(results))
+    return results
+
+
+def format_timings(results: Dict[str, CallResult]) -> str:
+    """Resumo compacto ``nome=123ms(ok)`` para logs."""
+    return " ".join(f"{r.name}={r.elapsed_ms:.0f}ms({r.status})" for r in results.values())
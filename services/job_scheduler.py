@@ -0,0 +1,325 @@
+# services/job_scheduler.py
+"""Agendador de jobs por usuário compartilhado entre os workers do gunicorn.
+
+Todo worker roda ``Coordenador.passo`` periodicamente, mas só executa os
+jobs dos shards cujo lease ele detém:
+
+* presença — cada worker renova a linha ``membro:<id>`` em
+  ``scheduler_leases``; quem não renova em ``SCHEDULER_LEASE_S`` sai da conta;
+* shards — ``SCHEDULER_SHARDS`` linhas ``shard:<n>``; cada worker tenta ficar
+  com ``ceil(shards / workers vivos)`` delas e devolve o excedente, então um
+  worker que morre tem seus shards assumidos pelos outros quando o lease
+  vence. Com um shard (o padrão) isso é eleição de líder;
+* tick — antes de executar, o dono reivindica o tick atual do job com um
+  UPDATE condicional a ``last_tick < tick``. Mesmo com dois donos por um
+  instante (lease vencido de um worker lento), cada tick roda uma vez só.
+
+Jobs, leases e o resultado da última execução ficam no banco, visíveis de
+qualquer worker (``estado()``).
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import math
+import os
+import socket
+import threading
+import time
+import json
+import uuid
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from db import get_session
+from models import ScheduledJob, SchedulerLease
+
+__all__ = ["Coordenador", "Disparo", "slot_de"]
+
+log = logging.getLogger(__name__)
+
+SCHEDULER_SHARDS = int(os.getenv("SCHEDULER_SHARDS", "1"))
+SCHEDULER_LEASE_S = float(os.getenv("SCHEDULER_LEASE_S", "30"))
+SCHEDULER_POLL_S = float(os.getenv("SCHEDULER_POLL_S", "5"))
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "4"))
+SLOTS = 4096
+
+
+@dataclass(frozen=True)
+class Disparo:
+    """Um tick reivindicado de um job, entregue às funções registradas com ``lote=True``."""
+    usuario: str
+    params: Dict[str, Any]
+    tick: int
+
+
+def slot_de(kind: str, usuario: str) -> int:
+    """Hash estável entre processos (``hash()`` do Python muda a cada processo)."""
+    h = hashlib.blake2b(f"{kind}:{usuario}".encode(), digest_size=4).digest()
+    return int.from_bytes(h, "big") % SLOTS
+
+
+class Coordenador:
+    def __init__(self, session_factory: Callable = get_session, shards: int = SCHEDULER_SHARDS,
+                 lease_s: float = SCHEDULER_LEASE_S, workers: int = SCHEDULER_WORKERS,
+                 identidade: str | None = None, relogio: Callable[[], float] = time.time,
+                 executor: Executor | None = None) -> None:
+        self.session_factory = session_factory
+        self.shards = max(1, shards)
+        self.lease_s = lease_s
+        self.identidade = identidade or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.relogio = relogio
+        self._funcoes: Dict[str, Callable[..., Any]] = {}
+        self._lotes: set = set()
+        self._executor = executor or ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._rodando: set = set()
+        self._lock = threading.Lock()
+        self._tabelas_ok = False
+        self.meus_shards: List[int] = []
+
+    # ------------------------------------------------------------ cadastro
+    def registrar(self, kind: str, fn: Callable[..., Any], lote: bool = False) -> None:
+        """``fn(usuario)`` é chamada a cada tick dos jobs ``kind`` dos shards deste worker.
+
+        Com ``lote=True`` é chamada uma vez por passo com a lista de
+        ``Disparo`` de todos os jobs ``kind`` vencidos, e devolve
+        ``{usuario: erro}`` (``""`` para sucesso).
+        """
+        self._funcoes[kind] = fn
+        if lote:
+            self._lotes.add(kind)
+        else:
+            self._lotes.discard(kind)
+
+    def agendar(self, kind: str, usuario: str, interval_s: int, params: Dict[str, Any] | None = None) -> None:
+        """Liga (ou muda o intervalo/parâmetros de) um job; vale para todos os workers."""
+        with self._sessao() as session:
+            job = self._job(session, kind, usuario)
+            if job is None:
+                job = ScheduledJob(kind=kind, usuario=usuario, slot=slot_de(kind, usuario), last_tick=-1)
+                session.add(job)
+            if job.interval_s != max(1, int(interval_s)):
+                job.last_tick = -1     # ticks são contados em unidades do intervalo antigo
+            job.interval_s = max(1, int(interval_s))
+            job.params = json.dumps(params or {}, sort_keys=True)
+            job.enabled = True
+            job.next_run_at = self.relogio()
+
+    def cancelar(self, kind: str, usuario: str) -> bool:
+        with self._sessao() as session:
+            job = self._job(session, kind, usuario)
+            if job is None or not job.enabled:
+                return False
+            job.enabled = False
+            return True
+
+    def job(self, kind: str, usuario: str) -> Optional[Dict[str, Any]]:
+        with self._sessao() as session:
+            job = self._job(session, kind, usuario)
+            return self._como_dict(job) if job is not None else None
+
+    def estado(self, usuario: str | None = None) -> Dict[str, Any]:
+        """Leases vivos e os jobs (todos ou só os de ``usuario``), como o banco os vê agora."""
+        agora = self.relogio()
+        with self._sessao() as session:
+            leases = session.scalars(select(SchedulerLease).order_by(SchedulerLease.name)).all()
+            q = select(ScheduledJob)
+            if usuario is not None:
+                q = q.where(ScheduledJob.usuario == usuario)
+            jobs = session.scalars(q.order_by(ScheduledJob.kind, ScheduledJob.usuario)).all()
+            return {
+                "eu": self.identidade,
+                "meus_shards": list(self.meus_shards),
+                "shards": self.shards,
+                "leases": [
+                    {"nome": l.name, "dono": l.owner, "vence_em_s": round(l.expires_at - agora, 1)}
+                    for l in leases if l.expires_at >= agora
+                ],
+                "jobs": [self._como_dict(j) for j in jobs],
+            }
+
+    # ---------------------------------------------------------------- laço
+    def passo(self) -> List[str]:
+        """Renova leases e dispara os jobs vencidos dos meus shards. Retorna quais disparou."""
+        try:
+            self.meus_shards = self._leases()
+            return self._disparar() if self.meus_shards else []
+        except Exception as e:
+            log.warning("agendador (%s) falhou: %s", self.identidade, e)
+            return []
+
+    def sair(self) -> None:
+        """Devolve os leases para outro worker assumir sem esperar o vencimento."""
+        try:
+            with self._sessao() as session:
+                session.execute(
+                    update(SchedulerLease).where(SchedulerLease.owner == self.identidade)
+                    .values(owner="", expires_at=0.0)
+                )
+        except Exception as e:
+            log.warning("não foi possível devolver os leases: %s", e)
+        self.meus_shards = []
+
+    # ------------------------------------------------------------- internos
+    def _sessao(self):
+        if not self._tabelas_ok:
+            with self.session_factory() as session:
+                bind = session.get_bind()
+                for model in (SchedulerLease, ScheduledJob):
+                    model.__table__.create(bind=bind, checkfirst=True)
+            self._tabelas_ok = True
+        return self.session_factory()
+
+    @staticmethod
+    def _job(session, kind: str, usuario: str) -> Optional[ScheduledJob]:
+        return session.scalars(select(ScheduledJob).where(
+            ScheduledJob.kind == kind, ScheduledJob.usuario == usuario,
+        )).first()
+
+    @staticmethod
+    def _como_dict(j: ScheduledJob) -> Dict[str, Any]:
+        return {
+            "kind": j.kind, "usuario": j.usuario, "intervalo_s": j.interval_s, "ativo": j.enabled,
+            "ultima_execucao": j.last_run_at.isoformat() if j.last_run_at else None,
+            "status": j.last_status, "erro": j.last_error or None, "worker": j.last_owner or None,
+            "execucoes": j.runs, "params": json.loads(j.params or "{}"),
+        }
+
+    def _garantir_lease(self, nome: str) -> None:
+        try:
+            with self._sessao() as session:
+                if session.get(SchedulerLease, nome) is None:
+                    session.add(SchedulerLease(name=nome, owner="", expires_at=0.0))
+        except IntegrityError:
+            pass  # outro worker criou ao mesmo tempo
+
+    def _tentar(self, session, nome: str, agora: float) -> bool:
+        movidas = session.execute(
+            update(SchedulerLease)
+            .where(SchedulerLease.name == nome,
+                   or_(SchedulerLease.owner == self.identidade, SchedulerLease.expires_at < agora))
+            .values(owner=self.identidade, expires_at=agora + self.lease_s)
+        ).rowcount
+        return movidas == 1
+
+    def _leases(self) -> List[int]:
+        agora = self.relogio()
+        membro = f"membro:{self.identidade}"
+        nomes = [f"shard:{n}" for n in range(self.shards)]
+        with self._sessao() as session:
+            existentes = set(session.scalars(select(SchedulerLease.name).where(
+                SchedulerLease.name.in_([membro] + nomes))))
+        for nome in [membro] + nomes:
+            if nome not in existentes:
+                self._garantir_lease(nome)
+
+        with self._sessao() as session:
+            self._tentar(session, membro, agora)
+            # presença de workers que morreram há tempo (cada processo tem identidade nova)
+            session.execute(delete(SchedulerLease).where(
+                SchedulerLease.name.like("membro:%"), SchedulerLease.expires_at < agora - 10 * self.lease_s))
+            vivos = session.scalars(select(SchedulerLease.name).where(
+                SchedulerLease.name.like("membro:%"), SchedulerLease.expires_at >= agora)).all()
+            alvo = math.ceil(self.shards / max(1, len(vivos)))
+            linhas = session.scalars(select(SchedulerLease).where(SchedulerLease.name.in_(nomes))).all()
+            meus = sorted(l.name for l in linhas if l.owner == self.identidade and l.expires_at >= agora)
+            livres = [l.name for l in linhas if l.expires_at < agora]
+
+        meus_ok: List[str] = []
+        with self._sessao() as session:
+            for nome in meus[:alvo]:
+                if self._tentar(session, nome, agora):
+                    meus_ok.append(nome)
+            # excedente (entrou um worker novo): devolve para ele pegar
+            for nome in meus[alvo:]:
+                session.execute(update(SchedulerLease).where(
+                    SchedulerLease.name == nome, SchedulerLease.owner == self.identidade,
+                ).values(owner="", expires_at=0.0))
+        for nome in livres:
+            if len(meus_ok) >= alvo:
+                break
+            with self._sessao() as session:
+                if self._tentar(session, nome, agora):
+                    meus_ok.append(nome)
+        return sorted(int(n.split(":", 1)[1]) for n in meus_ok)
+
+    def _disparar(self) -> List[str]:
+        agora = self.relogio()
+        with self._sessao() as session:
+            vencidos = session.scalars(select(ScheduledJob).where(
+                ScheduledJob.enabled.is_(True), ScheduledJob.next_run_at <= agora,
+                (ScheduledJob.slot % self.shards).in_(self.meus_shards),
+            )).all()
+            candidatos = [(j.id, j.kind, j.usuario, j.interval_s, j.params) for j in vencidos]
+
+        disparados = []
+        lotes: Dict[str, List[Tuple[int, str, Disparo]]] = {}
+        for job_id, kind, usuario, intervalo, params in candidatos:
+            fn = self._funcoes.get(kind)
+            chave = f"{kind}:{usuario}"
+            if fn is None:
+                continue
+            with self._lock:
+                if chave in self._rodando:
+                    continue  # a execução anterior ainda não terminou neste worker
+            tick = int(agora // intervalo)
+            with self._sessao() as session:
+                movidas = session.execute(
+                    update(ScheduledJob)
+                    .where(ScheduledJob.id == job_id, ScheduledJob.enabled.is_(True),
+                           ScheduledJob.last_tick < tick)
+                    .values(last_tick=tick, next_run_at=(tick + 1) * intervalo, last_owner=self.identidade)
+                ).rowcount
+            if movidas != 1:
+                continue  # outro worker já rodou este tick
+            with self._lock:
+                self._rodando.add(chave)
+            disparados.append(chave)
+            if kind in self._lotes:
+                lotes.setdefault(kind, []).append((job_id, chave, Disparo(usuario, json.loads(params or "{}"), tick)))
+            else:
+                self._executor.submit(self._executar, job_id, chave, fn, usuario)
+        for kind, itens in lotes.items():
+            self._executor.submit(self._executar_lote, self._funcoes[kind], itens)
+        return disparados
+
+    def _executar(self, job_id: int, chave: str, fn: Callable[[str], Any], usuario: str) -> None:
+        status, erro = "ok", ""
+        try:
+            fn(usuario)
+        except Exception as e:
+            status, erro = "erro", str(e)
+            log.warning("job %s falhou: %s", chave, e)
+        finally:
+            with self._lock:
+                self._rodando.discard(chave)
+        self._registrar_resultado([(job_id, chave, erro)])
+
+    def _executar_lote(self, fn: Callable[[List[Disparo]], Dict[str, str]],
+                       itens: List[Tuple[int, str, Disparo]]) -> None:
+        try:
+            erros = fn([d for _, _, d in itens]) or {}
+        except Exception as e:
+            log.warning("lote de %d jobs falhou: %s", len(itens), e)
+            erros = {d.usuario: str(e) for _, _, d in itens}
+        finally:
+            with self._lock:
+                self._rodando.difference_update(chave for _, chave, _ in itens)
+        self._registrar_resultado([(job_id, chave, erros.get(d.usuario) or "") for job_id, chave, d in itens])
+
+    def _registrar_resultado(self, resultados: List[Tuple[int, str, str]]) -> None:
+        try:
+            with self._sessao() as session:
+                for job_id, _, erro in resultados:
+                    session.execute(update(ScheduledJob).where(ScheduledJob.id == job_id).values(
+                        last_run_at=datetime.utcnow(), last_status="erro" if erro else "ok",
+                        last_error=erro[:2000], runs=ScheduledJob.runs + 1,
+                    ))
+        except Exception as e:
+            log.warning("não foi possível registrar o resultado de %s: %s",
+                        ", ".join(chave for _, chave, _ in resultados), e)
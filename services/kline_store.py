@@ -0,0 +1,200 @@
+# services/kline_store.py
+"""Armazenamento local de candles (OHLCV) por símbolo e intervalo.
+
+Cada série fica num diretório ``<raiz>/<SYMBOL>/<intervalo>/`` com um arquivo
+binário por coluna (``open_time`` int64, demais float64), sempre em ordem
+crescente de ``open_time``. As leituras usam ``numpy.memmap``: uma consulta
+por intervalo de tempo é um ``searchsorted`` e devolve fatias sem cópia.
+A sincronização busca só os candles fechados depois do último gravado.
+"""
+from __future__ import annotations
+
+import fcntl
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+from services.price_service import price_service
+
+__all__ = ["KlineStore", "kline_store", "INTERVAL_MS", "COLUMNS"]
+
+log = logging.getLogger(__name__)
+
+KLINE_STORE_DIR = os.getenv("KLINE_STORE_DIR", os.path.join("data", "klines"))
+KLINE_BACKFILL = int(os.getenv("KLINE_BACKFILL", "1000"))
+_PAGE = 1000  # máximo de candles por chamada de /api/v3/klines
+_FAILURE_BACKOFF_S = 60.0
+
+INTERVAL_MS: Dict[str, int] = {
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000, "6h": 21_600_000,
+    "8h": 28_800_000, "12h": 43_200_000, "1d": 86_400_000, "3d": 259_200_000,
+    "1w": 604_800_000,
+}
+
+COLUMNS: Tuple[Tuple[str, type], ...] = (
+    ("open_time", np.int64), ("open", np.float64), ("high", np.float64),
+    ("low", np.float64), ("close", np.float64), ("volume", np.float64),
+)
+
+_SYMBOL_RE = re.compile(r"[A-Z0-9]{2,20}")
+
+
+class KlineStore:
+    def __init__(self, root: str = KLINE_STORE_DIR, session=None, base_url: str | None = None) -> None:
+        self.root = root
+        self.session = session or price_service.session
+        self.base_url = (base_url or price_service.base_url).rstrip("/")
+        self._maps: Dict[Tuple[str, str, str], Tuple[int, np.memmap]] = {}
+        self._maps_lock = threading.Lock()
+        self._failed_until: Dict[Tuple[str, str], float] = {}
+
+    # ------------------------------------------------------------------ disco
+    def _dir(self, symbol: str, interval: str) -> str:
+        symbol = symbol.upper()
+        if not _SYMBOL_RE.fullmatch(symbol):
+            raise ValueError(f"símbolo inválido: {symbol!r}")
+        if interval not in INTERVAL_MS:
+            raise ValueError(f"intervalo inválido: {interval!r}")
+        return os.path.join(self.root, symbol, interval)
+
+    @contextmanager
+    def _locked(self, symbol: str, interval: str) -> Iterator[str]:
+        """Lock exclusivo entre processos para escrever numa série."""
+        d = self._dir(symbol, interval)
+        os.makedirs(d, exist_ok=True)
+        with open(os.path.join(d, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield d
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _rows_on_disk(self, d: str) -> int:
+        # a menor coluna manda: protege contra escrita interrompida no meio
+        sizes = []
+        for name, dtype in COLUMNS:
+            path = os.path.join(d, f"{name}.bin")
+            sizes.append(os.path.getsize(path) // np.dtype(dtype).itemsize if os.path.exists(path) else 0)
+        return min(sizes)
+
+    def length(self, symbol: str, interval: str) -> int:
+        return self._rows_on_disk(self._dir(symbol, interval))
+
+    def _column(self, symbol: str, interval: str, name: str, n: int) -> np.ndarray:
+        """Coluna mapeada em memória com exatamente ``n`` linhas."""
+        if n == 0:
+            return np.empty(0, dtype=dict(COLUMNS)[name])
+        key = (symbol.upper(), interval, name)
+        with self._maps_lock:
+            cached = self._maps.get(key)
+            if cached is None or cached[0] < n:
+                path = os.path.join(self._dir(symbol, interval), f"{name}.bin")
+                cached = (n, np.memmap(path, dtype=dict(COLUMNS)[name], mode="r", shape=(n,)))
+                self._maps[key] = cached
+        return cached[1][:n]
+
+    def last_open_time(self, symbol: str, interval: str) -> int | None:
+        n = self.length(symbol, interval)
+        if n == 0:
+            return None
+        return int(self._column(symbol, interval, "open_time", n)[-1])
+
+    def append(self, symbol: str, interval: str, rows: Sequence[Sequence]) -> int:
+        """Grava candles no formato da API (``[open_time, o, h, l, c, v, ...]``).
+
+        Linhas que não avançam o último ``open_time`` gravado são ignoradas.
+        Retorna quantas foram gravadas.
+        """
+        with self._locked(symbol, interval) as d:
+            return self._append_locked(d, rows)
+
+    def _append_locked(self, d: str, rows: Sequence[Sequence]) -> int:
+        n = self._rows_on_disk(d)
+        last = None
+        if n:
+            with open(os.path.join(d, "open_time.bin"), "rb") as f:
+                f.seek((n - 1) * 8)
+                last = int(np.frombuffer(f.read(8), dtype=np.int64)[0])
+        fresh = [r for r in rows if last is None or int(r[0]) > last]
+        fresh.sort(key=lambda r: int(r[0]))
+        if not fresh:
+            return 0
+        for i, (name, dtype) in enumerate(COLUMNS):
+            path = os.path.join(d, f"{name}.bin")
+            col = np.asarray([r[i] for r in fresh]).astype(dtype)
+            with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                # descarta sobras de uma escrita interrompida antes de anexar
+                f.truncate(n * np.dtype(dtype).itemsize)
+                f.seek(0, os.SEEK_END)
+                col.tofile(f)
+        return len(fresh)
+
+    # ------------------------------------------------------------- consultas
+    def range(self, symbol: str, interval: str, start_ms: int | None = None,
+              end_ms: int | None = None) -> Dict[str, np.ndarray]:
+        """Colunas (views sem cópia) com ``start_ms <= open_time < end_ms``."""
+        n = self.length(symbol, interval)
+        times = self._column(symbol, interval, "open_time", n)
+        lo = 0 if start_ms is None else int(np.searchsorted(times, start_ms, side="left"))
+        hi = n if end_ms is None else int(np.searchsorted(times, end_ms, side="left"))
+        return {name: self._column(symbol, interval, name, n)[lo:hi] for name, _ in COLUMNS}
+
+    def tail(self, symbol: str, interval: str, limit: int) -> Dict[str, np.ndarray]:
+        """Os últimos ``limit`` candles gravados."""
+        n = self.length(symbol, interval)
+        lo = max(n - limit, 0)
+        return {name: self._column(symbol, interval, name, n)[lo:] for name, _ in COLUMNS}
+
+    # ---------------------------------------------------------- sincronização
+    def sync(self, symbol: str, interval: str, now_ms: int | None = None) -> int:
+        """Busca na Binance os candles fechados que ainda não estão no disco.
+
+        Retorna quantos candles foram gravados. Se já temos o último candle
+        fechado, não faz nenhuma requisição.
+        """
+        symbol = symbol.upper()
+        step = INTERVAL_MS[interval]
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        key = (symbol, interval)
+        if self._failed_until.get(key, 0) > time.monotonic():
+            return 0
+        last = self.last_open_time(symbol, interval)
+        if last is not None and last + 2 * step > now_ms:
+            return 0  # o candle seguinte ainda não fechou
+
+        total = 0
+        try:
+            with self._locked(symbol, interval) as d:
+                # outro worker pode ter sincronizado enquanto esperávamos o lock
+                last = self.last_open_time(symbol, interval)
+                start = last + step if last is not None else now_ms - KLINE_BACKFILL * step
+                while start + step <= now_ms:
+                    page = self._fetch(symbol, interval, start)
+                    closed = [r for r in page if int(r[6]) < now_ms]
+                    total += self._append_locked(d, closed)
+                    if len(page) < _PAGE or not closed:
+                        break
+                    start = int(closed[-1][0]) + step
+        except Exception as e:
+            log.warning("falha ao sincronizar candles %s %s: %s", symbol, interval, e)
+            self._failed_until[key] = time.monotonic() + _FAILURE_BACKOFF_S
+        return total
+
+    def _fetch(self, symbol: str, interval: str, start_ms: int) -> List[list]:
+        r = self.session.get(
+            f"{self.base_url}/api/v3/klines",
+            params={"symbol": symbol, "interval": interval, "startTime": start_ms, "limit": _PAGE},
+            timeout=10,
+        )
+        r.raise_for_status()
+        return r.json()
+
+
+kline_store = KlineStore()
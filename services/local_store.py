@@ -0,0 +1,41 @@
+# services/local_store.py
+"""Banco SQLite local compartilhado entre os workers do gunicorn.
+
+Usado para estado efêmero que precisa ser visto por todos os processos da
+mesma máquina (caches, contadores). Em modo WAL leitores não bloqueiam o
+escritor, então consultas frequentes custam microssegundos.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import tempfile
+import threading
+
+__all__ = ["LOCAL_STORE_PATH", "connect"]
+
+LOCAL_STORE_PATH = os.getenv(
+    "LOCAL_STORE_PATH", os.path.join(tempfile.gettempdir(), "claraverse_local.db")
+)
+
+_local = threading.local()
+
+
+def connect(path: str | None = None) -> sqlite3.Connection:
+    """Conexão da thread atual para ``path`` (reaberta após fork).
+
+    Em autocommit: cada instrução é sua própria transação, a não ser que o
+    chamador abra uma com ``BEGIN``.
+    """
+    path = path or LOCAL_STORE_PATH
+    conns = getattr(_local, "conns", None)
+    if conns is None or _local.pid != os.getpid():
+        conns = _local.conns = {}
+        _local.pid = os.getpid()
+    conn = conns.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conns[path] = conn
+    return conn
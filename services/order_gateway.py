@@ -0,0 +1,300 @@
+# services/order_gateway.py
+"""Envio de ordens com ``newClientOrderId`` determinístico e retentativas seguras.
+
+Cada ordem recebe um ``newClientOrderId`` derivado da intenção (usuário,
+símbolo, lado, quantidade, chave do sinal). Se o envio falha de forma
+transitória (timeout, conexão caída, 5xx) não sabemos se a Binance aceitou a
+ordem; antes de reenviar consultamos ``origClientOrderId`` e, se ela já
+existe, devolvemos a existente em vez de executar de novo. A Binance só
+recusa ``newClientOrderId`` repetido entre ordens *abertas* (uma MARKET
+executada não conta), então quando o id vem de uma chave de intenção a
+consulta também é feita antes do primeiro envio.
+
+:class:`OrderGateway` assina e envia ordens (spot e futuros) numa fila de
+threads sobre uma sessão HTTP com pool de conexões; ``submit`` devolve um
+``Future``. Para quem já tem um ``binance.client.Client`` (ex.: a
+estratégia), :func:`create_order_idempotent` aplica a mesma regra.
+"""
+from __future__ import annotations
+
+import hashlib
+import hmac
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from services.weight_governor import GovernedSession
+
+try:
+    from binance.exceptions import BinanceAPIException, BinanceRequestException
+except Exception:
+    BinanceAPIException = BinanceRequestException = None
+
+__all__ = [
+    "OrderGateway", "OrderRejected", "OrderUncertain", "client_order_id",
+    "sign", "is_transient", "create_order_idempotent",
+]
+
+log = logging.getLogger(__name__)
+
+ORDER_SPOT_BASE = os.getenv("ORDER_SPOT_BASE", "https://api.binance.com").rstrip("/")
+ORDER_FUTURES_BASE = os.getenv("ORDER_FUTURES_BASE", "https://fapi.binance.com").rstrip("/")
+ORDER_GATEWAY_WORKERS = int(os.getenv("ORDER_GATEWAY_WORKERS", "8"))
+ORDER_MAX_ATTEMPTS = int(os.getenv("ORDER_MAX_ATTEMPTS", "4"))
+ORDER_RETRY_BACKOFF_S = float(os.getenv("ORDER_RETRY_BACKOFF_S", "0.25"))
+ORDER_HTTP_TIMEOUT_S = float(os.getenv("ORDER_HTTP_TIMEOUT_S", "10"))
+ORDER_RECV_WINDOW_MS = int(os.getenv("ORDER_RECV_WINDOW_MS", "5000"))
+
+# -1001 desconectado, -1003 excesso de requisições, -1007 timeout (status
+# desconhecido), -1008 servidor ocupado
+_TRANSIENT_CODES = {-1001, -1003, -1007, -1008}
+_REJECTED_CODE = -2010    # NEW_ORDER_REJECTED: saldo, filtros... e "Duplicate order sent."
+_NOT_FOUND_CODE = -2013   # "Order does not exist."
+
+_PATHS = {"spot": "/api/v3/order", "futures": "/fapi/v1/order"}
+
+
+class OrderRejected(Exception):
+    """A corretora respondeu com erro para a ordem."""
+
+    def __init__(self, status_code: int, code: int | None, message: str) -> None:
+        super().__init__(f"{status_code} {code} {message}")
+        self.status_code = status_code
+        self.code = code
+        self.message = message
+
+
+class OrderUncertain(Exception):
+    """Esgotamos as tentativas sem saber se a ordem foi aceita."""
+
+
+def client_order_id(*partes: Any) -> str:
+    """``newClientOrderId`` estável para a mesma intenção (máx. 36 caracteres)."""
+    bruto = "\x1f".join(str(p) for p in partes).encode()
+    return "cv-" + hashlib.blake2b(bruto, digest_size=15).hexdigest()
+
+
+def sign(params: Dict[str, Any], secret: str) -> str:
+    """Query string com ``signature`` HMAC-SHA256, como a Binance espera."""
+    query = urlencode(params)
+    assinatura = hmac.new(secret.encode(), query.encode(), hashlib.sha256).hexdigest()
+    return f"{query}&signature={assinatura}"
+
+
+def _codigo(exc: BaseException) -> int | None:
+    return getattr(exc, "code", None)
+
+
+def _duplicada(exc: BaseException) -> bool:
+    """-2010 só indica id repetido com essa mensagem; os demais -2010 são rejeições."""
+    mensagem = str(getattr(exc, "message", "") or "")
+    return _codigo(exc) == _REJECTED_CODE and "duplicate order" in mensagem.lower()
+
+
+def is_transient(exc: BaseException) -> bool:
+    """True se a falha pode ter acontecido com a ordem aceita (ou vale tentar de novo).
+
+    ``RateLimitShed`` não entra: é levantado antes de qualquer envio.
+    """
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if BinanceRequestException is not None and isinstance(exc, BinanceRequestException):
+        return True  # resposta ilegível
+    status = getattr(exc, "status_code", None)
+    if isinstance(exc, OrderRejected) or (BinanceAPIException is not None and isinstance(exc, BinanceAPIException)):
+        return (status or 0) >= 500 or _codigo(exc) in _TRANSIENT_CODES
+    return False
+
+
+def _com_retentativas(enviar: Callable[[], dict], consultar: Callable[[], Optional[dict]],
+                      tentativas: int, espera_s: float, stats: Dict[str, int] | None = None,
+                      consultar_antes: bool = False) -> dict:
+    """Envia uma ordem; depois de falha transitória só reenvia se a consulta não a encontrar.
+
+    Se a própria consulta falhar não reenviamos (poderia duplicar): a
+    próxima tentativa consulta de novo. ``consultar_antes`` faz a consulta
+    já antes do primeiro envio (id derivado de uma intenção que pode ter
+    sido executada antes). Ordem achada nessa consulta, sem nenhum envio
+    nesta chamada, conta como ``existentes``; achada depois de um envio
+    sem resposta, como ``recuperadas``.
+    """
+    stats = stats if stats is not None else {}
+    erro: BaseException | None = None
+    enviou = False
+    for tentativa in range(tentativas):
+        if tentativa:
+            stats["retentativas"] = stats.get("retentativas", 0) + 1
+            time.sleep(espera_s * 2 ** (tentativa - 1))
+        if consultar_antes:
+            try:
+                existente = consultar()
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                erro = e
+                continue
+            if existente is not None:
+                contador = "recuperadas" if enviou else "existentes"
+                stats[contador] = stats.get(contador, 0) + 1
+                return existente
+            consultar_antes = False
+        try:
+            enviou = True
+            return enviar()
+        except Exception as e:
+            if _duplicada(e) or is_transient(e):
+                erro = e
+                consultar_antes = True
+                continue
+            raise
+    if consultar_antes:
+        try:
+            existente = consultar()
+        except Exception as e:
+            erro = e
+        else:
+            if existente is not None:
+                stats["recuperadas"] = stats.get("recuperadas", 0) + 1
+                return existente
+    raise OrderUncertain(f"ordem sem confirmação após {tentativas} tentativas: {erro}") from erro
+
+
+def create_order_idempotent(client, tentativas: int = ORDER_MAX_ATTEMPTS,
+                            espera_s: float = ORDER_RETRY_BACKOFF_S,
+                            stats: Dict[str, int] | None = None, **params) -> dict:
+    """``client.create_order(**params)`` com ``newClientOrderId`` e retentativas seguras.
+
+    Com ``newClientOrderId`` informado pelo chamador, a ordem é consultada
+    antes do primeiro envio: se já existe (mesmo executada), é devolvida e
+    ``stats["existentes"]`` é incrementado, para o chamador não registrá-la
+    de novo.
+    """
+    informado = "newClientOrderId" in params
+    cid = params.setdefault("newClientOrderId", client_order_id(uuid.uuid4().hex))
+
+    def consultar() -> Optional[dict]:
+        try:
+            return client.get_order(symbol=params["symbol"], origClientOrderId=cid)
+        except Exception as e:
+            if _codigo(e) == _NOT_FOUND_CODE:
+                return None
+            raise
+
+    return _com_retentativas(lambda: client.create_order(**params), consultar, tentativas, espera_s,
+                             stats, consultar_antes=informado)
+
+
+class OrderGateway:
+    """Fila de envio de ordens assinadas para uma credencial."""
+
+    def __init__(self, api_key: str, api_secret: str, base_url: str = ORDER_SPOT_BASE,
+                 futures_base_url: str = ORDER_FUTURES_BASE, session: requests.Session | None = None,
+                 workers: int = ORDER_GATEWAY_WORKERS, tentativas: int = ORDER_MAX_ATTEMPTS,
+                 espera_s: float = ORDER_RETRY_BACKOFF_S, timeout_s: float = ORDER_HTTP_TIMEOUT_S,
+                 recv_window_ms: int = ORDER_RECV_WINDOW_MS) -> None:
+        if not api_key or not api_secret:
+            raise EnvironmentError("Chaves da Binance não configuradas")
+        self.api_key = api_key
+        self._secret = api_secret
+        self._bases = {"spot": base_url.rstrip("/"), "futures": futures_base_url.rstrip("/")}
+        self.session = session or GovernedSession()
+        # uma conexão keep-alive por worker
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["X-MBX-APIKEY"] = api_key
+        self.tentativas = tentativas
+        self.espera_s = espera_s
+        self.timeout_s = timeout_s
+        self.recv_window_ms = recv_window_ms
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="order-gateway")
+        self._em_voo: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"enviadas": 0, "retentativas": 0, "recuperadas": 0,
+                                      "rejeitadas": 0, "incertas": 0, "deduplicadas": 0,
+                                      "existentes": 0}
+
+    def submit(self, symbol: str, side: str, quantity, type: str = "MARKET", market: str = "spot",
+               chave: str | None = None, new_client_order_id: str | None = None, **params) -> Future:
+        """Enfileira uma ordem; o ``Future`` resolve com a resposta da corretora.
+
+        ``chave`` identifica a intenção (ex.: o tick do sinal). Duas chamadas
+        com a mesma intenção geram o mesmo ``newClientOrderId``; enquanto a
+        primeira estiver em andamento a segunda recebe o mesmo ``Future``, e
+        depois dela a consulta prévia devolve a ordem já existente. Sem
+        ``chave`` cada chamada é uma ordem nova.
+        """
+        if market not in _PATHS:
+            raise ValueError(f"mercado inválido: {market!r}")
+        cid = new_client_order_id or client_order_id(
+            self.api_key[:8], market, symbol, side, type, quantity,
+            sorted(params.items()), chave if chave is not None else uuid.uuid4().hex,
+        )
+        pedido = {"symbol": symbol, "side": side, "type": type, "quantity": quantity,
+                  "newClientOrderId": cid, **params}
+        with self._lock:
+            futuro = self._em_voo.get(cid)
+            if futuro is not None:
+                self.stats["deduplicadas"] += 1
+                return futuro
+            futuro = self._executor.submit(self._executar, market, pedido,
+                                           chave is not None or new_client_order_id is not None)
+            self._em_voo[cid] = futuro
+        futuro.add_done_callback(lambda _f, cid=cid: self._liberar(cid))
+        return futuro
+
+    def close(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+        self.session.close()
+
+    def _liberar(self, cid: str) -> None:
+        with self._lock:
+            self._em_voo.pop(cid, None)
+
+    def _executar(self, market: str, pedido: Dict[str, Any], consultar_antes: bool = False) -> dict:
+        path = _PATHS[market]
+        cid = pedido["newClientOrderId"]
+
+        def enviar() -> dict:
+            self.stats["enviadas"] += 1
+            return self._request("POST", market, path, dict(pedido))
+
+        def consultar() -> Optional[dict]:
+            try:
+                return self._request("GET", market, path, {"symbol": pedido["symbol"], "origClientOrderId": cid})
+            except OrderRejected as e:
+                if e.code == _NOT_FOUND_CODE:
+                    return None
+                raise
+
+        try:
+            return _com_retentativas(enviar, consultar, self.tentativas, self.espera_s, self.stats,
+                                     consultar_antes=consultar_antes)
+        except OrderUncertain:
+            self.stats["incertas"] += 1
+            log.error("ordem %s sem confirmação", cid)
+            raise
+        except OrderRejected:
+            self.stats["rejeitadas"] += 1
+            raise
+
+    def _request(self, method: str, market: str, path: str, params: Dict[str, Any]) -> dict:
+        params["recvWindow"] = self.recv_window_ms
+        params["timestamp"] = int(time.time() * 1000)
+        url = f"{self._bases[market]}{path}?{sign(params, self._secret)}"
+        resp = self.session.request(method, url, timeout=self.timeout_s)
+        if resp.status_code >= 400:
+            try:
+                corpo = resp.json()
+            except ValueError:
+                corpo = {}
+            raise OrderRejected(resp.status_code, corpo.get("code"), corpo.get("msg") or resp.reason or "")
+        return resp.json()
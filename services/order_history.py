@@ -0,0 +1,174 @@
+# services/order_history.py
+"""Histórico de ordens (``models.OrderLog``) paginado por cursor.
+
+A paginação é por *keyset*: a página seguinte começa depois do último
+``(created_at, id)`` mostrado, então cada página custa uma busca no índice
+``(user_id, created_at, id)`` independentemente de quantas linhas vieram
+antes — ao contrário de ``OFFSET``, que relê tudo o que pula. A exportação
+percorre o mesmo índice em lotes e vai gerando as linhas, sem carregar o
+resultado inteiro em memória.
+"""
+from __future__ import annotations
+
+import base64
+import csv
+import io
+import json
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+
+from db import get_session
+from models import OrderLog
+
+__all__ = [
+    "Filtros", "encode_cursor", "decode_cursor", "pagina", "iterar",
+    "exportar_csv", "exportar_ndjson", "EXPORTADORES", "contexto_historico",
+]
+
+PAGINA_MAX = 500
+EXPORT_LOTE = 1000
+COLUNAS = ("id", "created_at", "symbol", "side", "tipo", "qty", "price", "status", "exchange")
+
+_indices_ok = False
+_indices_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class Filtros:
+    symbol: Optional[str] = None
+    side: Optional[str] = None
+    inicio: Optional[datetime] = None   # inclusivo
+    fim: Optional[datetime] = None      # exclusivo
+
+    @classmethod
+    def from_args(cls, args) -> "Filtros":
+        """Lê ``symbol``, ``side``, ``inicio`` e ``fim`` (ISO 8601) da query string."""
+        def data(nome):
+            v = (args.get(nome) or "").strip()
+            return datetime.fromisoformat(v) if v else None
+        return cls(
+            symbol=(args.get("symbol") or "").strip().upper() or None,
+            side=(args.get("side") or "").strip().upper() or None,
+            inicio=data("inicio"),
+            fim=data("fim"),
+        )
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{row_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        quando, row_id = bruto.rsplit("|", 1)
+        return datetime.fromisoformat(quando), int(row_id)
+    except Exception as e:
+        raise ValueError("cursor inválido") from e
+
+
+def garantir_indices(session) -> None:
+    """Cria tabela/índices que faltarem em bancos antigos (uma vez por processo)."""
+    global _indices_ok
+    if _indices_ok:
+        return
+    with _indices_lock:
+        if not _indices_ok:
+            bind = session.get_bind()
+            OrderLog.__table__.create(bind=bind, checkfirst=True)
+            for indice in OrderLog.__table__.indexes:
+                indice.create(bind=bind, checkfirst=True)
+            _indices_ok = True
+
+
+def _consulta(user_id: str, filtros: Filtros, depois_de: Optional[Tuple[datetime, int]], limite: int):
+    q = select(OrderLog).where(OrderLog.user_id == str(user_id))
+    if filtros.symbol:
+        q = q.where(OrderLog.symbol == filtros.symbol)
+    if filtros.side:
+        q = q.where(OrderLog.side == filtros.side)
+    if filtros.inicio:
+        q = q.where(OrderLog.created_at >= filtros.inicio)
+    if filtros.fim:
+        q = q.where(OrderLog.created_at < filtros.fim)
+    if depois_de is not None:
+        q = q.where(tuple_(OrderLog.created_at, OrderLog.id) < tuple_(*depois_de))
+    return q.order_by(OrderLog.created_at.desc(), OrderLog.id.desc()).limit(limite)
+
+
+def pagina(session, user_id: str, filtros: Filtros = Filtros(), cursor: str | None = None,
+           limite: int = 50) -> Tuple[List[OrderLog], Optional[str]]:
+    """Uma página (mais recentes primeiro) e o cursor da próxima (``None`` no fim)."""
+    garantir_indices(session)
+    limite = max(1, min(int(limite), PAGINA_MAX))
+    depois_de = decode_cursor(cursor) if cursor else None
+    rows = list(session.scalars(_consulta(user_id, filtros, depois_de, limite + 1)))
+    if len(rows) <= limite:
+        return rows, None
+    rows = rows[:limite]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
+
+
+def iterar(user_id: str, filtros: Filtros = Filtros(), lote: int = EXPORT_LOTE) -> Iterator[OrderLog]:
+    """Todas as linhas do filtro, buscadas em lotes de ``lote`` pelo índice."""
+    depois_de = None
+    while True:
+        with get_session() as session:
+            garantir_indices(session)
+            rows = list(session.scalars(_consulta(user_id, filtros, depois_de, lote)))
+            session.expunge_all()
+        yield from rows
+        if len(rows) < lote:
+            return
+        depois_de = (rows[-1].created_at, rows[-1].id)
+
+
+def _valores(row: OrderLog) -> list:
+    return [getattr(row, c).isoformat() if c == "created_at" else getattr(row, c) for c in COLUNAS]
+
+
+def exportar_csv(user_id: str, filtros: Filtros = Filtros()) -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(COLUNAS)
+    for i, row in enumerate(iterar(user_id, filtros), start=1):
+        writer.writerow(_valores(row))
+        if i % 200 == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def exportar_ndjson(user_id: str, filtros: Filtros = Filtros()) -> Iterator[str]:
+    for row in iterar(user_id, filtros):
+        yield json.dumps(dict(zip(COLUNAS, _valores(row))), ensure_ascii=False) + "\n"
+
+
+def contexto_historico(user_id: str, args) -> dict:
+    """Variáveis do template ``usuarios/historico.html`` a partir da query string."""
+    ctx = {"rows": [], "proximo": None, "erro": None, "has_local": True, "filtros": Filtros(),
+           "args": {k: v for k, v in args.items() if k != "cursor"}}
+    try:
+        ctx["filtros"] = Filtros.from_args(args)
+        limite = int(args.get("limite") or 50)
+        with get_session() as session:
+            ctx["rows"], ctx["proximo"] = pagina(session, user_id, ctx["filtros"], args.get("cursor"), limite)
+            session.expunge_all()
+    except ValueError as e:
+        ctx["erro"] = f"Filtro inválido: {e}"
+    except SQLAlchemyError:
+        ctx["has_local"] = False
+    return ctx
+
+
+# formato -> (gerador, mimetype)
+EXPORTADORES = {
+    "csv": (exportar_csv, "text/csv"),
+    "ndjson": (exportar_ndjson, "application/x-ndjson"),
+}
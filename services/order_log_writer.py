@@ -0,0 +1,311 @@
+# services/order_log_writer.py
+"""Gravação em segundo plano (write-behind) de ``models.OrderLog``.
+
+Quem envia uma ordem só enfileira a linha (``record``) e segue; uma thread
+do processo junta as linhas e grava cada lote num único ``INSERT`` de várias
+linhas dentro de uma transação, quando o lote atinge ``ORDER_LOG_BATCH``
+linhas ou quando a mais antiga espera ``ORDER_LOG_FLUSH_S`` segundos.
+
+Garantias: ``flush()`` só retorna depois que tudo o que foi enfileirado
+antes dele está commitado; no encerramento do processo (``atexit`` ou
+``close()``) a fila é esvaziada. Se o banco falhar o lote é regravado com
+espera crescente, até ``ORDER_LOG_RETRY_MAX`` tentativas ou
+``ORDER_LOG_RETRY_TOTAL_S`` segundos; depois disso as linhas vão para o
+arquivo ``ORDER_LOG_SPILL_PATH`` (JSON por linha) e, se nem isso der, são
+descartadas — as duas saídas contam em ``stats()``. Com a fila cheia,
+``record`` tenta gravar a linha uma vez de forma síncrona e, falhando, a
+manda para o arquivo em vez de segurar quem envia a ordem.
+"""
+from __future__ import annotations
+
+import atexit
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import insert
+
+__all__ = ["OrderLogWriter", "order_log_writer", "record_order", "logs_order"]
+
+log = logging.getLogger(__name__)
+
+ORDER_LOG_BATCH = int(os.getenv("ORDER_LOG_BATCH", "200"))
+ORDER_LOG_FLUSH_S = float(os.getenv("ORDER_LOG_FLUSH_S", "0.5"))
+ORDER_LOG_QUEUE_MAX = int(os.getenv("ORDER_LOG_QUEUE_MAX", "20000"))
+ORDER_LOG_RETRY_MAX = int(os.getenv("ORDER_LOG_RETRY_MAX", "6"))
+ORDER_LOG_RETRY_TOTAL_S = float(os.getenv("ORDER_LOG_RETRY_TOTAL_S", "30"))
+ORDER_LOG_SPILL_PATH = os.getenv(
+    "ORDER_LOG_SPILL_PATH", os.path.join(tempfile.gettempdir(), "claraverse_order_log_spill.jsonl")
+)
+_RETRY_MAX_S = 8.0
+_ACORDAR = object()  # sentinela: grava o lote parcial sem esperar o prazo
+
+
+def _default_session_factory():
+    from db import SessionLocal
+    return SessionLocal()
+
+
+class OrderLogWriter:
+    def __init__(self, session_factory: Callable[[], Any] = _default_session_factory,
+                 batch: int = ORDER_LOG_BATCH, flush_s: float = ORDER_LOG_FLUSH_S,
+                 queue_max: int = ORDER_LOG_QUEUE_MAX, tentativas: int = ORDER_LOG_RETRY_MAX,
+                 retry_total_s: float = ORDER_LOG_RETRY_TOTAL_S,
+                 spill_path: str | None = ORDER_LOG_SPILL_PATH) -> None:
+        self.session_factory = session_factory
+        self.batch = batch
+        self.flush_s = flush_s
+        self.tentativas = tentativas
+        self.retry_total_s = retry_total_s
+        self.spill_path = spill_path
+        self._fila: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=queue_max)
+        self._cond = threading.Condition()
+        self._enfileiradas = 0   # linhas aceitas por record()
+        self._gravadas = 0       # linhas commitadas
+        self._perdidas = 0       # linhas que desistiram do banco (arquivo ou descarte)
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._tabela_ok = False
+        self.lotes = 0
+        self.falhas = 0
+        self.sincronas = 0
+        self.derramadas = 0
+        self.descartadas = 0
+        self.ultimo_erro: str | None = None
+        self._latencias: List[float] = []
+
+    # ------------------------------------------------------------ interface
+    def record(self, user_id: str, exchange: str, symbol: str, side: str, tipo: str,
+               qty: float, price: float = 0.0, status: str = "created", resp: Any = None) -> None:
+        """Enfileira uma linha; não toca o banco (salvo com a fila cheia)."""
+        linha = {
+            "user_id": str(user_id), "exchange": exchange, "symbol": symbol, "side": side,
+            "tipo": tipo, "qty": float(qty or 0.0), "price": float(price or 0.0), "status": status,
+            "resp": resp, "created_at": datetime.utcnow(),
+        }
+        self._garantir_thread()
+        with self._cond:
+            self._enfileiradas += 1
+        try:
+            self._fila.put_nowait(linha)
+        except queue.Full:
+            # sem espaço: uma tentativa síncrona; se o banco estiver fora, vai para o arquivo
+            self.sincronas += 1
+            self._gravar_com_retentativa([linha], tentativas=1)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Espera gravar tudo o que foi enfileirado até agora.
+
+        False se estourar o prazo ou se alguma linha desistiu do banco no meio.
+        """
+        with self._cond:
+            alvo = self._enfileiradas
+            perdidas = self._perdidas
+            if self._gravadas + self._perdidas >= alvo:
+                return True
+        self._acordar()
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._gravadas + self._perdidas < alvo:
+                restante = None if limite is None else limite - time.monotonic()
+                if restante is not None and restante <= 0:
+                    return False
+                self._cond.wait(restante)
+            return self._perdidas == perdidas
+
+    def close(self, timeout: float | None = 30.0) -> bool:
+        """Esvazia a fila e encerra a thread."""
+        if self._thread is None or self._pid != os.getpid():
+            return True  # nada foi enfileirado neste processo
+        ok = self.flush(timeout)
+        self._parar.set()
+        self._acordar()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+        return ok
+
+    def stats(self) -> Dict[str, Any]:
+        lat = sorted(self._latencias)
+        return {
+            "fila": self._fila.qsize(),
+            "pendentes": self._enfileiradas - self._gravadas - self._perdidas,
+            "enfileiradas": self._enfileiradas,
+            "gravadas": self._gravadas,
+            "lotes": self.lotes,
+            "falhas": self.falhas,
+            "sincronas": self.sincronas,
+            "derramadas": self.derramadas,
+            "descartadas": self.descartadas,
+            "flush_ms_ultimo": self._latencias[-1] if self._latencias else None,
+            "flush_ms_p50": lat[len(lat) // 2] if lat else None,
+            "flush_ms_max": lat[-1] if lat else None,
+            "ultimo_erro": self.ultimo_erro,
+        }
+
+    # ------------------------------------------------------------- internos
+    def _acordar(self) -> None:
+        self._garantir_thread()
+        try:
+            self._fila.put_nowait(_ACORDAR)
+        except queue.Full:
+            pass  # fila cheia: a thread já está gravando lotes completos
+
+    def _garantir_thread(self) -> None:
+        # a thread não sobrevive ao fork do gunicorn: recria no processo filho
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._parar.clear()
+                self._thread = threading.Thread(target=self._laco, name="order-log-writer", daemon=True)
+                self._thread.start()
+
+    def _laco(self) -> None:
+        lote: List[Dict[str, Any]] = []
+        prazo = None
+        while True:
+            espera = self.flush_s if prazo is None else max(prazo - time.monotonic(), 0.0)
+            urgente = False
+            try:
+                item = self._fila.get(timeout=espera)
+                while True:
+                    if item is _ACORDAR:
+                        urgente = True
+                    else:
+                        lote.append(item)
+                        if prazo is None:
+                            prazo = time.monotonic() + self.flush_s
+                    if len(lote) >= self.batch:
+                        break
+                    item = self._fila.get_nowait()
+            except queue.Empty:
+                pass
+            vencido = prazo is not None and time.monotonic() >= prazo
+            if lote and (len(lote) >= self.batch or vencido or urgente):
+                self._gravar_com_retentativa(lote)
+                lote, prazo = [], None
+            if self._parar.is_set() and not lote and self._fila.empty():
+                return
+
+    def _gravar_com_retentativa(self, lote: List[Dict[str, Any]], tentativas: int | None = None) -> None:
+        tentativas = tentativas or self.tentativas
+        limite = time.monotonic() + self.retry_total_s
+        espera = 0.5
+        for tentativa in range(1, tentativas + 1):
+            try:
+                self._gravar(lote)
+                return
+            except Exception as e:
+                self.falhas += 1
+                self.ultimo_erro = str(e)
+                if tentativa >= tentativas or time.monotonic() + espera > limite:
+                    log.error("desistindo de gravar %d OrderLog após %d tentativas: %s", len(lote), tentativa, e)
+                    break
+                log.warning("falha ao gravar %d OrderLog (nova tentativa em %.1fs): %s", len(lote), espera, e)
+                time.sleep(espera)
+                espera = min(espera * 2, _RETRY_MAX_S)
+        self._derramar(lote)
+
+    def _derramar(self, lote: List[Dict[str, Any]]) -> None:
+        """Anexa o lote ao arquivo de sobra; sem arquivo (ou se falhar), descarta."""
+        try:
+            if not self.spill_path:
+                raise OSError("ORDER_LOG_SPILL_PATH vazio")
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for l in lote:
+                    f.write(json.dumps(self._linha(l), default=str, ensure_ascii=False) + "\n")
+            self.derramadas += len(lote)
+            log.error("%d OrderLog gravados em %s para reprocessar", len(lote), self.spill_path)
+        except Exception as e:
+            self.descartadas += len(lote)
+            log.error("%d OrderLog descartados (arquivo de sobra indisponível): %s", len(lote), e)
+        with self._cond:
+            self._perdidas += len(lote)
+            self._cond.notify_all()
+
+    def _gravar(self, lote: List[Dict[str, Any]]) -> None:
+        from models import OrderLog
+
+        linhas = [self._linha(l) for l in lote]
+        t0 = time.perf_counter()
+        session = self.session_factory()
+        try:
+            if not self._tabela_ok:
+                OrderLog.__table__.create(bind=session.get_bind(), checkfirst=True)
+                self._tabela_ok = True
+            session.execute(insert(OrderLog), linhas)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+        self._latencias.append((time.perf_counter() - t0) * 1000)
+        del self._latencias[:-256]
+        self.lotes += 1
+        with self._cond:
+            self._gravadas += len(lote)
+            self._cond.notify_all()
+
+    @staticmethod
+    def _linha(l: Dict[str, Any]) -> Dict[str, Any]:
+        # a serialização do resp_json fica fora do caminho da ordem
+        linha = {k: v for k, v in l.items() if k != "resp"}
+        resp = l["resp"]
+        if resp is None:
+            linha["resp_json"] = ""
+        elif isinstance(resp, str):
+            linha["resp_json"] = resp
+        else:
+            linha["resp_json"] = json.dumps(resp, default=str, ensure_ascii=False)
+        return linha
+
+
+order_log_writer = OrderLogWriter()
+atexit.register(order_log_writer.close)
+
+
+def record_order(*args, **kwargs) -> None:
+    order_log_writer.record(*args, **kwargs)
+
+
+def logs_order(tipo: str, exchange: str = "binance"):
+    """Decorator para ``place_*(client, symbol, side, qty, ...)`` de ``services.binance_client``.
+
+    Aceita ``user_id=`` extra; com ele, o resultado ``{"ok", "order"/"error"}``
+    é enfileirado como ``OrderLog``. Se ``fn`` também aceitar ``user_id``
+    (dono da ordem no paper trading), ele é repassado.
+    """
+    def deco(fn):
+        assinatura = inspect.signature(fn)
+        repassa = "user_id" in assinatura.parameters
+
+        @functools.wraps(fn)
+        def wrapper(*args, user_id: str | None = None, **kwargs):
+            if repassa:
+                kwargs["user_id"] = user_id
+            resultado = fn(*args, **kwargs)
+            if user_id is not None:
+                chamada = assinatura.bind(*args, **kwargs)
+                chamada.apply_defaults()
+                a = chamada.arguments
+                ordem = resultado.get("order") or {}
+                record_order(
+                    user_id, exchange, a.get("symbol", ""), a.get("side", ""), ordem.get("type", tipo),
+                    a.get("qty", 0.0), a.get("price") or a.get("limit_price") or 0.0,
+                    ordem.get("status", "sent") if resultado.get("ok") else "error",
+                    ordem if resultado.get("ok") else resultado.get("error"),
+                )
+            return resultado
+        return wrapper
+    return deco
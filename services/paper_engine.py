@@ -0,0 +1,376 @@
+# services/paper_engine.py
+"""Motor de casamento das ordens em modo ``PAPER_TRADING``.
+
+As ordens que não executam na hora ficam num livro por símbolo com dois
+heaps de gatilhos: um para ordens que disparam quando o preço *cai* até um
+nível (compra limitada, stop-loss de venda, take-profit de compra) e outro
+para as que disparam quando o preço *sobe* (venda limitada, stop-loss de
+compra, take-profit de venda). A cada preço novo só o topo dos heaps é
+examinado: executar ``k`` ordens custa ``O(k log n)``, sem varrer as demais.
+
+Stops disparados viram ordens limitadas (executam na hora se o limite já
+foi cruzado). As pernas de uma OCO compartilham o lock do livro: quando uma
+executa ou dispara, a outra é cancelada na mesma operação. Cancelamentos
+são preguiçosos — a entrada fica no heap e é descartada ao chegar ao topo;
+quando as entradas mortas passam da metade o heap é reconstruído.
+
+Enquanto houver ordem em repouso, uma thread do processo chama ``feed`` a
+cada ``PAPER_FEED_S`` segundos (no singleton, atualiza o snapshot do
+``price_service``, cujo listener chama ``on_prices``); sem ela, o livro só
+andaria quando alguém consultasse um preço. A thread termina sozinha
+quando o livro esvazia e é recriada na próxima ordem que repousar.
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Mapping, Optional, Tuple
+
+from services.price_service import price_service
+
+__all__ = ["PaperOrder", "MatchingEngine", "paper_engine", "PAPER_PRICE_LIVE", "PAPER_PRICE_FIXED"]
+
+log = logging.getLogger(__name__)
+
+PAPER_HISTORY_MAX = int(os.getenv("PAPER_HISTORY_MAX", "10000"))
+PAPER_FEED_S = float(os.getenv("PAPER_FEED_S", "5"))
+PAPER_PRICE_LIVE = os.getenv("PAPER_PRICE_LIVE", "true").lower() == "true"
+PAPER_PRICE_FIXED = 68000.0   # preço de todos os pares com PAPER_PRICE_LIVE=false
+
+NEW, FILLED, CANCELED = "NEW", "FILLED", "CANCELED"
+_STOPS = ("STOP_LOSS_LIMIT", "TAKE_PROFIT_LIMIT")
+
+
+def _agora_ms() -> int:
+    return int(time.time() * 1000)
+
+
+@dataclass(eq=False)
+class PaperOrder:
+    order_id: int
+    symbol: str
+    side: str
+    type: str
+    qty: float
+    price: float = 0.0            # preço limite (0 para MARKET)
+    stop_price: float = 0.0       # só para STOP_LOSS_LIMIT / TAKE_PROFIT_LIMIT
+    owner: Optional[str] = None
+    order_list_id: int = -1       # OCO: id da lista; -1 fora de OCO
+    irma: int = 0                 # OCO: order_id da outra perna
+    status: str = NEW
+    triggered: bool = False       # stop já disparou e agora é uma limitada
+    executed_price: float = 0.0
+    time: int = field(default_factory=_agora_ms)
+    update_time: int = 0
+    _seq: int = 0                 # entrada viva no heap; entradas antigas são ignoradas
+
+    @property
+    def aberta(self) -> bool:
+        return self.status == NEW
+
+    def nivel(self) -> Tuple[str, float]:
+        """Heap (``"abaixo"``/``"acima"``) e preço em que a ordem dispara."""
+        compra = self.side == "BUY"
+        if self.type in _STOPS and not self.triggered:
+            # stop-loss de venda e take-profit de compra disparam na queda
+            cai = compra == (self.type == "TAKE_PROFIT_LIMIT")
+            return ("abaixo" if cai else "acima"), self.stop_price
+        return ("abaixo" if compra else "acima"), self.price
+
+    def as_dict(self) -> dict:
+        return {
+            "paper": True, "symbol": self.symbol, "orderId": self.order_id,
+            "orderListId": self.order_list_id, "side": self.side, "type": self.type,
+            "status": self.status, "origQty": self.qty, "price": self.price,
+            "stopPrice": self.stop_price, "executedQty": self.qty if self.status == FILLED else 0.0,
+            "executedPrice": self.executed_price, "transactTime": self.time,
+            "updateTime": self.update_time or self.time,
+        }
+
+
+class _Livro:
+    """Ordens em repouso de um símbolo."""
+
+    __slots__ = ("lock", "abaixo", "acima", "mortos", "ultimo")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        # abaixo: max-heap (chave = -nível); acima: min-heap (chave = nível)
+        self.abaixo: List[Tuple[float, int, PaperOrder]] = []
+        self.acima: List[Tuple[float, int, PaperOrder]] = []
+        self.mortos = 0
+        self.ultimo: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self.abaixo) + len(self.acima) - self.mortos
+
+
+class MatchingEngine:
+    def __init__(self, price_source: Optional[Callable[[str], Optional[float]]] = None,
+                 history_max: int = PAPER_HISTORY_MAX, feed: Optional[Callable[[], object]] = None,
+                 feed_s: float = PAPER_FEED_S) -> None:
+        self.price_source = price_source
+        self.feed = feed
+        self.feed_s = feed_s
+        self._feed_lock = threading.Lock()
+        self._feed_thread: Optional[threading.Thread] = None
+        self._feed_pid: Optional[int] = None
+        self._livros: Dict[str, _Livro] = {}
+        self._livros_lock = threading.Lock()
+        self._ordens: Dict[int, PaperOrder] = {}
+        self._encerradas: Deque[int] = deque()
+        self._hist_lock = threading.Lock()
+        self._history_max = history_max
+        self._ids = itertools.count(_agora_ms() * 1000)
+        self._seqs = itertools.count(1)
+        self.fills = 0
+
+    # ------------------------------------------------------------ consultas
+    def get(self, order_id: int) -> Optional[PaperOrder]:
+        return self._ordens.get(order_id)
+
+    def open_orders(self, symbol: str | None = None, owner: str | None = None) -> List[PaperOrder]:
+        return [
+            o for o in list(self._ordens.values())
+            if o.aberta and (symbol is None or o.symbol == symbol.upper())
+            and (owner is None or o.owner == owner)
+        ]
+
+    def resting(self, symbol: str | None = None) -> int:
+        """Quantas entradas vivas há nos heaps (de um símbolo ou de todos)."""
+        if symbol is not None:
+            livro = self._livros.get(symbol.upper())
+            return len(livro) if livro else 0
+        return sum(len(l) for l in list(self._livros.values()))
+
+    # --------------------------------------------------------------- ordens
+    def submit(self, symbol: str, side: str, tipo: str, qty: float, price: float = 0.0,
+               stop_price: float = 0.0, owner: str | None = None) -> PaperOrder:
+        """Registra uma ordem; executa na hora se o preço atual já a cruza."""
+        ordem = self._nova(symbol, side, tipo, qty, price, stop_price, owner)
+        livro = self._livro(ordem.symbol)
+        preco = self._preco(ordem.symbol)
+        with livro.lock:
+            self._entrar(livro, ordem, preco if preco is not None else livro.ultimo)
+        if ordem.aberta:
+            self._garantir_feed()
+        return ordem
+
+    def submit_oco(self, symbol: str, side: str, qty: float, price: float, stop_price: float,
+                   stop_limit_price: float, owner: str | None = None) -> Tuple[PaperOrder, PaperOrder]:
+        """OCO: limitada em ``price`` + stop-loss-limit em ``stop_price``/``stop_limit_price``."""
+        limite = self._nova(symbol, side, "LIMIT_MAKER", qty, price, 0.0, owner)
+        stop = self._nova(symbol, side, "STOP_LOSS_LIMIT", qty, stop_limit_price, stop_price, owner)
+        limite.order_list_id = stop.order_list_id = limite.order_id
+        limite.irma, stop.irma = stop.order_id, limite.order_id
+        livro = self._livro(limite.symbol)
+        preco = self._preco(limite.symbol)
+        with livro.lock:
+            preco = preco if preco is not None else livro.ultimo
+            self._entrar(livro, limite, preco)
+            if limite.aberta:
+                self._entrar(livro, stop, preco)
+            else:
+                self._cancelar(livro, stop)
+        if limite.aberta:
+            self._garantir_feed()
+        return limite, stop
+
+    def cancel(self, order_id: int) -> Optional[PaperOrder]:
+        """Cancela a ordem (e a outra perna, se for OCO). ``None`` se não está aberta."""
+        ordem = self._ordens.get(order_id)
+        if ordem is None:
+            return None
+        livro = self._livro(ordem.symbol)
+        with livro.lock:
+            if not ordem.aberta:
+                return None
+            self._cancelar(livro, ordem)
+            self._cancelar_irma(livro, ordem)
+            self._compactar(livro)
+        return ordem
+
+    # --------------------------------------------------------------- preços
+    def on_price(self, symbol: str, price: float) -> List[PaperOrder]:
+        """Aplica um preço novo e devolve as ordens executadas por ele."""
+        livro = self._livros.get(symbol.upper())
+        if livro is None:
+            return []
+        executadas: List[PaperOrder] = []
+        with livro.lock:
+            livro.ultimo = price
+            # disparar um stop pode criar uma limitada no outro heap
+            while self._topo_cruzado(livro.abaixo, -1, price) or self._topo_cruzado(livro.acima, 1, price):
+                for heap, sinal in ((livro.abaixo, -1), (livro.acima, 1)):
+                    while self._topo_cruzado(heap, sinal, price):
+                        _, seq, ordem = heapq.heappop(heap)
+                        if ordem._seq != seq or not ordem.aberta:
+                            livro.mortos -= 1
+                            continue
+                        ordem._seq = 0
+                        self._disparar(livro, ordem, price, executadas, repouso=True)
+            self._compactar(livro)
+        return executadas
+
+    def on_prices(self, prices: Mapping[str, float]) -> int:
+        """Aplica um snapshot de preços; só olha os símbolos com livro."""
+        total = 0
+        for symbol in list(self._livros):
+            p = prices.get(symbol)
+            if p is not None:
+                total += len(self.on_price(symbol, p))
+        return total
+
+    # ------------------------------------------------------------- internos
+    def _garantir_feed(self) -> None:
+        # a thread não sobrevive ao fork do gunicorn: recria no processo filho
+        if self.feed is None:
+            return
+        with self._feed_lock:
+            viva = self._feed_thread is not None and self._feed_thread.is_alive()
+            if viva and self._feed_pid == os.getpid():
+                return
+            self._feed_pid = os.getpid()
+            self._feed_thread = threading.Thread(target=self._laco_feed, name="paper-price-feed", daemon=True)
+            self._feed_thread.start()
+
+    def _laco_feed(self) -> None:
+        while True:
+            time.sleep(self.feed_s)
+            with self._feed_lock:
+                if not self.resting():
+                    self._feed_thread = None
+                    return
+            try:
+                self.feed()
+            except Exception as e:
+                log.warning("falha ao buscar preços para o paper trading: %s", e)
+
+    def _nova(self, symbol, side, tipo, qty, price, stop_price, owner) -> PaperOrder:
+        side = side.upper()
+        if side not in ("BUY", "SELL"):
+            raise ValueError(f"side inválido: {side!r}")
+        ordem = PaperOrder(next(self._ids), symbol.upper(), side, tipo, float(qty),
+                           float(price or 0.0), float(stop_price or 0.0), owner)
+        self._ordens[ordem.order_id] = ordem
+        return ordem
+
+    def _livro(self, symbol: str) -> _Livro:
+        livro = self._livros.get(symbol)
+        if livro is None:
+            with self._livros_lock:
+                livro = self._livros.setdefault(symbol, _Livro())
+        return livro
+
+    def _preco(self, symbol: str) -> Optional[float]:
+        # fora do lock do livro: a fonte pode atualizar o snapshot, que chama on_price
+        if self.price_source is None:
+            return None
+        try:
+            return self.price_source(symbol)
+        except Exception as e:
+            log.warning("sem preço para %s no paper trading: %s", symbol, e)
+            return None
+
+    @staticmethod
+    def _topo_cruzado(heap, sinal: int, price: float) -> bool:
+        # abaixo (sinal -1): dispara se price <= nível; acima (+1): se price >= nível
+        return bool(heap) and (price <= -heap[0][0] if sinal < 0 else price >= heap[0][0])
+
+    def _entrar(self, livro: _Livro, ordem: PaperOrder, preco: Optional[float]) -> None:
+        if ordem.type == "MARKET":
+            if preco is None:
+                self._cancelar(livro, ordem)
+            else:
+                self._executar(livro, ordem, preco)
+            return
+        lado, nivel = ordem.nivel()
+        if preco is not None and (preco <= nivel if lado == "abaixo" else preco >= nivel):
+            if ordem.type == "LIMIT_MAKER":
+                self._cancelar(livro, ordem)  # a Binance rejeita maker que executaria na hora
+            else:
+                self._disparar(livro, ordem, preco, [], repouso=False)
+            return
+        self._repousar(livro, ordem)
+
+    def _repousar(self, livro: _Livro, ordem: PaperOrder) -> None:
+        lado, nivel = ordem.nivel()
+        ordem._seq = next(self._seqs)
+        if lado == "abaixo":
+            heapq.heappush(livro.abaixo, (-nivel, ordem._seq, ordem))
+        else:
+            heapq.heappush(livro.acima, (nivel, ordem._seq, ordem))
+
+    def _disparar(self, livro: _Livro, ordem: PaperOrder, preco: float,
+                  executadas: List[PaperOrder], repouso: bool) -> None:
+        if ordem.type in _STOPS and not ordem.triggered:
+            ordem.triggered = True
+            self._cancelar_irma(livro, ordem)
+            lado, limite = ordem.nivel()
+            if preco <= limite if lado == "abaixo" else preco >= limite:
+                self._executar(livro, ordem, preco)  # limite já cruzado: executa como taker
+                executadas.append(ordem)
+            else:
+                self._repousar(livro, ordem)
+            return
+        # limitada em repouso executa no próprio limite; recém-chegada, no preço atual
+        self._executar(livro, ordem, ordem.price if repouso else preco)
+        executadas.append(ordem)
+
+    def _executar(self, livro: _Livro, ordem: PaperOrder, preco: float) -> None:
+        ordem.status = FILLED
+        ordem.executed_price = preco
+        ordem.update_time = _agora_ms()
+        self.fills += 1
+        self._cancelar_irma(livro, ordem)
+        self._encerrar(ordem)
+
+    def _cancelar(self, livro: _Livro, ordem: PaperOrder) -> None:
+        if ordem._seq:
+            livro.mortos += 1
+            ordem._seq = 0
+        ordem.status = CANCELED
+        ordem.update_time = _agora_ms()
+        self._encerrar(ordem)
+
+    def _cancelar_irma(self, livro: _Livro, ordem: PaperOrder) -> None:
+        outra = self._ordens.get(ordem.irma) if ordem.irma else None
+        if outra is not None and outra.aberta:
+            self._cancelar(livro, outra)
+
+    def _encerrar(self, ordem: PaperOrder) -> None:
+        with self._hist_lock:
+            self._encerradas.append(ordem.order_id)
+            while len(self._encerradas) > self._history_max:
+                self._ordens.pop(self._encerradas.popleft(), None)
+
+    def _compactar(self, livro: _Livro) -> None:
+        total = len(livro.abaixo) + len(livro.acima)
+        if livro.mortos < 64 or livro.mortos * 2 < total:
+            return
+        livro.abaixo = [e for e in livro.abaixo if e[2]._seq == e[1] and e[2].aberta]
+        livro.acima = [e for e in livro.acima if e[2]._seq == e[1] and e[2].aberta]
+        heapq.heapify(livro.abaixo)
+        heapq.heapify(livro.acima)
+        livro.mortos = 0
+
+
+def _motor(live: bool) -> MatchingEngine:
+    """Motor do processo: preços ao vivo do ``price_service`` ou o preço fixo."""
+    if not live:
+        # mesma fonte de ``get_symbol_price``; o preço não muda, então não há feed
+        return MatchingEngine(price_source=lambda symbol: PAPER_PRICE_FIXED)
+    motor = MatchingEngine(price_source=price_service.get_price,
+                           feed=lambda: price_service.snapshot(PAPER_FEED_S))
+    # cada snapshot novo de preços dispara as ordens cruzadas
+    price_service.add_listener(motor.on_prices)
+    return motor
+
+
+paper_engine = _motor(PAPER_PRICE_LIVE)
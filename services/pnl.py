@@ -0,0 +1,252 @@
+# services/pnl.py
+"""Lucro realizado/não realizado a partir dos trades copiados localmente.
+
+Cada (mercado, símbolo) tem uma fila FIFO de lotes abertos, todos do mesmo
+lado (comprado ou, em futuros, vendido). Um fill do lado oposto consome os
+lotes mais antigos e realiza ``(saída - entrada) × qtd``; o que sobra abre
+um lote novo. Cada lote entra e sai da fila uma vez, então o custo por fill
+é O(1) amortizado.
+
+O lucro realizado de cada fill vai para janelas deslizantes de 24h/7d/30d
+(uma fila por janela e uma soma corrente em ``Decimal``, sem erro de
+arredondamento ao somar e subtrair). Ler o painel só expira o que saiu das
+janelas, sem repassar o histórico.
+
+O estado de cada usuário é reconstruído dos ``TradeRecord`` na ordem
+``(time, trade_id)`` e depois atualizado só com as linhas novas; dentro de
+um livro a ordem é sempre a dos trade ids e as somas das janelas não
+dependem da ordem entre livros, então dois processos que leem o mesmo banco
+chegam ao mesmo resultado.
+"""
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Deque, Dict, List, Mapping, Optional, Tuple
+
+from services import trade_sync
+
+__all__ = ["Livro", "CarteiraPnL", "JANELAS", "quote_asset", "taxa_em_cotacao", "carteira", "resumo"]
+
+JANELAS: Dict[str, int] = {
+    "24h": 24 * 3600 * 1000,
+    "7d": 7 * 24 * 3600 * 1000,
+    "30d": 30 * 24 * 3600 * 1000,
+}
+QUOTES = ("USDT", "FDUSD", "USDC", "BUSD", "TUSD", "BTC", "ETH", "BNB", "EUR", "BRL", "TRY")
+
+_ZERO = Decimal("0")
+
+
+def quote_asset(symbol: str) -> str:
+    for q in QUOTES:
+        if symbol.endswith(q) and len(symbol) > len(q):
+            return q
+    return ""
+
+
+def taxa_em_cotacao(symbol: str, comissao: Any, ativo: str) -> Decimal:
+    """Comissão que entra no lucro: só a cobrada na moeda de cotação do símbolo."""
+    return _dec(comissao) if ativo and ativo == quote_asset(symbol) else _ZERO
+
+
+def _dec(v: Any) -> Decimal:
+    return v if isinstance(v, Decimal) else Decimal(str(v or 0))
+
+
+def _campo(t: Any, nome: str, padrao: Any = None) -> Any:
+    return t.get(nome, padrao) if isinstance(t, Mapping) else getattr(t, nome, padrao)
+
+
+@dataclass
+class Livro:
+    """Lotes abertos de um (mercado, símbolo). ``qtd`` > 0 comprado, < 0 vendido."""
+    symbol: str
+    lotes: Deque[List[Decimal]] = field(default_factory=deque)   # [qtd assinada, preço]
+    posicao: Decimal = _ZERO
+    realizado: Decimal = _ZERO
+    taxas: Decimal = _ZERO          # comissões pagas na moeda de cotação
+    sem_base: Decimal = _ZERO       # vendido sem lote de compra conhecido (histórico incompleto)
+    ultimo_trade: int = -1
+
+    def aplicar(self, lado: str, qtd: Decimal, preco: Decimal) -> Decimal:
+        """Executa o fill e retorna o lucro realizado por ele (antes de taxas)."""
+        sinal = 1 if lado == "BUY" else -1
+        restante = qtd
+        realizado = _ZERO
+        while restante > 0 and self.lotes and (self.lotes[0][0] > 0) != (sinal > 0):
+            lote = self.lotes[0]
+            usado = min(restante, abs(lote[0]))
+            # lote comprado (lote[0] > 0) realiza preço - entrada; vendido, o contrário
+            realizado += (preco - lote[1]) * usado * (1 if lote[0] > 0 else -1)
+            lote[0] += usado * sinal
+            restante -= usado
+            if lote[0] == 0:
+                self.lotes.popleft()
+        if restante > 0:
+            self.lotes.append([restante * sinal, preco])
+        self.posicao += qtd * sinal
+        self.realizado += realizado
+        return realizado
+
+    def nao_realizado(self, preco: Decimal) -> Decimal:
+        return sum(((preco - p) * q for q, p in self.lotes), _ZERO)
+
+
+class _Janela:
+    def __init__(self, largura_ms: int) -> None:
+        self.largura_ms = largura_ms
+        self.eventos: Deque[Tuple[int, Decimal]] = deque()
+        self.soma = _ZERO
+
+    def add(self, t: int, valor: Decimal) -> None:
+        if self.eventos and t < self.eventos[-1][0]:
+            # fora de ordem (símbolo sincronizado depois): raro, insere no lugar
+            self.eventos.insert(bisect.bisect_right(self.eventos, t, key=lambda e: e[0]), (t, valor))
+        else:
+            self.eventos.append((t, valor))
+        self.soma += valor
+
+    def valor(self, agora_ms: int) -> Decimal:
+        limite = agora_ms - self.largura_ms
+        while self.eventos and self.eventos[0][0] <= limite:
+            self.soma -= self.eventos.popleft()[1]
+        return self.soma
+
+
+class CarteiraPnL:
+    """Livros e janelas de um usuário; alimentada fill a fill por ``aplicar``."""
+
+    def __init__(self, janelas: Mapping[str, int] = JANELAS) -> None:
+        self.livros: Dict[Tuple[str, str], Livro] = {}
+        # por moeda de cotação: não há conversão determinística entre elas
+        self._janelas: Dict[str, Dict[str, _Janela]] = {}
+        self._larguras = dict(janelas)
+        self.fills = 0
+        self.ultimo_id = 0     # maior TradeRecord.id aplicado
+
+    def aplicar(self, t: Any) -> Optional[Decimal]:
+        """Aplica um trade (``TradeRecord`` ou dict com os mesmos campos).
+
+        Trades já vistos (``trade_id`` até o último do livro) são ignorados
+        e retornam ``None``; senão retorna o lucro realizado líquido de taxas.
+        """
+        market, symbol = _campo(t, "market", "spot"), _campo(t, "symbol")
+        livro = self.livros.get((market, symbol))
+        if livro is None:
+            livro = self.livros[(market, symbol)] = Livro(symbol)
+        trade_id = int(_campo(t, "trade_id"))
+        if trade_id <= livro.ultimo_trade:
+            return None
+        livro.ultimo_trade = trade_id
+
+        quote = quote_asset(symbol)
+        qtd, preco = _dec(_campo(t, "qty")), _dec(_campo(t, "price"))
+        lado = _campo(t, "side")
+        comissao, ativo_comissao = _campo(t, "commission"), _campo(t, "commission_asset", "")
+        taxa = taxa_em_cotacao(symbol, comissao, ativo_comissao)
+        if not taxa and ativo_comissao and quote and symbol == ativo_comissao + quote and lado == "BUY":
+            qtd -= _dec(comissao)    # taxa cobrada no ativo comprado: chega menos na carteira
+
+        if market == "spot" and lado == "SELL" and qtd > livro.posicao:
+            # spot não fica vendido: o excedente veio de antes do histórico copiado
+            excedente = qtd - max(livro.posicao, _ZERO)
+            livro.sem_base += excedente
+            qtd -= excedente
+        realizado = livro.aplicar(lado, qtd, preco) - taxa if qtd > 0 else -taxa
+        livro.taxas += taxa
+        livro.realizado -= taxa
+
+        momento = int(_campo(t, "time"))
+        janelas = self._janelas.get(quote)
+        if janelas is None:
+            janelas = self._janelas[quote] = {n: _Janela(l) for n, l in self._larguras.items()}
+        for j in janelas.values():
+            j.add(momento, realizado)
+        self.fills += 1
+        self.ultimo_id = max(self.ultimo_id, int(_campo(t, "id", 0) or 0))
+        return realizado
+
+    def janelas(self, agora_ms: int | None = None) -> Dict[str, Dict[str, Decimal]]:
+        """``{quote: {"24h": lucro, "7d": ..., "30d": ...}}`` realizado em cada janela."""
+        agora_ms = int(time.time() * 1000) if agora_ms is None else agora_ms
+        return {q: {n: j.valor(agora_ms) for n, j in js.items()} for q, js in self._janelas.items()}
+
+    def realizado_total(self) -> Dict[str, Decimal]:
+        total: Dict[str, Decimal] = {}
+        for (_, symbol), livro in self.livros.items():
+            q = quote_asset(symbol)
+            total[q] = total.get(q, _ZERO) + livro.realizado
+        return total
+
+    def nao_realizado(self, precos: Mapping[str, float]) -> Dict[str, Decimal]:
+        """Lucro em aberto pelos preços dados (símbolo → preço); símbolos sem preço ficam de fora."""
+        total: Dict[str, Decimal] = {}
+        for (_, symbol), livro in self.livros.items():
+            p = precos.get(symbol)
+            if livro.lotes and p:
+                q = quote_asset(symbol)
+                total[q] = total.get(q, _ZERO) + livro.nao_realizado(_dec(p))
+        return total
+
+
+# ------------------------------------------------------------ por usuário
+_carteiras: Dict[str, CarteiraPnL] = {}
+_locks: Dict[str, threading.Lock] = {}
+_lock = threading.Lock()   # só para criar as entradas dos dois dicts
+
+
+def _lock_usuario(user_id: str) -> threading.Lock:
+    lock = _locks.get(user_id)
+    if lock is None:
+        with _lock:
+            lock = _locks.setdefault(user_id, threading.Lock())
+    return lock
+
+
+def carteira(user_id: str) -> CarteiraPnL:
+    """Carteira do usuário, atualizada com os trades locais que ainda não viu.
+
+    A primeira chamada no processo reconstrói tudo; as seguintes só leem
+    as linhas gravadas depois da última aplicada (``TradeRecord.id``), o que
+    inclui trades antigos de um símbolo sincronizado pela primeira vez. Não
+    há buraco atrás do cursor: ``trade_sync`` serializa os syncs do usuário
+    pela sequência dele, então os ids de um usuário seguem a ordem de commit.
+
+    A leitura do banco fica fora de qualquer lock; só a aplicação no FIFO
+    segura o lock do próprio usuário, e descarta o que outra thread já
+    aplicou enquanto esta lia.
+    """
+    user_id = str(user_id)
+    c = _carteiras.get(user_id)
+    if c is None:
+        with _lock:
+            c = _carteiras.setdefault(user_id, CarteiraPnL())
+    novos = trade_sync.local_trades(user_id, depois_de_id=c.ultimo_id)
+    if novos:
+        with _lock_usuario(user_id):
+            desde = c.ultimo_id
+            for t in novos:
+                if t.id > desde:
+                    c.aplicar(t)
+    return c
+
+
+def resumo(user_id: str, precos: Mapping[str, float] | None = None, quote: str = "USDT",
+           agora_ms: int | None = None) -> Dict[str, Decimal]:
+    """Lucro realizado nas janelas (e em aberto, com ``precos``) numa moeda de cotação.
+
+    Tudo é lido sob o lock do usuário: ``janelas`` descarta eventos velhos
+    da soma e ``aplicar`` pode criar livros ao mesmo tempo em outra thread.
+    """
+    c = carteira(user_id)
+    with _lock_usuario(str(user_id)):
+        out = dict(c.janelas(agora_ms).get(quote) or {n: _ZERO for n in JANELAS})
+        out["total"] = c.realizado_total().get(quote, _ZERO)
+        if precos is not None:
+            out["aberto"] = c.nao_realizado(precos).get(quote, _ZERO)
+    return out
@@ -0,0 +1,130 @@
+# services/price_service.py
+"""Snapshot em memória de todos os preços spot da Binance.
+
+Uma única chamada a ``/api/v3/ticker/price`` (sem ``symbol``) devolve o preço
+de todos os pares; guardamos o resultado num dict e respondemos consultas
+por símbolo em O(1) até o snapshot passar do TTL. Avaliar uma carteira de 50
+ativos custa, assim, uma requisição HTTP em vez de 50.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Mapping
+
+import requests
+
+from services.weight_governor import GovernedSession
+
+__all__ = ["Quote", "PriceSnapshot", "PriceService", "price_service", "get_prices", "get_price"]
+
+log = logging.getLogger(__name__)
+
+PRICE_API_BASE = (os.getenv("PRICE_API_BASE") or os.getenv("BINANCE_API_BASE") or "https://api.binance.com").strip()
+PRICE_SNAPSHOT_TTL_S = float(os.getenv("PRICE_SNAPSHOT_TTL_S", "5"))
+PRICE_HTTP_TIMEOUT_S = float(os.getenv("PRICE_HTTP_TIMEOUT_S", "5"))
+
+
+@dataclass(frozen=True)
+class Quote:
+    """Preço de um símbolo e há quantos segundos ele foi obtido."""
+    symbol: str
+    price: float
+    age_s: float
+
+
+@dataclass
+class PriceSnapshot:
+    prices: Dict[str, float] = field(default_factory=dict)
+    fetched_at: float = 0.0  # time.time() da última atualização bem-sucedida
+
+    @property
+    def age_s(self) -> float:
+        return time.time() - self.fetched_at if self.fetched_at else float("inf")
+
+
+class PriceService:
+    """Mantém o snapshot de preços e o atualiza sob demanda."""
+
+    def __init__(self, base_url: str = PRICE_API_BASE, ttl_s: float = PRICE_SNAPSHOT_TTL_S,
+                 session: requests.Session | None = None, timeout_s: float = PRICE_HTTP_TIMEOUT_S) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.ttl_s = ttl_s
+        self.timeout_s = timeout_s
+        self.session = session or GovernedSession()
+        self._snapshot = PriceSnapshot()
+        self._lock = threading.Lock()
+        self._retry_at = 0.0  # após uma falha, não martelamos a API a cada chamada
+        self.fetches = 0
+        self._listeners: List[Callable[[Mapping[str, float]], object]] = []
+
+    def add_listener(self, fn: Callable[[Mapping[str, float]], object]) -> None:
+        """Chama ``fn(prices)`` a cada snapshot novo (ex.: motor de paper trading)."""
+        self._listeners.append(fn)
+
+    def snapshot(self, max_age_s: float | None = None) -> PriceSnapshot:
+        """Snapshot atual, atualizado se estiver mais velho que ``max_age_s``.
+
+        Se a atualização falhar, o snapshot anterior continua valendo (com a
+        idade real); cabe ao chamador decidir se ainda serve.
+        """
+        max_age_s = self.ttl_s if max_age_s is None else max_age_s
+        snap = self._snapshot
+        if snap.age_s <= max_age_s or time.monotonic() < self._retry_at:
+            return snap
+        with self._lock:
+            # outra thread pode ter atualizado enquanto esperávamos o lock
+            if self._snapshot.age_s > max_age_s and time.monotonic() >= self._retry_at:
+                self._refresh()
+            return self._snapshot
+
+    def refresh(self) -> PriceSnapshot:
+        """Força uma nova leitura de todos os preços."""
+        with self._lock:
+            self._refresh()
+            return self._snapshot
+
+    def get_prices(self, symbols: Iterable[str], max_age_s: float | None = None) -> Dict[str, Quote]:
+        """Cotações de ``symbols``; símbolos desconhecidos ficam de fora."""
+        snap = self.snapshot(max_age_s)
+        age = snap.age_s
+        out: Dict[str, Quote] = {}
+        for s in symbols:
+            p = snap.prices.get(s.upper())
+            if p is not None:
+                out[s.upper()] = Quote(s.upper(), p, age)
+        return out
+
+    def get_price(self, symbol: str, max_age_s: float | None = None) -> float | None:
+        return self.snapshot(max_age_s).prices.get(symbol.upper())
+
+    def _refresh(self) -> None:
+        try:
+            r = self.session.get(f"{self.base_url}/api/v3/ticker/price", timeout=self.timeout_s)
+            r.raise_for_status()
+            prices = {row["symbol"]: float(row["price"]) for row in r.json()}
+        except Exception as e:
+            log.warning("falha ao atualizar preços (%s); snapshot com %.0fs mantido", e, self._snapshot.age_s)
+            self._retry_at = time.monotonic() + min(self.ttl_s, 5.0)
+            return
+        self.fetches += 1
+        self._snapshot = PriceSnapshot(prices, time.time())
+        for fn in self._listeners:
+            try:
+                fn(prices)
+            except Exception:
+                log.exception("listener de preços falhou")
+
+
+price_service = PriceService()
+
+
+def get_prices(symbols: Iterable[str], max_age_s: float | None = None) -> Dict[str, Quote]:
+    return price_service.get_prices(symbols, max_age_s)
+
+
+def get_price(symbol: str, max_age_s: float | None = None) -> float | None:
+    return price_service.get_price(symbol, max_age_s)
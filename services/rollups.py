@@ -0,0 +1,274 @@
+# services/rollups.py
+"""Totais diários por usuário e símbolo (``models.DailyRollup``).
+
+Os relatórios somam linhas já agregadas — uma por (dia, mercado, símbolo)
+— em vez de varrer ``order_logs`` ou ``trade_records``. As linhas são
+mantidas de forma incremental: a cada sync que traz trades novos,
+``atualizar`` passa só os ``TradeRecord`` com id acima do cursor do
+usuário pelo motor FIFO de ``services.pnl`` e soma o delta de cada dia.
+
+O cursor (um ``SyncCursor`` com ``kind="rollup"``) avança com um UPDATE
+condicional ao valor lido, na mesma transação dos deltas; se outro worker
+chegou antes, a transação é desfeita e nada é contado duas vezes.
+``reconstruir`` refaz tudo dos trades brutos numa única passada ordenada.
+Ler só ``id > cursor`` é seguro porque ``trade_sync`` grava os trades de um
+usuário sob o lock da sequência dele: ids menores já estão commitados.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, update
+
+from db import get_session
+from models import DailyRollup, SyncCursor, TradeRecord
+from services import trade_sync
+from services.pnl import CarteiraPnL, quote_asset, taxa_em_cotacao
+
+__all__ = ["atualizar", "reconstruir", "relatorio", "Periodo"]
+
+log = logging.getLogger(__name__)
+
+LOTE = 1000
+_CURSOR = {"market": "*", "symbol": "*", "kind": "rollup"}
+
+_tabelas_ok = False
+_tabelas_lock = threading.Lock()
+
+# carteira FIFO de cada usuário neste processo, posicionada no cursor do rollup
+_carteiras: Dict[str, CarteiraPnL] = {}
+_lock = threading.Lock()
+
+Chave = Tuple[date, str, str]   # (dia, market, symbol)
+
+
+def _garantir_tabelas(session) -> None:
+    global _tabelas_ok
+    if _tabelas_ok:
+        return
+    with _tabelas_lock:
+        if not _tabelas_ok:
+            bind = session.get_bind()
+            for model in (TradeRecord, SyncCursor, DailyRollup):
+                model.__table__.create(bind=bind, checkfirst=True)
+            _tabelas_ok = True
+
+
+def _dia(ms: int) -> date:
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).date()
+
+
+def _acumular(acc: Dict[Chave, Dict[str, Any]], t: TradeRecord, realizado: Decimal) -> None:
+    chave = (_dia(t.time), t.market, t.symbol)
+    d = acc.get(chave)
+    if d is None:
+        d = acc[chave] = {"trades": 0, "volume": Decimal(0), "taxas": Decimal(0),
+                          "lucro": Decimal(0), "ganhos": 0, "perdas": 0}
+    d["trades"] += 1
+    d["volume"] += Decimal(str(t.quote_qty or t.price * t.qty))
+    taxa = taxa_em_cotacao(t.symbol, t.commission, t.commission_asset)
+    d["taxas"] += taxa
+    d["lucro"] += realizado
+    # só conta fills que fecharam posição (compra que abre lote não é ganho nem perda)
+    if realizado + taxa != 0:
+        d["ganhos" if realizado > 0 else "perdas"] += 1
+
+
+def _gravar(session, user_id: str, acc: Dict[Chave, Dict[str, Any]]) -> None:
+    """Soma os deltas de ``acc`` nas linhas existentes e insere as que faltam."""
+    if not acc:
+        return
+    dias = {k[0] for k in acc}
+    existentes = {
+        (r.dia, r.market, r.symbol): r for r in session.scalars(select(DailyRollup).where(
+            DailyRollup.user_id == user_id, DailyRollup.dia.between(min(dias), max(dias)),
+        ))
+    }
+    novas = []
+    for (dia, market, symbol), d in acc.items():
+        r = existentes.get((dia, market, symbol))
+        if r is None:
+            novas.append({"user_id": user_id, "dia": dia, "market": market, "symbol": symbol,
+                          "quote": quote_asset(symbol), "trades": d["trades"], "volume": float(d["volume"]),
+                          "taxas": float(d["taxas"]), "lucro": float(d["lucro"]),
+                          "ganhos": d["ganhos"], "perdas": d["perdas"]})
+            continue
+        r.trades += d["trades"]
+        r.volume += float(d["volume"])
+        r.taxas += float(d["taxas"])
+        r.lucro += float(d["lucro"])
+        r.ganhos += d["ganhos"]
+        r.perdas += d["perdas"]
+    if novas:
+        session.bulk_insert_mappings(DailyRollup, novas)
+
+
+def _trades_desde(session, user_id: str, depois_de_id: int, ate_id: int | None = None) -> Iterable[TradeRecord]:
+    q = select(TradeRecord).where(TradeRecord.user_id == user_id, TradeRecord.id > depois_de_id)
+    if ate_id is not None:
+        q = q.where(TradeRecord.id <= ate_id)
+    return session.scalars(q.order_by(TradeRecord.time, TradeRecord.trade_id).execution_options(yield_per=LOTE))
+
+
+def atualizar(user_id: str, symbol: str | None = None) -> int:
+    """Agrega os trades novos do usuário. Retorna quantos foram agregados.
+
+    ``symbol`` é ignorado (o cursor é por usuário); existe para servir de
+    listener de ``trade_sync``.
+    """
+    user_id = str(user_id)
+    with _lock:
+        try:
+            with get_session() as session:
+                _garantir_tabelas(session)
+                cur = session.scalars(select(SyncCursor).where(
+                    SyncCursor.user_id == user_id, *(getattr(SyncCursor, k) == v for k, v in _CURSOR.items()),
+                )).first()
+                if cur is None:
+                    cur = SyncCursor(user_id=user_id, next_id=0, **_CURSOR)
+                    session.add(cur)
+                    session.flush()
+                lido = cur.next_id
+                carteira = _carteiras.get(user_id)
+                if carteira is None or carteira.ultimo_id > lido:
+                    carteira = CarteiraPnL()
+                if carteira.ultimo_id < lido:
+                    # processo novo ou outro worker agregou antes: repõe o FIFO até o cursor
+                    for t in _trades_desde(session, user_id, carteira.ultimo_id, lido):
+                        carteira.aplicar(t)
+                    carteira.ultimo_id = lido
+                _carteiras[user_id] = carteira
+
+                acc: Dict[Chave, Dict[str, Any]] = {}
+                novos = 0
+                for t in list(_trades_desde(session, user_id, lido)):
+                    realizado = carteira.aplicar(t)
+                    if realizado is not None:
+                        _acumular(acc, t, realizado)
+                        novos += 1
+                if carteira.ultimo_id == lido:
+                    return 0
+                _gravar(session, user_id, acc)
+                movidas = session.execute(
+                    update(SyncCursor).where(SyncCursor.id == cur.id, SyncCursor.next_id == lido)
+                    .values(next_id=carteira.ultimo_id, synced_at=datetime.utcnow())
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                if movidas != 1:
+                    raise RuntimeError("cursor do rollup movido por outro processo")
+        except Exception:
+            # estado em memória pode estar à frente do banco: refaz na próxima chamada
+            _carteiras.pop(user_id, None)
+            raise
+    return novos
+
+
+def reconstruir(user_id: str | None = None) -> int:
+    """Apaga e refaz os rollups (de um usuário ou de todos) numa passada pelos trades.
+
+    Retorna quantos trades foram lidos.
+    """
+    with _lock:
+        with get_session() as session:
+            _garantir_tabelas(session)
+            q = select(TradeRecord)
+            if user_id is not None:
+                q = q.where(TradeRecord.user_id == str(user_id))
+            q = q.order_by(TradeRecord.user_id, TradeRecord.time, TradeRecord.trade_id)
+
+            por_usuario: Dict[str, Dict[Chave, Dict[str, Any]]] = {}
+            carteiras: Dict[str, CarteiraPnL] = {}
+            lidos = 0
+            for t in session.scalars(q.execution_options(yield_per=LOTE)):
+                carteira = carteiras.get(t.user_id)
+                if carteira is None:
+                    carteira = carteiras[t.user_id] = CarteiraPnL()
+                    por_usuario[t.user_id] = {}
+                realizado = carteira.aplicar(t)
+                if realizado is not None:
+                    _acumular(por_usuario[t.user_id], t, realizado)
+                lidos += 1
+
+            filtro_r = [] if user_id is None else [DailyRollup.user_id == str(user_id)]
+            filtro_c = [getattr(SyncCursor, k) == v for k, v in _CURSOR.items()]
+            if user_id is not None:
+                filtro_c.append(SyncCursor.user_id == str(user_id))
+            session.execute(delete(DailyRollup).where(*filtro_r))
+            session.execute(delete(SyncCursor).where(*filtro_c))
+            for uid, acc in por_usuario.items():
+                _gravar(session, uid, acc)
+                session.add(SyncCursor(user_id=uid, next_id=carteiras[uid].ultimo_id,
+                                       synced_at=datetime.utcnow(), **_CURSOR))
+        for uid in ([str(user_id)] if user_id is not None else list(_carteiras)):
+            _carteiras.pop(uid, None)
+        _carteiras.update(carteiras)
+    return lidos
+
+
+# ---------------------------------------------------------------- leitura
+@dataclass(frozen=True)
+class Periodo:
+    inicio: Optional[date] = None   # inclusivo
+    fim: Optional[date] = None      # inclusivo
+    symbol: Optional[str] = None
+
+    @classmethod
+    def from_args(cls, args) -> "Periodo":
+        """Lê ``inicio``/``fim`` (AAAA-MM-DD) e ``symbol``; sem datas, os últimos 30 dias."""
+        def data(nome):
+            v = (args.get(nome) or "").strip()
+            return date.fromisoformat(v) if v else None
+        fim = data("fim")
+        inicio = data("inicio") or (fim or datetime.utcnow().date()) - timedelta(days=29)
+        return cls(inicio, fim, (args.get("symbol") or "").strip().upper() or None)
+
+
+def _agregar(session, user_id: str, periodo: Periodo, *agrupar):
+    campos = (
+        func.sum(DailyRollup.trades), func.sum(DailyRollup.volume), func.sum(DailyRollup.taxas),
+        func.sum(DailyRollup.lucro), func.sum(DailyRollup.ganhos), func.sum(DailyRollup.perdas),
+    )
+    q = select(*agrupar, *campos).where(DailyRollup.user_id == user_id)
+    if periodo.inicio:
+        q = q.where(DailyRollup.dia >= periodo.inicio)
+    if periodo.fim:
+        q = q.where(DailyRollup.dia <= periodo.fim)
+    if periodo.symbol:
+        q = q.where(DailyRollup.symbol == periodo.symbol)
+    if agrupar:
+        q = q.group_by(*agrupar).order_by(*agrupar)
+    return session.execute(q).all()
+
+
+def _linha(chaves: Tuple, valores: Tuple) -> Dict[str, Any]:
+    trades, volume, taxas, lucro, ganhos, perdas = (v or 0 for v in valores)
+    fechados = ganhos + perdas
+    return dict(chaves, trades=trades, volume=volume, taxas=taxas, lucro=lucro, ganhos=ganhos,
+                perdas=perdas, win_rate=(ganhos / fechados) if fechados else None)
+
+
+def relatorio(user_id: str, periodo: Periodo = Periodo()) -> Dict[str, List[Dict[str, Any]]]:
+    """Totais do período por moeda de cotação, por símbolo e por dia."""
+    user_id = str(user_id)
+    with get_session() as session:
+        _garantir_tabelas(session)
+        q = DailyRollup.quote
+        return {
+            "totais": [_linha((("quote", r[0]),), r[1:]) for r in _agregar(session, user_id, periodo, q)],
+            "por_simbolo": [
+                _linha((("market", r[0]), ("symbol", r[1]), ("quote", r[2])), r[3:])
+                for r in _agregar(session, user_id, periodo, DailyRollup.market, DailyRollup.symbol, q)
+            ],
+            "por_dia": [
+                _linha((("dia", r[0]), ("quote", r[1])), r[2:])
+                for r in _agregar(session, user_id, periodo, DailyRollup.dia, q)
+            ],
+        }
+
+
+trade_sync.add_listener(atualizar)
@@ -0,0 +1,205 @@
+# services/single_flight.py
+"""Coalescência de chamadas idênticas simultâneas ("single-flight").
+
+Quando vários pedidos iguais chegam juntos (ex.: N usuários abrindo a
+análise do mesmo ticker), só o primeiro faz a chamada cara; os demais
+esperam e recebem o mesmo resultado:
+
+* no processo — os seguidores esperam num ``threading.Event`` do líder;
+* entre workers — o líder do processo disputa uma linha em
+  ``single_flight_locks`` no SQLite local. Quem perde espera o resultado
+  aparecer em ``single_flight_results`` (gravado depois do início da
+  espera) e, se o lock for liberado ou vencer sem resultado, assume a
+  chamada. O lock vence em ``SINGLE_FLIGHT_LOCK_S``, então um líder que
+  morreu não trava os outros.
+
+Não é cache: terminada a chamada, o próximo pedido faz outra. Os valores
+precisam ser serializáveis em JSON para passar entre workers.
+"""
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, TypeVar
+
+from services.local_store import connect
+
+__all__ = ["SingleFlight", "single_flight", "coalesce"]
+
+log = logging.getLogger(__name__)
+
+SINGLE_FLIGHT_LOCK_S = float(os.getenv("SINGLE_FLIGHT_LOCK_S", "30"))
+SINGLE_FLIGHT_WAIT_S = float(os.getenv("SINGLE_FLIGHT_WAIT_S", "30"))
+_RESULTADO_RETER_S = 60.0
+
+T = TypeVar("T")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS single_flight_locks (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS single_flight_results (
+    key TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+class _Voo:
+    __slots__ = ("evento", "valor", "erro")
+
+    def __init__(self) -> None:
+        self.evento = threading.Event()
+        self.valor: Any = None
+        self.erro: BaseException | None = None
+
+
+class SingleFlight:
+    def __init__(self, path: str | None = None, lock_s: float = SINGLE_FLIGHT_LOCK_S,
+                 espera_s: float = SINGLE_FLIGHT_WAIT_S, poll_s: float = 0.02) -> None:
+        self.path = path
+        self.lock_s = lock_s
+        self.espera_s = espera_s
+        self.poll_s = poll_s
+        self._voos: Dict[str, _Voo] = {}
+        self._lock = threading.Lock()
+        self._ready_pid: int | None = None
+        self.stats: Dict[str, int] = {"lideres": 0, "seguidores_locais": 0, "seguidores_remotos": 0,
+                                      "assumidas": 0, "sem_coordenacao": 0}
+
+    # ------------------------------------------------------------ interface
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        """Executa ``fn()`` uma vez para todos os chamadores simultâneos de ``key``."""
+        with self._lock:
+            voo = self._voos.get(key)
+            lider = voo is None
+            if lider:
+                voo = self._voos[key] = _Voo()
+        if not lider:
+            self.stats["seguidores_locais"] += 1
+            voo.evento.wait()
+            if voo.erro is not None:
+                raise voo.erro
+            return voo.valor
+        try:
+            voo.valor = self._entre_workers(key, fn)
+            return voo.valor
+        except BaseException as e:
+            voo.erro = e
+            raise
+        finally:
+            with self._lock:
+                self._voos.pop(key, None)
+            voo.evento.set()
+
+    # ------------------------------------------------------------- internos
+    def _conn(self):
+        conn = connect(self.path)
+        if self._ready_pid != os.getpid():
+            conn.executescript(_SCHEMA)
+            self._ready_pid = os.getpid()
+        return conn
+
+    def _entre_workers(self, key: str, fn: Callable[[], T]) -> T:
+        dono = uuid.uuid4().hex
+        inicio = time.time()
+        try:
+            adquirido = self._adquirir(key, dono)
+        except sqlite3.Error as e:
+            log.warning("single-flight sem coordenação entre workers: %s", e)
+            self.stats["sem_coordenacao"] += 1
+            return fn()
+        if adquirido:
+            return self._liderar(key, dono, fn)
+
+        self.stats["seguidores_remotos"] += 1
+        prazo = inicio + self.espera_s
+        espera = self.poll_s
+        while time.time() < prazo:
+            time.sleep(espera)
+            espera = min(espera * 1.5, 0.25)
+            try:
+                payload = self._resultado(key, inicio)
+                if payload is not None:
+                    if "erro" in payload:
+                        raise RuntimeError(payload["erro"])
+                    return payload["valor"]
+                if self._adquirir(key, dono):
+                    # o líder terminou sem publicar (ou morreu e o lock venceu)
+                    self.stats["assumidas"] += 1
+                    return self._liderar(key, dono, fn)
+            except sqlite3.Error as e:
+                log.warning("single-flight sem coordenação entre workers: %s", e)
+                break
+        self.stats["sem_coordenacao"] += 1
+        return fn()
+
+    def _liderar(self, key: str, dono: str, fn: Callable[[], T]) -> T:
+        self.stats["lideres"] += 1
+        try:
+            valor = fn()
+        except Exception as e:
+            self._publicar(key, {"erro": f"{type(e).__name__}: {e}"})
+            raise
+        else:
+            self._publicar(key, {"valor": valor})
+            return valor
+        finally:
+            try:
+                self._conn().execute("DELETE FROM single_flight_locks WHERE key = ? AND owner = ?", (key, dono))
+            except sqlite3.Error as e:
+                log.warning("lock de single-flight não liberado (vence em %.0fs): %s", self.lock_s, e)
+
+    def _adquirir(self, key: str, dono: str) -> bool:
+        agora = time.time()
+        cur = self._conn().execute(
+            "INSERT INTO single_flight_locks (key, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE single_flight_locks.expires_at < ?",
+            (key, dono, agora + self.lock_s, agora),
+        )
+        return cur.rowcount == 1
+
+    def _publicar(self, key: str, payload: Dict[str, Any]) -> None:
+        agora = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO single_flight_results (key, payload, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(payload, ensure_ascii=False), agora),
+            )
+            conn.execute("DELETE FROM single_flight_results WHERE created_at < ?", (agora - _RESULTADO_RETER_S,))
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            # sem resultado publicado os seguidores assumem quando o lock for liberado
+            log.warning("resultado de single-flight não publicado: %s", e)
+
+    def _resultado(self, key: str, desde: float) -> Dict[str, Any] | None:
+        row = self._conn().execute(
+            "SELECT payload FROM single_flight_results WHERE key = ? AND created_at >= ?", (key, desde)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+single_flight = SingleFlight()
+
+
+def coalesce(nome: str, sf: SingleFlight | None = None):
+    """Decorator: chamadas simultâneas com os mesmos argumentos viram uma só."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bruto = json.dumps([args, kwargs], sort_keys=True, default=str)
+            key = f"{nome}:{hashlib.blake2b(bruto.encode(), digest_size=16).hexdigest()}"
+            return (sf or single_flight).do(key, lambda: fn(*args, **kwargs))
+        return wrapper
+    return deco
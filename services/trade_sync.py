@@ -0,0 +1,324 @@
+# services/trade_sync.py
+"""Cópia local e incremental de trades e ordens da Binance.
+
+Para cada (usuário, mercado, símbolo) guardamos em ``SyncCursor`` até onde
+já copiamos: ``myTrades``/``userTrades`` são buscados com ``fromId`` a
+partir do próximo id de trade, e ``allOrders`` com ``orderId`` a partir da
+ordem aberta mais antiga (ordens abertas ainda mudam de status) ou da
+seguinte à última. Uma sincronização sem novidades custa uma requisição
+por cursor; as páginas leem só do banco, pelo índice
+``(user_id, symbol, time)``.
+
+Antes de inserir o primeiro trade, a transação do sync incrementa a
+sequência do usuário (``SyncCursor`` com ``kind="seq"``) e segura o lock
+dessa linha até o commit. Assim os syncs de um mesmo usuário gravam trades
+um de cada vez, e cada um só pega ids depois do commit do anterior: para
+um usuário, a ordem de ``TradeRecord.id`` é a ordem de commit. É isso
+que permite a ``services.pnl`` e ``services.rollups`` lerem só
+``id > cursor`` sem perder linhas de um sync que commitou atrasado (no
+Postgres, os valores da sequência não saem na ordem dos commits).
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from db import get_session
+from models import ExchangeOrder, SyncCursor, TradeRecord
+
+__all__ = [
+    "sync_symbol", "sync_user", "sync_in_background", "add_listener",
+    "local_orders", "local_trades", "last_synced", "MARKETS",
+]
+
+log = logging.getLogger(__name__)
+
+TRADE_SYNC_PAGE = 1000          # máximo por chamada de myTrades/allOrders
+TRADE_SYNC_MAX_PAGES = int(os.getenv("TRADE_SYNC_MAX_PAGES", "50"))
+TRADE_SYNC_STALE_S = float(os.getenv("TRADE_SYNC_STALE_S", "60"))
+MARKETS = ("spot", "futures")
+
+_OPEN_STATUSES = {"NEW", "PARTIALLY_FILLED", "PENDING_CANCEL"}
+_SEQ = {"market": "*", "symbol": "*", "kind": "seq"}
+
+_tabelas_ok = False
+_tabelas_lock = threading.Lock()
+_listeners: List = []
+
+
+def add_listener(fn) -> None:
+    """Chama ``fn(user_id, symbol)`` depois de cada sync que trouxe trades novos."""
+    _listeners.append(fn)
+
+
+def _garantir_tabelas(session) -> None:
+    global _tabelas_ok
+    if _tabelas_ok:
+        return
+    with _tabelas_lock:
+        if not _tabelas_ok:
+            bind = session.get_bind()
+            for model in (TradeRecord, ExchangeOrder, SyncCursor):
+                model.__table__.create(bind=bind, checkfirst=True)
+            _tabelas_ok = True
+
+
+# ------------------------------------------------------------- conversões
+def _trade_row(user_id: str, market: str, t: Dict[str, Any]) -> Dict[str, Any]:
+    if market == "spot":
+        side = "BUY" if t.get("isBuyer") else "SELL"
+        maker = bool(t.get("isMaker"))
+    else:
+        side = t.get("side") or ("BUY" if t.get("buyer") else "SELL")
+        maker = bool(t.get("maker"))
+    return {
+        "user_id": user_id, "market": market, "symbol": t["symbol"], "trade_id": int(t["id"]),
+        "order_id": int(t.get("orderId", 0)), "side": side, "price": float(t["price"]),
+        "qty": float(t["qty"]), "quote_qty": float(t.get("quoteQty") or 0.0),
+        "commission": float(t.get("commission") or 0.0), "commission_asset": t.get("commissionAsset", ""),
+        "realized_pnl": float(t.get("realizedPnl") or 0.0), "is_maker": maker, "time": int(t["time"]),
+    }
+
+
+def _order_row(user_id: str, market: str, o: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "user_id": user_id, "market": market, "symbol": o["symbol"], "order_id": int(o["orderId"]),
+        "client_order_id": o.get("clientOrderId", ""), "side": o.get("side", ""), "tipo": o.get("type", ""),
+        "price": float(o.get("price") or 0.0), "orig_qty": float(o.get("origQty") or 0.0),
+        "executed_qty": float(o.get("executedQty") or 0.0), "status": o.get("status", ""),
+        "time": int(o.get("time") or o.get("updateTime") or 0), "update_time": int(o.get("updateTime") or 0),
+    }
+
+
+def _fetch_trades(client, market: str, symbol: str, from_id: int) -> List[dict]:
+    if market == "spot":
+        return client.get_my_trades(symbol=symbol, fromId=from_id, limit=TRADE_SYNC_PAGE) or []
+    return client.futures_account_trades(symbol=symbol, fromId=from_id, limit=TRADE_SYNC_PAGE) or []
+
+
+def _fetch_orders(client, market: str, symbol: str, from_id: int) -> List[dict]:
+    if market == "spot":
+        return client.get_all_orders(symbol=symbol, orderId=from_id, limit=TRADE_SYNC_PAGE) or []
+    return client.futures_get_all_orders(symbol=symbol, orderId=from_id, limit=TRADE_SYNC_PAGE) or []
+
+
+# ------------------------------------------------------------------- sync
+def _cursor(session, user_id: str, market: str, symbol: str, kind: str) -> SyncCursor:
+    cur = session.scalars(select(SyncCursor).where(
+        SyncCursor.user_id == user_id, SyncCursor.market == market,
+        SyncCursor.symbol == symbol, SyncCursor.kind == kind,
+    )).first()
+    if cur is None:
+        cur = SyncCursor(user_id=user_id, market=market, symbol=symbol, kind=kind, next_id=0)
+        session.add(cur)
+    return cur
+
+
+def _criar_sequencia(user_id: str) -> None:
+    """Cria a linha da sequência do usuário, se ainda não existe (transação própria)."""
+    try:
+        with get_session() as session:
+            existe = session.scalars(select(SyncCursor.id).where(
+                SyncCursor.user_id == user_id, *(getattr(SyncCursor, k) == v for k, v in _SEQ.items()),
+            )).first()
+            if existe is None:
+                session.add(SyncCursor(user_id=user_id, next_id=0, **_SEQ))
+    except IntegrityError:
+        pass  # outro worker criou ao mesmo tempo
+
+
+def _travar_usuario(session, user_id: str) -> None:
+    """Incrementa a sequência do usuário; o lock da linha fica até o commit."""
+    filtro = [SyncCursor.user_id == user_id, *(getattr(SyncCursor, k) == v for k, v in _SEQ.items())]
+    movidas = session.execute(
+        update(SyncCursor).where(*filtro).values(next_id=SyncCursor.next_id + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if movidas != 1:
+        raise RuntimeError(f"sequência de sync do usuário {user_id} não existe")
+
+
+def _upsert(session, model, chave: str, user_id: str, market: str, symbol: str,
+            rows: List[Dict[str, Any]], atualizar: Tuple[str, ...] = ()) -> int:
+    """Insere as linhas novas e atualiza ``atualizar`` nas existentes. Retorna quantas eram novas."""
+    if not rows:
+        return 0
+    coluna = getattr(model, chave)
+    ids = [r[chave] for r in rows]
+    existentes = {
+        getattr(m, chave): m for m in session.scalars(select(model).where(
+            model.user_id == user_id, model.market == market, model.symbol == symbol, coluna.in_(ids),
+        ))
+    }
+    novas = [r for r in rows if r[chave] not in existentes]
+    for r in rows:
+        m = existentes.get(r[chave])
+        if m is not None:
+            for campo in atualizar:
+                setattr(m, campo, r[campo])
+    if novas:
+        session.bulk_insert_mappings(model, novas)
+    return len(novas)
+
+
+def _sync_trades(session, client, user_id: str, market: str, symbol: str) -> int:
+    cur = _cursor(session, user_id, market, symbol, "trades")
+    total, travado = 0, False
+    for _ in range(TRADE_SYNC_MAX_PAGES):
+        page = _fetch_trades(client, market, symbol, cur.next_id)
+        rows = [_trade_row(user_id, market, t) for t in page]
+        if rows and not travado:
+            _travar_usuario(session, user_id)   # antes de qualquer id ser sorteado
+            travado = True
+        total += _upsert(session, TradeRecord, "trade_id", user_id, market, symbol, rows)
+        if rows:
+            cur.next_id = max(r["trade_id"] for r in rows) + 1
+        session.flush()
+        if len(page) < TRADE_SYNC_PAGE:
+            break
+    cur.synced_at = datetime.utcnow()
+    return total
+
+
+def _sync_orders(session, client, user_id: str, market: str, symbol: str) -> int:
+    cur = _cursor(session, user_id, market, symbol, "orders")
+    total, desde = 0, cur.next_id
+    aberta_mais_antiga: Optional[int] = None
+    ultima: Optional[int] = None
+    for _ in range(TRADE_SYNC_MAX_PAGES):
+        page = _fetch_orders(client, market, symbol, desde)
+        rows = [_order_row(user_id, market, o) for o in page]
+        total += _upsert(session, ExchangeOrder, "order_id", user_id, market, symbol, rows,
+                         atualizar=("status", "executed_qty", "update_time", "price"))
+        session.flush()
+        if not rows:
+            break
+        abertas = [r["order_id"] for r in rows if r["status"] in _OPEN_STATUSES]
+        if abertas and aberta_mais_antiga is None:
+            aberta_mais_antiga = min(abertas)
+        ultima = max(r["order_id"] for r in rows)
+        desde = ultima + 1
+        if len(page) < TRADE_SYNC_PAGE:
+            break
+    if ultima is not None:
+        # a próxima busca recomeça na ordem aberta mais antiga: seu status ainda muda
+        cur.next_id = aberta_mais_antiga if aberta_mais_antiga is not None else ultima + 1
+    cur.synced_at = datetime.utcnow()
+    return total
+
+
+def sync_symbol(client, user_id: str, symbol: str, markets: Iterable[str] = MARKETS) -> Dict[str, int]:
+    """Copia trades e ordens novos de ``symbol``. Retorna quantos de cada foram inseridos.
+
+    Um mercado que falha (ex.: conta sem futuros) não impede os demais.
+    """
+    user_id, symbol = str(user_id), symbol.upper()
+    resultado: Dict[str, int] = {}
+    with get_session() as session:
+        _garantir_tabelas(session)
+    _criar_sequencia(user_id)
+    for market in markets:
+        try:
+            with get_session() as session:
+                _garantir_tabelas(session)
+                resultado[f"{market}_trades"] = _sync_trades(session, client, user_id, market, symbol)
+                resultado[f"{market}_orders"] = _sync_orders(session, client, user_id, market, symbol)
+        except Exception as e:
+            log.warning("sync de %s %s (%s) falhou: %s", user_id, symbol, market, e)
+            resultado[f"{market}_erro"] = str(e)
+    if any(v for k, v in resultado.items() if k.endswith("_trades")):
+        for fn in list(_listeners):
+            try:
+                fn(user_id, symbol)
+            except Exception as e:
+                log.warning("listener do sync falhou: %s", e)
+    return resultado
+
+
+def sync_user(client, user_id: str) -> Dict[str, Dict[str, int]]:
+    """Sincroniza todos os símbolos que o usuário já acompanha (os que têm cursor)."""
+    with get_session() as session:
+        _garantir_tabelas(session)
+        pares = session.execute(
+            select(SyncCursor.symbol, SyncCursor.market)
+            .where(SyncCursor.user_id == str(user_id), SyncCursor.symbol != "*").distinct()
+        ).all()
+    por_simbolo: Dict[str, List[str]] = {}
+    for symbol, market in pares:
+        por_simbolo.setdefault(symbol, []).append(market)
+    return {s: sync_symbol(client, user_id, s, sorted(set(m))) for s, m in por_simbolo.items()}
+
+
+# ---------------------------------------------------------------- leitura
+def local_orders(user_id: str, symbol: str, market: str | None = None, limite: int = 50) -> List[ExchangeOrder]:
+    """Últimas ordens do banco local (mais recentes primeiro)."""
+    with get_session() as session:
+        _garantir_tabelas(session)
+        q = select(ExchangeOrder).where(ExchangeOrder.user_id == str(user_id), ExchangeOrder.symbol == symbol.upper())
+        if market:
+            q = q.where(ExchangeOrder.market == market)
+        rows = list(session.scalars(q.order_by(ExchangeOrder.time.desc()).limit(limite)))
+        session.expunge_all()
+    return rows
+
+
+def local_trades(user_id: str, symbol: str | None = None, desde_ms: int | None = None,
+                 market: str | None = None, depois_de_id: int | None = None) -> List[TradeRecord]:
+    """Trades do banco local em ordem cronológica.
+
+    ``depois_de_id`` filtra pelas linhas gravadas depois de ``TradeRecord.id``.
+    """
+    with get_session() as session:
+        _garantir_tabelas(session)
+        q = select(TradeRecord).where(TradeRecord.user_id == str(user_id))
+        if symbol:
+            q = q.where(TradeRecord.symbol == symbol.upper())
+        if market:
+            q = q.where(TradeRecord.market == market)
+        if desde_ms is not None:
+            q = q.where(TradeRecord.time >= desde_ms)
+        if depois_de_id:
+            q = q.where(TradeRecord.id > depois_de_id)
+        rows = list(session.scalars(q.order_by(TradeRecord.time, TradeRecord.trade_id)))
+        session.expunge_all()
+    return rows
+
+
+def last_synced(user_id: str, symbol: str) -> Optional[datetime]:
+    """Momento da sincronização mais antiga entre os cursores do símbolo (None se nunca)."""
+    with get_session() as session:
+        _garantir_tabelas(session)
+        datas = list(session.scalars(select(SyncCursor.synced_at).where(
+            SyncCursor.user_id == str(user_id), SyncCursor.symbol == symbol.upper(),
+        )))
+    if not datas or any(d is None for d in datas):
+        return None
+    return min(datas)
+
+
+# ------------------------------------------------------- segundo plano
+_executor: ThreadPoolExecutor | None = None
+_em_andamento: Dict[Tuple[str, str], Future] = {}
+_lock = threading.Lock()
+
+
+def sync_in_background(client, user_id: str, symbol: str, markets: Iterable[str] = MARKETS) -> Future:
+    """Agenda ``sync_symbol`` numa thread; pedidos repetidos reaproveitam o que está rodando."""
+    global _executor
+    chave = (str(user_id), symbol.upper())
+    with _lock:
+        f = _em_andamento.get(chave)
+        if f is not None and not f.done():
+            return f
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="trade-sync")
+        f = _executor.submit(sync_symbol, client, user_id, symbol, tuple(markets))
+        _em_andamento[chave] = f
+    return f
@@ -0,0 +1,158 @@
+# services/valuation.py
+"""Avaliação de saldos em USDT a partir do snapshot de preços.
+
+Para cada ativo pré-calculamos (a partir do ``exchangeInfo``) os caminhos de
+conversão até USDT: par direto (``XUSDT``), par invertido (``USDTX``) ou via
+um ativo ponte (BTC, BNB, ETH). Com os caminhos em cache e o snapshot de
+preços quente, avaliar a carteira é só uma sequência de lookups em dict.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Mapping, Tuple
+
+from services.price_service import price_service
+
+__all__ = [
+    "ConversionPaths", "Valuation", "build_conversion_paths",
+    "conversion_paths", "value_balances", "QUOTE_ASSET",
+]
+
+log = logging.getLogger(__name__)
+
+QUOTE_ASSET = "USDT"
+BRIDGE_ASSETS = ("BTC", "BNB", "ETH")
+EXCHANGE_INFO_TTL_S = float(os.getenv("EXCHANGE_INFO_TTL_S", "3600"))
+EXCHANGE_INFO_RETRY_S = float(os.getenv("EXCHANGE_INFO_RETRY_S", "60"))
+
+# (símbolo, invertido): multiplica pelo preço ou, se invertido, divide
+Step = Tuple[str, bool]
+Path = Tuple[Step, ...]
+
+
+@dataclass
+class ConversionPaths:
+    """Caminhos candidatos por ativo, em ordem de preferência."""
+    paths: Dict[str, Tuple[Path, ...]] = field(default_factory=dict)
+    built_at: float = 0.0
+
+    def for_asset(self, asset: str) -> Tuple[Path, ...]:
+        if asset == QUOTE_ASSET:
+            return ((),)
+        found = self.paths.get(asset)
+        # saldos do Simple Earn aparecem como LDBTC, LDETH...
+        if found is None and asset.startswith("LD"):
+            found = self.paths.get(asset[2:])
+        return found or ()
+
+
+def build_conversion_paths(symbols: Iterable[Mapping]) -> ConversionPaths:
+    """Monta os caminhos a partir da lista ``symbols`` do exchangeInfo."""
+    pairs: Dict[Tuple[str, str], str] = {}
+    assets = set()
+    for s in symbols:
+        if s.get("status", "TRADING") != "TRADING":
+            continue
+        base, quote = s["baseAsset"], s["quoteAsset"]
+        pairs[(base, quote)] = s["symbol"]
+        assets.update((base, quote))
+
+    def step(src: str, dst: str) -> Step | None:
+        if (src, dst) in pairs:
+            return pairs[(src, dst)], False
+        if (dst, src) in pairs:
+            return pairs[(dst, src)], True
+        return None
+
+    out: Dict[str, Tuple[Path, ...]] = {}
+    for asset in assets:
+        if asset == QUOTE_ASSET:
+            continue
+        candidates: List[Path] = []
+        direct = step(asset, QUOTE_ASSET)
+        if direct:
+            candidates.append((direct,))
+        for bridge in BRIDGE_ASSETS:
+            if bridge == asset:
+                continue
+            first, second = step(asset, bridge), step(bridge, QUOTE_ASSET)
+            if first and second:
+                candidates.append((first, second))
+        if candidates:
+            out[asset] = tuple(candidates)
+    return ConversionPaths(out, time.time())
+
+
+_PATHS = ConversionPaths()
+_PATHS_LOCK = threading.Lock()
+_retry_at = 0.0  # após uma falha, não refazemos o exchangeInfo (peso 20) a cada render
+
+
+def _fresh(max_age_s: float) -> bool:
+    return (bool(_PATHS.paths) and time.time() - _PATHS.built_at <= max_age_s) \
+        or time.monotonic() < _retry_at
+
+
+def conversion_paths(max_age_s: float = EXCHANGE_INFO_TTL_S) -> ConversionPaths:
+    """Caminhos em cache; recarrega o exchangeInfo quando passar do TTL.
+
+    Se o exchangeInfo falhar, os caminhos anteriores (ou nenhum) valem por
+    ``EXCHANGE_INFO_RETRY_S`` antes de uma nova tentativa.
+    """
+    global _PATHS, _retry_at
+    if _fresh(max_age_s):
+        return _PATHS
+    with _PATHS_LOCK:
+        if _fresh(max_age_s):
+            return _PATHS
+        try:
+            r = price_service.session.get(f"{price_service.base_url}/api/v3/exchangeInfo",
+                                          timeout=price_service.timeout_s * 2)
+            r.raise_for_status()
+            _PATHS = build_conversion_paths(r.json().get("symbols", []))
+        except Exception as e:
+            log.warning("falha ao carregar exchangeInfo (%s); mantendo caminhos anteriores", e)
+            _retry_at = time.monotonic() + EXCHANGE_INFO_RETRY_S
+        return _PATHS
+
+
+@dataclass
+class Valuation:
+    total_usdt: float
+    per_asset: Dict[str, float]
+    unpriced: List[str]
+
+
+def value_balances(balances: Mapping[str, float], prices: Mapping[str, float],
+                   paths: ConversionPaths) -> Valuation:
+    """Converte ``balances`` (ativo → quantidade) para USDT.
+
+    Usa o primeiro caminho candidato cujos preços estejam no snapshot;
+    ativos sem caminho/preço vão para ``unpriced``.
+    """
+    total = 0.0
+    per_asset: Dict[str, float] = {}
+    unpriced: List[str] = []
+    for asset, qty in balances.items():
+        value = None
+        for path in paths.for_asset(asset):
+            v = qty
+            for symbol, inverted in path:
+                p = prices.get(symbol)
+                if not p:
+                    v = None
+                    break
+                v = v / p if inverted else v * p
+            if v is not None:
+                value = v
+                break
+        if value is None:
+            unpriced.append(asset)
+            continue
+        per_asset[asset] = value
+        total += value
+    return Valuation(total, per_asset, unpriced)
@@ -0,0 +1,320 @@
+# services/weight_governor.py
+"""Controle do peso de requisições à Binance compartilhado entre processos.
+
+Os limites da Binance (peso por minuto, ordens por 10s) valem por IP/conta,
+não por worker. Mantemos buckets de tokens no SQLite local, descontamos o
+peso de cada endpoint antes de enviar e sincronizamos com os cabeçalhos
+``X-MBX-USED-WEIGHT-*`` / ``X-MBX-ORDER-COUNT-*`` da resposta. Ordens têm
+prioridade: leituras do dashboard e jobs em segundo plano só consomem
+enquanto sobrar uma reserva, e esperam (ou são descartadas) antes de o
+limite real ser atingido. Os jobs do agendador rodam dentro de
+``priority(BACKGROUND)``.
+
+Cada host tem seus próprios buckets (``spot_weight@testnet.binance.vision``
+etc.): o tráfego da testnet não consome a cota da produção.
+"""
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import logging
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+from services.local_store import connect
+
+__all__ = [
+    "ORDER", "READ", "BACKGROUND", "RateLimitShed", "WeightGovernor", "governor",
+    "GovernedSession", "priority", "endpoint_weight",
+]
+
+log = logging.getLogger(__name__)
+
+# Prioridades: menor = mais importante
+ORDER, READ, BACKGROUND = 0, 1, 2
+
+# Fração da capacidade que cada prioridade deixa livre para as superiores
+_RESERVE = {ORDER: 0.0, READ: 0.15, BACKGROUND: 0.40}
+# Quanto cada prioridade aceita esperar na fila antes de desistir
+_MAX_WAIT_S = {
+    ORDER: float(os.getenv("GOVERNOR_ORDER_WAIT_S", "10")),
+    READ: float(os.getenv("GOVERNOR_READ_WAIT_S", "2")),
+    BACKGROUND: float(os.getenv("GOVERNOR_BACKGROUND_WAIT_S", "30")),
+}
+
+# Margem de segurança sobre os limites oficiais
+_SAFETY = float(os.getenv("GOVERNOR_SAFETY", "0.85"))
+
+
+@dataclass(frozen=True)
+class BucketSpec:
+    name: str
+    limit: float      # limite oficial na janela
+    window_s: float
+    header: str       # cabeçalho da resposta com o uso atual
+
+    @property
+    def capacity(self) -> float:
+        return self.limit * _SAFETY
+
+    @property
+    def refill_per_s(self) -> float:
+        return self.capacity / self.window_s
+
+
+BUCKETS: Dict[str, BucketSpec] = {
+    b.name: b for b in (
+        BucketSpec("spot_weight", float(os.getenv("BINANCE_SPOT_WEIGHT_LIMIT", "6000")), 60, "x-mbx-used-weight-1m"),
+        BucketSpec("spot_orders", float(os.getenv("BINANCE_SPOT_ORDER_LIMIT", "100")), 10, "x-mbx-order-count-10s"),
+        BucketSpec("futures_weight", float(os.getenv("BINANCE_FUTURES_WEIGHT_LIMIT", "2400")), 60, "x-mbx-used-weight-1m"),
+        BucketSpec("futures_orders", float(os.getenv("BINANCE_FUTURES_ORDER_LIMIT", "300")), 10, "x-mbx-order-count-10s"),
+    )
+}
+
+# (método, caminho) -> (peso com symbol, peso sem symbol). Método "*" vale para todos.
+_WEIGHTS: Dict[Tuple[str, str], Tuple[int, int]] = {
+    ("*", "/api/v3/account"): (20, 20),
+    ("*", "/api/v3/openOrders"): (6, 80),
+    ("*", "/api/v3/allOrders"): (20, 20),
+    ("*", "/api/v3/myTrades"): (20, 20),
+    ("GET", "/api/v3/order"): (4, 4),
+    ("*", "/api/v3/order"): (1, 1),
+    ("*", "/api/v3/order/oco"): (1, 1),
+    ("*", "/api/v3/orderList/oco"): (1, 1),
+    ("*", "/api/v3/ticker/price"): (2, 4),
+    ("*", "/api/v3/ticker/24hr"): (2, 80),
+    ("*", "/api/v3/exchangeInfo"): (20, 20),
+    ("*", "/api/v3/klines"): (2, 2),
+    ("*", "/api/v3/depth"): (5, 5),
+    ("*", "/fapi/v2/balance"): (5, 5),
+    ("*", "/fapi/v3/balance"): (5, 5),
+    ("*", "/fapi/v2/account"): (5, 5),
+    ("*", "/fapi/v1/openOrders"): (1, 40),
+    ("*", "/fapi/v1/allOrders"): (5, 5),
+    ("*", "/fapi/v1/userTrades"): (5, 5),
+    ("*", "/fapi/v1/order"): (1, 1),
+}
+
+_ORDER_PATHS = {"/api/v3/order", "/api/v3/order/oco", "/api/v3/orderList/oco", "/fapi/v1/order"}
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("binance_priority", default=READ)
+
+
+class RateLimitShed(RuntimeError):
+    """Requisição descartada para não estourar o limite da Binance."""
+
+
+def endpoint_weight(method: str, path: str, has_symbol: bool) -> int:
+    method = method.upper()
+    w = _WEIGHTS.get((method, path)) or _WEIGHTS.get(("*", path)) or (1, 1)
+    return w[0] if has_symbol else w[1]
+
+
+def is_order_request(method: str, path: str) -> bool:
+    return method.upper() in ("POST", "DELETE") and path in _ORDER_PATHS
+
+
+@contextlib.contextmanager
+def priority(level: int) -> Iterator[None]:
+    """Define a prioridade das chamadas feitas dentro do bloco (thread atual)."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL,
+    banned_until REAL NOT NULL DEFAULT 0
+);
+"""
+
+
+class WeightGovernor:
+    def __init__(self, path: str | None = None, buckets: Dict[str, BucketSpec] = BUCKETS) -> None:
+        self.path = path
+        self.buckets = buckets
+        self._ready_pid: int | None = None
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = connect(self.path)
+        if self._ready_pid != os.getpid():
+            conn.executescript(_SCHEMA)
+            self._ready_pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _chave(name: str, escopo: str) -> str:
+        return f"{name}@{escopo}" if escopo else name
+
+    def _load(self, conn: sqlite3.Connection, spec: BucketSpec, now: float,
+              escopo: str = "") -> Tuple[float, float]:
+        """(tokens já reabastecidos, banned_until) do bucket."""
+        row = conn.execute(
+            "SELECT tokens, updated, banned_until FROM rate_buckets WHERE name = ?",
+            (self._chave(spec.name, escopo),),
+        ).fetchone()
+        if row is None:
+            return spec.capacity, 0.0
+        tokens, updated, banned_until = row
+        return min(spec.capacity, tokens + (now - updated) * spec.refill_per_s), banned_until
+
+    def _store(self, conn: sqlite3.Connection, name: str, tokens: float, now: float, banned_until: float) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO rate_buckets (name, tokens, updated, banned_until) VALUES (?, ?, ?, ?)",
+            (name, tokens, now, banned_until),
+        )
+
+    def try_acquire(self, costs: Dict[str, float], level: int = READ, escopo: str = "") -> float:
+        """Tenta descontar ``costs`` ({bucket: peso}) de uma vez.
+
+        Retorna 0 se conseguiu, senão quantos segundos esperar antes de tentar
+        de novo. Nada é descontado se algum bucket não tiver saldo.
+        ``escopo`` separa os buckets por host.
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            state = {}
+            wait = 0.0
+            for name, cost in costs.items():
+                spec = self.buckets[name]
+                tokens, banned_until = self._load(conn, spec, now, escopo)
+                state[name] = (tokens, banned_until)
+                if banned_until > now:
+                    wait = max(wait, banned_until - now)
+                    continue
+                needed = cost + spec.capacity * _RESERVE[level]
+                if tokens < needed:
+                    wait = max(wait, (needed - tokens) / spec.refill_per_s)
+            if wait == 0.0:
+                for name, cost in costs.items():
+                    tokens, banned_until = state[name]
+                    self._store(conn, self._chave(name, escopo), tokens - cost, now, banned_until)
+            conn.execute("COMMIT")
+            return wait
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def acquire(self, costs: Dict[str, float], level: int | None = None, max_wait_s: float | None = None,
+                escopo: str = "") -> None:
+        """Espera na fila até haver saldo; levanta :class:`RateLimitShed` se passar do prazo."""
+        level = _priority.get() if level is None else level
+        max_wait_s = _MAX_WAIT_S[level] if max_wait_s is None else max_wait_s
+        deadline = time.monotonic() + max_wait_s
+        while True:
+            wait = self.try_acquire(costs, level, escopo)
+            if wait == 0.0:
+                return
+            if time.monotonic() + wait > deadline:
+                raise RateLimitShed(f"limite de peso da Binance próximo ({costs}); tente novamente em {wait:.1f}s")
+            time.sleep(min(wait, 0.25))
+
+    def observe(self, bucket_names: Tuple[str, ...], status_code: int, headers, escopo: str = "") -> None:
+        """Ajusta os buckets com o uso informado pela Binance na resposta."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for name in bucket_names:
+                spec = self.buckets[name]
+                tokens, banned_until = self._load(conn, spec, now, escopo)
+                used = headers.get(spec.header)
+                if used is not None:
+                    try:
+                        tokens = min(tokens, spec.capacity - float(used))
+                    except ValueError:
+                        pass
+                if status_code in (418, 429):
+                    retry_after = float(headers.get("Retry-After") or 60)
+                    banned_until = max(banned_until, now + retry_after)
+                    tokens = min(tokens, 0.0)
+                    log.error("Binance respondeu %s; %s bloqueado por %.0fs", status_code, name, retry_after)
+                self._store(conn, self._chave(name, escopo), tokens, now, banned_until)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def utilisation(self) -> Dict[str, dict]:
+        """Uso atual de cada bucket (``nome@host`` para cada host já visto), para monitoramento."""
+        now = time.time()
+        conn = self._conn()
+        escopos = {""} | {
+            row[0].split("@", 1)[1] for row in conn.execute("SELECT name FROM rate_buckets WHERE name LIKE '%@%'")
+        }
+        out = {}
+        for escopo in sorted(escopos):
+            for name, spec in self.buckets.items():
+                out[self._chave(name, escopo)] = self._uso(conn, spec, now, escopo)
+        return out
+
+    def _uso(self, conn: sqlite3.Connection, spec: BucketSpec, now: float, escopo: str) -> dict:
+        tokens, banned_until = self._load(conn, spec, now, escopo)
+        return {
+                "limit": spec.limit,
+                "capacity": round(spec.capacity, 1),
+                "available": round(max(tokens, 0.0), 1),
+                "utilisation": round(1 - max(tokens, 0.0) / spec.capacity, 3),
+                "banned_for_s": round(max(banned_until - now, 0.0), 1),
+            }
+        return out
+
+
+governor = WeightGovernor()
+
+
+def _has_symbol(params, data) -> bool:
+    for src in (params, data):
+        if not src:
+            continue
+        if isinstance(src, dict):
+            if "symbol" in src:
+                return True
+        elif isinstance(src, (list, tuple)):
+            if any(k == "symbol" for k, *_ in src):
+                return True
+        elif "symbol=" in str(src):
+            return True
+    return False
+
+
+class GovernedSession(requests.Session):
+    """``requests.Session`` que passa todo tráfego para a Binance pelo governor."""
+
+    def __init__(self, gov: WeightGovernor | None = None) -> None:
+        super().__init__()
+        self.governor = gov
+
+    def request(self, method, url, params=None, data=None, **kwargs):
+        gov = self.governor or governor
+        parts = urlsplit(url)
+        path = parts.path
+        market = "futures" if path.startswith("/fapi") else "spot"
+        has_symbol = _has_symbol(params, data) or "symbol=" in parts.query
+        costs = {f"{market}_weight": endpoint_weight(method, path, has_symbol)}
+        level = None
+        if is_order_request(method, path):
+            costs[f"{market}_orders"] = 1
+            level = ORDER
+        # limites da Binance são por host: testnet e produção não dividem cota
+        escopo = parts.netloc
+        gov.acquire(costs, level, escopo=escopo)
+        resp = super().request(method, url, params=params, data=data, **kwargs)
+        try:
+            gov.observe(tuple(costs), resp.status_code, resp.headers, escopo=escopo)
+        except sqlite3.Error as e:
+            log.warning("falha ao registrar uso de peso: %s", e)
+        return resp
@@ -1,9 +1,29 @@
+import os
+import time
+
 from clarinha_ia import solicitar_analise_json
+from services.account_cache import account_cache
+from services.client_registry import registry
+from services.order_gateway import client_order_id, create_order_idempotent
+
+# sinais repetidos dentro da mesma janela geram o mesmo newClientOrderId
+ORDEM_JANELA_S = int(os.getenv("ORDEM_JANELA_S", "60"))
+
 
+def decide_and_execute(usuario_nome: str, client, analisar=solicitar_analise_json,
+                       symbol: str = "BTCUSDT", quantidade: str = "0.001",
+                       chave: str | None = None) -> dict:
+    """Consulta a IA e executa uma ordem simples com salvaguardas.
 
-def decide_and_execute(usuario_nome: str, client) -> dict:
-    """Consulta a IA e executa uma ordem simples com salvaguardas."""
-    analise = solicitar_analise_json()
+    ``analisar`` devolve um dict com ``sugestao``; por padrão é a IA, mas o
+    backtest injeta uma análise feita a partir dos candles históricos.
+    ``chave`` identifica o sinal (padrão: a janela de ``ORDEM_JANELA_S``).
+    O ``newClientOrderId`` é derivado dele e consultado antes do envio, então
+    o sinal repetido devolve a ordem existente em vez de executar de novo
+    (vale enquanto a Binance mantiver a ordem consultável), com
+    ``existente=True`` no resultado.
+    """
+    analise = analisar()
     texto = analise.get("sugestao", "").lower()
     if "compra" in texto:
         side = "BUY"
@@ -12,9 +32,17 @@ def decide_and_execute(usuario_nome: str, client) -> dict:
     else:
         return {"executado": False, "motivo": "Sem sinal claro", "analise": analise}
 
-    quantidade = "0.001"
+    if chave is None:
+        chave = int(time.time() // ORDEM_JANELA_S)
+    cid = client_order_id(usuario_nome, symbol, side, quantidade, chave)
+    stats: dict = {}
     try:
-        order = client.create_order(symbol="BTCUSDT", side=side, type="MARKET", quantity=quantidade)
-        return {"executado": True, "ordem": order, "analise": analise}
+        order = create_order_idempotent(client, stats=stats, symbol=symbol, side=side, type="MARKET",
+                                        quantity=quantidade, newClientOrderId=cid)
+        return {"executado": True, "ordem": order, "analise": analise,
+                "existente": bool(stats.get("existentes"))}
     except Exception as e:
+        registry.report_error(client, e)
         return {"executado": False, "erro": str(e), "analise": analise}
+    finally:
+        account_cache.invalidate_client(client)
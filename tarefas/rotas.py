@@ -1,5 +1,31 @@
+from flask import flash, jsonify, redirect, request, url_for
+from flask_login import current_user, login_required
+
+import tasks
 from . import bp
 
+
 @bp.route('/')
+@login_required
 def index():
-    return 'tarefas placeholder'
+    """Leases e jobs do usuário logado como o banco os vê (igual em qualquer worker).
+
+    ``tick`` são os contadores do tick agrupado deste worker.
+    """
+    return jsonify(dict(tasks.coordenador.estado(current_user.id), tick=tasks.motor.stats))
+
+
+@bp.route('/auto', methods=['POST'])
+@login_required
+def auto():
+    """Liga (``acao=iniciar``, ``intervalo`` em segundos, ``symbol``, ``quantidade``) ou desliga o auto-trade."""
+    if request.form.get('acao') == 'parar':
+        tasks.stop_auto_mode(current_user.id)
+        flash('Modo automático desligado.')
+    else:
+        intervalo = max(10, request.form.get('intervalo', 60, type=int))
+        tasks.start_auto_mode(current_user.id, intervalo,
+                              symbol=(request.form.get('symbol') or 'BTCUSDT').strip(),
+                              quantidade=(request.form.get('quantidade') or '0.001').strip())
+        flash(f'Modo automático ligado (a cada {intervalo}s).')
+    return redirect(url_for('operacoes_automatico.painel_automatico'))
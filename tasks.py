@@ -1,24 +1,106 @@
+"""Jobs periódicos por usuário (auto-trade, sync do histórico).
+
+O estado dos jobs fica no banco (``services.job_scheduler``): qualquer
+worker liga/desliga, e só o dono do shard do job o executa, uma vez por
+tick. Cada worker chama ``iniciar()`` uma vez (``post_worker_init`` do
+gunicorn) para participar da eleição. Os jobs ``auto`` vencidos no mesmo
+passo rodam juntos pelo ``services.auto_tick.TickEngine``: dados de mercado
+e análise uma vez por (símbolo, intervalo), ordens em lotes.
+"""
+import time
+from datetime import datetime
+
 from apscheduler.schedulers.background import BackgroundScheduler
 from binance_client import get_client
-from strategy import decide_and_execute
+from clarinha_ia import solicitar_analise_json
+from inteligencia_financeira.utils import calcular_macd, calcular_rsi, obter_dados_mercado
+from services import rollups  # noqa: F401  (agrega os trades que o sync trouxer)
+from services.auto_tick import QUANTIDADE_PADRAO, TickEngine
+from services.job_scheduler import SCHEDULER_POLL_S, Coordenador, Disparo
+from services.order_log_writer import record_order
+from services.trade_sync import sync_user
+from services.weight_governor import BACKGROUND, priority
+from strategy import ORDEM_JANELA_S, decide_and_execute
 
 
 scheduler = BackgroundScheduler()
-scheduler.start()
+coordenador = Coordenador()
+
+
+def mercado(symbol: str, intervalo: str) -> dict:
+    """Snapshot compartilhado por todos os usuários de (symbol, intervalo) no tick."""
+    # klines do tick: abaixo das leituras do dashboard na fila do governor
+    with priority(BACKGROUND):
+        fechamentos = obter_dados_mercado(symbol, intervalo, 200)
+    snap = {"symbol": symbol, "intervalo": intervalo, "candles": len(fechamentos)}
+    if fechamentos:
+        macd, sinal = calcular_macd(fechamentos)
+        snap.update(preco=fechamentos[-1], rsi=calcular_rsi(fechamentos), macd=macd, sinal=sinal)
+    return snap
+
 
+def analisar(snapshot: dict) -> dict:
+    return dict(solicitar_analise_json(), mercado=snapshot)
 
-def auto_trade(usuario_nome: str):
+
+def executar_auto(usuario_nome: str, analise: dict, disparo: Disparo) -> dict:
+    symbol, _ = TickEngine.grupo(disparo)
     client = get_client(usuario_nome)
-    decide_and_execute(usuario_nome, client)
+    resultado = decide_and_execute(usuario_nome, client, analisar=lambda: analise, symbol=symbol,
+                                   quantidade=disparo.params.get("quantidade") or QUANTIDADE_PADRAO,
+                                   chave=f"auto:{disparo.tick}")
+    # ordem de um tick repetido já foi registrada quando foi enviada
+    if (resultado.get("executado") and not resultado.get("existente")) or "erro" in resultado:
+        ordem = resultado.get("ordem") or {}
+        record_order(usuario_nome, "binance-spot", ordem.get("symbol", symbol), ordem.get("side", ""),
+                     "MARKET", ordem.get("origQty", 0.0), ordem.get("price", 0.0),
+                     ordem.get("status", "sent") if resultado.get("executado") else "error",
+                     ordem or resultado.get("erro"))
+    return resultado
+
+
+motor = TickEngine(mercado=mercado, analisar=analisar, executar=executar_auto)
+
+
+def auto_trade(usuario_nome: str, **params):
+    """Um tick avulso do modo automático para um usuário."""
+    return motor([Disparo(usuario_nome, params, int(time.time() // ORDEM_JANELA_S))])
 
 
-def start_auto_mode(usuario_nome: str, interval: int = 60):
-    job_id = f"auto-{usuario_nome}"
-    scheduler.add_job(auto_trade, "interval", [usuario_nome], seconds=interval, id=job_id, replace_existing=True)
+def sincronizar_historico(usuario_nome: str):
+    with priority(BACKGROUND):
+        sync_user(get_client(usuario_nome), usuario_nome)
+
+
+coordenador.registrar("auto", motor, lote=True)
+coordenador.registrar("sync", sincronizar_historico)
+
+
+def iniciar():
+    """Liga o laço do coordenador neste processo (idempotente)."""
+    if scheduler.running:
+        return
+    scheduler.add_job(coordenador.passo, "interval", seconds=SCHEDULER_POLL_S, id="coordenador",
+                      replace_existing=True, max_instances=1, coalesce=True, next_run_time=datetime.now())
+    scheduler.start()
+
+
+def parar():
+    """Desliga o laço e devolve os leases (chamado na saída do worker)."""
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+    coordenador.sair()
+
+
+def start_auto_mode(usuario_nome: str, interval: int = 60, symbol: str = "BTCUSDT",
+                    quantidade: str = QUANTIDADE_PADRAO, intervalo: str = "1h"):
+    coordenador.agendar("auto", usuario_nome, interval,
+                        {"symbol": symbol.upper(), "quantidade": quantidade, "intervalo": intervalo})
 
 
 def stop_auto_mode(usuario_nome: str):
-    job_id = f"auto-{usuario_nome}"
-    job = scheduler.get_job(job_id)
-    if job:
-        scheduler.remove_job(job_id)
+    coordenador.cancelar("auto", usuario_nome)
+
+
+def start_trade_sync(usuario_nome: str, interval: int = 300):
+    coordenador.agendar("sync", usuario_nome, interval)
@@ -0,0 +1,39 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+
+@pytest.fixture
+def banco_sqlite(tmp_path, monkeypatch):
+    """Banco SQLite temporário no lugar de ``db.get_session``.
+
+    ``banco_sqlite(*modulos, nome=..., autoflush=...)`` troca o
+    ``get_session`` de cada módulo (e zera ``_tabelas_ok``, se existir) e
+    devolve ``(Session, get_session)``. O ``get_session`` faz commit no fim
+    e rollback em erro, como o de ``db.py``.
+    """
+    def criar(*modulos, nome: str = "banco.db", autoflush: bool = True):
+        engine = create_engine(f"sqlite:///{tmp_path / nome}", future=True)
+        Session = sessionmaker(bind=engine, future=True, autoflush=autoflush)
+
+        @contextmanager
+        def get_session():
+            s = Session()
+            try:
+                yield s
+                s.commit()
+            except Exception:
+                s.rollback()
+                raise
+            finally:
+                s.close()
+
+        for mod in modulos:
+            monkeypatch.setattr(mod, "get_session", get_session)
+            if hasattr(mod, "_tabelas_ok"):
+                monkeypatch.setattr(mod, "_tabelas_ok", False)
+        return Session, get_session
+
+    return criar
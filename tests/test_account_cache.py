@@ -0,0 +1,36 @@
+from services import account_cache as mod
+from services.account_cache import AccountCache, invalidates_account
+from services.client_registry import registry
+
+
+def test_ttl_e_geracao(tmp_path):
+    cache = AccountCache(path=str(tmp_path / "cache.db"), ttl_s=60)
+    gen = cache.generation("fp")
+    assert cache.put("fp", {"spot_saldos": {"balances": []}, "spot_ordens": [1]}, gen)
+    got = cache.get("fp", ["spot_saldos", "spot_ordens", "futuros_saldo"])
+    assert got["spot_ordens"][0] == [1]
+    assert "futuros_saldo" not in got
+    assert cache.get("fp", ["spot_ordens"], max_age_s=-1) == {}
+
+    # leitura iniciada antes de uma ordem não pode regravar dados antigos
+    cache.invalidate("fp")
+    assert cache.get("fp", ["spot_ordens"]) == {}
+    assert not cache.put("fp", {"spot_ordens": [1]}, gen)
+    assert cache.put("fp", {"spot_ordens": []}, cache.generation("fp"))
+
+
+def test_ordem_invalida_snapshot(tmp_path, monkeypatch):
+    cache = AccountCache(path=str(tmp_path / "cache.db"), ttl_s=60)
+    monkeypatch.setattr(mod, "account_cache", cache)
+    monkeypatch.setattr(registry, "_factory", lambda *a: object())
+    client = registry.get("key-invalida", "secret")
+    fp = registry.fingerprint_of(client)
+    cache.put(fp, {"spot_ordens": []}, cache.generation(fp))
+
+    @invalidates_account
+    def place(client, symbol):
+        return {"ok": True}
+
+    assert place(client, "BTCUSDT") == {"ok": True}
+    assert cache.get(fp, ["spot_ordens"]) == {}
+    registry.discard(client)
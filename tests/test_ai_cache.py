@@ -0,0 +1,81 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from services.ai_cache import AICache, cache_key, cached_chat
+
+
+class FakeOpenAI:
+    def __init__(self, atraso_s=0.0):
+        self.chamadas = []
+        self.atraso_s = atraso_s
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.chamadas.append(kwargs)
+        time.sleep(self.atraso_s)
+        texto = f"resposta {len(self.chamadas)}"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=texto))])
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return AICache(path=str(tmp_path / "ai.db"), ttl_s=60, max_entries=3)
+
+
+def msgs(texto):
+    return [{"role": "user", "content": texto}]
+
+
+def test_chave_normaliza_espacos_mas_distingue_parametros():
+    assert cache_key("m", msgs("RSI: 30\nMACD:  1 ")) == cache_key("m", msgs("  RSI:   30\nMACD: 1"))
+    assert cache_key("m", msgs("a")) != cache_key("m", msgs("a"), temperature=0.4)
+    assert cache_key("m", msgs("a"), max_tokens=200) != cache_key("m", msgs("a"), max_tokens=100)
+    assert cache_key("m", msgs("a")) != cache_key("outro", msgs("a"))
+
+
+def test_acerto_evita_a_chamada_e_conta_a_latencia(cache):
+    api = FakeOpenAI(atraso_s=0.02)
+    assert cached_chat(api, "m", msgs("oi"), temperature=0.4, cache=cache) == "resposta 1"
+    assert cached_chat(api, "m", msgs(" oi "), temperature=0.4, cache=cache) == "resposta 1"
+    assert len(api.chamadas) == 1 and api.chamadas[0]["temperature"] == 0.4
+    assert "max_tokens" not in api.chamadas[0]
+    s = cache.stats()
+    assert (s["acertos"], s["faltas"], s["entradas"]) == (1, 1, 1)
+    assert s["economizado_ms"] >= 15
+
+
+def test_ttl_e_lru(cache):
+    api = FakeOpenAI()
+    for t in ("a", "b", "c"):
+        cached_chat(api, "m", msgs(t), cache=cache)
+    cached_chat(api, "m", msgs("a"), cache=cache)          # "a" volta a ser recente
+    cached_chat(api, "m", msgs("d"), cache=cache)          # estoura: sai "b", o menos usado
+    assert cache.stats()["removidas_lru"] == 1
+    n = len(api.chamadas)
+    cached_chat(api, "m", msgs("a"), cache=cache)
+    assert len(api.chamadas) == n
+    cached_chat(api, "m", msgs("b"), cache=cache)
+    assert len(api.chamadas) == n + 1
+
+    cache.ttl_s = 0
+    cached_chat(api, "m", msgs("a"), cache=cache)
+    assert len(api.chamadas) == n + 2
+
+
+def test_erro_da_api_nao_e_guardado(cache):
+    class Falha(FakeOpenAI):
+        def _create(self, **kwargs):
+            raise RuntimeError("429")
+    with pytest.raises(RuntimeError):
+        cached_chat(Falha(), "m", msgs("x"), cache=cache)
+    assert cached_chat(FakeOpenAI(), "m", msgs("x"), cache=cache) == "resposta 1"
+
+
+def test_cache_compartilhado_entre_instancias(tmp_path):
+    path = str(tmp_path / "ai.db")
+    api = FakeOpenAI()
+    cached_chat(api, "m", msgs("oi"), cache=AICache(path=path))
+    cached_chat(api, "m", msgs("oi"), cache=AICache(path=path))   # "outro worker"
+    assert len(api.chamadas) == 1
@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+from services.ai_jobs import AIJobs
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    return AIJobs(path=str(tmp_path / "jobs.db"), workers=2)
+
+
+def _esperar(jobs, job_id, prazo=5.0):
+    fim = time.time() + prazo
+    while time.time() < fim:
+        estado = jobs.status(job_id)
+        if estado["status"] in ("concluido", "erro"):
+            return estado
+        time.sleep(0.01)
+    raise AssertionError("job não terminou")
+
+
+def test_submit_devolve_na_hora_e_status_traz_resultado(jobs):
+    liberar = threading.Event()
+    job_id = jobs.submit(lambda: liberar.wait(5) and {"texto": "ok"})
+    assert jobs.status(job_id)["status"] in ("pendente", "rodando")
+    liberar.set()
+    estado = _esperar(jobs, job_id)
+    assert estado["status"] == "concluido" and estado["resultado"] == {"texto": "ok"}
+    assert estado["espera_ms"] is not None and estado["execucao_ms"] is not None
+    assert jobs.status("nao-existe") is None
+
+
+def test_erro_fica_no_job(jobs):
+    def falha():
+        raise RuntimeError("timeout da OpenAI")
+
+    estado = _esperar(jobs, jobs.submit(falha))
+    assert estado["status"] == "erro" and "timeout da OpenAI" in estado["erro"]
+    assert jobs.resumo()["erros"] == 1
+
+
+def test_chave_reaproveita_job_em_andamento(jobs, tmp_path):
+    liberar = threading.Event()
+    chamadas = []
+
+    def lento():
+        chamadas.append(1)
+        liberar.wait(5)
+        return "ok"
+
+    a = jobs.submit(lento, chave="analise:x")
+    # outro worker com o mesmo arquivo enxerga o job pendente
+    b = AIJobs(path=str(tmp_path / "jobs.db")).submit(lento, chave="analise:x")
+    assert a == b
+    liberar.set()
+    assert _esperar(jobs, a)["resultado"] == "ok"
+    c = jobs.submit(lambda: "novo", chave="analise:x")
+    assert c != a and _esperar(jobs, c)["resultado"] == "novo"
+    assert chamadas == [1]
+
+
+def test_job_orfao_expira(tmp_path):
+    jobs = AIJobs(path=str(tmp_path / "jobs.db"), timeout_s=0.05)
+    jobs._conn().execute(
+        "INSERT INTO ai_jobs (id, chave, status, created_at) VALUES ('orfao', 'k', 'rodando', ?)",
+        (time.time() - 1,),
+    )
+    estado = jobs.status("orfao")
+    assert estado["status"] == "erro" and "expirou" in estado["erro"]
+    assert jobs.submit(lambda: 1, chave="k") != "orfao"
+
+
+def test_job_de_worker_morto_nao_e_reaproveitado(tmp_path):
+    jobs = AIJobs(path=str(tmp_path / "jobs.db"), heartbeat_s=0.05)
+    agora = time.time()
+    jobs._conn().executemany(
+        "INSERT INTO ai_jobs (id, chave, status, created_at, pid, heartbeat) VALUES (?, 'k', 'rodando', ?, ?, ?)",
+        [("morto", agora - 1, 999999, agora - 1), ("vivo", agora - 1, 999998, agora)],
+    )
+    assert jobs.submit(lambda: 1, chave="k") == "vivo"
+    estado = jobs.status("morto")
+    assert estado["status"] == "erro" and "parou" in estado["erro"]
+    time.sleep(0.2)  # o worker dono de "vivo" não renovou: agora ele também é órfão
+    novo = jobs.submit(lambda: 1, chave="k")
+    assert novo not in ("morto", "vivo") and _esperar(jobs, novo)["resultado"] == 1
+
+
+def test_heartbeat_mantem_job_longo_vivo(tmp_path):
+    jobs = AIJobs(path=str(tmp_path / "jobs.db"), heartbeat_s=0.02)
+    liberar = threading.Event()
+    job_id = jobs.submit(lambda: liberar.wait(5) and "ok", chave="k")
+    time.sleep(0.3)  # bem mais que 3 batidas
+    assert jobs.status(job_id)["status"] == "rodando"
+    assert jobs.submit(lambda: "outro", chave="k") == job_id
+    liberar.set()
+    assert _esperar(jobs, job_id)["resultado"] == "ok"
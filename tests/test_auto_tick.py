@@ -0,0 +1,94 @@
+import threading
+import time
+
+from services.auto_tick import TickEngine
+from services.job_scheduler import Disparo
+
+
+def _disparos(n, symbols=("BTCUSDT", "ETHUSDT")):
+    return [Disparo(f"u{i}", {"symbol": symbols[i % len(symbols)]}, 7) for i in range(n)]
+
+
+def test_um_fetch_e_uma_analise_por_simbolo():
+    chamadas = {"mercado": [], "analise": 0}
+    executados = []
+
+    def mercado(symbol, intervalo):
+        chamadas["mercado"].append((symbol, intervalo))
+        return {"symbol": symbol}
+
+    def analisar(snap):
+        chamadas["analise"] += 1
+        return {"sugestao": "compra", "mercado": snap}
+
+    def executar(usuario, analise, d):
+        executados.append((usuario, analise["mercado"]["symbol"], d.tick))
+        return {"executado": True}
+
+    motor = TickEngine(mercado, analisar, executar, concorrencia=4, lote=7)
+    assert motor(_disparos(300)) == {}
+    assert sorted(chamadas["mercado"]) == [("BTCUSDT", "1h"), ("ETHUSDT", "1h")]
+    assert chamadas["analise"] == 2
+    assert len(executados) == 300
+    assert all(s == ("BTCUSDT", "ETHUSDT")[int(u[1:]) % 2] and t == 7 for u, s, t in executados)
+    assert motor.stats["ordens"] == 300 and motor.stats["grupos"] == 2
+
+
+def test_concorrencia_das_ordens_e_limitada():
+    ativos, pico, lock = [0], [0], threading.Lock()
+
+    def executar(usuario, analise, d):
+        with lock:
+            ativos[0] += 1
+            pico[0] = max(pico[0], ativos[0])
+        time.sleep(0.005)
+        with lock:
+            ativos[0] -= 1
+        return {"executado": False}
+
+    motor = TickEngine(lambda s, i: {}, lambda snap: {}, executar, concorrencia=3)
+    motor(_disparos(40))
+    assert pico[0] <= 3
+
+
+def test_falha_de_um_grupo_ou_usuario_nao_derruba_os_outros():
+    def mercado(symbol, intervalo):
+        if symbol == "ETHUSDT":
+            raise RuntimeError("sem candles")
+        return {}
+
+    def executar(usuario, analise, d):
+        if usuario == "u2":
+            raise RuntimeError("saldo insuficiente")
+        return {"executado": True} if usuario != "u4" else {"executado": False, "erro": "recusada"}
+
+    motor = TickEngine(mercado, lambda snap: {}, executar)
+    erros = motor(_disparos(6))
+    assert erros["u2"] == "saldo insuficiente" and erros["u4"] == "recusada"
+    assert all("indisponível" in erros[u] for u in ("u1", "u3", "u5"))
+    assert "u0" not in erros
+
+
+def test_tick_repetido_nao_registra_a_ordem_de_novo(monkeypatch):
+    import tasks
+
+    class Cliente:
+        def __init__(self):
+            self.ordens = {}
+
+        def create_order(self, **params):
+            self.ordens[params["newClientOrderId"]] = dict(params, status="FILLED", origQty=params["quantity"])
+            return self.ordens[params["newClientOrderId"]]
+
+        def get_order(self, symbol, origClientOrderId):
+            return self.ordens.get(origClientOrderId)
+
+    cliente, registros = Cliente(), []
+    monkeypatch.setattr(tasks, "get_client", lambda usuario: cliente)
+    monkeypatch.setattr(tasks, "record_order", lambda *a, **k: registros.append(a))
+    disparo = Disparo("ana", {"symbol": "BTCUSDT"}, 7)
+    for _ in range(2):
+        r = tasks.executar_auto("ana", {"sugestao": "compra"}, disparo)
+        assert r["executado"]
+    assert r["existente"] and len(cliente.ordens) == 1
+    assert [(a[1], a[2], a[3]) for a in registros] == [("binance-spot", "BTCUSDT", "BUY")]
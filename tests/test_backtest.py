@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from backtest import SimulatedClient, executar_backtest
+from inteligencia_financeira.utils import calcular_comissao
+
+
+def _roteiro(sinais):
+    """Análise que devolve os sinais na ordem, um por candle."""
+    def fabrica(_indicadores):
+        it = iter(sinais)
+        return lambda: {"sugestao": next(it)}
+    return fabrica
+
+
+def test_compra_e_venda_cobram_comissao():
+    r = executar_backtest(
+        [100.0, 110.0, 120.0], saldo_inicial=1000.0, quantidade="1", taxa=0.001,
+        analise=_roteiro(["compra", "aguardar", "venda"]),
+    )
+    assert [t["side"] for t in r.trades] == ["BUY", "SELL"]
+    esperado = 1000 - 100 - calcular_comissao(100, 0.001) + 120 - calcular_comissao(120, 0.001)
+    assert r.patrimonio[-1] == pytest.approx(esperado)
+    assert r.patrimonio[1] == pytest.approx(1000 - calcular_comissao(100, 0.001) + 10)
+    assert r.resumo()["comissoes"] == pytest.approx(0.22)
+
+
+def test_ordem_sem_saldo_e_recusada():
+    r = executar_backtest([100.0, 100.0], saldo_inicial=50.0, quantidade="1",
+                          analise=_roteiro(["compra", "venda"]))
+    assert r.trades == []
+    assert r.recusadas == 2
+    assert np.all(r.patrimonio == 50.0)
+
+
+def test_drawdown_relativo_ao_topo():
+    # compra 1 com todo o saldo: o patrimônio acompanha o preço até a venda
+    precos = [100.0, 200.0, 100.0, 150.0, 80.0, 120.0]
+    r = executar_backtest(precos, saldo_inicial=100.0, quantidade="1", taxa=0.0,
+                          analise=_roteiro(["compra", "aguardar", "aguardar", "aguardar", "aguardar", "venda"]))
+    assert [t["side"] for t in r.trades] == ["BUY", "SELL"]
+    assert r.patrimonio.tolist() == precos
+    assert r.drawdown.tolist() == [0.0, 0.0, -0.5, -0.25, -0.6, -0.4]   # topo em 200, fundo em 80
+    assert r.max_drawdown == pytest.approx(-0.6)
+    assert r.resumo()["max_drawdown_pct"] == pytest.approx(-60.0)
+    assert r.retorno_pct == pytest.approx(20.0)
+
+
+def test_cruzamento_de_macd_gera_operacoes():
+    rng = np.random.default_rng(1)
+    precos = 100 * np.cumprod(1 + rng.normal(0, 0.01, 2000))
+    r = executar_backtest(precos, saldo_inicial=1000.0, quantidade="1")
+    assert r.patrimonio.shape == (2000,)
+    assert len(r.trades) > 10
+    assert all(t["status"] == "FILLED" for t in r.trades)
+
+
+def test_simulated_client_recusa_tipo_nao_suportado():
+    c = SimulatedClient("BTCUSDT", 1000.0)
+    c.avancar(0, 10.0)
+    with pytest.raises(Exception):
+        c.create_order(symbol="BTCUSDT", side="BUY", type="LIMIT", quantity="1")
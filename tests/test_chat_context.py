@@ -0,0 +1,105 @@
+import pytest
+
+from services.chat_context import GestorContexto, contar_tokens, conversa_id, tokens_mensagens
+
+
+def _historico(n, palavras=40):
+    hist = []
+    for i in range(n):
+        hist.append({"role": "user", "content": f"pergunta {i} " + "btc " * palavras})
+        hist.append({"role": "assistant", "content": f"resposta {i} " + "risco " * palavras})
+    return hist
+
+
+class Resumidor:
+    def __init__(self):
+        self.pedidos = []
+
+    def __call__(self, msgs, max_tokens):
+        self.pedidos.append(msgs)
+        return f"resumo {len(self.pedidos)}"
+
+
+@pytest.fixture
+def resumir():
+    return Resumidor()
+
+
+@pytest.fixture
+def gestor(tmp_path, resumir):
+    return GestorContexto(resumir, orcamento=600, recentes=4, resumo_tokens=100, path=str(tmp_path / "ctx.db"))
+
+
+def test_contar_tokens_local():
+    assert contar_tokens("") == 0
+    assert 0 < contar_tokens("Qual o risco do BTC hoje?") < 20
+
+
+def test_historico_curto_vai_inteiro(gestor, resumir):
+    hist = _historico(2)
+    msgs = gestor.montar("sistema", hist, "e agora?")
+    assert msgs == [{"role": "system", "content": "sistema"}, *hist, {"role": "user", "content": "e agora?"}]
+    assert resumir.pedidos == []
+
+
+def test_historico_longo_dobra_no_resumo_dentro_do_orcamento(gestor, resumir):
+    hist = _historico(20)
+    msgs = gestor.montar("sistema", hist, "e agora?")
+    assert msgs[0]["content"] == "sistema" and msgs[-1]["content"] == "e agora?"
+    assert msgs[1]["role"] == "system" and msgs[1]["content"].endswith("resumo 1")
+    assert msgs[-5:-1] == hist[-4:]                 # recentes sempre vão
+    assert msgs[2]["role"] == "user"                # corte não separa pergunta e resposta
+    assert tokens_mensagens(msgs) <= 600
+    assert "pergunta 0" in resumir.pedidos[0][1]["content"]
+
+
+def test_resumo_acumulado_e_reaproveitado(gestor, resumir):
+    hist = _historico(20)
+    gestor.montar("sistema", hist, "a", conversa="c1")
+    # próxima rodada: duas mensagens novas ainda cabem sem refazer o resumo
+    hist += [{"role": "user", "content": "a"}, {"role": "assistant", "content": "ok"}]
+    msgs = gestor.montar("sistema", hist, "b", conversa="c1")
+    assert len(resumir.pedidos) == 1 and msgs[1]["content"].endswith("resumo 1")
+
+    # muitas novas: só o trecho que saiu é somado ao resumo anterior
+    hist += _historico(6)[2:]
+    msgs = gestor.montar("sistema", hist, "c", conversa="c1")
+    assert len(resumir.pedidos) == 2
+    pedido = resumir.pedidos[1][1]["content"]
+    assert pedido.startswith("Resumo anterior:\nresumo 1") and "pergunta 0 " not in pedido
+    assert msgs[1]["content"].endswith("resumo 2") and tokens_mensagens(msgs) <= 600
+
+
+def test_conversas_com_o_mesmo_inicio_nao_compartilham_resumo(gestor, resumir):
+    inicio = _historico(20)
+    ana, bia = conversa_id("ana", "s1"), conversa_id("bia", "s1")
+    gestor.montar("sistema", inicio, "a", conversa=ana)
+    hist_bia = inicio[:2] + _historico(20, palavras=41)[2:]   # mesma primeira pergunta, resto diferente
+    msgs = gestor.montar("sistema", hist_bia, "a", conversa=bia)
+    assert len(resumir.pedidos) == 2 and msgs[1]["content"].endswith("resumo 2")
+    assert not resumir.pedidos[1][1]["content"].startswith("Resumo anterior")
+
+    # sem id de conversa nada é guardado: cada chamada resume de novo
+    gestor.montar("sistema", inicio, "a")
+    gestor.montar("sistema", inicio, "a")
+    assert len(resumir.pedidos) == 4
+
+
+def test_historico_editado_recomeca_o_resumo(gestor, resumir):
+    hist = _historico(20)
+    gestor.montar("sistema", hist, "a", conversa="c1")
+    hist[1] = {"role": "assistant", "content": "outra coisa " * 40}
+    gestor.montar("sistema", hist, "a", conversa="c1")
+    assert len(resumir.pedidos) == 2
+    assert not resumir.pedidos[1][1]["content"].startswith("Resumo anterior")
+
+
+def test_falha_no_resumo_descarta_antigas(tmp_path):
+    def quebrado(msgs, max_tokens):
+        raise RuntimeError("sem API")
+
+    gestor = GestorContexto(quebrado, orcamento=600, recentes=4, path=str(tmp_path / "ctx.db"))
+    hist = _historico(20)
+    msgs = gestor.montar("sistema", hist, "e agora?")
+    assert all(m["role"] != "system" for m in msgs[1:])
+    assert msgs[-5:-1] == hist[-4:] and gestor.stats["falhas_resumo"] == 1
@@ -0,0 +1,110 @@
+import json
+import time
+
+import pytest
+from openai import OpenAI
+
+from benchmarks.fake_openai import FakeOpenAI
+from services.ai_cache import AICache, cache_key
+from services.chat_stream import ChatStreamStats, MetricasStream, stream_chat
+
+MSGS = [{"role": "user", "content": "risco do BTC hoje"}]
+
+
+@pytest.fixture
+def fake():
+    with FakeOpenAI(latencia_s=0.05, tokens=20, s_por_token=0.002) as f:
+        yield f
+
+
+@pytest.fixture
+def api(fake):
+    return OpenAI(base_url=f"{fake.url}/v1", api_key="stub", max_retries=0)
+
+
+def test_stream_relay_metricas_e_cache(api, fake, tmp_path):
+    cache, stats = AICache(path=str(tmp_path / "ai.db")), ChatStreamStats()
+    m = MetricasStream(model="m")
+    pedacos = list(stream_chat(api, "m", MSGS, cache=cache, metricas=m, stats=stats))
+    assert len(pedacos) == 20
+    assert "".join(pedacos).startswith("risco do BTC")
+    assert m.status == "concluido" and m.tokens == 20 and not m.cache
+    assert m.ttft_ms >= 50 and m.tokens_s > 0
+
+    # a resposta completa foi para o cache: sai de uma vez, sem ir à API
+    assert list(stream_chat(api, "m", MSGS, cache=cache, stats=stats)) == ["".join(pedacos)]
+    assert fake.requisicoes == 1
+    resumo = stats.resumo()
+    assert resumo["concluido"] == 2 and resumo["cache"] == 1 and resumo["ttft_p50_ms"] == m.ttft_ms
+
+
+def test_fechar_o_gerador_cancela_o_stream(api, fake, tmp_path):
+    fake.s_por_token = 0.02
+    cache, stats = AICache(path=str(tmp_path / "ai.db")), ChatStreamStats()
+    m = MetricasStream(model="m")
+    gerador = stream_chat(api, "m", MSGS, cache=cache, metricas=m, stats=stats)
+    assert next(gerador) and next(gerador)
+    gerador.close()
+    assert m.status == "cancelado" and m.tokens == 2
+    time.sleep(0.2)
+    assert fake.interrompidos == 1
+    # resposta parcial não entra no cache
+    assert cache.get(cache_key("m", MSGS)) is None
+
+
+def test_erro_da_api_sobe(fake, api, tmp_path):
+    fake.status = 500
+    stats = ChatStreamStats()
+    with pytest.raises(Exception):
+        list(stream_chat(api, "m", MSGS, cache=AICache(path=str(tmp_path / "ai.db")), stats=stats))
+    assert stats.totais["erro"] == 1
+
+
+def test_rota_sse(monkeypatch):
+    import app as app_module
+    from inteligencia import rotas
+
+    conversas = []
+
+    def falso(mensagem, modelo, metricas, conversa):
+        conversas.append(conversa)
+        for t in ("Olá", ", ", mensagem):
+            metricas.tokens += 1
+            yield t
+        metricas.status, metricas.ttft_ms = "concluido", 12.0
+
+    monkeypatch.setattr(rotas.ai_client, "chat_stream", falso)
+    cliente = app_module.app.test_client()
+    assert cliente.get("/inteligencia/chat/stream?mensagem=oi").status_code in (302, 401)
+    cliente.post("/usuario/login", data={"username": "admin", "password": app_module.ADMIN.password})
+
+    resp = cliente.get("/inteligencia/chat/stream?mensagem=tudo%20bem&conversa=aba1")
+    assert resp.status_code == 200 and resp.mimetype == "text/event-stream"
+    eventos = resp.get_data(as_text=True).strip().split("\n\n")
+    assert [json.loads(e[len("data: "):])["t"] for e in eventos[:3]] == ["Olá", ", ", "tudo bem"]
+    assert eventos[3].startswith("event: fim")
+    assert json.loads(eventos[3].split("data: ", 1)[1])["tokens"] == 3
+    assert conversas == [f"{app_module.ADMIN.id}:aba1"]
+    assert cliente.get("/inteligencia/chat/stream").status_code == 400
+
+
+def test_rota_sse_corta_no_tempo_maximo(monkeypatch):
+    import app as app_module
+    from inteligencia import rotas
+
+    fechado = []
+
+    def infinito(mensagem, modelo, metricas, conversa):
+        try:
+            while True:
+                yield "x"
+        finally:
+            fechado.append(True)
+
+    monkeypatch.setattr(rotas.ai_client, "chat_stream", infinito)
+    monkeypatch.setattr(rotas, "CHAT_STREAM_MAX_S", 0.05)
+    cliente = app_module.app.test_client()
+    cliente.post("/usuario/login", data={"username": "admin", "password": app_module.ADMIN.password})
+    corpo = cliente.get("/inteligencia/chat/stream?mensagem=oi").get_data(as_text=True)
+    assert corpo.rstrip().split("\n\n")[-1].startswith("event: erro")
+    assert fechado == [True]
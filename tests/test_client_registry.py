@@ -0,0 +1,48 @@
+from binance.exceptions import BinanceAPIException
+
+from services.client_registry import ClientRegistry, is_auth_error
+
+
+class _Resp:
+    def __init__(self, status, text):
+        self.status_code = status
+        self.text = text
+
+
+def _registry(**kw):
+    return ClientRegistry(factory=lambda k, s, t, b: object(), **kw)
+
+
+def test_reaproveita_client_por_credencial():
+    reg = _registry()
+    a = reg.get("k1", "s1")
+    assert reg.get("k1", "s1") is a
+    assert reg.get("k1", "s1", testnet=True) is not a
+    assert reg.get("k2", "s2") is not a
+    assert reg.stats() == {"size": 3, "builds": 3, "hits": 1}
+
+
+def test_lru_e_ttl_ocioso():
+    reg = _registry(max_size=2)
+    a = reg.get("a", "a")
+    reg.get("b", "b")
+    reg.get("a", "a")          # "b" vira o menos recente
+    reg.get("c", "c")
+    assert reg.fingerprint_of(a) is not None
+    assert reg.stats()["size"] == 2
+    assert reg.get("a", "a") is a
+
+    reg = _registry(idle_ttl_s=0)
+    a = reg.get("a", "a")
+    assert reg.get("a", "a") is not a
+
+
+def test_erro_de_autenticacao_recria_client():
+    reg = _registry()
+    a = reg.get("k", "s")
+    exc = BinanceAPIException(_Resp(401, '{"code": -2015, "msg": "Invalid API-key"}'), 401, '{"code": -2015, "msg": "x"}')
+    assert is_auth_error(exc)
+    reg.report_error(a, ValueError("rede"))
+    assert reg.get("k", "s") is a
+    reg.report_error(a, exc)
+    assert reg.get("k", "s") is not a
@@ -0,0 +1,22 @@
+import time
+
+from services.fanout import fan_out
+
+
+def test_fan_out_paralelo_e_prazo():
+    inicio = time.perf_counter()
+    res = fan_out(
+        {
+            "rapida": lambda: 1,
+            "lenta": lambda: time.sleep(0.5),
+            "falha": lambda: 1 / 0,
+            "media": lambda: time.sleep(0.1) or "ok",
+        },
+        deadline_s=0.2,
+    )
+    assert time.perf_counter() - inicio < 0.45
+    assert res["rapida"].ok and res["rapida"].value == 1
+    assert res["media"].value == "ok"
+    assert res["lenta"].status == "timeout"
+    assert res["falha"].status == "error"
+    assert isinstance(res["falha"].error, ZeroDivisionError)
@@ -58,3 +58,93 @@ def test_analise_route(monkeypatch):
     assert resp.status_code == 200
 
 
+def test_analise_gpt_em_job(monkeypatch, tmp_path):
+    from services.ai_cache import AICache
+    from services.ai_jobs import AIJobs
+
+    app = create_app()
+    client = app.test_client()
+    jobs = AIJobs(path=str(tmp_path / "jobs.db"), workers=1)
+    cache = AICache(path=str(tmp_path / "cache.db"))
+    contexto = {}
+    monkeypatch.setattr(rotas, "ai_jobs", jobs)
+    monkeypatch.setattr(rotas, "ai_cache", cache)
+    monkeypatch.setattr(rotas, "client", object())
+    monkeypatch.setattr(rotas, "gerar_analise", lambda msgs: "RSI neutro")
+    monkeypatch.setattr(rotas, "obter_dados_mercado", lambda ticker: list(range(1, 60)))
+    monkeypatch.setattr(rotas, "render_template", lambda *a, **k: contexto.update(k) or "ok")
+
+    assert client.get("/inteligencia_financeira/").status_code == 200
+    assert contexto["analise"] is None and contexto["job_id"]
+    jobs._pool_().shutdown(wait=True)
+
+    estado = client.get(f"/inteligencia_financeira/analise/{contexto['job_id']}").get_json()
+    assert estado["status"] == "concluido" and estado["analise"] == "RSI neutro"
+    assert client.get("/inteligencia_financeira/analise/nao-existe").status_code == 404
+
+    # com a resposta no cache a página já sai com o texto, sem job para consultar
+    msgs = rotas._mensagens_analise(contexto["rsi"], contexto["macd"], contexto["sinal"],
+                                    contexto["media_movel"], contexto["performance_liquida"])
+    cache.put(rotas.cache_key(rotas.MODELO_ANALISE, msgs, 0.4, 200), rotas.MODELO_ANALISE, " RSI neutro ", 10.0)
+    enviados = jobs.stats["enviados"]
+    assert client.get("/inteligencia_financeira/").status_code == 200
+    assert contexto["analise"] == "RSI neutro" and contexto["job_id"] is None
+    assert jobs.stats["enviados"] == enviados
+
+
+def test_varredura_route(monkeypatch):
+    app = create_app()
+    client = app.test_client()
+
+    valores = [100 + (i % 17) * 1.5 + i * 0.2 for i in range(300)]
+    monkeypatch.setattr(rotas, "obter_dados_mercado", lambda ticker: valores)
+
+    resp = client.get(
+        "/inteligencia_financeira/varredura?ticker=TESTE&rsi_periodo=7:21:7"
+        "&macd_curto=8,12&macd_longo=26&mm_periodo=10,20&taxa=0.001,0.002&limite=5"
+    )
+    assert resp.status_code == 200
+    dados = resp.get_json()
+    assert dados["combinacoes"] == 3 * 2 * 2 * 2
+    liquidas = [r["performance_liquida"] for r in dados["resultados"]]
+    assert len(liquidas) == 5 and liquidas == sorted(liquidas, reverse=True)
+    r = dados["resultados"][0]
+    assert r["comissao"] == pytest.approx(calcular_comissao(100.0 * r["operacoes"], r["taxa"]))
+
+    assert client.get("/inteligencia_financeira/varredura?rsi_periodo=a:b").status_code == 400
+
+
+def test_varredura_divide_as_cpus_entre_os_workers():
+    from inteligencia_financeira.varredura import _processos_por_worker
+
+    assert _processos_por_worker(16, 4) == 4
+    assert _processos_por_worker(4, 4) == 2   # no mínimo 2: a grade não roda no worker web
+    assert _processos_por_worker(None, 0) == 2
+
+
+def test_varredura_grande_usa_o_pool_e_bate_com_o_calculo_direto(monkeypatch):
+    from inteligencia_financeira import varredura
+
+    monkeypatch.setattr(varredura, "VARREDURA_MIN_PARALELO", 4)
+    monkeypatch.setattr(varredura, "VARREDURA_PROCESSOS", 2)
+    monkeypatch.setattr(varredura, "_POOL", None)
+    valores = [100 + (i % 17) * 1.5 + i * 0.2 for i in range(300)]
+    grade = varredura.montar_grade([7, 14], [8, 12], [26], [9], [10, 20], [0.001, 0.002])
+    try:
+        assert varredura._avaliar_paralelo(valores, grade) == varredura.avaliar_grade(valores, grade)
+        assert varredura._POOL is not None   # passou mesmo pelos processos
+    finally:
+        if varredura._POOL is not None:
+            varredura._POOL.shutdown()
+
+
+def test_varredura_grade_enorme_recusada_antes_de_montar(monkeypatch):
+    import time
+
+    app = create_app()
+    client = app.test_client()
+    monkeypatch.setattr(rotas, "obter_dados_mercado", lambda ticker: list(range(1, 60)))
+    t0 = time.perf_counter()
+    resp = client.get("/inteligencia_financeira/varredura?rsi_periodo=1:20000&mm_periodo=1:20000")
+    assert resp.status_code == 400 and "400000000" in resp.get_json()["erro"]
+    assert time.perf_counter() - t0 < 1
@@ -0,0 +1,61 @@
+import json
+import random
+
+import pytest
+
+from inteligencia_financeira.incremental import (
+    IndicadoresIncrementais,
+    MACDIncremental,
+    MediaMovelIncremental,
+    RSIIncremental,
+)
+from inteligencia_financeira.utils import calcular_macd, calcular_media_movel, calcular_rsi
+
+
+def _serie(n=600, seed=7):
+    rnd = random.Random(seed)
+    preco, out = 30000.0, []
+    for _ in range(n):
+        preco *= 1 + rnd.uniform(-0.01, 0.01)
+        out.append(round(preco, 2))
+    return out
+
+
+def test_incremental_igual_ao_lote_a_cada_tick():
+    valores = _serie()
+    rsi, macd, mm = RSIIncremental(14), MACDIncremental(12, 26, 9), MediaMovelIncremental(20)
+    for i, preco in enumerate(valores, start=1):
+        parcial = valores[:i]
+        assert rsi.atualizar(preco) == calcular_rsi(parcial, 14)
+        assert macd.atualizar(preco) == calcular_macd(parcial, 12, 26, 9)
+        assert mm.atualizar(preco) == calcular_media_movel(parcial, 20)
+
+
+@pytest.mark.parametrize("seed,periodo", [(1, 2), (2, 9), (3, 14), (4, 50)])
+def test_rsi_e_media_identicos_em_varias_janelas(seed, periodo):
+    valores = _serie(400, seed)
+    rsi, mm = RSIIncremental(periodo), MediaMovelIncremental(periodo)
+    for i, preco in enumerate(valores, start=1):
+        assert rsi.atualizar(preco) == calcular_rsi(valores[:i], periodo)
+        assert mm.atualizar(preco) == calcular_media_movel(valores[:i], periodo)
+
+
+def test_rsi_extremos_exatos():
+    alta, queda = RSIIncremental(5), RSIIncremental(5)
+    for p in [1, 2, 3, 4, 5, 6, 7]:
+        alta.atualizar(p)
+    for p in [0.3, 0.2, 0.1, 0.05, 0.01, 0.001]:
+        queda.atualizar(p)
+    assert alta.valor == 100.0 == calcular_rsi([1, 2, 3, 4, 5, 6, 7], 5)
+    assert queda.valor == 0.0
+
+
+def test_salvar_e_restaurar_estado():
+    valores = _serie(200)
+    original = IndicadoresIncrementais()
+    for p in valores[:150]:
+        original.atualizar(p)
+    copia = IndicadoresIncrementais.carregar_estado(json.loads(json.dumps(original.salvar_estado())))
+    for p in valores[150:]:
+        a, b = original.atualizar(p), copia.atualizar(p)
+    assert b == a
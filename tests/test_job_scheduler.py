@@ -0,0 +1,159 @@
+import pytest
+
+from services.job_scheduler import Coordenador
+
+
+class Relogio:
+    def __init__(self, t=1_000_000.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+class Imediato:
+    """Executor que roda o job na hora (o teste não precisa esperar threads)."""
+
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+@pytest.fixture
+def ambiente(banco_sqlite):
+    _, get_session = banco_sqlite(nome="jobs.db", autoflush=False)
+
+    relogio = Relogio()
+    execucoes = []
+
+    def novo(nome, shards=1):
+        c = Coordenador(session_factory=get_session, shards=shards, lease_s=30, identidade=nome,
+                        relogio=relogio, executor=Imediato())
+        c.registrar("auto", lambda u: execucoes.append((nome, u)))
+        return c
+
+    return novo, relogio, execucoes
+
+
+def test_um_lider_e_um_disparo_por_tick(ambiente):
+    novo, relogio, execucoes = ambiente
+    workers = [novo(f"w{i}") for i in range(4)]
+    workers[0].agendar("auto", "ana", 60)
+    for _ in range(3):            # vários passos no mesmo tick
+        for w in workers:
+            w.passo()
+    assert len(execucoes) == 1
+    assert sum(bool(w.meus_shards) for w in workers) == 1
+
+    relogio.t += 60
+    for w in workers:
+        w.passo()
+    assert len(execucoes) == 2
+
+
+def test_failover_quando_o_lider_para_de_renovar(ambiente):
+    novo, relogio, execucoes = ambiente
+    a, b = novo("a"), novo("b")
+    a.agendar("auto", "ana", 60)
+    a.passo()
+    b.passo()
+    assert a.meus_shards == [0] and b.meus_shards == []
+
+    relogio.t += 61               # "a" morreu: nem renova nem devolve
+    b.passo()
+    assert b.meus_shards == [0]
+    assert [e[0] for e in execucoes] == ["a", "b"]
+
+
+def test_lider_que_sai_devolve_o_lease(ambiente):
+    novo, relogio, _ = ambiente
+    a, b = novo("a"), novo("b")
+    a.passo()
+    a.sair()
+    b.passo()
+    assert b.meus_shards == [0]
+
+
+def test_shards_se_dividem_entre_os_workers(ambiente):
+    novo, relogio, execucoes = ambiente
+    a, b = novo("a", shards=4), novo("b", shards=4)
+    usuarios = [f"u{i}" for i in range(40)]
+    for u in usuarios:
+        a.agendar("auto", u, 60)
+    a.passo()                      # sozinho: pega os 4
+    assert a.meus_shards == [0, 1, 2, 3]
+    b.passo()                      # ainda não há shard livre
+    a.passo()                      # "a" vê dois vivos e devolve metade
+    b.passo()
+    assert len(a.meus_shards) == 2 and len(b.meus_shards) == 2
+    assert not set(a.meus_shards) & set(b.meus_shards)
+
+    execucoes.clear()
+    for _ in range(3):             # os dois seguem renovando antes de o lease vencer
+        relogio.t += 20
+        a.passo()
+        b.passo()
+    assert sorted(u for _, u in execucoes) == sorted(usuarios)
+    assert {w for w, _ in execucoes} == {"a", "b"}
+
+
+def test_estado_e_cancelamento_visiveis_de_qualquer_worker(ambiente):
+    novo, relogio, execucoes = ambiente
+    a, b = novo("a"), novo("b")
+    a.agendar("auto", "ana", 60)
+    a.passo()
+    assert b.job("auto", "ana")["execucoes"] == 1
+    assert b.job("auto", "ana")["worker"] == "a"
+    assert b.cancelar("auto", "ana")
+    relogio.t += 60
+    a.passo()
+    assert len(execucoes) == 1
+    nomes = {l["nome"] for l in b.estado()["leases"]}
+    assert {"shard:0", "membro:a"} <= nomes
+
+
+def test_erro_do_job_fica_registrado(ambiente):
+    novo, relogio, _ = ambiente
+    a = novo("a")
+
+    def falha(u):
+        raise RuntimeError("sem chave")
+    a.registrar("auto", falha)
+    a.agendar("auto", "ana", 60)
+    a.passo()
+    j = a.job("auto", "ana")
+    assert j["status"] == "erro" and j["erro"] == "sem chave"
+
+
+def test_jobs_em_lote_recebem_todos_os_disparos_do_passo(ambiente):
+    novo, relogio, _ = ambiente
+    a = novo("a")
+    lotes = []
+
+    def lote(disparos):
+        lotes.append(sorted((d.usuario, d.params["symbol"]) for d in disparos))
+        return {"bia": "recusada"}
+    a.registrar("auto", lote, lote=True)
+    a.agendar("auto", "ana", 60, {"symbol": "BTCUSDT"})
+    a.agendar("auto", "bia", 60, {"symbol": "ETHUSDT"})
+    a.passo()
+    a.passo()
+    assert lotes == [[("ana", "BTCUSDT"), ("bia", "ETHUSDT")]]
+    assert a.job("auto", "ana")["status"] == "ok"
+    assert a.job("auto", "bia")["erro"] == "recusada"
+
+
+def test_rota_tarefas_exige_login_e_mostra_so_os_jobs_do_usuario(ambiente, monkeypatch):
+    import app as app_module
+    import tasks
+
+    novo, _, _ = ambiente
+    c = novo("w0")
+    c.agendar("auto", "admin", 60, {"symbol": "BTCUSDT"})
+    c.agendar("auto", "outro", 60, {"symbol": "ETHUSDT"})
+    monkeypatch.setattr(tasks, "coordenador", c)
+
+    cliente = app_module.app.test_client()
+    assert cliente.get("/tarefas/").status_code in (302, 401)
+    cliente.post("/usuario/login", data={"username": "admin", "password": app_module.ADMIN.password})
+    jobs = cliente.get("/tarefas/").get_json()["jobs"]
+    assert [j["usuario"] for j in jobs] == ["admin"]
@@ -0,0 +1,75 @@
+import numpy as np
+
+from services.kline_store import INTERVAL_MS, KlineStore
+
+STEP = INTERVAL_MS["1m"]
+
+
+class _Resp:
+    def __init__(self, data):
+        self._data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._data
+
+
+class FakeBinance:
+    """Candles de 1m com close = índice do candle."""
+
+    def __init__(self, now_ms):
+        self.now_ms = now_ms
+        self.calls = []
+
+    def get(self, url, params=None, timeout=None):
+        self.calls.append(params["startTime"])
+        start = params["startTime"] - params["startTime"] % STEP
+        rows = []
+        t = start
+        while t <= self.now_ms and len(rows) < params["limit"]:
+            i = t // STEP
+            rows.append([t, i, i + 1, i - 1, float(i), 10.0, t + STEP - 1])
+            t += STEP
+        return _Resp(rows)
+
+
+def test_backfill_incremental_e_consulta_sem_copia(tmp_path, monkeypatch):
+    monkeypatch.setattr("services.kline_store.KLINE_BACKFILL", 2500)
+    now = 10_000 * STEP + 30_000  # candle 10000 ainda aberto
+    fake = FakeBinance(now)
+    store = KlineStore(root=str(tmp_path), session=fake, base_url="http://x")
+
+    assert store.sync("BTCUSDT", "1m", now_ms=now) == 2500
+    assert len(fake.calls) == 3          # páginas de 1000
+    assert store.last_open_time("BTCUSDT", "1m") == 9_999 * STEP
+
+    # nada novo fechou: nenhuma requisição
+    assert store.sync("BTCUSDT", "1m", now_ms=now) == 0
+    assert len(fake.calls) == 3
+
+    # dois candles novos: só a cauda é buscada
+    fake.now_ms = now + 2 * STEP
+    assert store.sync("BTCUSDT", "1m", now_ms=fake.now_ms) == 2
+    assert fake.calls[-1] == 10_000 * STEP
+
+    cols = store.range("BTCUSDT", "1m", 9_000 * STEP, 9_010 * STEP)
+    assert cols["close"].tolist() == [float(i) for i in range(9_000, 9_010)]
+    assert isinstance(cols["close"].base, np.memmap) or isinstance(cols["close"], np.memmap)
+    assert store.tail("BTCUSDT", "1m", 3)["close"].tolist() == [9_999.0, 10_000.0, 10_001.0]
+
+    # sobrevive a "reinício": nova instância lê o que está em disco
+    again = KlineStore(root=str(tmp_path), session=fake, base_url="http://x")
+    assert again.length("BTCUSDT", "1m") == 2502
+
+
+def test_escrita_interrompida_e_descartada(tmp_path):
+    store = KlineStore(root=str(tmp_path), session=None, base_url="http://x")
+    store.append("ETHUSDT", "1h", [[0, 1, 1, 1, 1, 1], [3_600_000, 2, 2, 2, 2, 2]])
+    d = tmp_path / "ETHUSDT" / "1h"
+    with open(d / "close.bin", "ab") as f:
+        f.write(b"\x00" * 8)            # coluna com uma linha a mais
+    assert store.length("ETHUSDT", "1h") == 2
+    assert store.append("ETHUSDT", "1h", [[7_200_000, 3, 3, 3, 3, 3]]) == 1
+    assert store.tail("ETHUSDT", "1h", 5)["close"].tolist() == [1.0, 2.0, 3.0]
@@ -0,0 +1,157 @@
+import pytest
+import requests
+
+from benchmarks.fake_exchange import FakeExchange
+from services.order_gateway import (
+    OrderGateway,
+    OrderRejected,
+    OrderUncertain,
+    client_order_id,
+    create_order_idempotent,
+)
+
+
+def _gateway(fx, **kw):
+    return OrderGateway("chave", fx.api_secret, base_url=fx.url, futures_base_url=fx.url,
+                        session=requests.Session(), espera_s=0.0, **kw)
+
+
+def test_client_order_id_deterministico():
+    a = client_order_id("ana", "BTCUSDT", "BUY", "0.001", 42)
+    assert a == client_order_id("ana", "BTCUSDT", "BUY", "0.001", 42)
+    assert a != client_order_id("ana", "BTCUSDT", "BUY", "0.001", 43)
+    assert len(a) <= 36
+
+
+def test_respostas_perdidas_nao_duplicam_ordens():
+    with FakeExchange(falha_pct=0.3, seed=1) as fx:
+        gw = _gateway(fx, workers=4, tentativas=6)
+        futuros = [gw.submit("BTCUSDT", "BUY", "0.001", chave=i) for i in range(60)]
+        resultados = [f.result() for f in futuros]
+        gw.close()
+    assert len(fx.ordens) == 60
+    assert fx.posts == 60  # nenhum reenvio: a consulta achou cada ordem perdida
+    assert gw.stats["recuperadas"] > 0
+    assert {r["clientOrderId"] for r in resultados} == set(fx.ordens)
+
+
+def test_mesma_intencao_nao_gera_segunda_ordem():
+    with FakeExchange() as fx:
+        gw = _gateway(fx)
+        primeira = gw.submit("BTCUSDT", "SELL", "0.5", chave="sinal-1").result()
+        segunda = gw.submit("BTCUSDT", "SELL", "0.5", chave="sinal-1", market="futures").result()
+        repetida = gw.submit("BTCUSDT", "SELL", "0.5", chave="sinal-1").result()
+        gw.close()
+    assert repetida["orderId"] == primeira["orderId"]
+    assert segunda["orderId"] != primeira["orderId"]
+    assert len(fx.ordens) == 2
+
+
+def test_erro_definitivo_nao_tenta_de_novo():
+    with FakeExchange(api_secret="outro") as fx:
+        gw = OrderGateway("chave", "errado", base_url=fx.url, session=requests.Session(), espera_s=0.0)
+        with pytest.raises(OrderRejected) as exc:
+            gw.submit("BTCUSDT", "BUY", "1").result()
+        gw.close()
+    assert exc.value.code == -1022
+    assert gw.stats["retentativas"] == 0
+
+
+class _ClientInstavel:
+    """Aceita a ordem mas derruba a conexão nas primeiras respostas."""
+
+    def __init__(self, falhas):
+        self.falhas = falhas
+        self.ordens = {}
+        self.consultas_falhas = 0
+
+    def create_order(self, **params):
+        self.ordens.setdefault(params["newClientOrderId"], params)
+        if self.falhas:
+            self.falhas -= 1
+            raise requests.ConnectionError("reset")
+        return params
+
+    def get_order(self, symbol, origClientOrderId):
+        if self.consultas_falhas:
+            self.consultas_falhas -= 1
+            raise requests.Timeout("lento")
+        return self.ordens.get(origClientOrderId)
+
+
+def test_create_order_idempotent_com_client():
+    client = _ClientInstavel(falhas=1)
+    ordem = create_order_idempotent(client, espera_s=0.0, symbol="BTCUSDT", side="BUY",
+                                    type="MARKET", quantity="1", newClientOrderId="cv-x")
+    assert ordem["newClientOrderId"] == "cv-x"
+    assert len(client.ordens) == 1
+
+
+def test_consulta_falhando_nao_reenvia():
+    client = _ClientInstavel(falhas=1)
+    client.consultas_falhas = 10
+    with pytest.raises(OrderUncertain):
+        create_order_idempotent(client, tentativas=3, espera_s=0.0, symbol="BTCUSDT", side="BUY",
+                                type="MARKET", quantity="1")
+    assert len(client.ordens) == 1
+
+
+def test_consulta_previa_falhando_nao_envia():
+    client = _ClientInstavel(falhas=0)
+    client.consultas_falhas = 10
+    with pytest.raises(OrderUncertain):
+        create_order_idempotent(client, tentativas=2, espera_s=0.0, symbol="BTCUSDT", side="BUY",
+                                type="MARKET", quantity="1", newClientOrderId="cv-y")
+    assert client.ordens == {}
+
+
+class _ClientRejeita:
+    def __init__(self, mensagem):
+        self.mensagem = mensagem
+        self.envios = 0
+        self.consultas = 0
+
+    def create_order(self, **params):
+        self.envios += 1
+        raise OrderRejected(400, -2010, self.mensagem)
+
+    def get_order(self, symbol, origClientOrderId):
+        self.consultas += 1
+        raise OrderRejected(400, -2013, "Order does not exist.")
+
+
+def test_rejeicao_2010_nao_e_retentada():
+    client = _ClientRejeita("Account has insufficient balance for requested action.")
+    with pytest.raises(OrderRejected) as exc:
+        create_order_idempotent(client, espera_s=0.0, symbol="BTCUSDT", side="BUY",
+                                type="MARKET", quantity="1")
+    assert "insufficient balance" in exc.value.message
+    assert client.envios == 1 and client.consultas == 0
+
+
+def test_2010_duplicada_consulta_a_existente():
+    client = _ClientRejeita("Duplicate order sent.")
+    with pytest.raises(OrderUncertain):
+        create_order_idempotent(client, tentativas=2, espera_s=0.0, symbol="BTCUSDT", side="BUY",
+                                type="MARKET", quantity="1")
+    assert client.consultas >= 1
+
+
+def test_rate_limit_shed_nao_e_transitorio():
+    from services.order_gateway import is_transient
+    from services.weight_governor import RateLimitShed
+
+    assert not is_transient(RateLimitShed("sem folga"))
+
+
+def test_sinal_repetido_com_mesma_chave_nao_executa_de_novo():
+    from backtest import SimulatedClient
+    from strategy import decide_and_execute
+
+    client = SimulatedClient("BTCUSDT", 1_000.0)
+    client.avancar(1, 100.0)
+    compra = lambda: {"sugestao": "compra"}
+    primeira = decide_and_execute("ana", client, analisar=compra, chave="tick-1")
+    segunda = decide_and_execute("ana", client, analisar=compra, chave="tick-1")
+    assert primeira["executado"] and segunda["ordem"]["orderId"] == primeira["ordem"]["orderId"]
+    assert len(client.trades) == 1
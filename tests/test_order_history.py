@@ -0,0 +1,82 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import OrderLog
+from services import order_history
+from services.order_history import Filtros, decode_cursor, encode_cursor, pagina
+
+T0 = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def Session(banco_sqlite, monkeypatch):
+    Session, _ = banco_sqlite(order_history, nome="hist.db")
+    OrderLog.__table__.create(Session.kw["bind"])
+    monkeypatch.setattr(order_history, "_indices_ok", False)
+    with Session() as s:
+        for i in range(250):
+            # horários repetidos de propósito: o id desempata
+            s.add(OrderLog(user_id="admin", exchange="binance", symbol="BTCUSDT" if i % 2 else "ETHUSDT",
+                           side="BUY" if i % 3 else "SELL", tipo="MARKET", qty=1, price=i,
+                           created_at=T0 + timedelta(minutes=i // 2)))
+        s.add(OrderLog(user_id="outro", exchange="binance", symbol="BTCUSDT", side="BUY",
+                       tipo="MARKET", qty=1, price=0, created_at=T0))
+        s.commit()
+    return Session
+
+
+def test_cursor_ida_e_volta():
+    assert decode_cursor(encode_cursor(T0, 42)) == (T0, 42)
+    with pytest.raises(ValueError):
+        decode_cursor("lixo")
+
+
+def test_paginas_cobrem_tudo_sem_repetir(Session):
+    vistos, cursor = [], None
+    with Session() as s:
+        while True:
+            rows, cursor = pagina(s, "admin", cursor=cursor, limite=40)
+            vistos.extend((r.created_at, r.id) for r in rows)
+            if cursor is None:
+                break
+    assert len(vistos) == 250
+    assert vistos == sorted(vistos, reverse=True)
+
+
+def test_filtros(Session):
+    filtros = Filtros(symbol="BTCUSDT", side="SELL", inicio=T0 + timedelta(minutes=10),
+                      fim=T0 + timedelta(minutes=60))
+    with Session() as s:
+        rows, _ = pagina(s, "admin", filtros, limite=500)
+    assert rows
+    assert all(r.symbol == "BTCUSDT" and r.side == "SELL" for r in rows)
+    assert all(filtros.inicio <= r.created_at < filtros.fim for r in rows)
+
+
+def test_exportacao_em_lotes(Session, monkeypatch):
+    monkeypatch.setattr(order_history, "EXPORT_LOTE", 7)
+    linhas = list(order_history.iterar("admin", lote=7))
+    assert len(linhas) == 250
+    ndjson = "".join(order_history.exportar_ndjson("admin", Filtros(symbol="ETHUSDT")))
+    assert len(ndjson.splitlines()) == 125
+    assert json.loads(ndjson.splitlines()[0])["symbol"] == "ETHUSDT"
+    csv_texto = "".join(order_history.exportar_csv("admin"))
+    assert csv_texto.splitlines()[0].startswith("id,created_at,symbol")
+    assert len(csv_texto.splitlines()) == 251
+
+
+def test_rotas_historico_e_exportacao(Session):
+    import app as app_module
+
+    cliente = app_module.app.test_client()
+    cliente.post("/usuario/login", data={"username": "admin", "password": app_module.ADMIN.password})
+    resp = cliente.get("/usuario/historico?symbol=btcusdt&limite=10")
+    assert resp.status_code == 200
+    assert b"cursor=" in resp.data
+    resp = cliente.get("/usuario/historico/exportar.ndjson?side=SELL")
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    assert all(json.loads(l)["side"] == "SELL" for l in resp.data.decode().splitlines())
+    assert cliente.get("/usuario/historico/exportar.xls").status_code == 404
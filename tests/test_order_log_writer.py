@@ -0,0 +1,123 @@
+import json
+import threading
+import time
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from models import OrderLog
+from services.order_log_writer import OrderLogWriter
+
+
+def _writer(tmp_path, **kw):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ordens.db'}", future=True)
+    Session = sessionmaker(bind=engine, future=True)
+    OrderLog.__table__.create(engine)
+    return OrderLogWriter(session_factory=Session, **kw), Session
+
+
+def _contar(Session):
+    with Session() as s:
+        return s.scalar(select(func.count()).select_from(OrderLog))
+
+
+def test_flush_grava_tudo_em_lotes(tmp_path):
+    w, Session = _writer(tmp_path, batch=50, flush_s=5.0)
+    for i in range(120):
+        w.record("ana", "binance", "BTCUSDT", "BUY", "MARKET", 0.001, 100.0 + i, "FILLED", {"orderId": i})
+    assert w.flush(timeout=5)
+    assert _contar(Session) == 120
+    assert w.stats()["lotes"] <= 4  # 50 + 50 + resto (o flush não espera os 5 s)
+    with Session() as s:
+        row = s.scalars(select(OrderLog).order_by(OrderLog.id.desc())).first()
+    assert row.resp_json == '{"orderId": 119}'
+    w.close()
+
+
+def test_prazo_grava_lote_parcial(tmp_path):
+    w, Session = _writer(tmp_path, batch=1000, flush_s=0.05)
+    w.record("ana", "binance", "ETHUSDT", "SELL", "LIMIT", 1, 2000, "NEW", "texto")
+    deadline = time.monotonic() + 2
+    while _contar(Session) == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert _contar(Session) == 1
+    w.close()
+
+
+def test_record_nao_espera_o_banco(tmp_path):
+    w, Session = _writer(tmp_path, flush_s=0.01)
+    trava = threading.Event()
+    original = w._gravar
+
+    def gravar_lento(lote):
+        trava.wait(5)
+        original(lote)
+
+    w._gravar = gravar_lento
+    t0 = time.perf_counter()
+    for _ in range(100):
+        w.record("ana", "binance", "BTCUSDT", "BUY", "MARKET", 1)
+    assert time.perf_counter() - t0 < 0.5
+    assert w.stats()["pendentes"] == 100
+    trava.set()
+    assert w.close(timeout=5)
+    assert _contar(Session) == 100
+
+
+def test_falha_no_banco_mantem_o_lote(tmp_path, monkeypatch):
+    w, Session = _writer(tmp_path, flush_s=0.01)
+    original, falhas = w._gravar, [2]
+
+    def gravar_instavel(lote):
+        if falhas[0]:
+            falhas[0] -= 1
+            raise RuntimeError("banco fora")
+        original(lote)
+
+    monkeypatch.setattr(w, "_gravar", gravar_instavel)
+    monkeypatch.setattr("services.order_log_writer.time.sleep", lambda s: None)
+    w.record("ana", "binance", "BTCUSDT", "BUY", "MARKET", 1)
+    assert w.flush(timeout=5)
+    assert _contar(Session) == 1
+    assert w.stats()["falhas"] == 2
+    w.close()
+
+
+def test_place_order_com_user_id_enfileira(monkeypatch):
+    from services import binance_client, order_log_writer
+
+    registros = []
+    monkeypatch.setattr(order_log_writer, "record_order", lambda *a, **k: registros.append(a))
+    monkeypatch.setattr(binance_client, "PAPER_TRADING", True)
+    binance_client.place_limit_order(None, "BTCUSDT", "BUY", 0.5, price=1.0, user_id="ana")
+    binance_client.place_limit_order(None, "BTCUSDT", "BUY", 0.5, price=1.0)
+    assert len(registros) == 1
+    user, exchange, symbol, side, tipo, qty, price, status, _ = registros[0]
+    assert (user, symbol, side, tipo, qty, price) == ("ana", "BTCUSDT", "BUY", "LIMIT", 0.5, 1.0)
+
+
+def test_desiste_apos_tentativas_e_grava_no_arquivo(tmp_path, monkeypatch):
+    spill = tmp_path / "sobra.jsonl"
+    w, Session = _writer(tmp_path, flush_s=0.01, tentativas=3, spill_path=str(spill))
+
+    def gravar_fora(lote):
+        raise RuntimeError("banco fora")
+
+    monkeypatch.setattr(w, "_gravar", gravar_fora)
+    monkeypatch.setattr("services.order_log_writer.time.sleep", lambda s: None)
+    w.record("ana", "binance", "BTCUSDT", "BUY", "MARKET", 1, resp={"orderId": 7})
+    assert w.flush(timeout=5) is False  # não trava, mas avisa que a linha não foi ao banco
+    st = w.stats()
+    assert (st["falhas"], st["derramadas"], st["descartadas"], st["pendentes"]) == (3, 1, 0, 0)
+    linha = json.loads(spill.read_text().splitlines()[0])
+    assert (linha["user_id"], linha["resp_json"]) == ("ana", '{"orderId": 7}')
+    w.close()
+
+
+def test_sem_arquivo_de_sobra_descarta_e_conta(tmp_path, monkeypatch):
+    w, Session = _writer(tmp_path, flush_s=0.01, tentativas=2, spill_path=str(tmp_path / "nao" / "existe.jsonl"))
+    monkeypatch.setattr(w, "_gravar", lambda lote: (_ for _ in ()).throw(RuntimeError("banco fora")))
+    monkeypatch.setattr("services.order_log_writer.time.sleep", lambda s: None)
+    w.record("ana", "binance", "BTCUSDT", "BUY", "MARKET", 1)
+    assert w.close(timeout=5) is False
+    assert w.stats()["descartadas"] == 1
@@ -0,0 +1,149 @@
+import random
+import time
+
+from services.paper_engine import CANCELED, FILLED, NEW, MatchingEngine
+
+
+def _engine(preco=100.0):
+    precos = {"BTCUSDT": preco}
+    return MatchingEngine(price_source=precos.get), precos
+
+
+def test_limitada_repousa_ate_o_preco_cruzar():
+    eng, _ = _engine()
+    compra = eng.submit("BTCUSDT", "BUY", "LIMIT", 1, price=95)
+    venda = eng.submit("BTCUSDT", "SELL", "LIMIT", 1, price=105)
+    assert compra.status == venda.status == NEW
+    assert eng.on_price("BTCUSDT", 99) == []
+    assert eng.on_price("BTCUSDT", 94) == [compra]
+    assert compra.status == FILLED and compra.executed_price == 95
+    assert eng.on_price("BTCUSDT", 106) == [venda]
+    assert eng.resting("BTCUSDT") == 0
+
+
+def test_limitada_marketable_executa_na_hora_no_preco_atual():
+    eng, _ = _engine(100.0)
+    o = eng.submit("BTCUSDT", "BUY", "LIMIT", 1, price=110)
+    assert o.status == FILLED and o.executed_price == 100.0
+
+
+def test_stop_loss_dispara_e_vira_limitada():
+    eng, _ = _engine(100.0)
+    stop = eng.submit("BTCUSDT", "SELL", "STOP_LOSS_LIMIT", 1, price=89, stop_price=90)
+    assert eng.on_price("BTCUSDT", 95) == []
+    # dispara em 90 e o limite 89 já é cruzado: executa como taker
+    assert eng.on_price("BTCUSDT", 90) == [stop]
+    assert stop.executed_price == 90
+
+    stop2 = eng.submit("BTCUSDT", "SELL", "STOP_LOSS_LIMIT", 1, price=91, stop_price=92)
+    assert eng.on_price("BTCUSDT", 92.5) == []
+    assert eng.on_price("BTCUSDT", 90.5) == []  # disparou, mas limite 91 > preço
+    assert stop2.triggered and stop2.aberta
+    assert eng.on_price("BTCUSDT", 91.5) == [stop2]
+    assert stop2.executed_price == 91
+
+
+def test_take_profit_de_venda_dispara_na_alta():
+    eng, _ = _engine(100.0)
+    tp = eng.submit("BTCUSDT", "SELL", "TAKE_PROFIT_LIMIT", 1, price=110, stop_price=110)
+    assert eng.on_price("BTCUSDT", 90) == []
+    assert eng.on_price("BTCUSDT", 111) == [tp]
+
+
+def test_oco_cancela_a_outra_perna():
+    eng, _ = _engine(100.0)
+    limite, stop = eng.submit_oco("BTCUSDT", "SELL", 1, price=110, stop_price=90, stop_limit_price=89)
+    assert limite.order_list_id == stop.order_list_id
+    assert eng.on_price("BTCUSDT", 111) == [limite]
+    assert stop.status == CANCELED
+    assert eng.on_price("BTCUSDT", 80) == []
+
+    limite, stop = eng.submit_oco("BTCUSDT", "SELL", 1, price=110, stop_price=90, stop_limit_price=89)
+    eng.on_price("BTCUSDT", 89.5)
+    assert stop.status == FILLED and limite.status == CANCELED
+
+
+def test_oco_com_maker_cruzado_e_rejeitada():
+    eng, _ = _engine(100.0)
+    limite, stop = eng.submit_oco("BTCUSDT", "SELL", 1, price=99, stop_price=90, stop_limit_price=89)
+    assert limite.status == stop.status == CANCELED
+
+
+def test_cancelamento_e_compactacao():
+    eng, _ = _engine(100.0)
+    ordens = [eng.submit("BTCUSDT", "BUY", "LIMIT", 1, price=50 + i * 0.001) for i in range(500)]
+    for o in ordens[:400]:
+        eng.cancel(o.order_id)
+    assert eng.resting("BTCUSDT") == 100
+    assert len(eng._livros["BTCUSDT"].abaixo) < 500
+    executadas = eng.on_price("BTCUSDT", 10)
+    assert set(executadas) == set(ordens[400:])
+
+
+def test_tick_so_toca_ordens_cruzadas():
+    eng, _ = _engine(100.0)
+    rnd = random.Random(3)
+    for _ in range(20000):
+        eng.submit("BTCUSDT", "BUY", "LIMIT", 1, price=rnd.uniform(50, 99))
+        eng.submit("BTCUSDT", "SELL", "LIMIT", 1, price=rnd.uniform(101, 150))
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        assert eng.on_price("BTCUSDT", 100.0) == []
+    assert time.perf_counter() - t0 < 0.5
+    assert len(eng.on_price("BTCUSDT", 98.0)) > 0
+
+
+def test_feed_periodico_so_enquanto_ha_ordem_em_repouso():
+    precos = {"BTCUSDT": 100.0}
+    chamadas = []
+    eng = MatchingEngine(price_source=precos.get, feed_s=0.01,
+                         feed=lambda: chamadas.append(eng.on_prices(precos)))
+    eng.submit("BTCUSDT", "BUY", "MARKET", 1)
+    time.sleep(0.05)
+    assert chamadas == []  # nada em repouso: nenhuma thread buscando preço
+    compra = eng.submit("BTCUSDT", "BUY", "LIMIT", 1, price=95)
+    precos["BTCUSDT"] = 94.0
+    deadline = time.monotonic() + 2
+    while compra.status == NEW and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert compra.status == FILLED and compra.executed_price == 95
+    deadline = time.monotonic() + 2
+    while eng._feed_thread is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert eng._feed_thread is None  # livro vazio: a thread terminou
+
+
+def test_paper_order_repassa_dono_e_rejeita_mercado_sem_preco(monkeypatch):
+    from services import binance_client, order_log_writer
+
+    precos = {}
+    eng = MatchingEngine(price_source=precos.get)
+    monkeypatch.setattr(binance_client, "paper_engine", eng)
+    monkeypatch.setattr(binance_client, "PAPER_TRADING", True)
+    monkeypatch.setattr(order_log_writer, "record_order", lambda *a, **k: None)
+
+    r = binance_client.place_market_order(None, "BTCUSDT", "BUY", 1, user_id="ana")
+    assert r["ok"] is False and "sem preço" in r["error"]
+
+    r = binance_client.place_limit_order(None, "BTCUSDT", "BUY", 1, price=90.0, user_id="ana")
+    assert r["ok"] and r["order"]["status"] == NEW
+    assert [o.order_id for o in eng.open_orders(owner="ana")] == [r["order"]["orderId"]]
+
+    precos["BTCUSDT"] = 100.0
+    r = binance_client.place_market_order(None, "BTCUSDT", "SELL", 1, user_id="ana")
+    assert r["ok"] and r["order"]["status"] == FILLED
+
+
+def test_preco_fixo_vale_tambem_para_o_motor(monkeypatch):
+    from services import binance_client, order_log_writer, paper_engine as modulo
+
+    eng = modulo._motor(live=False)
+    monkeypatch.setattr(binance_client, "paper_engine", eng)
+    monkeypatch.setattr(binance_client, "PAPER_TRADING", True)
+    monkeypatch.setattr(binance_client, "PAPER_PRICE_LIVE", False)
+    monkeypatch.setattr(order_log_writer, "record_order", lambda *a, **k: None)
+
+    assert binance_client.get_symbol_price(None, "ETHUSDT") == modulo.PAPER_PRICE_FIXED
+    r = binance_client.place_market_order(None, "ETHUSDT", "BUY", 1, user_id="ana")
+    assert r["ok"] and r["order"]["status"] == FILLED
+    assert r["order"]["executedPrice"] == modulo.PAPER_PRICE_FIXED
@@ -0,0 +1,166 @@
+import random
+import threading
+import time
+from decimal import Decimal
+
+import pytest
+
+from models import TradeRecord
+from services import pnl, trade_sync
+from services.pnl import CarteiraPnL, quote_asset
+
+H = 3600 * 1000
+D = 24 * H
+
+
+def trade(tid, side, qty, price, t, market="spot", symbol="BTCUSDT", fee=0, fee_asset="USDT"):
+    return {"trade_id": tid, "market": market, "symbol": symbol, "side": side, "qty": qty,
+            "price": price, "time": t, "commission": fee, "commission_asset": fee_asset}
+
+
+def test_quote_asset():
+    assert quote_asset("BTCUSDT") == "USDT"
+    assert quote_asset("ETHBTC") == "BTC"
+    assert quote_asset("USDT") == ""
+
+
+def test_fifo_consome_os_lotes_mais_antigos():
+    c = CarteiraPnL()
+    c.aplicar(trade(1, "BUY", "1", "100", 0))
+    c.aplicar(trade(2, "BUY", "1", "200", 1))
+    assert c.aplicar(trade(3, "SELL", "1.5", "300", 2)) == Decimal("250")   # 1×200 + 0.5×100
+    livro = c.livros[("spot", "BTCUSDT")]
+    assert [list(l) for l in livro.lotes] == [[Decimal("0.5"), Decimal("200")]]
+    assert c.nao_realizado({"BTCUSDT": 260})["USDT"] == Decimal("30")
+
+
+def test_taxas_e_venda_sem_base():
+    c = CarteiraPnL()
+    c.aplicar(trade(1, "BUY", "1", "100", 0, fee="0.001", fee_asset="BTC"))   # chega 0.999 BTC
+    assert c.aplicar(trade(2, "SELL", "0.999", "110", 1, fee="0.5")) == Decimal("9.49")
+    c.aplicar(trade(3, "SELL", "1", "120", 2))                                # sem lote: não é lucro
+    livro = c.livros[("spot", "BTCUSDT")]
+    assert livro.sem_base == Decimal("1") and livro.taxas == Decimal("0.5")
+
+
+def test_futuros_abre_vendido_e_vira_a_mao():
+    c = CarteiraPnL()
+    c.aplicar(trade(1, "SELL", "2", "100", 0, market="futures"))
+    assert c.aplicar(trade(2, "BUY", "3", "90", 1, market="futures")) == Decimal("20")
+    livro = c.livros[("futures", "BTCUSDT")]
+    assert livro.posicao == Decimal("1") and [list(l) for l in livro.lotes] == [[Decimal("1"), Decimal("90")]]
+
+
+def test_janelas_deslizantes_e_trades_repetidos():
+    c = CarteiraPnL()
+    agora = 40 * D
+    for i, idade in enumerate([35 * D, 20 * D, 3 * D, 2 * H]):
+        c.aplicar(trade(2 * i, "BUY", "1", "100", agora - idade - 1))
+        c.aplicar(trade(2 * i + 1, "SELL", "1", "110", agora - idade))
+    assert c.aplicar(trade(1, "SELL", "1", "110", agora)) is None
+    assert c.janelas(agora)["USDT"] == {"24h": Decimal("10"), "7d": Decimal("20"), "30d": Decimal("30")}
+    assert c.janelas(agora + 23 * H)["USDT"]["24h"] == 0
+    assert c.realizado_total()["USDT"] == Decimal("40")
+
+
+def test_evento_atrasado_entra_na_ordem():
+    c = CarteiraPnL()
+    c.aplicar(trade(10, "BUY", "1", "100", 5 * D, symbol="ETHUSDT"))
+    c.aplicar(trade(11, "SELL", "1", "101", 5 * D + 1, symbol="ETHUSDT"))
+    c.aplicar(trade(1, "BUY", "1", "100", 0))          # símbolo sincronizado depois
+    c.aplicar(trade(2, "SELL", "1", "105", 1))
+    assert c.janelas(5 * D + 2)["USDT"] == {"24h": Decimal("1"), "7d": Decimal("6"), "30d": Decimal("6")}
+    assert c.janelas(7 * D + 1)["USDT"]["7d"] == Decimal("1")
+
+
+@pytest.fixture
+def banco(banco_sqlite, monkeypatch):
+    Session, _ = banco_sqlite(trade_sync, nome="pnl.db")
+    monkeypatch.setattr(pnl, "_carteiras", {})
+    return Session
+
+
+def _gravar(Session, trades):
+    with Session() as s:
+        s.bulk_insert_mappings(TradeRecord, [
+            dict(t, user_id="admin", order_id=t["trade_id"], quote_qty=0.0, realized_pnl=0.0, is_maker=False)
+            for t in trades
+        ])
+        s.commit()
+
+
+def test_reconstrucao_deterministica_e_incremental(banco):
+    rnd = random.Random(7)
+    trades = []
+    for i in range(3000):
+        symbol = ("BTCUSDT", "ETHUSDT")[i % 2]
+        trades.append(trade(i, rnd.choice(["BUY", "BUY", "SELL"]), round(rnd.uniform(0.1, 2), 3),
+                            round(rnd.uniform(90, 110), 2), i * 60_000, symbol=symbol, fee=0.01))
+    trade_sync.local_trades("admin")          # cria as tabelas
+    _gravar(banco, trades[:2000])
+    incremental = pnl.carteira("admin")
+    _gravar(banco, trades[2000:])
+    assert pnl.carteira("admin") is incremental and incremental.fills == 3000
+
+    do_zero = CarteiraPnL()
+    for t in trade_sync.local_trades("admin"):
+        do_zero.aplicar(t)
+    agora = 3000 * 60_000
+    assert do_zero.janelas(agora) == incremental.janelas(agora)
+    assert do_zero.realizado_total() == incremental.realizado_total()
+    assert pnl.resumo("admin", agora_ms=agora)["24h"] == incremental.janelas(agora)["USDT"]["24h"]
+
+
+def test_leitura_lenta_de_um_usuario_nao_trava_os_outros(banco, monkeypatch):
+    trade_sync.local_trades("admin")          # cria as tabelas
+    _gravar(banco, [
+        {"market": "spot", "symbol": "BTCUSDT", "trade_id": 1, "side": "BUY", "price": 100.0, "qty": 1.0,
+         "commission": 0.0, "commission_asset": "USDT", "time": 1000},
+        {"market": "spot", "symbol": "BTCUSDT", "trade_id": 2, "side": "SELL", "price": 110.0, "qty": 1.0,
+         "commission": 0.0, "commission_asset": "USDT", "time": 2000},
+    ])
+    original, liberar, lendo = trade_sync.local_trades, threading.Event(), threading.Event()
+
+    def local_trades(user_id, **kw):
+        if user_id == "lento":
+            lendo.set()
+            liberar.wait(5)
+            user_id = "admin"
+        return original(user_id, **kw)
+
+    monkeypatch.setattr(trade_sync, "local_trades", local_trades)
+    t = threading.Thread(target=pnl.carteira, args=("lento",))
+    t.start()
+    assert lendo.wait(5)
+    t0 = time.perf_counter()
+    assert pnl.carteira("admin").realizado_total()["USDT"] == Decimal("10")
+    assert time.perf_counter() - t0 < 1
+    liberar.set()
+    t.join(5)
+
+    # leituras concorrentes do mesmo usuário não aplicam o mesmo trade duas vezes
+    threads = [threading.Thread(target=pnl.carteira, args=("lento",)) for _ in range(4)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join(5)
+    assert pnl.carteira("lento").fills == 2
+
+
+def test_resumo_le_a_carteira_sob_o_lock_do_usuario(banco, monkeypatch):
+    trade_sync.local_trades("admin")          # cria as tabelas
+    _gravar(banco, [
+        {"market": "spot", "symbol": "BTCUSDT", "trade_id": 1, "side": "BUY", "price": 100.0, "qty": 1.0,
+         "commission": 0.0, "commission_asset": "USDT", "time": 1000},
+    ])
+    travado = []
+    for nome in ("janelas", "realizado_total", "nao_realizado"):
+        original = getattr(CarteiraPnL, nome)
+
+        def espiao(self, *a, _original=original, **k):
+            travado.append(pnl._lock_usuario("admin").locked())
+            return _original(self, *a, **k)
+
+        monkeypatch.setattr(CarteiraPnL, nome, espiao)
+    out = pnl.resumo("admin", {"BTCUSDT": 110.0})
+    assert out["aberto"] == Decimal("10") and travado == [True, True, True]
@@ -0,0 +1,44 @@
+from services.price_service import PriceService
+
+
+class _Resp:
+    def __init__(self, data):
+        self._data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._data
+
+
+class _Session:
+    def __init__(self, data):
+        self.data = data
+        self.calls = 0
+
+    def get(self, url, timeout=None):
+        self.calls += 1
+        if isinstance(self.data, Exception):
+            raise self.data
+        return _Resp(self.data)
+
+
+def test_uma_requisicao_para_varios_simbolos():
+    sess = _Session([{"symbol": f"A{i}USDT", "price": str(i)} for i in range(50)])
+    svc = PriceService(session=sess, ttl_s=60)
+    quotes = svc.get_prices([f"a{i}usdt" for i in range(50)] + ["NAOEXISTE"])
+    assert len(quotes) == 50
+    assert quotes["A7USDT"].price == 7.0
+    assert quotes["A7USDT"].age_s < 1
+    assert svc.get_price("A3USDT") == 3.0
+    assert sess.calls == 1
+
+
+def test_falha_mantem_snapshot_anterior():
+    sess = _Session([{"symbol": "BTCUSDT", "price": "100"}])
+    svc = PriceService(session=sess, ttl_s=60)
+    assert svc.get_price("BTCUSDT") == 100.0
+    sess.data = RuntimeError("offline")
+    assert svc.get_price("BTCUSDT", max_age_s=0) == 100.0
+    assert PriceService(session=_Session(RuntimeError("x"))).get_price("BTCUSDT") is None
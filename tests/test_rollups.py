@@ -0,0 +1,92 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+
+from models import DailyRollup, TradeRecord
+from services import pnl, rollups, trade_sync
+from services.rollups import Periodo, atualizar, reconstruir, relatorio
+
+D = 24 * 3600 * 1000
+DIA0 = date(1970, 1, 1)
+
+
+@pytest.fixture
+def Session(banco_sqlite, monkeypatch):
+    Session, get_session = banco_sqlite(rollups, trade_sync, nome="rollups.db", autoflush=False)
+    monkeypatch.setattr(rollups, "_carteiras", {})
+    monkeypatch.setattr(pnl, "_carteiras", {})
+    with get_session() as s:
+        rollups._garantir_tabelas(s)
+    return Session
+
+
+def _gravar(Session, *trades, user="admin"):
+    with Session() as s:
+        s.bulk_insert_mappings(TradeRecord, [
+            {"user_id": user, "market": "spot", "symbol": sym, "trade_id": tid, "order_id": tid,
+             "side": side, "price": price, "qty": 1.0, "quote_qty": price, "commission": 0.1,
+             "commission_asset": "USDT", "realized_pnl": 0.0, "is_maker": False, "time": t}
+            for tid, sym, side, price, t in trades
+        ])
+        s.commit()
+
+
+def _linhas(Session):
+    with Session() as s:
+        return sorted((r.user_id, r.dia, r.symbol, r.trades, round(r.volume, 6), round(r.taxas, 6),
+                       round(r.lucro, 6), r.ganhos, r.perdas) for r in s.scalars(select(DailyRollup)))
+
+
+def test_incremental_igual_a_reconstrucao(Session):
+    _gravar(Session, (1, "BTCUSDT", "BUY", 100.0, 0), (2, "BTCUSDT", "SELL", 110.0, 1000))
+    assert atualizar("admin") == 2
+    assert atualizar("admin") == 0        # nada novo: nada somado de novo
+    _gravar(Session, (3, "BTCUSDT", "BUY", 100.0, D), (4, "BTCUSDT", "SELL", 95.0, D + 1),
+            (1, "ETHUSDT", "BUY", 10.0, D + 2))
+    _gravar(Session, (1, "BTCUSDT", "BUY", 1.0, 0), user="outro")
+    assert atualizar("admin") == 3
+    incremental = [l for l in _linhas(Session) if l[0] == "admin"]
+    assert incremental == [
+        ("admin", DIA0, "BTCUSDT", 2, 210.0, 0.2, 9.8, 1, 0),
+        ("admin", date(1970, 1, 2), "BTCUSDT", 2, 195.0, 0.2, -5.2, 0, 1),
+        ("admin", date(1970, 1, 2), "ETHUSDT", 1, 10.0, 0.1, -0.1, 0, 0),
+    ]
+    assert reconstruir() == 6
+    assert [l for l in _linhas(Session) if l[0] == "admin"] == incremental
+    assert atualizar("admin") == 0 and atualizar("outro") == 0
+
+
+def test_outro_processo_nao_conta_duas_vezes(Session, monkeypatch):
+    _gravar(Session, (1, "BTCUSDT", "BUY", 100.0, 0))
+    atualizar("admin")
+    monkeypatch.setattr(rollups, "_carteiras", {})   # "outro worker": FIFO vazio, mesmo banco
+    _gravar(Session, (2, "BTCUSDT", "SELL", 120.0, 1))
+    assert atualizar("admin") == 1
+    assert _linhas(Session) == [("admin", DIA0, "BTCUSDT", 2, 220.0, 0.2, 19.8, 1, 0)]
+
+
+def test_relatorio_por_periodo(Session):
+    _gravar(Session, (1, "BTCUSDT", "BUY", 100.0, 0), (2, "BTCUSDT", "SELL", 110.0, 1),
+            (3, "BTCUSDT", "BUY", 100.0, 3 * D), (4, "BTCUSDT", "SELL", 90.0, 3 * D + 1))
+    atualizar("admin")
+    tudo = relatorio("admin", Periodo())
+    assert tudo["totais"][0]["trades"] == 4 and tudo["totais"][0]["win_rate"] == 0.5
+    assert [d["dia"] for d in tudo["por_dia"]] == [DIA0, date(1970, 1, 4)]
+    so_o_primeiro = relatorio("admin", Periodo(fim=DIA0))
+    assert so_o_primeiro["por_simbolo"][0]["lucro"] == pytest.approx(9.8)
+    assert Periodo.from_args({"fim": "2024-01-31"}).inicio == date(2024, 1, 2)
+
+
+def test_sync_dispara_o_rollup(Session):
+    class Client:
+        def get_my_trades(self, symbol, fromId, limit):
+            t = {"symbol": symbol, "id": 7, "orderId": 7, "price": "100", "qty": "1", "quoteQty": "100",
+                 "commission": "0", "commissionAsset": "USDT", "time": 5, "isBuyer": True, "isMaker": False}
+            return [t] if fromId <= 7 else []
+
+        def get_all_orders(self, symbol, orderId, limit):
+            return []
+
+    trade_sync.sync_symbol(Client(), "admin", "BTCUSDT", ["spot"])
+    assert _linhas(Session) == [("admin", DIA0, "BTCUSDT", 1, 100.0, 0.0, 0.0, 0, 0)]
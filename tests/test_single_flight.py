@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+
+from services.single_flight import SingleFlight, coalesce
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "sf.db")
+
+
+def _disparar(n, fn):
+    resultados, erros = [None] * n, [None] * n
+    barreira = threading.Barrier(n)
+
+    def rodar(i):
+        barreira.wait()
+        try:
+            resultados[i] = fn()
+        except Exception as e:
+            erros[i] = e
+
+    threads = [threading.Thread(target=rodar, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    return resultados, erros
+
+
+def test_chamadas_simultaneas_no_processo_viram_uma(path):
+    sf = SingleFlight(path=path)
+    chamadas = []
+
+    def lento():
+        chamadas.append(1)
+        time.sleep(0.1)
+        return [1.0, 2.0]
+
+    resultados, erros = _disparar(8, lambda: sf.do("k", lento))
+    assert len(chamadas) == 1
+    assert resultados == [[1.0, 2.0]] * 8 and erros == [None] * 8
+    assert sf.stats["lideres"] == 1 and sf.stats["seguidores_locais"] == 7
+
+
+def test_coalescencia_entre_workers(path):
+    # duas instâncias no mesmo arquivo fazem o papel de dois workers
+    workers = [SingleFlight(path=path, poll_s=0.005) for _ in range(2)]
+    chamadas = []
+
+    def lento():
+        chamadas.append(1)
+        time.sleep(0.2)
+        return {"texto": "ok"}
+
+    resultados, _ = _disparar(6, lambda: workers[threading.get_ident() % 2].do("k", lento))
+    assert len(chamadas) == 1
+    assert resultados == [{"texto": "ok"}] * 6
+
+
+def test_erro_do_lider_chega_aos_seguidores(path):
+    sf = SingleFlight(path=path)
+
+    def falha():
+        time.sleep(0.05)
+        raise ValueError("api fora")
+
+    _, erros = _disparar(4, lambda: sf.do("k", falha))
+    assert all(isinstance(e, ValueError) for e in erros)
+
+    a, b = SingleFlight(path=path), SingleFlight(path=path, poll_s=0.005)
+    t = threading.Thread(target=lambda: pytest.raises(ValueError, a.do, "k2", falha))
+    t.start()
+    time.sleep(0.01)
+    with pytest.raises(RuntimeError, match="api fora"):
+        b.do("k2", lambda: "não deveria rodar")
+    t.join()
+
+
+def test_nao_e_cache(path):
+    sf = SingleFlight(path=path)
+    assert sf.do("k", lambda: 1) == 1
+    assert sf.do("k", lambda: 2) == 2
+
+
+def test_lock_vencido_e_assumido(path):
+    morto = SingleFlight(path=path, lock_s=0.05)
+    morto._adquirir("k", "worker-morto")    # líder que nunca liberou
+    sf = SingleFlight(path=path, lock_s=0.05, poll_s=0.01)
+    assert sf.do("k", lambda: "refeito") == "refeito"
+    assert sf.stats["seguidores_remotos"] == 1 and sf.stats["assumidas"] == 1
+
+
+def test_coalesce_decorator_por_argumentos(path):
+    sf = SingleFlight(path=path)
+    chamadas = []
+
+    @coalesce("dobro", sf)
+    def dobro(x):
+        chamadas.append(x)
+        time.sleep(0.05)
+        return x * 2
+
+    resultados, _ = _disparar(6, lambda: dobro(1))
+    assert resultados == [2] * 6 and chamadas == [1]
+    assert dobro(3) == 6
@@ -0,0 +1,133 @@
+import pytest
+
+from services import trade_sync
+from services.trade_sync import last_synced, local_orders, local_trades, sync_symbol, sync_user
+
+
+class FakeClient:
+    """Simula myTrades/allOrders com paginação por fromId/orderId e conta as chamadas."""
+
+    def __init__(self):
+        self.trades = {"spot": [], "futures": []}
+        self.orders = {"spot": [], "futures": []}
+        self.chamadas = []
+
+    def add_trade(self, market, tid, side="BUY", price=100.0, qty=1.0, pnl=0.0):
+        t = {"symbol": "BTCUSDT", "id": tid, "orderId": tid, "price": str(price), "qty": str(qty),
+             "quoteQty": str(price * qty), "commission": "0.1", "commissionAsset": "USDT", "time": 1000 * tid}
+        if market == "spot":
+            t.update(isBuyer=side == "BUY", isMaker=False)
+        else:
+            t.update(side=side, maker=False, realizedPnl=str(pnl))
+        self.trades[market].append(t)
+
+    def add_order(self, market, oid, status="FILLED"):
+        self.orders[market].append({"symbol": "BTCUSDT", "orderId": oid, "clientOrderId": f"c{oid}",
+                                    "side": "BUY", "type": "LIMIT", "price": "100", "origQty": "1",
+                                    "executedQty": "1" if status == "FILLED" else "0",
+                                    "status": status, "time": 1000 * oid, "updateTime": 1000 * oid})
+
+    def _pagina(self, itens, chave, desde, limit):
+        return [dict(i) for i in sorted(itens, key=lambda i: i[chave]) if i[chave] >= desde][:limit]
+
+    def get_my_trades(self, symbol, fromId, limit):
+        self.chamadas.append(("spot_trades", fromId))
+        return self._pagina(self.trades["spot"], "id", fromId, limit)
+
+    def futures_account_trades(self, symbol, fromId, limit):
+        self.chamadas.append(("futures_trades", fromId))
+        return self._pagina(self.trades["futures"], "id", fromId, limit)
+
+    def get_all_orders(self, symbol, orderId, limit):
+        self.chamadas.append(("spot_orders", orderId))
+        return self._pagina(self.orders["spot"], "orderId", orderId, limit)
+
+    def futures_get_all_orders(self, symbol, orderId, limit):
+        self.chamadas.append(("futures_orders", orderId))
+        return self._pagina(self.orders["futures"], "orderId", orderId, limit)
+
+
+@pytest.fixture(autouse=True)
+def banco(banco_sqlite, monkeypatch):
+    banco_sqlite(trade_sync, nome="sync.db")
+    monkeypatch.setattr(trade_sync, "_listeners", [])   # rollups usariam o banco real
+
+
+def test_sync_incremental_busca_so_o_que_e_novo(monkeypatch):
+    monkeypatch.setattr(trade_sync, "TRADE_SYNC_PAGE", 3)
+    c = FakeClient()
+    for i in range(1, 8):
+        c.add_trade("spot", i)
+    assert sync_symbol(c, "admin", "btcusdt", ["spot"])["spot_trades"] == 7
+    assert [t.trade_id for t in local_trades("admin", "BTCUSDT")] == list(range(1, 8))
+
+    c.chamadas.clear()
+    assert sync_symbol(c, "admin", "BTCUSDT", ["spot"])["spot_trades"] == 0
+    assert c.chamadas == [("spot_trades", 8), ("spot_orders", 0)]
+
+    c.add_trade("spot", 8, side="SELL")
+    c.chamadas.clear()
+    assert sync_symbol(c, "admin", "BTCUSDT", ["spot"])["spot_trades"] == 1
+    assert c.chamadas[0] == ("spot_trades", 8)
+    assert local_trades("admin", "BTCUSDT")[-1].side == "SELL"
+
+
+def test_ordem_aberta_volta_a_ser_consultada_ate_fechar():
+    c = FakeClient()
+    c.add_order("spot", 1)
+    c.add_order("spot", 2, status="NEW")
+    c.add_order("spot", 3)
+    sync_symbol(c, "admin", "BTCUSDT", ["spot"])
+
+    c.orders["spot"][1].update(status="FILLED", executedQty="1")
+    c.chamadas.clear()
+    sync_symbol(c, "admin", "BTCUSDT", ["spot"])
+    assert ("spot_orders", 2) in c.chamadas
+    assert {o.order_id: o.status for o in local_orders("admin", "BTCUSDT")} == {1: "FILLED", 2: "FILLED", 3: "FILLED"}
+
+    c.chamadas.clear()
+    sync_symbol(c, "admin", "BTCUSDT", ["spot"])
+    assert ("spot_orders", 4) in c.chamadas
+    assert [o.order_id for o in local_orders("admin", "BTCUSDT", limite=2)] == [3, 2]
+
+
+def test_mercado_com_erro_nao_impede_os_outros():
+    c = FakeClient()
+    c.add_trade("futures", 5, pnl=2.5)
+
+    def sem_spot(**kw):
+        raise RuntimeError("sem permissão")
+    c.get_my_trades = sem_spot
+
+    r = sync_symbol(c, "admin", "BTCUSDT")
+    assert "spot_erro" in r and r["futures_trades"] == 1
+    assert local_trades("admin", market="futures")[0].realized_pnl == 2.5
+    assert last_synced("admin", "BTCUSDT") is not None  # só o mercado que funcionou tem cursor
+
+
+def test_sync_user_percorre_os_simbolos_com_cursor():
+    c = FakeClient()
+    assert sync_user(c, "admin") == {}
+    sync_symbol(c, "admin", "BTCUSDT", ["futures"])
+    c.add_trade("futures", 1)
+    assert sync_user(c, "admin") == {"BTCUSDT": {"futures_trades": 1, "futures_orders": 0}}
+
+
+def test_sequencia_do_usuario_travada_antes_de_inserir_trades(monkeypatch):
+    from models import SyncCursor
+
+    ordem = []
+    travar, upsert = trade_sync._travar_usuario, trade_sync._upsert
+    monkeypatch.setattr(trade_sync, "_travar_usuario", lambda s, u: (ordem.append("trava"), travar(s, u)))
+    monkeypatch.setattr(trade_sync, "_upsert", lambda s, m, *a, **k: (ordem.append(m.__name__), upsert(s, m, *a, **k))[1])
+    c = FakeClient()
+    c.add_trade("spot", 1)
+    c.add_trade("futures", 1)
+    sync_symbol(c, "admin", "BTCUSDT")
+    sync_symbol(c, "admin", "BTCUSDT")  # sem trades novos: não trava
+    assert ordem[:2] == ["trava", "TradeRecord"] and ordem.count("trava") == 2
+    with trade_sync.get_session() as s:
+        seq = s.query(SyncCursor).filter_by(user_id="admin", kind="seq").one()
+        assert seq.next_id == 2
+    # a linha da sequência não é um símbolo a sincronizar
+    assert set(sync_user(c, "admin")) == {"BTCUSDT"}
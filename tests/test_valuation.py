@@ -0,0 +1,102 @@
+import time
+
+import pytest
+
+from services.price_service import PriceSnapshot
+from services.valuation import build_conversion_paths, value_balances
+
+
+def _sym(base, quote, status="TRADING"):
+    return {"symbol": base + quote, "baseAsset": base, "quoteAsset": quote, "status": status}
+
+
+SYMBOLS = [
+    _sym("BTC", "USDT"), _sym("ETH", "USDT"), _sym("BNB", "USDT"),
+    _sym("XYZ", "BTC"),            # só via ponte BTC
+    _sym("ABC", "ETH"),            # só via ponte ETH
+    _sym("USDT", "BRL"),           # par invertido
+    _sym("OLD", "USDT", "BREAK"),  # fora de negociação
+]
+PRICES = {"BTCUSDT": 50000.0, "ETHUSDT": 2500.0, "BNBUSDT": 500.0,
+          "XYZBTC": 0.0001, "ABCETH": 0.01, "USDTBRL": 5.0, "OLDUSDT": 1.0}
+
+
+def test_caminhos_diretos_invertidos_e_por_ponte():
+    paths = build_conversion_paths(SYMBOLS)
+    v = value_balances(
+        {"USDT": 10, "BTC": 0.5, "XYZ": 100, "ABC": 4, "BRL": 50, "LDBTC": 0.1, "OLD": 3},
+        PRICES, paths,
+    )
+    assert v.per_asset["USDT"] == 10
+    assert v.per_asset["BTC"] == pytest.approx(25000)
+    assert v.per_asset["XYZ"] == pytest.approx(100 * 0.0001 * 50000)
+    assert v.per_asset["ABC"] == pytest.approx(4 * 0.01 * 2500)
+    assert v.per_asset["BRL"] == pytest.approx(10)
+    assert v.per_asset["LDBTC"] == pytest.approx(5000)
+    assert v.unpriced == ["OLD"]
+    assert v.total_usdt == pytest.approx(sum(v.per_asset.values()))
+
+
+def test_centenas_de_ativos_abaixo_de_1ms():
+    symbols = [_sym("BTC", "USDT")] + [_sym(f"A{i}", "BTC") for i in range(500)]
+    prices = {"BTCUSDT": 50000.0, **{f"A{i}BTC": 1e-5 for i in range(500)}}
+    paths = build_conversion_paths(symbols)
+    balances = {f"A{i}": 1.0 for i in range(500)}
+    value_balances(balances, prices, paths)
+    t0 = time.perf_counter()
+    v = value_balances(balances, prices, paths)
+    assert time.perf_counter() - t0 < 0.001 * 5  # margem para máquinas de CI lentas
+    assert len(v.per_asset) == 500
+
+
+def test_dashboard_soma_todos_os_ativos(monkeypatch):
+    import app as app_module
+
+    class FakeClient:
+        def get_account(self):
+            return {"balances": [{"asset": "USDT", "free": "10", "locked": "0"},
+                                 {"asset": "BTC", "free": "0.5", "locked": "0"}]}
+
+        def get_open_orders(self):
+            return [{}]
+
+        def futures_account_balance(self):
+            return [{"asset": "USDT", "balance": "5"}]
+
+        def futures_get_open_orders(self):
+            return []
+
+    captured = {}
+    monkeypatch.setattr(app_module, "get_binance_client", lambda: FakeClient())
+    monkeypatch.setattr(app_module.price_service, "snapshot", lambda: PriceSnapshot(PRICES, time.time()))
+    monkeypatch.setattr(app_module, "conversion_paths", lambda: build_conversion_paths(SYMBOLS))
+    monkeypatch.setattr(app_module, "render_template", lambda *a, **k: captured.update(k) or "ok")
+
+    monkeypatch.setitem(app_module.app.config, "LOGIN_DISABLED", True)
+    resp = app_module.app.test_client().get("/painel/operacao")
+    assert resp.status_code == 200
+    assert captured["saldo_total_usdt"] == "25015"
+    assert captured["spot_rows"][0]["asset"] == "BTC"
+    assert captured["abertas"] == 1
+
+
+def test_falha_no_exchange_info_espera_antes_de_tentar_de_novo(monkeypatch):
+    from services import valuation
+
+    chamadas = []
+
+    class SessaoQuebrada:
+        def get(self, url, timeout):
+            chamadas.append(url)
+            raise ConnectionError("fora do ar")
+
+    monkeypatch.setattr(valuation.price_service, "session", SessaoQuebrada())
+    monkeypatch.setattr(valuation, "_PATHS", valuation.ConversionPaths())
+    monkeypatch.setattr(valuation, "_retry_at", 0.0)
+    for _ in range(5):
+        assert valuation.conversion_paths().paths == {}
+    assert len(chamadas) == 1
+
+    monkeypatch.setattr(valuation, "_retry_at", time.monotonic() - 1)  # passou o back-off
+    valuation.conversion_paths()
+    assert len(chamadas) == 2
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from inteligencia_financeira.utils import (
+    calcular_macd,
+    calcular_media_movel,
+    calcular_performance,
+    calcular_rsi,
+)
+from inteligencia_financeira.vetorizado import (
+    macd_matriz,
+    media_movel_matriz,
+    performance_matriz,
+    rsi_matriz,
+)
+
+
+@pytest.fixture
+def precos():
+    rng = np.random.default_rng(3)
+    return 100 * np.cumprod(1 + rng.normal(0, 0.01, (12, 120)), axis=1)
+
+
+def test_series_completas_batem_com_escalar(precos):
+    rsi = rsi_matriz(precos, [7, 14])
+    mm = media_movel_matriz(precos, [5, 20])
+    macd, sinal = macd_matriz(precos, [(12, 26, 9), (5, 35, 5)])
+    perf = performance_matriz(precos)
+    assert rsi.shape == mm.shape == (2, 12, 120)
+    assert macd.shape == sinal.shape == (2, 12, 120)
+    for s in (0, 11):
+        for t in (0, 6, 7, 30, 119):
+            v = precos[s, : t + 1].tolist()
+            assert rsi[1, s, t] == pytest.approx(calcular_rsi(v, 14), abs=1e-9)
+            assert mm[1, s, t] == pytest.approx(calcular_media_movel(v, 20), rel=1e-12)
+            assert (macd[1, s, t], sinal[1, s, t]) == calcular_macd(v, 5, 35, 5)
+            assert perf[s, t] == pytest.approx(calcular_performance(v))
+
+
+def test_sem_dados_suficientes_devolve_zero():
+    assert rsi_matriz([1.0, 2.0], [14]).sum() == 0
+    assert media_movel_matriz([1.0, 2.0], [3]).sum() == 0
+    assert rsi_matriz([3.0, 2.0, 1.0], [2])[0, 0, -1] == 0.0
+    assert rsi_matriz([1.0, 2.0, 3.0], [2])[0, 0, -1] == 100.0
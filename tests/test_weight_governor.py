@@ -0,0 +1,64 @@
+import pytest
+
+from services.weight_governor import (
+    BACKGROUND, ORDER, READ, BucketSpec, RateLimitShed, WeightGovernor, endpoint_weight,
+)
+
+
+def _gov(tmp_path):
+    buckets = {"spot_weight": BucketSpec("spot_weight", 100 / 0.85, 60, "x-mbx-used-weight-1m")}
+    return WeightGovernor(path=str(tmp_path / "gov.db"), buckets=buckets)
+
+
+def test_peso_por_endpoint():
+    assert endpoint_weight("GET", "/api/v3/openOrders", has_symbol=True) == 6
+    assert endpoint_weight("GET", "/api/v3/openOrders", has_symbol=False) == 80
+    assert endpoint_weight("GET", "/api/v3/order", True) == 4
+    assert endpoint_weight("POST", "/api/v3/order", True) == 1
+    assert endpoint_weight("GET", "/api/v3/desconhecido", False) == 1
+
+
+def test_leituras_deixam_reserva_para_ordens(tmp_path):
+    gov = _gov(tmp_path)
+    gov.acquire({"spot_weight": 80}, READ)
+    # leitura teria que invadir a reserva de 15% -> descartada sem esperar
+    with pytest.raises(RateLimitShed):
+        gov.acquire({"spot_weight": 10}, READ, max_wait_s=0)
+    with pytest.raises(RateLimitShed):
+        gov.acquire({"spot_weight": 1}, BACKGROUND, max_wait_s=0)
+    gov.acquire({"spot_weight": 10}, ORDER, max_wait_s=0)
+    assert gov.utilisation()["spot_weight"]["utilisation"] == pytest.approx(0.9, abs=0.01)
+
+
+def test_cabecalhos_e_ban(tmp_path):
+    gov = _gov(tmp_path)
+    gov.observe(("spot_weight",), 200, {"x-mbx-used-weight-1m": "95"})
+    assert gov.try_acquire({"spot_weight": 10}, ORDER) > 0
+    gov.observe(("spot_weight",), 429, {"Retry-After": "30"})
+    assert gov.utilisation()["spot_weight"]["banned_for_s"] == pytest.approx(30, abs=1)
+    assert gov.try_acquire({"spot_weight": 1}, ORDER) >= 29
+
+
+def test_buckets_separados_por_host(tmp_path):
+    gov = _gov(tmp_path)
+    gov.acquire({"spot_weight": 80}, ORDER, escopo="testnet.binance.vision")
+    # a testnet gastou a cota dela; a produção continua cheia
+    assert gov.try_acquire({"spot_weight": 80}, READ, escopo="api.binance.com") == 0
+    uso = gov.utilisation()
+    assert uso["spot_weight@testnet.binance.vision"]["utilisation"] == pytest.approx(0.8, abs=0.01)
+    assert uso["spot_weight@api.binance.com"]["utilisation"] == pytest.approx(0.8, abs=0.01)
+    assert uso["spot_weight"]["utilisation"] == pytest.approx(0.0, abs=0.01)
+
+
+def test_jobs_do_agendador_rodam_em_background(monkeypatch):
+    import tasks
+    from services import weight_governor
+
+    vistos = []
+    monkeypatch.setattr(tasks, "obter_dados_mercado", lambda *a: vistos.append(weight_governor._priority.get()) or [])
+    monkeypatch.setattr(tasks, "get_client", lambda u: object())
+    monkeypatch.setattr(tasks, "sync_user", lambda c, u: vistos.append(weight_governor._priority.get()))
+    tasks.mercado("BTCUSDT", "1h")
+    tasks.sincronizar_historico("ana")
+    assert vistos == [BACKGROUND, BACKGROUND]
+    assert weight_governor._priority.get() == READ
@@ -2,7 +2,8 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from services.binance_client import get_test_client
-from models import UserCredential, OrderHistory, db
+from models import UserCredential, db
+from services.order_history import contexto_historico
 
 bp_api = Blueprint("usuario_api", __name__, url_prefix="/usuario")
 
@@ -34,5 +35,4 @@ def testar_api():
 @bp_api.route("/historico")
 @login_required
 def historico():
-    ordens = OrderHistory.query.filter_by(user_id=current_user.id).order_by(OrderHistory.created_at.desc()).all()
-    return render_template("usuarios/historico.html", ordens=ordens)
\ No newline at end of file
+    return render_template("usuarios/historico.html", **contexto_historico(current_user.id, request.args))
\ No newline at end of file